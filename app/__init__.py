@@ -13,7 +13,11 @@ from app.base_datos import GestorDB
 logger = logging.getLogger(__name__)
 
 
-def create_app(config_name=None):
+def create_app(config_name=None, start_monitoring=True):
+    """
+    Crea la aplicación. Con ``start_monitoring=False`` (scripts, pruebas) no
+    se inicia ningún servicio de monitoreo, independientemente de MONITORING_MODE.
+    """
     app = Flask(__name__)
 
     # --- Configuración ---
@@ -59,6 +63,7 @@ def create_app(config_name=None):
     # --- SocketIO ---
     cors_origins = app.config.get('CORS_ORIGINS', ['*'])
     socketio.init_app(app, cors_allowed_origins=cors_origins, async_mode='threading')
+    from app.routes import monitoreo_socket  # noqa: F401  (registra los handlers)
 
     # --- Blueprints ---
     from app.routes.auth import auth_bp
@@ -91,11 +96,31 @@ def create_app(config_name=None):
     app.register_blueprint(user_mgmt_bp)
 
     # --- Monitoreo en segundo plano ---
+    monitoring_mode = app.config.get('MONITORING_MODE', 'embedded') if start_monitoring else 'off'
     try:
-        from app.services.monitoring_service import MonitoringService
-        monitor_service = MonitoringService()
-        monitor_service.start()
-        logger.info("Servicio de monitoreo iniciado")
+        if monitoring_mode == 'subscribe':
+            # El sondeo corre en `python -m app.services.poller`; aquí solo se reemite
+            from app.services.event_bus import parse_address
+            from app.services.poller import PollerSubscriber
+            if not app.config.get('POLLER_AUTHKEY'):
+                raise RuntimeError("POLLER_AUTHKEY no definido")
+            monitor_service = PollerSubscriber(parse_address(app.config['POLLER_ADDRESS']),
+                                               app.config['POLLER_AUTHKEY'].encode())
+        elif monitoring_mode == 'embedded' and app.config.get('MONITOR_SHARDS', 0) > 0:
+            # La flota se sondea en procesos aparte; aquí solo se reemiten eventos
+            from app.services.monitor_shards import ShardedMonitoringService
+            monitor_service = ShardedMonitoringService(app.config['MONITOR_SHARDS'])
+        elif monitoring_mode == 'embedded':
+            from app.services.monitoring_service import MonitoringService
+            monitor_service = MonitoringService()
+        else:
+            monitor_service = None
+            logger.info("Monitoreo deshabilitado en este proceso (modo %s)", monitoring_mode)
+
+        if monitor_service is not None:
+            monitor_service.start()
+            app.monitor_service = monitor_service
+            logger.info("Servicio de monitoreo iniciado (modo %s)", monitoring_mode)
     except Exception as e:
         logger.warning("No se pudo iniciar el servicio de monitoreo: %s", e)
 
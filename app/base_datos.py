@@ -1095,8 +1095,8 @@ class GestorDB:
             with self.pool.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
-                    INSERT INTO monitoreo_config (ip, port, slave_id, nombre, protocolo, snmp_community, snmp_port)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    INSERT INTO monitoreo_config (ip, port, slave_id, nombre, protocolo, snmp_community, snmp_port, sitio)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                 ''', (
                     datos['ip'],
                     int(datos.get('port', 502)),
@@ -1104,7 +1104,8 @@ class GestorDB:
                     datos.get('nombre', 'UPS'),
                     datos.get('protocolo', 'modbus'),
                     datos.get('snmp_community', 'public'),
-                    int(datos.get('snmp_port', 161))
+                    int(datos.get('snmp_port', 161)),
+                    datos.get('sitio') or None
                 ))
                 return True
         except Exception as e:
@@ -1122,6 +1123,71 @@ class GestorDB:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM monitoreo_config WHERE id = %s", (id_device,))
 
+    def guardar_monitoreo_ups(self, filas):
+        """Inserta o actualiza (por ip/port/slave_id) equipos con todas sus columnas."""
+        with self.pool.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT INTO monitoreo_config
+                    (ip, port, slave_id, nombre, protocolo, snmp_community, snmp_port, snmp_version, ups_type)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (ip, port, slave_id) DO UPDATE SET
+                    nombre = EXCLUDED.nombre,
+                    protocolo = EXCLUDED.protocolo,
+                    snmp_community = EXCLUDED.snmp_community,
+                    snmp_port = EXCLUDED.snmp_port,
+                    snmp_version = EXCLUDED.snmp_version,
+                    ups_type = EXCLUDED.ups_type
+            ''', [(
+                datos['ip'],
+                int(datos.get('port', 502)),
+                int(datos.get('slave_id', 1)),
+                datos.get('nombre', 'UPS'),
+                datos.get('protocolo', 'modbus'),
+                datos.get('snmp_community', 'public'),
+                int(datos.get('snmp_port', 161)),
+                int(datos.get('snmp_version', 1)),
+                datos.get('ups_type', 'invt_enterprise'),
+            ) for datos in filas])
+            return len(filas)
+
+    def tocar_monitoreo_ups(self, id_device):
+        """Actualiza ``updated_at`` del equipo: los pollers reconstruyen su sesión SNMP."""
+        with self.pool.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE monitoreo_config SET updated_at = NOW() WHERE id = %s", (id_device,))
+
+    def eliminar_monitoreo_por_prefijo(self, prefijo):
+        """Borra los equipos cuyo nombre empieza con ``prefijo``; devuelve cuántos."""
+        with self.pool.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM monitoreo_config WHERE nombre LIKE %s", (prefijo + '%',))
+            return cursor.rowcount
+
+    def obtener_capacidades_snmp(self, id_device):
+        """Perfil de capacidades SNMP de un equipo (migración 010) o None."""
+        with self.pool.get_connection() as conn:
+            cursor = conn.cursor(row_factory=self.pool.get_row_factory())
+            cursor.execute("SELECT * FROM monitoreo_capacidades WHERE device_id = %s", (id_device,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    def guardar_capacidades_snmp(self, id_device, profile, supported, missing, source, probed_at):
+        with self.pool.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO monitoreo_capacidades
+                    (device_id, profile, supported_oids, missing_oids, source, probed_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, NOW())
+                ON CONFLICT (device_id) DO UPDATE SET
+                    profile = EXCLUDED.profile,
+                    supported_oids = EXCLUDED.supported_oids,
+                    missing_oids = EXCLUDED.missing_oids,
+                    source = EXCLUDED.source,
+                    probed_at = EXCLUDED.probed_at,
+                    updated_at = NOW()
+            ''', (id_device, profile, list(supported), list(missing), source, probed_at))
+
     # =========================================================================
     # GESTIÓN DE USUARIOS
     # =========================================================================
@@ -0,0 +1,17 @@
+-- Migración 009: updated_at en monitoreo_config
+-- Los pollers reconstruyen la sesión SNMP de un equipo solo cuando cambia su
+-- configuración. El trigger cubre también los UPDATE hechos por scripts.
+ALTER TABLE monitoreo_config
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION monitoreo_config_touch() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_monitoreo_config_touch ON monitoreo_config;
+CREATE TRIGGER trg_monitoreo_config_touch
+    BEFORE UPDATE ON monitoreo_config
+    FOR EACH ROW EXECUTE FUNCTION monitoreo_config_touch();
@@ -0,0 +1,14 @@
+-- Migración 010: perfil de capacidades SNMP por equipo
+-- OIDs del perfil del cliente (ups_mib_standard / hybrid) que existen o no en
+-- cada UPS. Lo siembra la auto-detección (SNMPScanner), lo refinan las
+-- respuestas del polling y se vuelve a sondear periódicamente (cambios de
+-- firmware). El polling solo pide los OIDs soportados.
+CREATE TABLE IF NOT EXISTS monitoreo_capacidades (
+    device_id INTEGER PRIMARY KEY REFERENCES monitoreo_config(id) ON DELETE CASCADE,
+    profile TEXT NOT NULL,
+    supported_oids TEXT[] NOT NULL DEFAULT '{}',
+    missing_oids TEXT[] NOT NULL DEFAULT '{}',
+    source TEXT NOT NULL DEFAULT 'probe',   -- 'scanner' | 'probe' | 'poll'
+    probed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
@@ -0,0 +1,56 @@
+-- Migración 011: historial de muestras en PostgreSQL (alternativa a InfluxDB)
+-- Una fila por (instante, equipo, métrica), particionada por rango de tiempo.
+-- Las particiones (por día en ups_samples y ups_samples_1m, por mes en los
+-- rollups de 15 min y 1 h) las crea y las elimina por retención
+-- app/services/pg_telemetry.py; esta migración solo define las tablas padre.
+CREATE TABLE IF NOT EXISTS ups_samples (
+    ts TIMESTAMPTZ NOT NULL,
+    device_id INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    value DOUBLE PRECISION NOT NULL
+) PARTITION BY RANGE (ts);
+
+CREATE INDEX IF NOT EXISTS idx_ups_samples_device ON ups_samples (device_id, metric, ts);
+CREATE INDEX IF NOT EXISTS idx_ups_samples_ts ON ups_samples USING BRIN (ts);
+
+-- Rollups: min/max/promedio por métrica y bucket. ``samples`` es la cantidad de
+-- muestras crudas del bucket (pondera el promedio al agregar el nivel siguiente)
+CREATE TABLE IF NOT EXISTS ups_samples_1m (
+    bucket TIMESTAMPTZ NOT NULL,
+    device_id INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    min_value DOUBLE PRECISION NOT NULL,
+    max_value DOUBLE PRECISION NOT NULL,
+    avg_value DOUBLE PRECISION NOT NULL,
+    samples INTEGER NOT NULL,
+    PRIMARY KEY (device_id, metric, bucket)
+) PARTITION BY RANGE (bucket);
+
+CREATE TABLE IF NOT EXISTS ups_samples_15m (
+    bucket TIMESTAMPTZ NOT NULL,
+    device_id INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    min_value DOUBLE PRECISION NOT NULL,
+    max_value DOUBLE PRECISION NOT NULL,
+    avg_value DOUBLE PRECISION NOT NULL,
+    samples INTEGER NOT NULL,
+    PRIMARY KEY (device_id, metric, bucket)
+) PARTITION BY RANGE (bucket);
+
+CREATE TABLE IF NOT EXISTS ups_samples_1h (
+    bucket TIMESTAMPTZ NOT NULL,
+    device_id INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    min_value DOUBLE PRECISION NOT NULL,
+    max_value DOUBLE PRECISION NOT NULL,
+    avg_value DOUBLE PRECISION NOT NULL,
+    samples INTEGER NOT NULL,
+    PRIMARY KEY (device_id, metric, bucket)
+) PARTITION BY RANGE (bucket);
+
+-- Hasta dónde está agregado cada nivel (los rollups se recalculan por tramos)
+CREATE TABLE IF NOT EXISTS ups_samples_rollup_estado (
+    nivel TEXT PRIMARY KEY,
+    hasta TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
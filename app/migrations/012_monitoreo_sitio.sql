@@ -0,0 +1,5 @@
+-- Migración 012: sitio de cada equipo monitoreado
+-- Agrupa los equipos para las suscripciones Socket.IO por sitio (sala
+-- "site:<sitio>"): un cliente recibe solo los equipos del sitio que mira.
+ALTER TABLE monitoreo_config
+ADD COLUMN IF NOT EXISTS sitio TEXT;
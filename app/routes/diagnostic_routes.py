@@ -3,13 +3,18 @@ Rutas de Diagnóstico de Red y UPS
 Herramientas integradas para probar conectividad y protocolos
 """
 
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, Response, render_template, request, jsonify, send_file, stream_with_context
 import asyncio
+import json
+import logging
+import os
 import socket
 import subprocess
 import platform
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 diagnostic_bp = Blueprint('diagnostic', __name__)
 
 
@@ -214,7 +219,7 @@ def test_modbus():
         return jsonify({'error': 'IP requerida'}), 400
     
     try:
-        from pymodbus.client import ModbusTcpClient
+        from app.services.modbus_pool import modbus_pool, ModbusConnectionUnavailable
         
         output_lines = [
             f'🔍 Probando conexión Modbus TCP...',
@@ -223,30 +228,39 @@ def test_modbus():
             ''
         ]
         
-        # Crear cliente Modbus
-        client = ModbusTcpClient(ip, port=int(port), timeout=3)
+        # Reutiliza la conexión persistente del monitor si ya existe
+        async def run_test():
+            conn = modbus_pool.get(ip, int(port), int(slave_id))
+            reused = conn.connected
+            try:
+                # Prueba manual: ignorar el backoff del monitor
+                async with conn.lock:
+                    await conn.ensure_connected(force=True)
+            except ModbusConnectionUnavailable as e:
+                return False, reused, None, str(e), conn.to_dict()
+            try:
+                registers = await conn.read_holding_registers(0, 1)
+                read_error = None
+            except Exception as e:
+                registers, read_error = None, str(e)
+            return True, reused, registers, read_error, conn.to_dict()
         
-        # Intentar conexión
-        connection = client.connect()
+        connection, reused, registers, detail, conn_stats = modbus_pool.run(run_test(), timeout=10)
         
         if connection:
             output_lines.append(f'✅ Conexión Modbus establecida!')
+            if reused:
+                output_lines.append(f'♻️  Socket reutilizado del pool (reconexiones: {conn_stats["reconnects"]})')
             
             # Intentar leer algunos registros de prueba
-            try:
-                # Leer registro 0 (común en muchos dispositivos)
-                result = client.read_holding_registers(0, 1, slave=int(slave_id))
-                
-                if not result.isError():
-                    output_lines.append(f'✅ Lectura de registro exitosa')
-                    output_lines.append(f'   Registro 0: {result.registers[0]}')
-                else:
-                    output_lines.append(f'⚠️  Registro no disponible (normal si no existe)')
-                    
-            except Exception as e:
-                output_lines.append(f'⚠️  No se pudieron leer registros: {e}')
-            
-            client.close()
+            if registers:
+                output_lines.append(f'✅ Lectura de registro exitosa')
+                output_lines.append(f'   Registro 0: {registers[0]}')
+                output_lines.append(f'   RTT: {conn_stats["last_rtt_ms"]} ms')
+            elif detail:
+                output_lines.append(f'⚠️  No se pudieron leer registros: {detail}')
+            else:
+                output_lines.append(f'⚠️  Registro no disponible (normal si no existe)')
             
             output_lines.extend([
                 '',
@@ -261,11 +275,13 @@ def test_modbus():
                 'output': '\n'.join(output_lines),
                 'ip': ip,
                 'port': port,
-                'slave_id': slave_id
+                'slave_id': slave_id,
+                'connection': conn_stats
             })
         else:
             output_lines.extend([
                 f'❌ No se pudo conectar via Modbus TCP',
+                f'   {detail}',
                 '',
                 'Posibles causas:',
                 '- Puerto Modbus no habilitado en el UPS',
@@ -279,7 +295,8 @@ def test_modbus():
                 'output': '\n'.join(output_lines),
                 'ip': ip,
                 'port': port,
-                'slave_id': slave_id
+                'slave_id': slave_id,
+                'connection': conn_stats
             })
             
     except ImportError:
@@ -299,78 +316,62 @@ def test_modbus():
 
 @diagnostic_bp.route('/api/diagnostic/scan', methods=['POST'])
 def scan_ip_range():
-    """Escaneo rápido de IPs en un rango"""
-    data = request.json
-    network = data.get('network', '192.168.0')  # ej: 192.168.0
+    """
+    Inicia un descubrimiento asíncrono de la red (Modbus 502, SNMP 161, HTTP 80).
+
+    Acepta ``cidr`` ('192.168.0.0/24') o el formato anterior ``network`` +
+    ``start``/``end``. Responde de inmediato con el id del trabajo; los hosts
+    llegan por Socket.IO (discovery_host / discovery_progress / discovery_done)
+    y el estado se consulta en /api/diagnostic/scan/<job_id>.
+    """
+    from app.services.discovery import discovery_service, parse_targets
+
+    data = request.json or {}
+    cidr = data.get('cidr')
+    network = data.get('network', '' if cidr else '192.168.0')  # ej: 192.168.0
     start = data.get('start', 1)
     end = data.get('end', 254)
-    
+
     try:
-        output_lines = [
-            f'🔍 Escaneando red {network}.{start}-{end}...',
-            f'Buscando hosts activos y puertos comunes (502, 161)',
-            ''
-        ]
-        
-        hosts_found = []
-        
-        # Escaneo simple de ping
-        for i in range(int(start), min(int(end) + 1, 255)):
-            ip = f'{network}.{i}'
-            
-            # Ping simple
-            param = '-n' if platform.system().lower() == 'windows' else '-c'
-            command = ['ping', param, '1', '-w', '500', ip]
-            
-            try:
-                result = subprocess.run(
-                    command,
-                    capture_output=True,
-                    text=True,
-                    timeout=1
-                )
-                
-                if result.returncode == 0:
-                    output_lines.append(f'✅ {ip} - ACTIVO')
-                    
-                    # Probar puertos comunes
-                    ports_info = []
-                    for port in [502, 161, 80]:
-                        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                        sock.settimeout(0.5)
-                        if sock.connect_ex((ip, port)) == 0:
-                            port_name = {502: 'Modbus', 161: 'SNMP', 80: 'HTTP'}.get(port, str(port))
-                            ports_info.append(f'{port_name}:{port}')
-                        sock.close()
-                    
-                    if ports_info:
-                        output_lines.append(f'   Puertos abiertos: {", ".join(ports_info)}')
-                        
-                    hosts_found.append({
-                        'ip': ip,
-                        'ports': ports_info
-                    })
-                    
-            except (subprocess.TimeoutExpired, Exception):
-                continue
-        
-        output_lines.extend([
-            '',
-            f'─' * 50,
-            f'Total de hosts encontrados: {len(hosts_found)}'
-        ])
-        
-        return jsonify({
-            'success': True,
-            'output': '\n'.join(output_lines),
-            'hosts': hosts_found
-        })
-        
-    except Exception as e:
+        targets = parse_targets(cidr=cidr, network=network, start=start, end=end)
+        label = cidr or f'{network}.{start}-{end}'
+        job = discovery_service.start(targets, label,
+                                      rate=data.get('rate'),
+                                      timeout=data.get('timeout'),
+                                      community=data.get('community', 'public'))
+    except ValueError as e:
         return jsonify({
             'success': False,
-            'output': f'❌ Error en escaneo: {str(e)}'
-        })
+            'output': f'❌ Rango inválido: {str(e)}'
+        }), 400
+
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'total': len(targets),
+        'output': f'🔍 Escaneando {label} ({len(targets)} hosts, {job.rate:g} hosts/s)...'
+    }), 202
+
+
+@diagnostic_bp.route('/api/diagnostic/scan/<job_id>', methods=['GET'])
+def scan_status(job_id):
+    """Estado y hosts encontrados de un descubrimiento"""
+    from app.services.discovery import discovery_service
+
+    job = discovery_service.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(job.snapshot())
+
+
+@diagnostic_bp.route('/api/diagnostic/scan/<job_id>', methods=['DELETE'])
+def scan_cancel(job_id):
+    """Cancela un descubrimiento en curso"""
+    from app.services.discovery import discovery_service
+
+    if not discovery_service.cancel(job_id):
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado o terminado'}), 404
+    return jsonify({'success': True})
 
 
 @diagnostic_bp.route('/api/diagnostic/route', methods=['POST'])
@@ -454,6 +455,14 @@ def snmp_autodetect():
         config = loop.run_until_complete(run_detection())
         loop.close()
         
+        # Sembrar el perfil de capacidades de los equipos ya configurados con esa IP
+        try:
+            from app.base_datos import GestorDB
+            from app.services.snmp_capabilities import seed_from_scan
+            seed_from_scan(GestorDB(), config)
+        except Exception as e:
+            logger.warning(f"No se pudo sembrar capacidades SNMP de {ip}: {e}")
+        
         # Formatear resultados para la terminal
         output_lines = []
         for log_entry in scanner.results:
@@ -477,79 +486,84 @@ def snmp_autodetect():
 
 
 @diagnostic_bp.route('/api/diagnostic/snmp-walk', methods=['POST'])
-async def snmp_walk():
+def snmp_walk():
     """
-    Realiza un SNMP Walk (secuencia de GetNext) para listar OIDs disponibles.
-    Limitado a 50 resultados por seguridad.
+    SNMP Walk de un subárbol completo (GETBULK en v2c, GETNEXT en v1).
+
+    Sin límite de filas salvo ``max_rows``. Con ``stream: 'ndjson'`` (por
+    defecto) responde una línea JSON por OID y una línea final con el resumen
+    (``done: true``); con ``stream: 'socketio'`` y ``sid`` (el ``socket.id``
+    del cliente) responde 202 con ``walk_id`` y las páginas llegan solo a esa
+    sesión por los eventos snmp_walk_rows / snmp_walk_done. Los walks
+    completos se guardan en disco (``save: false`` para no guardar).
     """
-    data = request.json
-    ip = data.get('ip')
-    port = int(data.get('port', 161))
-    community = data.get('community', 'public')
-    version = int(data.get('version', 0)) # Default v1 (0) o v2c (1)
-    # Default: .1.3.6.1.4.1 (enterprises) para buscar cosas custom
-    # O .1.3.6.1.2.1 (MIB-2) para estandar
-    root_oid_str = data.get('oid', '1.3.6.1.2.1') 
+    from app.services.snmp_runtime import snmp_runtime
+    from app.services.snmp_walk import SnmpWalk, iter_walk, publish_walk
 
+    data = request.json or {}
+    ip = data.get('ip')
+    if not ip:
+        return jsonify({'success': False, 'error': 'IP requerida'}), 400
     try:
-        # Importar aqui para evitar ciclos y solo cargar si se usa
-        from pysnmp.hlapi.v3arch.asyncio import next_cmd, SnmpEngine, CommunityData, UdpTransportTarget, ContextData, ObjectType, ObjectIdentity
-        
-        results = []
-        limit = 50 # Limite estricto para no saturar
-        
-        # Objeto raiz
-        engine = SnmpEngine()
-        auth = CommunityData(community, mpModel=version)
-        transport = await UdpTransportTarget.create((ip, port), timeout=2.0, retries=0)
-        context = ContextData()
-        
-        # Iniciar desde el OID raiz solicitado
-        # NOTA: next_cmd espera un objeto ObjectType(ObjectIdentity(oid))
-        current_oid = ObjectType(ObjectIdentity(root_oid_str))
-        
-        # Bucle GetNext manual para simular Walk
-        for _ in range(limit):
-            errorIndication, errorStatus, errorIndex, varBinds = await next_cmd(
-                engine, auth, transport, context, current_oid
-            )
-            
-            if errorIndication:
-                return jsonify({'success': False, 'error': f"Error de conexión: {errorIndication}"})
-            
-            if errorStatus:
-                # Fin de MIB o error
-                if str(errorStatus) == 'noSuchName':
-                    break # Fin
-                return jsonify({'success': False, 'error': f"Error SNMP: {errorStatus.prettyPrint()}"})
-                
-            if not varBinds:
-                break
-            
-            # Procesar resultado (usualmente un solo varBind)
-            varBind = varBinds[0]
-            oid_obj = varBind[0]
-            val_obj = varBind[1]
-            
-            oid_str = str(oid_obj)
-            val_str = val_obj.prettyPrint()
-            
-            # Guardar
-            results.append({
-                'oid': oid_str,
-                'value': val_str
-            })
-            
-            # Preparar siguiente iteración usando el OID obtenido
-            current_oid = ObjectType(ObjectIdentity(oid_str))
-            
-        return jsonify({
-            'success': True,
-            'results': results,
-            'count': len(results),
-            'limit_reache': len(results) >= limit
-        })
+        walk = SnmpWalk(
+            ip,
+            # Default: .1.3.6.1.2.1 (MIB-2); .1.3.6.1.4.1 (enterprises) para buscar cosas custom
+            data.get('oid', '1.3.6.1.2.1'),
+            port=data.get('port', 161),
+            community=data.get('community', 'public'),
+            version=data.get('version', 0),  # Default v1 (0) o v2c (1)
+            max_repetitions=data.get('max_repetitions'),
+            timeout=data.get('timeout', 2.0),
+            max_rows=data.get('max_rows', 0),
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    save = bool(data.get('save', True))
 
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+    if data.get('stream') == 'socketio':
+        sid = data.get('sid')
+        if not sid:
+            return jsonify({'success': False, 'error': 'sid requerido para stream socketio'}), 400
+        snmp_runtime.submit(publish_walk(walk, sid, save=save))
+        return jsonify({'success': True, 'walk_id': walk.id}), 202
+
+    def generate():
+        for page in iter_walk(walk, save=save):
+            for oid, kind, value in page:
+                yield json.dumps({'oid': oid, 'type': kind, 'value': value}) + '\n'
+        yield json.dumps({'done': True, 'success': walk.end not in ('timeout', 'error'),
+                          **walk.summary()}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@diagnostic_bp.route('/api/diagnostic/snmp-walk/files', methods=['GET'])
+def snmp_walk_files():
+    """Walks completos guardados en disco"""
+    from app.services.snmp_walk import list_walks
+
+    return jsonify({'files': list_walks()})
+
+
+@diagnostic_bp.route('/api/diagnostic/snmp-walk/files/<name>', methods=['GET'])
+def snmp_walk_file(name):
+    """
+    Filas de un walk guardado, paginadas con ``offset``/``limit`` (máx. 5000);
+    ``?download=1`` descarga el archivo comprimido.
+    """
+    from app.services.snmp_walk import read_walk, walk_path
+
+    try:
+        path = walk_path(name)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not os.path.isfile(path):
+        return jsonify({'error': 'Walk no encontrado'}), 404
+    if request.args.get('download'):
+        return send_file(path, as_attachment=True, download_name=name)
 
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = min(max(1, request.args.get('limit', 1000, type=int)), 5000)
+    meta, rows, total = read_walk(path, offset=offset, limit=limit)
+    return jsonify({'file': name, 'meta': meta, 'total': total,
+                    'offset': offset, 'limit': limit, 'rows': rows})
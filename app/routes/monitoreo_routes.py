@@ -1,7 +1,12 @@
+import logging
+from datetime import datetime, timezone
+
 from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_login import login_required
 from app.permisos import permiso_requerido
 
+logger = logging.getLogger(__name__)
+
 monitoreo_bp = Blueprint('monitoreo', __name__)
 
 
@@ -47,3 +52,129 @@ def delete_device(id_device):
     db = current_app.db
     db.eliminar_monitoreo_ups(id_device)
     return jsonify({'status': 'ok'})
+
+
+def _modbus_stats(monitor_service, key):
+    """
+    Una parte (cycle, cadence, connections) de ``get_stats_snapshot``: se
+    toma en el loop Modbus, que modifica esos diccionarios mientras sondea.
+    """
+    try:
+        snapshot = monitor_service.modbus_monitor.get_stats_snapshot()
+    except Exception as e:
+        logger.warning(f"No se pudieron recolectar estadísticas Modbus: {e}")
+        return jsonify({'error': 'Estadísticas Modbus no disponibles'}), 503
+    return jsonify(snapshot[key])
+
+
+@monitoreo_bp.route('/api/monitoreo/modbus/stats', methods=['GET'])
+@login_required
+@permiso_requerido('scada')
+def modbus_cycle_stats():
+    """Ciclo objetivo vs real de cada dispositivo Modbus."""
+    monitor_service = getattr(current_app, 'monitor_service', None)
+    if monitor_service is None:
+        return jsonify({'error': 'Servicio de monitoreo no iniciado'}), 503
+    return _modbus_stats(monitor_service, 'cycle')
+
+
+@monitoreo_bp.route('/api/monitoreo/modbus/cadence', methods=['GET'])
+@login_required
+@permiso_requerido('scada')
+def modbus_cadence():
+    """Estado adaptativo (normal/alarma/estable/offline) e intervalo efectivo por grupo."""
+    monitor_service = getattr(current_app, 'monitor_service', None)
+    if monitor_service is None:
+        return jsonify({'error': 'Servicio de monitoreo no iniciado'}), 503
+    return _modbus_stats(monitor_service, 'cadence')
+
+
+@monitoreo_bp.route('/api/monitoreo/modbus/connections', methods=['GET'])
+@login_required
+@permiso_requerido('scada')
+def modbus_connection_stats():
+    """Salud de las conexiones Modbus persistentes (reconexiones, RTT, racha de errores)."""
+    monitor_service = getattr(current_app, 'monitor_service', None)
+    if monitor_service is not None:
+        return _modbus_stats(monitor_service, 'connections')
+    from app.services.modbus_pool import modbus_pool
+    return jsonify(modbus_pool.get_stats())
+
+
+@monitoreo_bp.route('/api/monitoreo/storage/stats', methods=['GET'])
+@login_required
+@permiso_requerido('scada')
+def storage_stats():
+    """Estado de los sinks de muestras de este proceso (cola, lotes escritos, spool)."""
+    from app.services.sample_sink import get_sink
+    return jsonify(get_sink().get_stats())
+
+
+@monitoreo_bp.route('/api/monitoreo/<int:id_device>/history', methods=['GET'])
+@login_required
+@permiso_requerido('scada')
+def device_history(id_device):
+    """
+    Serie histórica reducida para gráficos de tendencia.
+    Query: metric (una o varias separadas por coma), from/to (ISO 8601 o epoch;
+    por defecto la última hora), points (500) y mode (lttb | minmax).
+    """
+    from app.services.sample_history import (
+        DEFAULT_POINTS, DEFAULT_RANGE, history_store, parse_time, query_history,
+    )
+    store = history_store()
+    if store is None:
+        return jsonify({'error': 'No hay almacén de historial configurado (SAMPLE_SINKS)'}), 503
+    try:
+        end = parse_time(request.args.get('to'), datetime.now(timezone.utc))
+        start = parse_time(request.args.get('from'), end - DEFAULT_RANGE)
+        points = int(request.args.get('points', DEFAULT_POINTS))
+        metrics = [m.strip() for m in request.args.get('metric', '').split(',') if m.strip()]
+        return jsonify(query_history(store, id_device, metrics, start, end, points,
+                                     request.args.get('mode', 'lttb')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error consultando historial de {id_device}: {e}")
+        return jsonify({'error': 'Almacén de historial no disponible'}), 503
+
+
+def _recent_payload(device_id, seconds, limit):
+    from app.services.recent_samples import recent_samples
+    view = recent_samples.view(device_id, seconds, limit)
+    if view is None:
+        return None
+    updated_at, latest = recent_samples.latest(device_id)
+    payload = view.to_dict()
+    payload.update(device_id=device_id, latest=latest,
+                   updated_at=int(updated_at * 1000) if updated_at else None)
+    return payload
+
+
+def _recent_args():
+    minutes = request.args.get('minutes', type=float)
+    limit = request.args.get('limit', type=int)
+    return (minutes * 60 if minutes else None), limit
+
+
+@monitoreo_bp.route('/api/monitoreo/recent', methods=['GET'])
+@login_required
+@permiso_requerido('scada')
+def recent_all():
+    """Muestras recientes en memoria de todos los equipos (backfill del dashboard al cargar)."""
+    from app.services.recent_samples import recent_samples
+    seconds, limit = _recent_args()
+    return jsonify({str(device_id): _recent_payload(device_id, seconds, limit)
+                    for device_id in recent_samples.device_ids()})
+
+
+@monitoreo_bp.route('/api/monitoreo/<int:id_device>/recent', methods=['GET'])
+@login_required
+@permiso_requerido('scada')
+def recent_device(id_device):
+    """Muestras recientes en memoria de un equipo (?minutes=, ?limit=)."""
+    seconds, limit = _recent_args()
+    payload = _recent_payload(id_device, seconds, limit)
+    if payload is None:
+        return jsonify({'error': 'Sin muestras recientes para el equipo'}), 404
+    return jsonify(payload)
@@ -0,0 +1,84 @@
+"""
+Eventos Socket.IO del dashboard de monitoreo.
+
+Al conectarse cada cliente recibe ``ups_status`` (estado de todos los
+equipos) y nada más hasta que se suscribe con ``subscribe`` a un equipo, un
+sitio o la flota (ver ``app.services.update_rooms``). Al suscribirse recibe
+``ups_snapshot`` de esos equipos; después solo llegan sus ``ups_delta`` (ver
+``app.services.update_delta``). Si el cliente detecta un salto de ``seq``
+pide ``request_snapshot``; ``request_update`` responde con el último estado
+conocido de un equipo sin esperar al próximo ciclo de sondeo.
+"""
+
+import logging
+
+from flask import request
+from flask_socketio import emit, join_room, leave_room
+
+from app.extensions import socketio
+from app.services.update_delta import SNAPSHOT_EVENT, STATUS_EVENT, update_encoder
+from app.services.update_rooms import parse_rooms, room_covers, subscriptions
+
+logger = logging.getLogger(__name__)
+
+
+def _device_ids(data):
+    device_id = (data or {}).get('device_id')
+    try:
+        return None if device_id is None else [int(device_id)]
+    except (TypeError, ValueError):
+        logger.debug(f"device_id inválido de {request.sid}: {device_id!r}")
+        return []
+
+
+@socketio.on('connect')
+def on_connect():
+    emit(STATUS_EVENT, update_encoder.statuses())
+
+
+@socketio.on('disconnect')
+def on_disconnect():
+    subscriptions.drop(request.sid)
+
+
+@socketio.on('subscribe')
+def on_subscribe(data=None):
+    try:
+        rooms = parse_rooms(data)
+    except ValueError as e:
+        logger.debug(f"subscribe inválido de {request.sid}: {e}")
+        return {'error': str(e)}
+    for room in rooms:
+        join_room(room)
+        subscriptions.join(request.sid, room)
+    emit(SNAPSHOT_EVENT, [state for state in update_encoder.snapshot()
+                          if any(room_covers(room, state) for room in rooms)])
+    return {'rooms': rooms}
+
+
+@socketio.on('unsubscribe')
+def on_unsubscribe(data=None):
+    try:
+        rooms = parse_rooms(data)
+    except ValueError as e:
+        return {'error': str(e)}
+    for room in rooms:
+        leave_room(room)
+        subscriptions.leave(request.sid, room)
+    return {'rooms': rooms}
+
+
+@socketio.on('request_snapshot')
+def on_request_snapshot(data=None):
+    device_ids = _device_ids(data)
+    if device_ids == []:
+        return
+    emit(SNAPSHOT_EVENT, update_encoder.snapshot(device_ids))
+
+
+@socketio.on('request_update')
+def on_request_update(data=None):
+    device_ids = _device_ids(data)
+    if not device_ids:
+        return
+    emit(SNAPSHOT_EVENT, update_encoder.snapshot(device_ids))
@@ -0,0 +1,71 @@
+"""
+Event loop asyncio persistente en un hilo de fondo.
+
+Permite que los servicios de monitoreo mantengan un solo loop vivo durante
+toda la vida del proceso (en lugar de crear uno por ciclo con asyncio.run)
+y que el código síncrono (rutas Flask, scripts) ejecute corrutinas en él.
+"""
+
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRuntime:
+    """Loop asyncio dedicado corriendo en un hilo daemon."""
+
+    def __init__(self, name='async-runtime'):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        """Loop en ejecución (arranca el hilo si aún no existe)."""
+        self.start()
+        return self._loop
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._ready.set()
+        logger.info("Event loop '%s' iniciado", self.name)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+            logger.info("Event loop '%s' detenido", self.name)
+
+    def submit(self, coro):
+        """Agenda una corrutina en el loop. Retorna un concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Ejecuta una corrutina en el loop y espera su resultado (bloqueante)."""
+        return self.submit(coro).result(timeout)
+
+    def stop(self):
+        with self._lock:
+            if not self.running:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            if threading.current_thread() is not self._thread:
+                self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,339 @@
+"""
+Descubrimiento de equipos en una subred (CIDR).
+
+Reemplaza el escaneo con un ``ping`` por IP seguido de ``connect_ex``
+bloqueantes: cada host se sondea en paralelo por TCP 502 (Modbus), un GET
+SNMP de sysDescr por UDP 161 y HTTP (puerto 80), con un límite de hosts
+iniciados por segundo y de sondeos simultáneos. El trabajo corre en un loop
+propio en segundo plano; la ruta devuelve un id de trabajo y los hallazgos se
+publican por Socket.IO a medida que llegan:
+
+    discovery_host      {'job_id', 'host'}
+    discovery_progress  {'job_id', 'scanned', 'total', 'found'}
+    discovery_done      snapshot del trabajo (sin la lista de hosts)
+
+El GET SNMP se codifica una sola vez en v1 y en v2c (las tarjetas Megatec
+solo responden v1) y los dos paquetes se envían a todos los hosts desde un
+único socket UDP; las respuestas se asocian por IP de origen y vale la
+primera que llegue.
+"""
+
+import asyncio
+import ipaddress
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+from pyasn1.codec.ber import decoder, encoder
+from pysnmp.proto import api
+
+from app.services.async_runtime import AsyncRuntime
+from app.services.event_bus import publish
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_RATE = float(os.environ.get('DISCOVERY_RATE', '100'))            # hosts/segundo
+DISCOVERY_CONCURRENCY = int(os.environ.get('DISCOVERY_CONCURRENCY', '256'))  # hosts en vuelo
+DISCOVERY_TIMEOUT = float(os.environ.get('DISCOVERY_TIMEOUT', '1.0'))        # por sondeo
+MAX_HOSTS = 4096   # /20
+MAX_JOBS = 20      # Trabajos terminados que se conservan para consulta
+PROGRESS_EVERY = 0.5
+
+MODBUS_PORT = 502
+SNMP_PORT = 161
+HTTP_PORT = 80
+
+SYS_DESCR_OID = (1, 3, 6, 1, 2, 1, 1, 1, 0)
+
+
+def parse_targets(cidr=None, network=None, start=1, end=254):
+    """
+    IPs a sondear a partir de un CIDR ('192.168.0.0/24') o del formato
+    anterior de la ruta (red '192.168.0' y rango start-end).
+    """
+    if cidr:
+        net = ipaddress.ip_network(cidr.strip(), strict=False)
+        if net.num_addresses > MAX_HOSTS + 2:
+            raise ValueError(f'Rango demasiado grande: máximo {MAX_HOSTS} hosts')
+        hosts = list(net.hosts()) or [net.network_address]
+        return [str(ip) for ip in hosts]
+
+    if not network:
+        raise ValueError('Indicar cidr o network')
+    start, end = int(start), min(int(end), 254)
+    return [str(ipaddress.ip_address(f'{network}.{i}')) for i in range(start, end + 1)]
+
+
+def _snmp_request(community, version=api.SNMP_VERSION_2C):
+    """GET de sysDescr ya codificado (el mismo paquete sirve para todos los hosts)."""
+    p_mod = api.PROTOCOL_MODULES[version]
+    pdu = p_mod.GetRequestPDU()
+    p_mod.apiPDU.set_defaults(pdu)
+    p_mod.apiPDU.set_varbinds(pdu, [(SYS_DESCR_OID, p_mod.Null())])
+    msg = p_mod.Message()
+    p_mod.apiMessage.set_defaults(msg)
+    p_mod.apiMessage.set_community(msg, community)
+    p_mod.apiMessage.set_pdu(msg, pdu)
+    return encoder.encode(msg)
+
+
+def _snmp_requests(community):
+    """GET de sysDescr en v1 y v2c: un host vale como SNMP si responde cualquiera."""
+    return tuple(_snmp_request(community, version)
+                 for version in (api.SNMP_VERSION_1, api.SNMP_VERSION_2C))
+
+
+def _snmp_value(data):
+    """(versión, sysDescr) de una respuesta; versión 0 = v1, 1 = v2c (como snmp_version)."""
+    version = int(api.decodeMessageVersion(data))
+    p_mod = api.PROTOCOL_MODULES[version]
+    msg, _ = decoder.decode(data, asn1Spec=p_mod.Message())
+    pdu = p_mod.apiMessage.get_pdu(msg)
+    if p_mod.apiPDU.get_error_status(pdu):
+        return version, ''
+    for _, value in p_mod.apiPDU.get_varbinds(pdu):
+        return version, value.prettyPrint()
+    return version, ''
+
+
+class _SnmpSweep(asyncio.DatagramProtocol):
+    """Un socket UDP para todos los GET de sysDescr de un trabajo."""
+
+    def __init__(self, packets):
+        self.packets = packets
+        self.transport = None
+        self._waiters = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        waiter = self._waiters.pop(addr[0], None)
+        if waiter is None or waiter.done():
+            return
+        try:
+            waiter.set_result(_snmp_value(data))
+        except Exception as e:
+            logger.debug(f"Respuesta SNMP inválida de {addr[0]}: {e}")
+            waiter.set_result((None, ''))
+
+    def error_received(self, exc):
+        pass  # ICMP port unreachable: el host no tiene SNMP
+
+    async def probe(self, ip, timeout):
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[ip] = waiter
+        try:
+            for packet in self.packets:
+                self.transport.sendto(packet, (ip, SNMP_PORT))
+            return await asyncio.wait_for(waiter, timeout)
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            self._waiters.pop(ip, None)
+
+
+async def _tcp_probe(ip, port, timeout):
+    """True si el puerto acepta, False si rechaza (host vivo), None sin respuesta."""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except ConnectionRefusedError:
+        return False
+    except (asyncio.TimeoutError, OSError):
+        return None
+    writer.close()
+    return True
+
+
+async def _http_probe(ip, timeout):
+    """Línea de estado y header Server de un HEAD /; False/None como ``_tcp_probe``."""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, HTTP_PORT), timeout)
+    except ConnectionRefusedError:
+        return False
+    except (asyncio.TimeoutError, OSError):
+        return None
+    try:
+        writer.write(f'HEAD / HTTP/1.0\r\nHost: {ip}\r\n\r\n'.encode())
+        head = await asyncio.wait_for(reader.read(1024), timeout)
+        lines = head.decode('latin-1', 'replace').split('\r\n')
+        server = next((line.split(':', 1)[1].strip() for line in lines[1:]
+                       if line.lower().startswith('server:')), '')
+        return ' '.join(part for part in (lines[0], server) if part) or 'HTTP'
+    except (asyncio.TimeoutError, OSError):
+        return 'HTTP'
+    finally:
+        writer.close()
+
+
+class _RateLimiter:
+    """Espacia el inicio de cada host para no superar ``rate`` por segundo."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._next = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        delay = self._next - now
+        self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class DiscoveryJob:
+    """Estado de un descubrimiento en curso o terminado."""
+
+    def __init__(self, targets, label, rate, timeout, community):
+        self.id = uuid.uuid4().hex[:12]
+        self.targets = targets
+        self.label = label
+        self.rate = rate
+        self.timeout = timeout
+        self.community = community
+        self.status = 'running'
+        self.scanned = 0
+        self.hosts = []
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self.future = None
+
+    def snapshot(self, include_hosts=True):
+        data = {
+            'job_id': self.id,
+            'target': self.label,
+            'status': self.status,
+            'total': len(self.targets),
+            'scanned': self.scanned,
+            'found': len(self.hosts),
+            'rate': self.rate,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'elapsed_s': round((self.finished_at or time.time()) - self.started_at, 2),
+            'error': self.error,
+        }
+        if include_hosts:
+            data['hosts'] = list(self.hosts)
+        return data
+
+
+async def _probe_host(ip, sweep, timeout):
+    modbus, snmp, http = await asyncio.gather(
+        _tcp_probe(ip, MODBUS_PORT, timeout),
+        sweep.probe(ip, timeout),
+        _http_probe(ip, timeout),
+    )
+    ports = []
+    if modbus:
+        ports.append(f'Modbus:{MODBUS_PORT}')
+    if snmp is not None:
+        ports.append(f'SNMP:{SNMP_PORT}')
+    if http:
+        ports.append(f'HTTP:{HTTP_PORT}')
+    # Un RST también prueba que el host existe aunque no tenga los servicios
+    if not ports and modbus is None and http is None:
+        return None
+    snmp_version, sys_descr = snmp or (None, None)
+    return {
+        'ip': ip,
+        'ports': ports,
+        'modbus': bool(modbus),
+        'snmp': snmp is not None,
+        'snmp_version': snmp_version,
+        'sys_descr': sys_descr or None,
+        'http': http or None,
+    }
+
+
+async def run_discovery(job):
+    """Sondea todos los hosts del trabajo publicando los hallazgos."""
+    loop = asyncio.get_running_loop()
+    transport, sweep = await loop.create_datagram_endpoint(
+        lambda: _SnmpSweep(_snmp_requests(job.community)), local_addr=('0.0.0.0', 0))
+    limiter = _RateLimiter(job.rate)
+    in_flight = asyncio.Semaphore(DISCOVERY_CONCURRENCY)
+    last_progress = 0.0
+
+    async def scan(ip):
+        nonlocal last_progress
+        try:
+            host = await _probe_host(ip, sweep, job.timeout)
+        finally:
+            in_flight.release()
+        job.scanned += 1
+        if host is not None:
+            job.hosts.append(host)
+            publish('discovery_host', {'job_id': job.id, 'host': host})
+        now = time.monotonic()
+        if now - last_progress >= PROGRESS_EVERY:
+            last_progress = now
+            publish('discovery_progress', {'job_id': job.id, 'scanned': job.scanned,
+                                           'total': len(job.targets), 'found': len(job.hosts)})
+
+    tasks = []
+    try:
+        for ip in job.targets:
+            await in_flight.acquire()
+            await limiter.wait()
+            tasks.append(asyncio.ensure_future(scan(ip)))
+        await asyncio.gather(*tasks)
+        job.status = 'done'
+    except asyncio.CancelledError:
+        for task in tasks:
+            task.cancel()
+        job.status = 'cancelled'
+    except Exception as e:
+        logger.exception(f"Error en descubrimiento {job.id}: {e}")
+        job.status = 'error'
+        job.error = str(e)
+    finally:
+        transport.close()
+        job.finished_at = time.time()
+        job.hosts.sort(key=lambda host: ipaddress.ip_address(host['ip']))
+        logger.info(f"Descubrimiento {job.id} ({job.label}): {len(job.hosts)} hosts "
+                    f"en {job.finished_at - job.started_at:.1f}s [{job.status}]")
+        publish('discovery_done', job.snapshot(include_hosts=False))
+
+
+class DiscoveryService:
+    """Trabajos de descubrimiento corriendo en un loop de fondo."""
+
+    def __init__(self, runtime=None):
+        self.runtime = runtime or AsyncRuntime('discovery')
+        self._jobs = OrderedDict()
+
+    def start(self, targets, label, rate=None, timeout=None, community='public'):
+        job = DiscoveryJob(targets, label,
+                           rate=DISCOVERY_RATE if rate is None else float(rate),
+                           timeout=DISCOVERY_TIMEOUT if timeout is None else float(timeout),
+                           community=community or 'public')
+        self._jobs[job.id] = job
+        while len(self._jobs) > MAX_JOBS:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.status == 'running':
+                break
+            self._jobs.popitem(last=False)
+        job.future = self.runtime.submit(run_discovery(job))
+        logger.info(f"Descubrimiento {job.id} iniciado: {label} ({len(targets)} hosts, {job.rate:g}/s)")
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None or job.status != 'running':
+            return False
+        job.future.cancel()
+        return True
+
+    def list(self):
+        return [job.snapshot(include_hosts=False) for job in reversed(self._jobs.values())]
+
+
+discovery_service = DiscoveryService()
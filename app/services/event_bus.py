@@ -0,0 +1,127 @@
+"""
+Publicación de eventos de monitoreo.
+
+Los monitores SNMP/Modbus publican con ``publish(event, payload, namespace)``.
+En el proceso web el destino es ``socketio.emit`` (``ups_update`` se emite
+como diferencia, ver ``update_delta``, y solo a las salas suscritas a ese
+equipo, ver ``update_rooms``); los procesos de sondeo
+(shards, poller headless) instalan un destino que reenvía los eventos al
+proceso web por multiprocessing.connection.
+"""
+
+import logging
+import queue
+import threading
+
+from app.extensions import socketio
+from app.services.recent_samples import recent_samples
+from app.services.update_delta import DELTA_EVENT, STATUS_EVENT, UPDATE_EVENT, update_encoder
+from app.services.update_rooms import subscriptions
+
+logger = logging.getLogger(__name__)
+
+# Evento interno con estadísticas Modbus de un proceso de sondeo (no se reemite)
+STATS_EVENT = '_shard_stats'
+
+# Evento interno con una muestra normalizada para el buffer de recientes del proceso web
+SAMPLE_EVENT = '_shard_sample'
+
+# Eventos en espera de envío por conexión; si el receptor se atrasa se
+# descartan las muestras más nuevas en lugar de frenar el polling
+UPLINK_MAXSIZE = 10000
+
+_sink = None
+
+
+def set_sink(sink):
+    """Redirige las publicaciones a ``sink(event, payload, namespace)`` (None restaura Socket.IO)."""
+    global _sink
+    _sink = sink
+
+
+def publish(event, payload, namespace=None):
+    if _sink is not None:
+        _sink(event, payload, namespace)
+    elif event == UPDATE_EVENT:
+        _emit_update(payload)
+    elif namespace:
+        socketio.emit(event, payload, namespace=namespace)
+    else:
+        socketio.emit(event, payload)
+
+
+def _emit_update(payload):
+    """
+    Guarda el estado del equipo y envía solo lo que cambió, y solo a los
+    clientes suscritos a él; los cambios de estado van a todos.
+    """
+    delta = update_encoder.encode(payload)
+    status = delta.get('set', {}).get('status')
+    if status is not None:
+        socketio.emit(STATUS_EVENT, [{'id': delta['id'], 'status': status}])
+    rooms = subscriptions.rooms_for(delta['id'], payload.get('sitio'))
+    if rooms:
+        socketio.emit(DELTA_EVENT, delta, to=rooms)
+
+
+def parse_address(address):
+    """'host:puerto' -> (host, puerto) para multiprocessing.connection."""
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+def relay_events(conn, stats_view, is_running):
+    """
+    Recibe eventos de una conexión y los publica en este proceso; las
+    estadísticas (STATS_EVENT) se guardan en ``stats_view`` y las muestras
+    (SAMPLE_EVENT) en ``recent_samples``, sin reemitirse.
+    Retorna cuando la conexión se cierra o ``is_running()`` es falso.
+    """
+    while is_running():
+        try:
+            event, payload, namespace = conn.recv()
+        except (EOFError, OSError):
+            return
+        if event == STATS_EVENT:
+            stats_view.update(payload)
+            continue
+        if event == SAMPLE_EVENT:
+            recent_samples.record(payload)
+            continue
+        try:
+            publish(event, payload, namespace)
+        except Exception as e:
+            logger.error(f"Error reemitiendo evento {event}: {e}")
+
+
+class EventUplink:
+    """
+    Envía eventos por una conexión multiprocessing.connection desde un hilo
+    propio, con cola acotada. Se usa como sink: ``uplink(event, payload, ns)``.
+    """
+
+    def __init__(self, conn, name='event-uplink'):
+        self.conn = conn
+        self.alive = True
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=UPLINK_MAXSIZE)
+        threading.Thread(target=self._send_loop, name=name, daemon=True).start()
+
+    def __call__(self, event, payload, namespace=None):
+        try:
+            self._queue.put_nowait((event, payload, namespace))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self.alive = False
+        self.conn.close()
+
+    def _send_loop(self):
+        while self.alive:
+            item = self._queue.get()
+            try:
+                self.conn.send(item)
+            except (OSError, ValueError):
+                # El receptor cerró la conexión
+                self.alive = False
@@ -1,71 +1,383 @@
+"""
+Escritura de muestras de monitoreo en InfluxDB.
+
+``enqueue`` no toca la red: deja la línea de line protocol (armada por
+``sample_sink`` con el timestamp de la lectura) en una cola acotada. Un
+hilo escritor la vacía en lotes de ``INFLUXDB_BATCH_SIZE`` líneas o cada
+``INFLUXDB_FLUSH_INTERVAL`` segundos, lo que ocurra primero, así el polling
+nunca espera a InfluxDB.
+
+Si InfluxDB no responde, los lotes se agregan a un spool en disco
+(``INFLUXDB_SPOOL_DIR/spool.lp``, solo append) y se reintenta con backoff.
+Al volver, el spool se reenvía en orden antes que los lotes nuevos; el
+avance se confirma en ``spool.offset`` para no duplicar tras un reinicio.
+``INFLUXDB_SPOOL_MAX_MB`` limita lo pendiente de reenviar; lo ya reenviado
+se descarta compactando el archivo cuando haría falta el lugar.
+El spool es de un solo proceso: los shards y el poller headless usan cada
+uno un subdirectorio propio (``use_spool``) para no pisarse el archivo.
+Un lote que InfluxDB rechaza por contenido (4xx) se descarta en lugar de
+bloquear el spool.
+"""
+
+import atexit
+import logging
+import math
 import os
+import queue
+import shutil
+import threading
 import time
-from datetime import datetime
-from influxdb_client import InfluxDBClient, Point
+
+from influxdb_client import InfluxDBClient
 from influxdb_client.client.write_api import SYNCHRONOUS
+from influxdb_client.rest import ApiException
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+INFLUXDB_ENABLED = os.environ.get('INFLUXDB_ENABLED', '1').lower() not in ('0', 'false', 'no', 'off')
+INFLUXDB_BATCH_SIZE = int(os.environ.get('INFLUXDB_BATCH_SIZE', '5000'))         # líneas por escritura
+INFLUXDB_FLUSH_INTERVAL = float(os.environ.get('INFLUXDB_FLUSH_INTERVAL', '1.0'))  # segundos
+INFLUXDB_QUEUE_SIZE = int(os.environ.get('INFLUXDB_QUEUE_SIZE', '100000'))       # líneas en memoria
+INFLUXDB_SPOOL_DIR = os.environ.get('INFLUXDB_SPOOL_DIR', os.path.join(_PROJECT_ROOT, 'data', 'influx_spool'))
+INFLUXDB_SPOOL_MAX_MB = float(os.environ.get('INFLUXDB_SPOOL_MAX_MB', '256'))
+INFLUXDB_RETRY_MAX = float(os.environ.get('INFLUXDB_RETRY_MAX', '60'))           # backoff máximo
+
+MEASUREMENT = 'ups_status'
+REPLAY_BATCHES = 10  # Lotes del spool reenviados por vuelta del escritor
+
+_TAG_ESCAPES = str.maketrans({',': r'\,', '=': r'\=', ' ': r'\ ', '\n': ''})
+
+
+def _escape(value):
+    return str(value).translate(_TAG_ESCAPES)
+
+
+def to_line(measurement, tags, fields, timestamp_ns):
+    """
+    Línea de line protocol con los campos numéricos de ``fields`` como float.
+    Retorna None si no hay ningún campo escribible.
+    """
+    values = []
+    for key, value in fields.items():
+        if isinstance(value, (int, float)) and math.isfinite(value):
+            values.append(f'{_escape(key)}={float(value)!r}')
+    if not values:
+        return None
+    tag_set = ''.join(f',{_escape(k)}={_escape(v)}' for k, v in tags.items() if v not in (None, ''))
+    return f"{_escape(measurement)}{tag_set} {','.join(values)} {timestamp_ns}"
+
+
+class LineSpool:
+    """
+    Spool en disco de líneas pendientes: archivo solo-append más el offset
+    (en bytes) hasta donde ya se reenvió. Se usa desde un único hilo.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.path = os.path.join(directory, 'spool.lp')
+        self.offset_path = os.path.join(directory, 'spool.offset')
+        self.max_bytes = max_bytes
+        self.offset = 0
+        self.size = 0
+        if os.path.exists(self.path):
+            self.size = os.path.getsize(self.path)
+            try:
+                with open(self.offset_path) as f:
+                    self.offset = min(int(f.read().strip() or 0), self.size)
+            except (OSError, ValueError):
+                self.offset = 0
+
+    @property
+    def pending(self):
+        return self.size > self.offset
+
+    @property
+    def pending_bytes(self):
+        return self.size - self.offset
+
+    def append(self, lines):
+        """Agrega líneas al final; retorna cuántas no entraron por tamaño."""
+        data = ''.join(line + '\n' for line in lines).encode()
+        if self.pending_bytes + len(data) > self.max_bytes:
+            return len(lines)
+        if self.size + len(data) > self.max_bytes:
+            self._compact()
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path, 'ab') as f:
+            f.write(data)
+        self.size += len(data)
+        return 0
+
+    def _compact(self):
+        """
+        Reescribe el archivo sin lo ya reenviado para que el límite cuente
+        solo lo pendiente. El offset 0 se confirma antes de reemplazar el
+        archivo: un corte entre ambos pasos reenvía duplicados (InfluxDB los
+        sobrescribe por serie y timestamp) en vez de perder líneas.
+        """
+        tmp = self.path + '.tmp'
+        with open(self.path, 'rb') as src, open(tmp, 'wb') as dst:
+            src.seek(self.offset)
+            shutil.copyfileobj(src, dst)
+        offset_tmp = self.offset_path + '.tmp'
+        with open(offset_tmp, 'w') as f:
+            f.write('0')
+        os.replace(offset_tmp, self.offset_path)
+        os.replace(tmp, self.path)
+        self.size -= self.offset
+        self.offset = 0
+
+    def read(self, max_lines):
+        """(líneas, offset_final) del siguiente tramo sin reenviar."""
+        lines = []
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            end = self.offset
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break  # Línea incompleta (corte durante una escritura)
+                end += len(raw)
+                lines.append(raw[:-1].decode())
+                if len(lines) >= max_lines:
+                    break
+        return lines, end
+
+    def commit(self, end):
+        """Marca como reenviado hasta ``end``; vacía el archivo si no queda nada."""
+        if end >= self.size:
+            for path in (self.path, self.offset_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self.offset = self.size = 0
+            return
+        self.offset = end
+        tmp = self.offset_path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(str(end))
+        os.replace(tmp, self.offset_path)
+
 
 class InfluxDBService:
-    def __init__(self):
+    def __init__(self, enabled=None, batch_size=None, flush_interval=None, queue_size=None,
+                 spool_dir=None, spool_max_mb=None):
         # Configuration - should preferably come from env vars
         self.url = os.environ.get('INFLUXDB_URL', 'http://localhost:8086')
         self.token = os.environ.get('INFLUXDB_TOKEN', 'my-token')
         self.org = os.environ.get('INFLUXDB_ORG', 'my-org')
         self.bucket = os.environ.get('INFLUXDB_BUCKET', 'ups_monitoring')
+        self.enabled = INFLUXDB_ENABLED if enabled is None else enabled
+        self.batch_size = batch_size or INFLUXDB_BATCH_SIZE
+        self.flush_interval = INFLUXDB_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.spool = LineSpool(spool_dir or INFLUXDB_SPOOL_DIR,
+                               int((spool_max_mb or INFLUXDB_SPOOL_MAX_MB) * 1024 * 1024))
         self.client = None
         self.write_api = None
-        self.last_error_time = 0
-        self.backoff_duration = 60 # Seconds
+        self._query_client = None  # Consultas del historial (hilos web), aparte del escritor
+        self.online = True
+        self.last_error = None
+        self.written = 0
+        self.spooled = 0
+        self.dropped = 0
+        self.rejected = 0
+        self._queue = queue.Queue(maxsize=queue_size or INFLUXDB_QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._running = False
+        self._retry_at = 0.0
+        self._backoff = 1.0
 
-    def connect(self):
-        # Circuit breaker: don't retry if recently failed
-        if time.time() - self.last_error_time < self.backoff_duration:
-            return False
+    def use_spool(self, name):
+        """
+        Usa ``INFLUXDB_SPOOL_DIR/<name>`` como spool de este proceso. Cada
+        proceso que sondea necesita el suyo: el archivo y su offset no se
+        comparten. Llamar antes de encolar la primera línea.
+        """
+        if self._thread is not None:
+            raise RuntimeError("El escritor de InfluxDB ya está en marcha")
+        self.spool = LineSpool(os.path.join(self.spool.directory, name), self.spool.max_bytes)
 
+    # ------------------------------------------------------------------
+    # Productores (hilos de polling)
+    # ------------------------------------------------------------------
+    def enqueue(self, line):
+        """Encola una línea de line protocol (no bloquea)."""
+        if self._thread is None:
+            self.start()
         try:
-            self.client = InfluxDBClient(url=self.url, token=self.token, org=self.org, timeout=1000) # 1s timeout
-            self.write_api = self.client.write_api(write_options=SYNCHRONOUS)
-            print("Conectado a InfluxDB")
-            self.last_error_time = 0 # Reset
+            self._queue.put_nowait(line)
             return True
-        except Exception as e:
-            print(f"Error conectando a InfluxDB: {e}")
-            self.last_error_time = time.time()
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Cola de InfluxDB llena: {self.dropped} muestras descartadas")
             return False
 
-    def write_ups_data(self, ups_name, ip, data_dict):
-        """
-        Escribe datos de un UPS a InfluxDB.
-        data_dict: Diccionario con métricas { 'voltaje_in': 220, 'bateria_pct': 100, ... }
-        """
-        # Circuit breaker check
-        if time.time() - self.last_error_time < self.backoff_duration:
-            return False
+    # ------------------------------------------------------------------
+    # Hilo escritor
+    # ------------------------------------------------------------------
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='influx-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        if self.spool.pending:
+            logger.info(f"Spool de InfluxDB con {self.spool.pending_bytes} bytes pendientes de reenviar")
+
+    def _collect(self):
+        """Espera hasta juntar un lote completo o que pase ``flush_interval``."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while self._running or not self._queue.empty():
+            batch = self._collect()
+            try:
+                self._flush(batch)
+            except Exception as e:
+                logger.exception(f"Error en el escritor de InfluxDB: {e}")
+
+    def _flush(self, batch):
+        now = time.monotonic()
+        if self.spool.pending or not self.online:
+            # Hay datos anteriores sin enviar: el lote va detrás de ellos
+            if batch:
+                self._spill(batch)
+            if now >= self._retry_at:
+                self._replay()
+        elif batch and not self._send(batch):
+            self._spill(batch)
+
+    def _replay(self):
+        for _ in range(REPLAY_BATCHES):
+            if not self.spool.pending:
+                break
+            lines, end = self.spool.read(self.batch_size)
+            if not lines:
+                break
+            if not self._send(lines):
+                return
+            self.spool.commit(end)
+        if not self.spool.pending and not self.online:
+            self._set_online(True)
 
-        if not self.write_api:
-            if not self.connect():
-                return False
+    def _spill(self, lines):
+        lost = self.spool.append(lines)
+        self.spooled += len(lines) - lost
+        if lost:
+            self.dropped += lost
+            logger.warning(f"Spool de InfluxDB lleno: {lost} muestras descartadas")
 
+    def _send(self, lines):
+        """Escribe un lote; False si InfluxDB no está disponible (reintentar más tarde)."""
         try:
-            point = Point("ups_status") \
-                .tag("device_name", ups_name) \
-                .tag("ip", ip) \
-                .time(datetime.utcnow())
-
-            for key, value in data_dict.items():
-                if isinstance(value, (int, float)):
-                    point = point.field(key, float(value))
-            
-            self.write_api.write(bucket=self.bucket, org=self.org, record=point)
-            return True
+            if self.write_api is None:
+                self.client = InfluxDBClient(url=self.url, token=self.token, org=self.org, timeout=5000)
+                self.write_api = self.client.write_api(write_options=SYNCHRONOUS)
+            self.write_api.write(bucket=self.bucket, org=self.org, record='\n'.join(lines))
+        except ApiException as e:
+            if e.status and 400 <= e.status < 500 and e.status not in (401, 403, 404, 429):
+                # Datos inválidos: reintentar no sirve y bloquearía el spool
+                self.rejected += len(lines)
+                logger.error(f"InfluxDB rechazó un lote de {len(lines)} líneas: {e.status} {e.reason}")
+                return True
+            return self._failed(e)
         except Exception as e:
-            print(f"Error escribiendo a InfluxDB: {e}")
-            self.last_error_time = time.time()
-            self.write_api = None # Force reconnect next time
-            return False
+            return self._failed(e)
+        self.written += len(lines)
+        if self.online:
+            self._backoff = 1.0
+        return True
+
+    def _failed(self, error):
+        self.last_error = str(error)
+        self.write_api = None
+        if self.client:
+            try:
+                self.client.close()
+            except Exception:
+                pass
+            self.client = None
+        self._retry_at = time.monotonic() + self._backoff
+        self._backoff = min(self._backoff * 2, INFLUXDB_RETRY_MAX)
+        if self.online:
+            self._set_online(False)
+        return False
+
+    def _set_online(self, online):
+        self.online = online
+        if online:
+            self._backoff = 1.0
+            logger.info(f"InfluxDB disponible de nuevo; spool reenviado ({self.written} líneas escritas)")
+        else:
+            logger.error(f"InfluxDB no disponible ({self.last_error}); guardando muestras en {self.spool.path}")
+
+    def series(self, device_id, metric, start, end, every, fn='mean'):
+        """
+        (instante, valor) de ``metric`` de un equipo en [start, end), agregado
+        por InfluxDB en ventanas de ``every`` con ``fn`` (mean, min, max).
+        """
+        if self._query_client is None:
+            self._query_client = InfluxDBClient(url=self.url, token=self.token, org=self.org, timeout=30000)
+        every_ms = max(int(every.total_seconds() * 1000), 1000)
+        flux = (
+            f'from(bucket: "{self.bucket}")\n'
+            f'  |> range(start: {start.isoformat()}, stop: {end.isoformat()})\n'
+            f'  |> filter(fn: (r) => r._measurement == "{MEASUREMENT}" and '
+            f'r.device_id == "{int(device_id)}" and r._field == "{_escape(metric)}")\n'
+            f'  |> aggregateWindow(every: {every_ms}ms, fn: {fn}, timeSrc: "_start", createEmpty: false)'
+        )
+        tables = self._query_client.query_api().query(flux, org=self.org)
+        return [(record.get_time(), record.get_value()) for table in tables for record in table.records]
+
+    def flush(self, timeout=10.0):
+        """Espera a que la cola en memoria quede vacía (pruebas y apagado)."""
+        deadline = time.monotonic() + timeout
+        while not self._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self._queue.empty()
+
+    def get_stats(self):
+        return {
+            'enabled': self.enabled,
+            'online': self.online,
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'spooled': self.spooled,
+            'spool_pending_bytes': self.spool.pending_bytes,
+            'dropped': self.dropped,
+            'rejected': self.rejected,
+            'last_error': self.last_error,
+        }
 
     def close(self):
+        """Detiene el escritor: lo que quede en cola se envía o va al spool."""
+        thread = self._thread
+        if thread is not None and self._running:
+            self._running = False
+            thread.join(self.flush_interval + 15)
         if self.client:
             self.client.close()
+            self.client = None
+            self.write_api = None
+        if self._query_client:
+            self._query_client.close()
+            self._query_client = None
+
 
 # Singleton instance
 influx_service = InfluxDBService()
@@ -0,0 +1,197 @@
+"""
+Motor asyncio de polling Modbus.
+
+Un despachador toma del planificador adaptativo los grupos de registros
+vencidos y lanza una tarea por dispositivo, de modo que un equipo caído solo
+consume su propio deadline y no retrasa al resto de la flota. Un semáforo
+limita cuántos dispositivos se consultan a la vez.
+"""
+
+import asyncio
+import logging
+import time
+
+from app.services.modbus_scheduler import AdaptiveScheduler, STATE_OFFLINE
+
+logger = logging.getLogger(__name__)
+
+# Peso del promedio exponencial para el ciclo real por dispositivo
+_EWMA_ALPHA = 0.3
+
+
+class DeviceCycleStats:
+    """Estadísticas de ciclo de un dispositivo (objetivo vs real)."""
+
+    __slots__ = ('device_id', 'ip', 'target_s', 'achieved_s', 'last_duration_s',
+                 'last_start', 'last_ok', 'cycles', 'timeouts', 'errors')
+
+    def __init__(self, device_id, ip, target_s):
+        self.device_id = device_id
+        self.ip = ip
+        self.target_s = target_s
+        self.achieved_s = None
+        self.last_duration_s = None
+        self.last_start = None
+        self.last_ok = None
+        self.cycles = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def mark_start(self, now):
+        if self.last_start is not None:
+            period = now - self.last_start
+            if self.achieved_s is None:
+                self.achieved_s = period
+            else:
+                self.achieved_s += _EWMA_ALPHA * (period - self.achieved_s)
+        self.last_start = now
+
+    def to_dict(self):
+        return {
+            'device_id': self.device_id,
+            'ip': self.ip,
+            'target_s': self.target_s,
+            'achieved_s': round(self.achieved_s, 3) if self.achieved_s is not None else None,
+            'last_duration_s': round(self.last_duration_s, 3) if self.last_duration_s is not None else None,
+            'last_ok': self.last_ok,
+            'cycles': self.cycles,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+        }
+
+
+class ModbusPollingEngine:
+    """
+    Orquesta el polling concurrente de la flota Modbus.
+
+    Args:
+        poll_device: corrutina ``poll_device(dev, groups)`` que lee los grupos
+            indicados y retorna el estado del equipo para el planificador.
+        load_devices: función síncrona que retorna las filas de monitoreo_config
+            a consultar (se ejecuta en un hilo para no bloquear el loop).
+        scheduler: AdaptiveScheduler que decide qué grupos tocan y cuándo.
+        max_concurrency: máximo de dispositivos consultándose simultáneamente.
+        device_timeout: deadline de cada consulta individual, en segundos.
+        refresh_interval: cada cuánto se relee la lista de dispositivos.
+        on_timeout: callback opcional ``on_timeout(dev)`` al exceder el deadline.
+    """
+
+    def __init__(self, poll_device, load_devices, scheduler=None, max_concurrency=32,
+                 device_timeout=5.0, refresh_interval=10.0, on_timeout=None):
+        self.poll_device = poll_device
+        self.load_devices = load_devices
+        self.scheduler = scheduler or AdaptiveScheduler()
+        self.on_timeout = on_timeout
+        self.max_concurrency = max_concurrency
+        self.device_timeout = device_timeout
+        self.refresh_interval = refresh_interval
+        self.running = False
+        self._semaphore = None
+        self._wakeup = None
+        self._tasks = {}      # device_id -> asyncio.Task de la lectura en curso
+        self._devices = {}    # device_id -> fila de configuración
+        self._stats = {}      # device_id -> DeviceCycleStats
+
+    async def run(self):
+        """Despachador: lanza las lecturas que el planificador marca como vencidas."""
+        self.running = True
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._wakeup = asyncio.Event()
+        logger.info("Motor Modbus async iniciado (concurrencia=%d, deadline=%.1fs)",
+                    self.max_concurrency, self.device_timeout)
+        refresher = asyncio.create_task(self._refresh_loop())
+        try:
+            while self.running:
+                for dev_id, groups in self.scheduler.pop_due().items():
+                    dev = self._devices.get(dev_id)
+                    if dev is not None:
+                        self._tasks[dev_id] = asyncio.create_task(self._poll(dev, groups))
+
+                delay = self.scheduler.time_until_next()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(),
+                                           timeout=min(delay, 1.0) if delay is not None else 1.0)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            refresher.cancel()
+            tasks = [refresher, *self._tasks.values()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._tasks.clear()
+
+    def stop(self):
+        self.running = False
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _refresh_loop(self):
+        while self.running:
+            try:
+                devices = await asyncio.to_thread(self.load_devices)
+                self._sync_devices(devices)
+            except Exception as e:
+                logger.error(f"Error actualizando lista de dispositivos Modbus: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def _sync_devices(self, devices):
+        """Agenda, reinicia o retira dispositivos según la configuración actual."""
+        current = {dev['id']: dev for dev in devices}
+
+        for dev_id in list(self._devices):
+            if dev_id not in current or current[dev_id] != self._devices[dev_id]:
+                self._devices.pop(dev_id)
+                self.scheduler.remove_device(dev_id)
+                task = self._tasks.pop(dev_id, None)
+                if task:
+                    task.cancel()
+                if dev_id not in current:
+                    self._stats.pop(dev_id, None)
+
+        for dev_id, dev in current.items():
+            if dev_id not in self._devices:
+                self._devices[dev_id] = dev
+                self.scheduler.add_device(dev_id)
+                self._wakeup.set()
+
+    async def _poll(self, dev, groups):
+        stats = self._stats.get(dev['id'])
+        if stats is None or stats.ip != dev['ip']:
+            stats = DeviceCycleStats(dev['id'], dev['ip'], None)
+            self._stats[dev['id']] = stats
+
+        started = time.monotonic()
+        stats.mark_start(started)
+        state = STATE_OFFLINE
+        try:
+            async with self._semaphore:
+                state = await asyncio.wait_for(self.poll_device(dev, groups),
+                                               timeout=self.device_timeout)
+            stats.last_ok = time.time()
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            logger.warning(f"Deadline de {self.device_timeout}s excedido en {dev['ip']}")
+            if self.on_timeout:
+                self.on_timeout(dev)
+        except Exception as e:
+            stats.errors += 1
+            logger.error(f"Error en polling Modbus {dev['ip']}: {e}")
+
+        stats.last_duration_s = time.monotonic() - started
+        stats.cycles += 1
+        if self._tasks.get(dev['id']) is asyncio.current_task():
+            del self._tasks[dev['id']]
+        self.scheduler.complete(dev['id'], groups, state)
+        if dev['id'] in self.scheduler:
+            stats.target_s = self.scheduler.cycle_interval(dev['id'])
+        self._wakeup.set()
+
+    def get_stats(self):
+        """Ciclo objetivo vs real por dispositivo."""
+        return [s.to_dict() for s in self._stats.values()]
+
+    def get_cadence(self):
+        """Estado adaptativo e intervalo efectivo por grupo de cada dispositivo."""
+        return self.scheduler.snapshot()
@@ -2,116 +2,30 @@
 Monitor Modbus TCP para UPS INVT.
 Basado en la documentación oficial de protocolos INVT.
 
-Direccionamiento: Dirección Final = Offset del Equipo + ID del Registro
-  - Gabinete:  Offset 0,    IDs 0-99
-  - UPS:       Offset 100,  IDs 0-3071
-  - THS:       Offset 3271, IDs 0-39
-  - Water:     Offset 3311, IDs 0-9
-
-Coeficientes: 0.1 para voltajes/corrientes/temp, 0.01 para frecuencia/PF
+El mapa de registros vive en app/utils/modbus_registers.py y las lecturas
+se agrupan en bloques contiguos con app/services/modbus_read_plan.py.
 """
 
-import threading
+import os
 import time
+import asyncio
 import logging
-from pymodbus.client import ModbusTcpClient
-from app.services.influx_db import influx_service
+from app.services.modbus_engine import ModbusPollingEngine
+from app.services.modbus_pool import modbus_pool, ModbusConnectionUnavailable
+from app.services.monitor_shards import filter_shard
+from app.services.modbus_read_plan import build_read_plan, execute_plan, decode_plan
+from app.services.modbus_scheduler import (
+    AdaptiveScheduler, ALARM_STATE_CODES, STATE_ALARM, STATE_NORMAL, STATE_OFFLINE,
+)
 from app.base_datos import GestorDB
-from app.extensions import socketio
+from app.services.event_bus import publish
+from app.services.sample_sink import record_sample
 
 logger = logging.getLogger(__name__)
 
-# =============================================================================
-# MAPA DE REGISTROS INVT (Offset UPS = 100)
-# =============================================================================
-
-# Lectura en bloque: registros 100..155 (56 registros)
-UPS_BLOCK_START = 100
-UPS_BLOCK_COUNT = 56
-
-# IDs relativos al offset 100 (posición en el bloque leído)
-REGISTER_MAP = {
-    # Bypass (IDs 0-6)
-    'bypass_voltage_a':    {'pos': 0,  'coef': 0.1, 'unit': 'V'},
-    'bypass_voltage_b':    {'pos': 1,  'coef': 0.1, 'unit': 'V'},
-    'bypass_voltage_c':    {'pos': 2,  'coef': 0.1, 'unit': 'V'},
-    'bypass_current_a':    {'pos': 3,  'coef': 0.1, 'unit': 'A'},
-    'bypass_frequency':    {'pos': 6,  'coef': 0.01, 'unit': 'Hz'},
-
-    # Input (IDs 12-23)
-    'input_voltage_a':     {'pos': 12, 'coef': 0.1, 'unit': 'V'},
-    'input_voltage_b':     {'pos': 13, 'coef': 0.1, 'unit': 'V'},
-    'input_voltage_c':     {'pos': 14, 'coef': 0.1, 'unit': 'V'},
-    'input_current_a':     {'pos': 15, 'coef': 0.1, 'unit': 'A'},
-    'input_current_b':     {'pos': 16, 'coef': 0.1, 'unit': 'A'},
-    'input_current_c':     {'pos': 17, 'coef': 0.1, 'unit': 'A'},
-    'input_frequency_a':   {'pos': 18, 'coef': 0.01, 'unit': 'Hz'},
-    'input_frequency_b':   {'pos': 19, 'coef': 0.01, 'unit': 'Hz'},
-    'input_frequency_c':   {'pos': 20, 'coef': 0.01, 'unit': 'Hz'},
-    'input_pf_a':          {'pos': 21, 'coef': 0.01, 'unit': ''},
-    'input_pf_b':          {'pos': 22, 'coef': 0.01, 'unit': ''},
-    'input_pf_c':          {'pos': 23, 'coef': 0.01, 'unit': ''},
-
-    # Output (IDs 24-47)
-    'output_voltage_a':    {'pos': 24, 'coef': 0.1, 'unit': 'V'},
-    'output_voltage_b':    {'pos': 25, 'coef': 0.1, 'unit': 'V'},
-    'output_voltage_c':    {'pos': 26, 'coef': 0.1, 'unit': 'V'},
-    'output_current_a':    {'pos': 27, 'coef': 0.1, 'unit': 'A'},
-    'output_current_b':    {'pos': 28, 'coef': 0.1, 'unit': 'A'},
-    'output_current_c':    {'pos': 29, 'coef': 0.1, 'unit': 'A'},
-    'output_frequency_a':  {'pos': 30, 'coef': 0.01, 'unit': 'Hz'},
-    'output_pf_a':         {'pos': 33, 'coef': 0.01, 'unit': ''},
-    'output_apparent_a':   {'pos': 36, 'coef': 0.1, 'unit': 'kVA'},
-    'output_active_a':     {'pos': 39, 'coef': 0.1, 'unit': 'kW'},
-    'load_pct_a':          {'pos': 45, 'coef': 0.1, 'unit': '%'},
-    'load_pct_b':          {'pos': 46, 'coef': 0.1, 'unit': '%'},
-    'load_pct_c':          {'pos': 47, 'coef': 0.1, 'unit': '%'},
-
-    # Battery (IDs 49-55)
-    'battery_temp':        {'pos': 49, 'coef': 0.1, 'unit': '°C'},
-    'battery_voltage_pos': {'pos': 50, 'coef': 0.1, 'unit': 'V'},
-    'battery_voltage_neg': {'pos': 51, 'coef': 0.1, 'unit': 'V'},
-    'battery_current_pos': {'pos': 52, 'coef': 0.1, 'unit': 'A'},
-    'battery_current_neg': {'pos': 53, 'coef': 0.1, 'unit': 'A'},
-    'battery_remain_time': {'pos': 54, 'coef': 0.1, 'unit': 'min'},
-    'battery_capacity':    {'pos': 55, 'coef': 0.1, 'unit': '%'},
-}
-
-# Bloque de estado: registros 171..195 (25 registros)
-STATUS_BLOCK_START = 171
-STATUS_BLOCK_COUNT = 25
-
-STATUS_MAP = {
-    'power_supply_mode':    {'pos': 0,  'values': {0: 'Sin carga', 1: 'En UPS', 2: 'En Bypass'}},
-    'battery_status':       {'pos': 1,  'values': {0: 'No conectada', 1: 'Falla', 2: 'Flotacion', 3: 'Carga rapida', 4: 'Descargando'}},
-    'maint_breaker':        {'pos': 2,  'values': {0: 'Abierto', 1: 'Cerrado'}},
-    'battery_test':         {'pos': 3,  'values': {0: 'Sin test', 1: 'OK', 2: 'Fallido', 3: 'En progreso'}},
-    'rectifier_status':     {'pos': 5,  'values': {0: 'Cerrado', 1: 'Arranque suave', 2: 'Normal'}},
-    'phase_config':         {'pos': 20, 'values': {0: '3/3', 1: '3/1', 2: '1/1'}},
-    'battery_type':         {'pos': 24, 'values': {0: 'VRLA', 1: 'Litio', 2: 'NiCd'}},
-}
-
-# Sensores ambientales
-THS_BLOCK_START = 3271
-THS_BLOCK_COUNT = 2
-
-WATER_BLOCK_START = 3311
-WATER_BLOCK_COUNT = 1
-
-# Modulos: Dirección = 100 + 111 + (N-1)*96 + ID_Relativo
-MODULE_BASE = 211  # 100 + 111
-MODULE_STRIDE = 96
-MODULE_PARAMS = {
-    'mod_input_voltage_a':  {'rel': 0,  'coef': 0.1, 'unit': 'V'},
-    'mod_input_current_a':  {'rel': 3,  'coef': 0.1, 'unit': 'A'},
-    'mod_dc_bus_voltage':   {'rel': 12, 'coef': 0.1, 'unit': 'V'},
-    'mod_battery_voltage':  {'rel': 14, 'coef': 0.1, 'unit': 'V'},
-    'mod_discharge_current':{'rel': 20, 'coef': 0.1, 'unit': 'A'},
-    'mod_output_voltage_a': {'rel': 34, 'coef': 0.1, 'unit': 'V'},
-    'mod_inlet_temp':       {'rel': 84, 'coef': 0.1, 'unit': '°C'},
-    'mod_outlet_temp':      {'rel': 85, 'coef': 0.1, 'unit': '°C'},
-    'mod_scr_temp':         {'rel': 95, 'coef': 0.1, 'unit': '°C'},
-}
+# Concurrencia y deadline del motor async (configurables por entorno)
+MODBUS_MAX_CONCURRENCY = int(os.environ.get('MODBUS_MAX_CONCURRENCY', '32'))
+MODBUS_DEVICE_TIMEOUT = float(os.environ.get('MODBUS_DEVICE_TIMEOUT', '5'))
 
 
 # =============================================================================
@@ -133,17 +47,17 @@ ALARM_THRESHOLDS = {
 }
 
 
-def _safe_read(client, address, count, slave=1):
-    """Lectura segura con reintentos."""
+async def _safe_read(conn, address, count):
+    """Lectura segura con reintentos sobre una conexión del pool."""
     for attempt in range(3):
         try:
-            result = client.read_holding_registers(address, count, slave=slave)
-            if not result.isError():
-                return result.registers
+            return await conn.read_holding_registers(address, count)
+        except ModbusConnectionUnavailable:
+            return None
         except Exception as e:
             logger.warning(f"Intento {attempt+1} fallido en dir {address}: {e}")
             if attempt < 2:
-                time.sleep(0.5)
+                await asyncio.sleep(0.5)
     return None
 
 
@@ -218,51 +132,78 @@ def _check_alarms(data, status):
 
 
 class ModbusMonitor:
-    def __init__(self):
+    def __init__(self, max_concurrency=None, device_timeout=None, shard=None, db=None):
         self.running = False
-        self.db = GestorDB()
-        self.thread = None
-        # Contadores para polling diferenciado
-        self._cycle_count = 0
+        self.shard = shard
+        self.db = db or GestorDB()
+        self.pool = modbus_pool
+        self.runtime = modbus_pool.runtime
+        # Último estado leído por equipo: el grupo de estados no se lee en
+        # cada ciclo y las alarmas de batería no deben parpadear
+        self._last_status = {}
+        # Últimos valores por equipo de los grupos que no se leen en cada
+        # ciclo (módulos, ambiente): se publican hasta la próxima lectura
+        self._last_data = {}
+        self.engine = ModbusPollingEngine(
+            poll_device=self._process_device,
+            load_devices=self._load_devices,
+            scheduler=AdaptiveScheduler(),
+            on_timeout=self._emit_offline,
+            max_concurrency=max_concurrency or MODBUS_MAX_CONCURRENCY,
+            device_timeout=device_timeout or MODBUS_DEVICE_TIMEOUT,
+        )
+        self._engine_future = None
 
     def start_background_task(self):
         if not self.running:
             self.running = True
-            self.thread = threading.Thread(target=self._monitor_loop, daemon=True)
-            self.thread.start()
+            self._engine_future = self.runtime.submit(self.engine.run())
             logger.info("Servicio de Monitoreo Modbus INVT Iniciado")
 
     def stop(self):
         self.running = False
-
-    def _monitor_loop(self):
-        while self.running:
-            try:
-                devices = self.db.obtener_monitoreo_ups()
-                modbus_devices = [d for d in devices if d.get('protocolo', 'modbus') == 'modbus']
-
-                for dev in modbus_devices:
-                    if not self.running:
-                        break
-                    self._process_device(dev)
-                    time.sleep(0.1)  # Yield entre dispositivos
-
-            except Exception as e:
-                logger.error(f"Error en ciclo de monitoreo Modbus: {e}")
-
-            self._cycle_count += 1
-            time.sleep(2)  # Polling base: 2 segundos
-
-    def _process_device(self, dev):
+        self.engine.stop()
+        if self._engine_future:
+            self._engine_future.cancel()
+
+    def get_cycle_stats(self):
+        """Ciclo objetivo vs real de cada dispositivo Modbus."""
+        return self.engine.get_stats()
+
+    def get_cadence(self):
+        """Estado adaptativo e intervalos efectivos por dispositivo."""
+        return self.engine.get_cadence()
+
+    def get_connection_stats(self):
+        """Salud de las conexiones persistentes del pool."""
+        return self.pool.get_stats()
+
+    def get_stats_snapshot(self):
+        """Ciclo, cadencia y conexiones tomados desde el loop Modbus (seguro entre hilos)."""
+        async def collect():
+            return {
+                'cycle': self.get_cycle_stats(),
+                'cadence': self.get_cadence(),
+                'connections': self.get_connection_stats(),
+            }
+        return self.runtime.run(collect(), timeout=5)
+
+    def _load_devices(self):
+        devices = filter_shard(self.db.obtener_monitoreo_ups(), self.shard)
+        return [d for d in devices if d.get('protocolo', 'modbus') == 'modbus']
+
+    async def _process_device(self, dev, groups):
+        """Lee los grupos vencidos del equipo y retorna su estado para el planificador."""
         ip = dev['ip']
         port = dev.get('port', 502)
         slave = dev.get('slave_id', 1)
-        name = dev.get('nombre', 'UPS')
 
-        client = ModbusTcpClient(ip, port=port, timeout=5)
+        conn = self.pool.get(ip, port, slave)
         try:
-            connected = client.connect()
-        except Exception:
+            await conn.ensure_connected()
+            connected = True
+        except ModbusConnectionUnavailable as e:
+            logger.debug(f"Modbus {ip} no disponible: {e}")
             connected = False
 
         data = {}
@@ -272,75 +213,67 @@ class ModbusMonitor:
 
         if connected:
             try:
-                # === BLOQUE 1: Parametros electricos (cada 2s) ===
-                regs = _safe_read(client, UPS_BLOCK_START, UPS_BLOCK_COUNT, slave)
-                if regs:
+                # Lecturas contiguas en bloque y decodificación desde los buffers
+                plan = build_read_plan(groups)
+                responses = await execute_plan(
+                    plan, lambda start, count: _safe_read(conn, start, count))
+                data, status_data, online = decode_plan(plan, responses)
+                if online:
                     device_status = 'online'
-                    for key, info in REGISTER_MAP.items():
-                        pos = info['pos']
-                        if pos < len(regs):
-                            data[key] = round(regs[pos] * info['coef'], 2)
-
-                # === BLOQUE 2: Estados (cada 5s ~ cada 2-3 ciclos) ===
-                if self._cycle_count % 3 == 0:
-                    status_regs = _safe_read(client, STATUS_BLOCK_START, STATUS_BLOCK_COUNT, slave)
-                    if status_regs:
-                        for key, info in STATUS_MAP.items():
-                            pos = info['pos']
-                            if pos < len(status_regs):
-                                raw_val = status_regs[pos]
-                                status_data[f'{key}_raw'] = raw_val
-                                status_data[key] = info['values'].get(raw_val, f'Desconocido({raw_val})')
-
-                # === BLOQUE 3: Sensores ambientales (cada 30s ~ cada 15 ciclos) ===
-                if self._cycle_count % 15 == 0:
-                    ths_regs = _safe_read(client, THS_BLOCK_START, THS_BLOCK_COUNT, slave)
-                    if ths_regs:
-                        data['env_temperature'] = round(ths_regs[0] * 0.1, 1)
-                        data['env_humidity'] = round(ths_regs[1] * 0.1, 1)
-
-                    water_regs = _safe_read(client, WATER_BLOCK_START, WATER_BLOCK_COUNT, slave)
-                    if water_regs:
-                        data['water_leak_location'] = water_regs[0]
-
-                # === BLOQUE 4: Modulos (cada 10s ~ cada 5 ciclos, max 4 modulos) ===
-                if self._cycle_count % 5 == 0:
-                    modules_data = []
-                    for mod_num in range(1, 5):  # Hasta 4 modulos
-                        mod_base = MODULE_BASE + (mod_num - 1) * MODULE_STRIDE
-                        # Intentar leer solo el primer registro para ver si el modulo existe
-                        test_reg = _safe_read(client, mod_base, 1, slave)
-                        if test_reg is None or test_reg[0] == 0:
-                            break  # No hay mas modulos
-
-                        mod_data = {'module_number': mod_num}
-                        for key, info in MODULE_PARAMS.items():
-                            reg = _safe_read(client, mod_base + info['rel'], 1, slave)
-                            if reg:
-                                mod_data[key] = round(reg[0] * info['coef'], 2)
-                        modules_data.append(mod_data)
-
-                    if modules_data:
-                        data['modules'] = modules_data
+                    if status_data:
+                        self._last_status[dev['id']] = status_data
+
+                    # === Historial (se encola; el sink escribe en segundo plano) ===
+                    # Solo los grupos leídos en este ciclo: sin repetir valores viejos
+                    record_sample(dev, 'modbus', data)
+
+                    # Los grupos que no tocaban conservan su último valor, así las
+                    # alarmas ambientales no desaparecen entre lecturas
+                    last = self._last_data.setdefault(dev['id'], {})
+                    last.update(data)
+                    data = dict(last)
+                    status_data = status_data or self._last_status.get(dev['id'], {})
+                else:
+                    self._forget(dev['id'])
 
                 # === Detectar alarmas ===
-                alarms = _check_alarms(data, status_data)
-
-                # === Escribir a InfluxDB ===
-                influx_service.write_ups_data(name, ip, data)
+                alarms = _check_alarms(data, status_data or self._last_status.get(dev['id']))
 
             except Exception as e:
                 logger.error(f"Error lectura Modbus {ip}: {e}")
-            finally:
-                client.close()
 
+        if device_status == 'offline':
+            self._forget(dev['id'])
+        self._emit_update(dev, device_status, data, status_data, alarms)
+
+        if device_status == 'offline':
+            return STATE_OFFLINE
+        if any(alarm['code'] in ALARM_STATE_CODES for alarm in alarms):
+            return STATE_ALARM
+        return STATE_NORMAL
+
+    def _emit_offline(self, dev):
+        """Publica el equipo como offline cuando excede su deadline."""
+        self._forget(dev['id'])
+        self._emit_update(dev, 'offline', {}, {}, [])
+
+    def _forget(self, device_id):
+        """
+        Descarta los últimos valores de un equipo offline: tras el corte no se
+        muestran ni alarman datos de antes hasta volver a leer cada grupo.
+        """
+        self._last_data.pop(device_id, None)
+        self._last_status.pop(device_id, None)
+
+    def _emit_update(self, dev, device_status, data, status_data, alarms):
         # Mapear datos al formato del frontend
         mapped = self._map_to_frontend(data, status_data)
 
         payload = {
             'id': dev['id'],
-            'ip': ip,
-            'name': name,
+            'ip': dev['ip'],
+            'name': dev.get('nombre', 'UPS'),
+            'sitio': dev.get('sitio'),
             'status': device_status,
             'protocol': 'modbus',
             'data': mapped,
@@ -348,7 +281,7 @@ class ModbusMonitor:
             'alarms': alarms,
             'timestamp': time.time()
         }
-        socketio.emit('ups_update', payload)
+        publish('ups_update', payload)
 
     def _map_to_frontend(self, data, status_data):
         """Mapea datos crudos al formato esperado por el frontend."""
@@ -408,5 +341,3 @@ class ModbusMonitor:
             'phases': 3 if data.get('input_voltage_b', 0) > 50 else 1,
         }
 
-
-monitor_service = ModbusMonitor()
@@ -0,0 +1,179 @@
+"""
+Pool de conexiones Modbus TCP persistentes.
+
+Las tarjetas de red INVT tienen tablas de conexión muy pequeñas; abrir y
+cerrar un socket por ciclo las agota. El pool mantiene una conexión viva por
+(ip, puerto, slave), la reabre de forma perezosa con backoff exponencial y
+lleva estadísticas de salud por conexión.
+
+Todas las conexiones viven en el loop de ``modbus_runtime``; el código
+síncrono (rutas Flask) debe usar ``modbus_pool.run(...)``.
+"""
+
+import asyncio
+import logging
+import time
+
+from pymodbus.client import AsyncModbusTcpClient
+
+from app.services.async_runtime import AsyncRuntime
+
+logger = logging.getLogger(__name__)
+
+
+class ModbusConnectionUnavailable(Exception):
+    """La conexión está en backoff o no se pudo establecer."""
+
+
+class PooledModbusConnection:
+    """Conexión Modbus TCP de larga duración con métricas de salud."""
+
+    def __init__(self, ip, port, slave, timeout, backoff_base, backoff_max):
+        self.ip = ip
+        self.port = port
+        self.slave = slave
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.client = None
+        self.lock = asyncio.Lock()
+        self.connects = 0
+        self.reconnects = 0
+        self.error_streak = 0
+        self.last_rtt_ms = None
+        self.last_error = None
+        self.last_used = None
+        self.next_retry_at = 0.0
+
+    @property
+    def key(self):
+        return (self.ip, self.port, self.slave)
+
+    @property
+    def connected(self):
+        return self.client is not None and self.client.connected
+
+    async def ensure_connected(self, force=False):
+        """Conecta si hace falta, respetando el backoff tras errores (salvo force)."""
+        if self.connected:
+            return
+        now = time.monotonic()
+        if not force and now < self.next_retry_at:
+            raise ModbusConnectionUnavailable(
+                f"{self.ip}:{self.port} en backoff ({self.next_retry_at - now:.1f}s restantes)")
+
+        self._drop_client()
+        # reconnect_delay=0: la reconexión la gestiona el pool, no pymodbus
+        self.client = AsyncModbusTcpClient(self.ip, port=self.port, timeout=self.timeout,
+                                           retries=0, reconnect_delay=0)
+        try:
+            ok = await self.client.connect()
+        except Exception as e:
+            ok = False
+            self.last_error = str(e)
+        if not ok:
+            self._register_error(self.last_error or 'conexión rechazada')
+            raise ModbusConnectionUnavailable(f"No se pudo conectar a {self.ip}:{self.port}")
+
+        if self.connects:
+            self.reconnects += 1
+        self.connects += 1
+        logger.debug(f"Conexión Modbus abierta {self.ip}:{self.port} (slave {self.slave})")
+
+    async def read_holding_registers(self, address, count):
+        """Lee registros midiendo RTT. Retorna la lista de registros o None."""
+        async with self.lock:
+            await self.ensure_connected()
+            started = time.perf_counter()
+            try:
+                result = await self.client.read_holding_registers(address, count, slave=self.slave)
+            except asyncio.CancelledError:
+                # Deadline del llamador: la transacción queda a medias, reabrir
+                self._register_error('deadline excedido')
+                self._drop_client()
+                raise
+            except Exception as e:
+                self._register_error(str(e))
+                self._drop_client()
+                raise
+            self.last_rtt_ms = (time.perf_counter() - started) * 1000
+            self.last_used = time.time()
+            self.error_streak = 0
+            self.next_retry_at = 0.0
+            # Una respuesta de excepción Modbus sigue siendo un socket sano
+            if result.isError():
+                return None
+            return result.registers
+
+    def _register_error(self, message):
+        self.error_streak += 1
+        self.last_error = message
+        delay = min(self.backoff_base * (2 ** (self.error_streak - 1)), self.backoff_max)
+        self.next_retry_at = time.monotonic() + delay
+
+    def _drop_client(self):
+        if self.client is not None:
+            try:
+                self.client.close()
+            except Exception:
+                pass
+            self.client = None
+
+    def close(self):
+        self._drop_client()
+
+    def to_dict(self):
+        return {
+            'ip': self.ip,
+            'port': self.port,
+            'slave': self.slave,
+            'connected': self.connected,
+            'reconnects': self.reconnects,
+            'last_rtt_ms': round(self.last_rtt_ms, 2) if self.last_rtt_ms is not None else None,
+            'error_streak': self.error_streak,
+            'last_error': self.last_error,
+            'last_used': self.last_used,
+        }
+
+
+class ModbusConnectionPool:
+    """Pool de conexiones indexado por (ip, puerto, slave)."""
+
+    def __init__(self, runtime, timeout=3.0, backoff_base=1.0, backoff_max=60.0):
+        self.runtime = runtime
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._connections = {}
+
+    def get(self, ip, port=502, slave=1):
+        """Retorna (creando si no existe) la conexión del equipo. Debe llamarse desde el loop."""
+        key = (ip, int(port), int(slave))
+        conn = self._connections.get(key)
+        if conn is None:
+            conn = PooledModbusConnection(ip, key[1], key[2], self.timeout,
+                                          self.backoff_base, self.backoff_max)
+            self._connections[key] = conn
+        return conn
+
+    def discard(self, ip, port=502, slave=1):
+        conn = self._connections.pop((ip, int(port), int(slave)), None)
+        if conn:
+            conn.close()
+
+    def run(self, coro, timeout=None):
+        """Ejecuta una corrutina sobre el loop del pool desde código síncrono."""
+        return self.runtime.run(coro, timeout)
+
+    def get_stats(self):
+        return [conn.to_dict() for conn in list(self._connections.values())]
+
+    def close_all(self):
+        for conn in list(self._connections.values()):
+            conn.close()
+        self._connections.clear()
+
+
+# Loop y pool compartidos por ModbusMonitor y las rutas de diagnóstico
+modbus_runtime = AsyncRuntime('modbus')
+modbus_pool = ModbusConnectionPool(modbus_runtime)
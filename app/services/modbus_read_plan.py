@@ -0,0 +1,281 @@
+"""
+Planificador de lecturas Modbus.
+
+Convierte los grupos de registros que tocan en un ciclo (eléctricos, estados,
+ambientales, módulos) en el mínimo de peticiones ``read_holding_registers``
+contiguas, respetando el máximo de 125 registros por petición del protocolo
+y sin cruzar entre mapas de equipo ni entre módulos (``MAP_BOUNDARIES``).
+
+La decodificación es vectorizada: los mapas de registros se compilan una vez
+al importar en arreglos de direcciones y coeficientes, y cada plan se escala
+con una sola operación NumPy sobre un arreglo preasignado.
+"""
+
+from bisect import bisect_right
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+
+from app.utils.modbus_registers import (
+    UPS_BLOCK_START, REGISTER_MAP,
+    STATUS_BLOCK_START, STATUS_MAP,
+    THS_BLOCK_START, THS_MAP, WATER_BLOCK_START, WATER_MAP,
+    MODULE_PARAMS, MODULE_STRIDE, MAX_MODULES,
+    GROUP_ELECTRICAL, GROUP_STATUS, GROUP_ENVIRONMENT, GROUP_MODULES,
+    module_base, group_addresses,
+)
+
+# Límite de la especificación Modbus para la función 0x03
+MAX_REGISTERS_PER_READ = 125
+
+# Los huecos dentro del mapa UPS (IDs 0-3071) son direcciones definidas y se
+# leen de relleno, pero una petición nunca cruza un límite de ``MAP_BOUNDARIES``
+MAX_GAP = MODULE_STRIDE
+
+# Inicio de cada mapa de equipo (UPS/THS/Water): una lectura que cruza entre
+# mapas puede ser rechazada y perder datos de ambos. Cada módulo también va
+# en su propia petición: un UPS con menos módulos que MAX_MODULES rechaza las
+# direcciones de los ausentes sin arrastrar al módulo 1 ni a los estados.
+MAP_BOUNDARIES = tuple(sorted(
+    [UPS_BLOCK_START, THS_BLOCK_START, WATER_BLOCK_START] +
+    [module_base(n) for n in range(1, MAX_MODULES + 2)]
+))
+
+
+class ReadRequest(NamedTuple):
+    start: int
+    count: int
+
+
+def plan_reads(addresses, max_count=MAX_REGISTERS_PER_READ, max_gap=MAX_GAP,
+               boundaries=MAP_BOUNDARIES):
+    """
+    Agrupa direcciones en el mínimo de peticiones contiguas.
+
+    Barrido voraz sobre las direcciones ordenadas: cada petición se extiende
+    mientras la siguiente dirección quepa en ``max_count`` registros, no haya
+    un hueco mayor a ``max_gap`` y no cruce ninguna dirección de ``boundaries``.
+    """
+    requests = []
+    start = last = None
+    segment = None
+    for addr in sorted(set(addresses)):
+        addr_segment = bisect_right(boundaries, addr)
+        if (start is not None and addr - start < max_count and addr - last <= max_gap
+                and addr_segment == segment):
+            last = addr
+            continue
+        if start is not None:
+            requests.append(ReadRequest(start, last - start + 1))
+        start = last = addr
+        segment = addr_segment
+    if start is not None:
+        requests.append(ReadRequest(start, last - start + 1))
+    return requests
+
+
+class CompiledGroup:
+    """Mapa de un grupo compilado a arreglos (nombres, direcciones, coeficientes)."""
+
+    def __init__(self, names, addresses, coefs):
+        self.names = tuple(names)
+        self.addresses = np.asarray(addresses, dtype=np.intp)
+        self.coefs = np.asarray(coefs, dtype=np.float64)
+        self.dtype = np.dtype([(name, np.float64) for name in self.names])
+
+
+def _compile_map(base, field_map):
+    return CompiledGroup(
+        field_map.keys(),
+        [base + info['pos'] for info in field_map.values()],
+        [info.get('coef', 1) for info in field_map.values()],
+    )
+
+
+def _compile_modules():
+    # Matriz (módulo x parámetro) de direcciones
+    return CompiledGroup(
+        MODULE_PARAMS.keys(),
+        [[module_base(n) + info['rel'] for info in MODULE_PARAMS.values()]
+         for n in range(1, MAX_MODULES + 1)],
+        [info['coef'] for info in MODULE_PARAMS.values()],
+    )
+
+
+# Tablas compiladas al importar
+COMPILED_GROUPS = {
+    GROUP_ELECTRICAL: _compile_map(UPS_BLOCK_START, REGISTER_MAP),
+    GROUP_STATUS: _compile_map(STATUS_BLOCK_START, STATUS_MAP),
+    GROUP_ENVIRONMENT: CompiledGroup(
+        list(THS_MAP) + list(WATER_MAP),
+        [THS_BLOCK_START + i['pos'] for i in THS_MAP.values()] +
+        [WATER_BLOCK_START + i['pos'] for i in WATER_MAP.values()],
+        [i['coef'] for i in THS_MAP.values()] + [i['coef'] for i in WATER_MAP.values()],
+    ),
+    GROUP_MODULES: _compile_modules(),
+}
+
+_STATUS_VALUES = [info['values'] for info in STATUS_MAP.values()]
+
+
+class ReadPlan:
+    """
+    Peticiones de un conjunto de grupos y sus tablas de decodificación.
+
+    Cada plan preasigna un buffer plano de registros (todas las respuestas
+    concatenadas) y un único arreglo de salida; ``values[grupo]`` es una vista
+    de ese arreglo y ``fields[grupo]`` un registro NumPy con un campo por
+    nombre sobre la misma memoria.
+    """
+
+    def __init__(self, groups, requests):
+        self.groups = groups
+        self.requests = requests
+        self._index = {}
+        offsets = []
+        size = 0
+        for i, req in enumerate(requests):
+            offsets.append(size)
+            for offset in range(req.count):
+                self._index[req.start + offset] = (i, offset)
+            size += req.count
+        self._offsets = offsets
+        # Los registros Modbus son de 16 bits; copiar enteros pequeños es más
+        # barato que convertirlos a float al llenar el buffer
+        self._buffer = np.zeros(size, dtype=np.uint16)
+        self._valid = np.ones(size, dtype=bool)
+
+        # Posición de cada campo dentro del buffer plano, grupo tras grupo
+        positions = []
+        coefs = []
+        slices = {}
+        for group in sorted(groups):
+            compiled = COMPILED_GROUPS[group]
+            flat = [offsets[i] + off for i, off in map(self._index.__getitem__,
+                                                      compiled.addresses.ravel().tolist())]
+            slices[group] = (len(positions), len(positions) + len(flat))
+            positions.extend(flat)
+            coefs.extend(np.broadcast_to(compiled.coefs, compiled.addresses.shape).ravel().tolist())
+        self._positions = np.asarray(positions, dtype=np.intp)
+        self._coefs = np.asarray(coefs, dtype=np.float64)
+        self._out = np.empty(len(positions), dtype=np.float64)
+
+        self.values = {}
+        self.fields = {}
+        for group, (lo, hi) in slices.items():
+            compiled = COMPILED_GROUPS[group]
+            self.values[group] = self._out[lo:hi].reshape(compiled.addresses.shape)
+            if group != GROUP_MODULES:
+                self.fields[group] = self.values[group].view(compiled.dtype)[0]
+
+    def __len__(self):
+        return len(self.requests)
+
+    def locate(self, address):
+        """(índice de petición, offset) de una dirección del plan."""
+        return self._index[address]
+
+    def fill(self, responses):
+        """Copia las respuestas al buffer plano y marca las peticiones fallidas."""
+        buf = self._buffer
+        valid = self._valid
+        complete = True
+        for req, start, regs in zip(self.requests, self._offsets, responses):
+            end = start + req.count
+            if regs is None or len(regs) < req.count:
+                valid[start:end] = False
+                complete = False
+            else:
+                buf[start:end] = regs[:req.count] if len(regs) > req.count else regs
+                valid[start:end] = True
+        return complete
+
+    def scale(self, complete=True):
+        """
+        Escala todo el plan en una operación: salida = buffer[posiciones] * coef.
+        Los campos de peticiones fallidas quedan en NaN.
+        """
+        out = self._out
+        np.multiply(self._buffer[self._positions], self._coefs, out=out)
+        np.round(out, 2, out=out)
+        if not complete:
+            out[~self._valid[self._positions]] = np.nan
+        return out
+
+
+def _as_dict(names, values, complete):
+    if complete:
+        return dict(zip(names, values.tolist()))
+    # NaN != NaN: descarta los campos de peticiones fallidas
+    return {k: v for k, v in zip(names, values.tolist()) if v == v}
+
+
+@lru_cache(maxsize=None)
+def build_read_plan(groups):
+    """Plan (cacheado) para un frozenset de grupos de polling."""
+    addresses = []
+    for group in sorted(groups):
+        addresses.extend(group_addresses(group))
+    return ReadPlan(groups, plan_reads(addresses))
+
+
+async def execute_plan(plan, read):
+    """
+    Ejecuta las peticiones del plan con ``read(start, count)``.
+    Retorna una lista paralela a ``plan.requests`` (None si la lectura falló).
+    """
+    responses = []
+    for req in plan.requests:
+        responses.append(await read(req.start, req.count))
+    return responses
+
+
+def decode_plan(plan, responses):
+    """
+    Decodifica los buffers de un plan ejecutado.
+
+    Returns:
+        (data, status_data, online) con el mismo formato que el polling por
+        bloques: valores escalados, estados con su texto y ``modules``.
+    """
+    complete = plan.fill(responses)
+    plan.scale(complete)
+    data = {}
+    status_data = {}
+    online = False
+
+    if GROUP_ELECTRICAL in plan.groups:
+        electrical = _as_dict(COMPILED_GROUPS[GROUP_ELECTRICAL].names,
+                              plan.values[GROUP_ELECTRICAL], complete)
+        online = bool(electrical)
+        data.update(electrical)
+
+    if GROUP_STATUS in plan.groups:
+        raw = plan.values[GROUP_STATUS].tolist()
+        for key, raw_val, values in zip(COMPILED_GROUPS[GROUP_STATUS].names, raw, _STATUS_VALUES):
+            if raw_val != raw_val:
+                continue
+            raw_val = int(raw_val)
+            status_data[f'{key}_raw'] = raw_val
+            status_data[key] = values.get(raw_val, f'Desconocido({raw_val})')
+
+    if GROUP_ENVIRONMENT in plan.groups:
+        data.update(_as_dict(COMPILED_GROUPS[GROUP_ENVIRONMENT].names,
+                             plan.values[GROUP_ENVIRONMENT], complete))
+
+    if GROUP_MODULES in plan.groups:
+        matrix = plan.values[GROUP_MODULES]
+        names = COMPILED_GROUPS[GROUP_MODULES].names
+        # El primer registro en cero (o ilegible) indica que no hay más módulos
+        present = matrix[:, 0] > 0
+        count = int(present.argmin()) if not present.all() else len(present)
+        modules_data = []
+        for mod_num in range(count):
+            mod_data = {'module_number': mod_num + 1}
+            mod_data.update(_as_dict(names, matrix[mod_num], complete))
+            modules_data.append(mod_data)
+        if modules_data:
+            data['modules'] = modules_data
+
+    return data, status_data, online
@@ -0,0 +1,220 @@
+"""
+Planificador adaptativo de polling Modbus.
+
+Mantiene un heap con el próximo vencimiento de cada (dispositivo, grupo de
+registros). La cadencia de cada grupo parte de un intervalo base y se ajusta
+según el estado del equipo:
+
+- alarma (ON_BATTERY, OVERLOAD): intervalos a la mitad
+- estable (muchos ciclos seguidos sin alarma): intervalos al doble
+- offline: backoff exponencial hasta 8x
+"""
+
+import heapq
+import itertools
+import time
+
+from app.utils.modbus_registers import (
+    GROUP_ELECTRICAL, GROUP_STATUS, GROUP_ENVIRONMENT, GROUP_MODULES,
+)
+
+STATE_NORMAL = 'normal'
+STATE_ALARM = 'alarm'
+STATE_STABLE = 'stable'
+STATE_OFFLINE = 'offline'
+
+# Cadencias base (equivalentes a los antiguos múltiplos del ciclo de 2s)
+BASE_INTERVALS = {
+    GROUP_ELECTRICAL: 2.0,
+    GROUP_STATUS: 6.0,
+    GROUP_MODULES: 10.0,
+    GROUP_ENVIRONMENT: 30.0,
+}
+
+# Alarmas que aceleran el polling del equipo
+ALARM_STATE_CODES = frozenset({'ON_BATTERY', 'OVERLOAD'})
+
+ALARM_FACTOR = 0.5
+STABLE_FACTOR = 2.0
+STABLE_AFTER = 15          # polls normales consecutivos para considerarse estable
+OFFLINE_FACTOR_MAX = 8.0
+MIN_INTERVAL = 1.0
+
+# Grupos que vencen dentro de esta ventana se leen juntos en un solo plan
+COALESCE_WINDOW = 0.5
+
+
+class DeviceSchedule:
+    """Estado de planificación de un dispositivo."""
+
+    __slots__ = ('device_id', 'state', 'factor', 'normal_streak', 'offline_streak',
+                 'next_due', 'in_flight', 'pending', 'generation')
+
+    def __init__(self, device_id, generation):
+        self.device_id = device_id
+        self.state = STATE_NORMAL
+        self.factor = 1.0
+        self.normal_streak = 0
+        self.offline_streak = 0
+        self.next_due = {}        # grupo -> vencimiento (reloj monotónico)
+        self.in_flight = frozenset()
+        self.pending = set()      # grupos vencidos mientras había una lectura en curso
+        self.generation = generation
+
+
+class AdaptiveScheduler:
+    """
+    Heap de vencimientos por dispositivo x grupo.
+
+    ``pop_due`` entrega los grupos vencidos agrupados por dispositivo; el
+    llamador lee esos grupos y reporta el resultado con ``complete``, que
+    reprograma los grupos según el nuevo estado del equipo. Un dispositivo
+    nunca se entrega dos veces mientras tiene una lectura en curso.
+    """
+
+    def __init__(self, base_intervals=None, clock=time.monotonic):
+        self.base_intervals = dict(base_intervals or BASE_INTERVALS)
+        self._clock = clock
+        self._heap = []
+        self._seq = itertools.count()
+        self._generations = itertools.count()
+        self._devices = {}
+
+    def __contains__(self, device_id):
+        return device_id in self._devices
+
+    def add_device(self, device_id):
+        """Registra un dispositivo con todos sus grupos vencidos."""
+        sched = DeviceSchedule(device_id, next(self._generations))
+        self._devices[device_id] = sched
+        now = self._clock()
+        for group in self.base_intervals:
+            self._push(sched, group, now)
+
+    def remove_device(self, device_id):
+        # Las entradas del heap quedan huérfanas y se descartan al salir
+        self._devices.pop(device_id, None)
+
+    def interval(self, device_id, group):
+        """Intervalo efectivo actual de un grupo, en segundos."""
+        sched = self._devices[device_id]
+        return max(MIN_INTERVAL, self.base_intervals[group] * sched.factor)
+
+    def cycle_interval(self, device_id):
+        """Intervalo efectivo del grupo más frecuente (ciclo objetivo del equipo)."""
+        return min(self.interval(device_id, g) for g in self.base_intervals)
+
+    def time_until_next(self):
+        """Segundos hasta el próximo vencimiento (None si no hay nada agendado)."""
+        self._discard_stale()
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self._clock())
+
+    def pop_due(self):
+        """Retorna {device_id: frozenset(grupos)} con lo que toca leer ahora."""
+        limit = self._clock() + COALESCE_WINDOW
+        due = {}
+        while self._heap and self._heap[0][0] <= limit:
+            _, _, device_id, group, generation = heapq.heappop(self._heap)
+            sched = self._devices.get(device_id)
+            if sched is None or sched.generation != generation:
+                continue
+            sched.next_due.pop(group, None)
+            if sched.in_flight:
+                sched.pending.add(group)
+            else:
+                due.setdefault(device_id, set()).add(group)
+        for device_id, groups in due.items():
+            self._devices[device_id].in_flight = frozenset(groups)
+        return {device_id: frozenset(groups) for device_id, groups in due.items()}
+
+    def complete(self, device_id, groups, state):
+        """
+        Reporta el resultado de leer ``groups`` y reprograma el dispositivo.
+
+        Args:
+            state: STATE_NORMAL, STATE_ALARM o STATE_OFFLINE según la lectura.
+        """
+        sched = self._devices.get(device_id)
+        if sched is None or sched.in_flight != groups:
+            return
+        now = self._clock()
+        previous_factor = sched.factor
+        self._update_state(sched, state)
+        sched.in_flight = frozenset()
+
+        if state == STATE_OFFLINE:
+            # Un equipo caído se sondea con una sola lectura de todos sus grupos
+            sched.generation = next(self._generations)
+            probe = now + self.cycle_interval(device_id)
+            for group in set(sched.next_due) | groups | sched.pending:
+                self._push(sched, group, probe)
+            sched.pending.clear()
+            return
+
+        for group in groups:
+            self._push(sched, group, now + self.interval(device_id, group))
+        # Lo que venció durante la lectura se atiende de inmediato
+        for group in sched.pending:
+            self._push(sched, group, now)
+        sched.pending.clear()
+
+        # Al acelerar, los grupos lejanos se adelantan al nuevo intervalo
+        if sched.factor < previous_factor:
+            self._reschedule(sched, now)
+
+    def snapshot(self):
+        """Cadencia efectiva y estado de cada dispositivo."""
+        now = self._clock()
+        result = []
+        for device_id, sched in self._devices.items():
+            result.append({
+                'device_id': device_id,
+                'state': sched.state,
+                'factor': sched.factor,
+                'intervals_s': {g: self.interval(device_id, g) for g in self.base_intervals},
+                'next_due_s': {g: round(max(0.0, due - now), 2)
+                               for g, due in sched.next_due.items()},
+                'in_flight': sorted(sched.in_flight),
+            })
+        return result
+
+    def _update_state(self, sched, state):
+        if state == STATE_OFFLINE:
+            sched.normal_streak = 0
+            sched.offline_streak += 1
+            sched.state = STATE_OFFLINE
+            sched.factor = min(2.0 ** (sched.offline_streak - 1), OFFLINE_FACTOR_MAX)
+            return
+
+        sched.offline_streak = 0
+        if state == STATE_ALARM:
+            sched.normal_streak = 0
+            sched.state = STATE_ALARM
+            sched.factor = ALARM_FACTOR
+        else:
+            sched.normal_streak += 1
+            if sched.normal_streak >= STABLE_AFTER:
+                sched.state = STATE_STABLE
+                sched.factor = STABLE_FACTOR
+            else:
+                sched.state = STATE_NORMAL
+                sched.factor = 1.0
+
+    def _reschedule(self, sched, now):
+        sched.generation = next(self._generations)
+        for group, due in list(sched.next_due.items()):
+            self._push(sched, group, min(due, now + self.interval(sched.device_id, group)))
+
+    def _push(self, sched, group, due):
+        sched.next_due[group] = due
+        heapq.heappush(self._heap, (due, next(self._seq), sched.device_id, group, sched.generation))
+
+    def _discard_stale(self):
+        while self._heap:
+            _, _, device_id, _, generation = self._heap[0]
+            sched = self._devices.get(device_id)
+            if sched is not None and sched.generation == generation:
+                return
+            heapq.heappop(self._heap)
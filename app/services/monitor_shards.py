@@ -0,0 +1,176 @@
+"""
+Reparto de la flota de monitoreo en procesos (shards).
+
+Con ``MONITOR_SHARDS=N`` el proceso web no sondea equipos: lanza N procesos
+``python -m app.services.monitor_shards <indice> <N>``, cada uno dueño de la
+partición ``id % N`` de monitoreo_config y con su propio MonitoringService
+(SNMP + Modbus) y su propio GIL. Los eventos decodificados vuelven al proceso
+web por una conexión local autenticada (multiprocessing.connection) y allí se
+reemiten por Socket.IO.
+
+Los workers se lanzan como módulos y no con multiprocessing.Process para no
+reimportar el script principal (run.py crea la app al importarse).
+"""
+
+import logging
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+from app.services.event_bus import STATS_EVENT, EventUplink, parse_address, relay_events
+
+logger = logging.getLogger(__name__)
+
+STATS_INTERVAL = 5.0
+
+_ENV_ADDRESS = 'MONITOR_SHARD_ADDRESS'
+_ENV_AUTHKEY = 'MONITOR_SHARD_AUTHKEY'
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+def shard_of(device_id, count):
+    """Shard dueño de un dispositivo (los ids son seriales: reparto parejo)."""
+    return int(device_id) % count
+
+
+def filter_shard(devices, shard):
+    """Filtra las filas de monitoreo_config que pertenecen a ``shard=(indice, total)``."""
+    if shard is None:
+        return devices
+    index, count = shard
+    return [d for d in devices if shard_of(d['id'], count) == index]
+
+
+class ShardStatsView:
+    """Estadísticas Modbus agregadas de los shards, con la interfaz de ModbusMonitor."""
+
+    def __init__(self):
+        self._by_shard = {}
+
+    def update(self, stats):
+        self._by_shard[stats['shard']] = stats
+
+    def _collect(self, key):
+        return [item for shard in sorted(self._by_shard) for item in self._by_shard[shard][key]]
+
+    def get_cycle_stats(self):
+        return self._collect('cycle')
+
+    def get_cadence(self):
+        return self._collect('cadence')
+
+    def get_connection_stats(self):
+        return self._collect('connections')
+
+    def get_stats_snapshot(self):
+        return {
+            'cycle': self.get_cycle_stats(),
+            'cadence': self.get_cadence(),
+            'connections': self.get_connection_stats(),
+        }
+
+
+class ShardedMonitoringService(threading.Thread):
+    """
+    Reemplazo de MonitoringService para el proceso web en modo sharded.
+
+    Lanza y supervisa los procesos de sondeo y reemite sus eventos.
+    ``modbus_monitor`` expone las estadísticas agregadas para las rutas.
+    """
+
+    def __init__(self, shards):
+        super().__init__(name='monitor-shards', daemon=True)
+        self.shards = shards
+        self.running = True
+        self.modbus_monitor = ShardStatsView()
+        self._authkey = secrets.token_bytes(32)
+        self._listener = Listener(('127.0.0.1', 0), authkey=self._authkey)
+        self._processes = [None] * shards
+
+    def run(self):
+        threading.Thread(target=self._accept_loop,
+                         name='monitor-shards-accept', daemon=True).start()
+        for index in range(self.shards):
+            self._spawn(index)
+        logger.info(f"Monitoreo repartido en {self.shards} procesos")
+
+        while self.running:
+            time.sleep(STATS_INTERVAL)
+            for index, proc in enumerate(self._processes):
+                if self.running and proc.poll() is not None:
+                    logger.warning(f"Shard {index} terminó (código {proc.returncode}), reiniciando")
+                    self._spawn(index)
+
+    def stop(self):
+        self.running = False
+        for proc in self._processes:
+            if proc is not None and proc.poll() is None:
+                proc.terminate()
+        self._listener.close()
+
+    def _spawn(self, index):
+        env = dict(os.environ)
+        env[_ENV_ADDRESS] = '%s:%d' % self._listener.address
+        env[_ENV_AUTHKEY] = self._authkey.hex()
+        self._processes[index] = subprocess.Popen(
+            [sys.executable, '-m', 'app.services.monitor_shards', str(index), str(self.shards)],
+            cwd=_PROJECT_ROOT, env=env)
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._read_loop, args=(conn,),
+                             name='monitor-shards-reader', daemon=True).start()
+
+    def _read_loop(self, conn):
+        with conn:
+            relay_events(conn, self.modbus_monitor, lambda: self.running)
+
+
+def run_shard(index, count):
+    """Punto de entrada de un proceso de sondeo."""
+    logging.basicConfig(level=logging.INFO,
+                        format=f'%(asctime)s [%(levelname)s] shard-{index} %(name)s: %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    from app.config import config_map
+    from app.db_connection import ConnectionPool
+    from app.services import event_bus
+    from app.services.influx_db import influx_service
+    from app.services.recent_samples import recent_samples
+
+    config = config_map[os.environ.get('FLASK_CONFIG', 'development')]
+    ConnectionPool.initialize(config.DATABASE_URL, minconn=1, maxconn=4)
+
+    uplink = EventUplink(Client(parse_address(os.environ[_ENV_ADDRESS]),
+                                authkey=bytes.fromhex(os.environ[_ENV_AUTHKEY])))
+    event_bus.set_sink(uplink)
+    recent_samples.forward_to(lambda sample: uplink(event_bus.SAMPLE_EVENT, sample))
+    influx_service.use_spool(f'shard-{index}')
+
+    from app.services.monitoring_service import MonitoringService
+    service = MonitoringService(shard=(index, count))
+    service.start()
+    modbus = service.modbus_monitor
+    logger.info(f"Shard {index}/{count} iniciado (pid {os.getpid()})")
+
+    while uplink.alive and service.is_alive():
+        time.sleep(STATS_INTERVAL)
+        try:
+            uplink(STATS_EVENT, dict(modbus.get_stats_snapshot(), shard=index))
+        except Exception as e:
+            logger.warning(f"No se pudieron recolectar estadísticas del shard: {e}")
+
+    service.stop()
+    logger.info(f"Shard {index} detenido")
+
+
+if __name__ == '__main__':
+    run_shard(int(sys.argv[1]), int(sys.argv[2]))
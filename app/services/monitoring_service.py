@@ -8,21 +8,28 @@ import time
 import asyncio
 import logging
 from app.base_datos import GestorDB
-from app.services.protocols.snmp_client import SNMPClient
 from app.services.modbus_monitor import ModbusMonitor
-from app.extensions import socketio
+from app.services.snmp_runtime import snmp_runtime
+from app.services.snmp_sessions import SnmpSessionRegistry
+from app.services.snmp_capabilities import CapabilityStore
+from app.services.event_bus import publish
+from app.services.sample_sink import record_sample
+from app.services.monitor_shards import filter_shard
 
 logger = logging.getLogger(__name__)
 
 
 class MonitoringService(threading.Thread):
-    def __init__(self, interval=2):
+    def __init__(self, interval=2, shard=None, db=None):
         super().__init__()
         self.interval = interval
+        self.shard = shard
         self.running = True
-        self.db = GestorDB()
+        self.db = db or GestorDB()
         self.daemon = True
-        self.modbus_monitor = ModbusMonitor()
+        self.modbus_monitor = ModbusMonitor(shard=shard, db=self.db)
+        self.capabilities = CapabilityStore(self.db)
+        self.sessions = SnmpSessionRegistry(snmp_runtime, capabilities=self.capabilities)
         self._cycle_count = 0
 
     def run(self):
@@ -45,20 +52,24 @@ class MonitoringService(threading.Thread):
         self.modbus_monitor.stop()
 
     def _poll_snmp_devices(self):
+        # Loop y SnmpEngine persistentes: no se recrean en cada ciclo
         try:
-            asyncio.run(self._async_poll())
+            snmp_runtime.run(self._async_poll())
         except Exception as e:
             logger.error(f"Error ejecutando poll async SNMP: {e}")
 
     async def _async_poll(self):
         try:
-            devices = self.db.obtener_monitoreo_ups()
+            # Consulta síncrona fuera del loop: no frena las peticiones SNMP en curso
+            devices = filter_shard(await asyncio.to_thread(self.db.obtener_monitoreo_ups), self.shard)
         except Exception as e:
             logger.error(f"Error leyendo DB: {e}")
             return
 
         # Filtrar solo dispositivos SNMP
         snmp_devices = [d for d in devices if d.get('protocolo', 'modbus') == 'snmp']
+        self.sessions.prune(d['id'] for d in snmp_devices)
+        await self.sessions.refresh(snmp_devices)
 
         tasks = []
         for dev in snmp_devices:
@@ -68,39 +79,12 @@ class MonitoringService(threading.Thread):
             await asyncio.gather(*tasks)
 
     async def _check_device(self, dev):
-        ip = dev['ip']
-        port = dev.get('snmp_port', 161) or 161
-        community = dev.get('snmp_community', 'public') or 'public'
-        # Manejo robusto de snmp_version (puede ser None, str, o int)
-        snmp_version_raw = dev.get('snmp_version')
-        if snmp_version_raw is None or snmp_version_raw == '':
-            snmp_version = 1  # Default SNMPv2c
-        else:
-            snmp_version = int(snmp_version_raw)
-        
-        # Tipo de UPS (nuevo)
-        ups_type = dev.get('ups_type', 'invt_enterprise')
+        session = self.sessions.get(dev)
+        client = session.client
+        ip = session.ip
         dev_id = dev['id']
 
         try:
-            # Seleccionar cliente según tipo de UPS
-            if ups_type == 'ups_mib_standard' or ups_type == 'hybrid':
-                # Usar cliente UPS-MIB para monofásicos o híbridos
-                from app.services.protocols.snmp_upsmib_client import UPSMIBClient
-                client = UPSMIBClient(
-                    ip_address=ip,
-                    community=community,
-                    port=port,
-                    mp_model=int(snmp_version),  # Asegurar que sea int
-                    include_invt=(ups_type == 'hybrid')
-                )
-                logger.info(f"Usando UPSMIBClient para {ip} (tipo: {ups_type})")
-            else:
-                # Usar cliente MINIMAL para INVT (muchos UPS INVT tienen OIDs limitados)
-                from app.services.protocols.snmp_minimal_client import MinimalSNMPClient
-                client = MinimalSNMPClient(community=community, port=port, mp_model=int(snmp_version))
-                logger.info(f"Usando MinimalSNMPClient para {ip} (tipo: {ups_type}, solo 5 OIDs)")
-            
             data = await client.get_ups_data(ip)
 
             if data:
@@ -111,10 +95,9 @@ class MonitoringService(threading.Thread):
                 data['estado'] = 'ONLINE'
 
                 # Agregar info de versión SNMP
-                version_name = 'SNMPv1' if snmp_version == 0 else 'SNMPv2c'
+                version_name = session.version_name
                 data['snmp_version'] = version_name
 
-                socketio.emit('ups_data', data, namespace='/monitor')
                 logger.info(f"✅ {ip} ({version_name}): {data.get('input_voltage_l1', 0)}V entrada, {data.get('battery_capacity', 0)}% batería")
 
                 # Original logic for mapped_data and alarms, adapted to use the 'data' dictionary
@@ -153,6 +136,9 @@ class MonitoringService(threading.Thread):
                 }
                 # Generar alarmas SNMP
                 alarms = self._check_snmp_alarms(mapped_data)
+
+                # Historial con el mismo esquema que Modbus (se encola, no bloquea)
+                record_sample(dev, 'snmp', data, ups_type=session.ups_type)
             else:
                 status = 'offline'
                 mapped_data = {}
@@ -163,12 +149,17 @@ class MonitoringService(threading.Thread):
                 'status': status,
                 'ip': ip,
                 'nombre': dev['nombre'],
+                'sitio': dev.get('sitio'),
                 'protocol': 'snmp',
                 'data': mapped_data,
                 'alarms': alarms,
             }
 
-            socketio.emit('ups_update', payload)
+            publish('ups_update', payload)
+
+            # Perfil de capacidades refinado por esta respuesta
+            if session.capabilities is not None and session.capabilities.dirty:
+                await asyncio.to_thread(self.capabilities.save, dev_id, session.capabilities)
 
         except Exception as e:
             logger.error(f"Error checking SNMP device {ip}: {e}")
@@ -0,0 +1,483 @@
+"""
+Historial de muestras en PostgreSQL (sink ``postgres`` de ``SAMPLE_SINKS``),
+para instalaciones sin InfluxDB.
+
+Cada muestra se guarda como una fila por métrica en ``ups_samples``
+(particionada por día). Un hilo escritor vacía la cola en lotes con ``COPY``
+cada ``PG_TELEMETRY_BATCH_SIZE`` muestras o ``PG_TELEMETRY_FLUSH_INTERVAL``
+segundos; si PostgreSQL no responde el lote se reintenta con backoff.
+
+Cada ``PG_TELEMETRY_MAINTENANCE_INTERVAL`` segundos el mismo hilo:
+
+- crea por adelantado las particiones de los próximos días/meses;
+- agrega incrementalmente los rollups de 1 min (desde las muestras), 15 min
+  (desde 1 min) y 1 h (desde 15 min) con min/max/promedio por métrica. Solo
+  recalcula los buckets cerrados desde la última marca de cada nivel más
+  ``PG_TELEMETRY_LATE_SECONDS`` hacia atrás, para incluir muestras atrasadas;
+- aplica la retención de cada nivel eliminando particiones completas (sin
+  DELETE ni VACUUM).
+
+Con varios procesos de sondeo (monitor_shards) cada uno escribe sus
+muestras y el rollup de cada nivel lo hace el que toma el advisory lock.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+import psycopg
+from psycopg import sql
+
+logger = logging.getLogger(__name__)
+
+PG_TELEMETRY_BATCH_SIZE = int(os.environ.get('PG_TELEMETRY_BATCH_SIZE', '5000'))         # muestras por COPY
+PG_TELEMETRY_FLUSH_INTERVAL = float(os.environ.get('PG_TELEMETRY_FLUSH_INTERVAL', '1.0'))  # segundos
+PG_TELEMETRY_QUEUE_SIZE = int(os.environ.get('PG_TELEMETRY_QUEUE_SIZE', '100000'))       # muestras en memoria
+PG_TELEMETRY_MAINTENANCE_INTERVAL = float(os.environ.get('PG_TELEMETRY_MAINTENANCE_INTERVAL', '60'))
+PG_TELEMETRY_LATE_SECONDS = float(os.environ.get('PG_TELEMETRY_LATE_SECONDS', '120'))
+PG_TELEMETRY_RAW_DAYS = int(os.environ.get('PG_TELEMETRY_RAW_DAYS', '14'))
+PG_TELEMETRY_1M_DAYS = int(os.environ.get('PG_TELEMETRY_1M_DAYS', '90'))
+PG_TELEMETRY_15M_DAYS = int(os.environ.get('PG_TELEMETRY_15M_DAYS', '400'))
+PG_TELEMETRY_1H_DAYS = int(os.environ.get('PG_TELEMETRY_1H_DAYS', '1825'))
+
+RETRY_MAX = 60.0                          # backoff máximo con PostgreSQL caído
+PARTITIONS_AHEAD = 2                      # días (o meses) de particiones creadas por adelantado
+ROLLUP_MAX_WINDOW = timedelta(hours=6)    # tramo máximo por pasada al ponerse al día
+STATE_TABLE = 'ups_samples_rollup_estado'
+_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)  # origen de los buckets
+_LOCK_ID = 0x55505354                     # advisory lock del mantenimiento ('UPST')
+
+
+class Level(NamedTuple):
+    """Nivel del historial: muestras crudas o un rollup."""
+    name: str
+    table: str
+    source: str            # tabla que se agrega (None en crudo)
+    width: timedelta       # ancho del bucket (None en crudo)
+    partition: str         # 'day' | 'month'
+    retention_days: int    # 0 conserva todo
+
+
+RAW = Level('raw', 'ups_samples', None, None, 'day', PG_TELEMETRY_RAW_DAYS)
+ROLLUPS = (
+    Level('1m', 'ups_samples_1m', 'ups_samples', timedelta(minutes=1), 'day', PG_TELEMETRY_1M_DAYS),
+    Level('15m', 'ups_samples_15m', 'ups_samples_1m', timedelta(minutes=15), 'month', PG_TELEMETRY_15M_DAYS),
+    Level('1h', 'ups_samples_1h', 'ups_samples_15m', timedelta(hours=1), 'month', PG_TELEMETRY_1H_DAYS),
+)
+LEVELS = (RAW,) + ROLLUPS
+
+_COPY = 'COPY ups_samples (ts, device_id, metric, value) FROM STDIN'
+
+_CREATE_PARTITION = 'CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {table} FOR VALUES FROM ({start}) TO ({end})'
+
+_CHILDREN = """
+    SELECT c.relname FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_class p ON p.oid = i.inhparent
+    WHERE p.relname = %s
+"""
+
+# Primer nivel: desde las muestras crudas
+_ROLLUP_FROM_RAW = """
+    SELECT date_bin(%(width)s, ts, %(origin)s), device_id, metric,
+           min(value), max(value), avg(value), count(*)
+    FROM {source} WHERE ts >= %(start)s AND ts < %(until)s
+    GROUP BY 1, 2, 3
+"""
+
+# Niveles siguientes: desde el rollup anterior, con el promedio ponderado
+_ROLLUP_FROM_ROLLUP = """
+    SELECT date_bin(%(width)s, bucket, %(origin)s), device_id, metric,
+           min(min_value), max(max_value), sum(avg_value * samples) / sum(samples), sum(samples)
+    FROM {source} WHERE bucket >= %(start)s AND bucket < %(until)s
+    GROUP BY 1, 2, 3
+"""
+
+_UPSERT = """
+    INSERT INTO {table} (bucket, device_id, metric, min_value, max_value, avg_value, samples)
+    {select}
+    ON CONFLICT (device_id, metric, bucket) DO UPDATE SET
+        min_value = EXCLUDED.min_value, max_value = EXCLUDED.max_value,
+        avg_value = EXCLUDED.avg_value, samples = EXCLUDED.samples
+"""
+
+
+# Serie de una métrica: (instante, min, max, promedio); en crudo los tres son el valor
+_SERIES_RAW = """
+    SELECT ts, value, value, value FROM ups_samples
+    WHERE device_id = %s AND metric = %s AND ts >= %s AND ts < %s ORDER BY ts
+"""
+_SERIES_ROLLUP = """
+    SELECT bucket, min_value, max_value, avg_value FROM {table}
+    WHERE device_id = %s AND metric = %s AND bucket >= %s AND bucket < %s ORDER BY bucket
+"""
+
+
+def floor_time(ts, width):
+    """Inicio del bucket de ancho ``width`` que contiene ``ts``."""
+    return ts - (ts - _EPOCH) % width
+
+
+def partition_range(granularity, ts):
+    """(sufijo, desde, hasta) de la partición diaria o mensual (UTC) que contiene ``ts``."""
+    ts = ts.astimezone(timezone.utc)
+    if granularity == 'day':
+        start = datetime(ts.year, ts.month, ts.day, tzinfo=timezone.utc)
+        return start.strftime('%Y%m%d'), start, start + timedelta(days=1)
+    start = datetime(ts.year, ts.month, 1, tzinfo=timezone.utc)
+    end = datetime(ts.year + ts.month // 12, ts.month % 12 + 1, 1, tzinfo=timezone.utc)
+    return start.strftime('%Y%m'), start, end
+
+
+def partition_name(table, suffix):
+    return f'{table}_p{suffix}'
+
+
+def partition_span(granularity, start, until):
+    """Un instante por cada partición que cubre [start, until)."""
+    points = [start]
+    end = partition_range(granularity, start)[2]
+    while end < until:
+        points.append(end)
+        end = partition_range(granularity, end)[2]
+    return points
+
+
+def expired_partitions(level, names, now):
+    """Particiones de ``level`` cuyo rango terminó antes del corte de retención."""
+    if level.retention_days <= 0:
+        return []
+    cutoff = now - timedelta(days=level.retention_days)
+    prefix = partition_name(level.table, '')
+    fmt = '%Y%m%d' if level.partition == 'day' else '%Y%m'
+    expired = []
+    for name in names:
+        if not name.startswith(prefix):
+            continue
+        try:
+            start = datetime.strptime(name[len(prefix):], fmt).replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue  # No la creó este módulo
+        if partition_range(level.partition, start)[2] <= cutoff:
+            expired.append(name)
+    return sorted(expired)
+
+
+def rollup_window(level, watermark, source_until):
+    """
+    Tramo [desde, hasta) de buckets de ``level`` a recalcular: los cerrados
+    hasta ``source_until`` desde la marca anterior, más el margen para muestras
+    atrasadas. None si no cerró ningún bucket nuevo.
+    """
+    start = floor_time(watermark - timedelta(seconds=PG_TELEMETRY_LATE_SECONDS), level.width)
+    until = min(floor_time(source_until, level.width), start + ROLLUP_MAX_WINDOW)
+    if until <= watermark:
+        return None
+    return start, until
+
+
+def choose_level(start, end, points, now):
+    """
+    Nivel a consultar para ``points`` puntos entre ``start`` y ``end``: el más
+    grueso cuyo bucket no supera el paso pedido, subiendo a uno más grueso si
+    ya no conserva ``start``. Así las filas leídas no dependen del rango.
+    """
+    step = (end - start) / max(points, 1)
+    index = 0
+    for i, level in enumerate(ROLLUPS, start=1):
+        if level.width <= step:
+            index = i
+    for level in LEVELS[index:]:
+        if level.retention_days <= 0 or start >= now - timedelta(days=level.retention_days):
+            return level
+    return LEVELS[-1]
+
+
+def sample_rows(sample):
+    """Filas (ts, device_id, metric, value) de una muestra para el COPY."""
+    seconds, nanos = divmod(sample.timestamp_ns, 1_000_000_000)
+    ts = datetime.fromtimestamp(seconds, timezone.utc) + timedelta(microseconds=nanos // 1000)
+    return [(ts, sample.device_id, metric, value) for metric, value in sample.fields.items()]
+
+
+class PostgresTelemetry:
+    """Escritor en lotes de ``ups_samples`` y mantenimiento de rollups/particiones."""
+
+    def __init__(self, pool=None, batch_size=None, flush_interval=None, queue_size=None,
+                 maintenance_interval=None):
+        self._pool = pool
+        self.batch_size = batch_size or PG_TELEMETRY_BATCH_SIZE
+        self.flush_interval = PG_TELEMETRY_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.max_pending = queue_size or PG_TELEMETRY_QUEUE_SIZE
+        self.maintenance_interval = (PG_TELEMETRY_MAINTENANCE_INTERVAL
+                                     if maintenance_interval is None else maintenance_interval)
+        self.online = True
+        self.last_error = None
+        self.written = 0          # muestras escritas
+        self.rows = 0             # filas (muestra x métrica)
+        self.dropped = 0
+        self.rejected = 0
+        self.watermarks = {}      # nivel -> hasta dónde está agregado
+        self.last_maintenance = None
+        self._partitions = set()  # particiones que ya existen
+        self._pending = []        # muestras de un COPY fallido, se reintentan primero
+        self._queue = queue.Queue(maxsize=self.max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._running = False
+        self._retry_at = 0.0
+        self._backoff = 1.0
+        self._maintain_at = 0.0
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            from app.db_connection import ConnectionPool
+            self._pool = ConnectionPool.get_instance()
+        return self._pool
+
+    # ------------------------------------------------------------------
+    # Productores (hilos de polling)
+    # ------------------------------------------------------------------
+    def enqueue(self, sample):
+        """Encola una ``Sample`` (no bloquea); False si la cola está llena."""
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(sample)
+            return True
+        except queue.Full:
+            self._drop(1)
+            return False
+
+    def _drop(self, count):
+        self.dropped += count
+        if self.dropped % 1000 < count:
+            logger.warning(f"Cola de PostgreSQL llena: {self.dropped} muestras descartadas")
+
+    # ------------------------------------------------------------------
+    # Hilo escritor
+    # ------------------------------------------------------------------
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='pg-telemetry-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _collect(self):
+        """Espera hasta juntar un lote completo o que pase ``flush_interval``."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while self._running or not self._queue.empty():
+            batch = self._collect()
+            try:
+                self._flush(batch)
+                now = time.monotonic()
+                if self._running and self.online and now >= self._maintain_at:
+                    self._maintain_at = now + self.maintenance_interval
+                    self.maintain()
+            except Exception as e:
+                logger.exception(f"Error en el escritor de PostgreSQL: {e}")
+
+    def _flush(self, batch):
+        if self._pending:
+            room = max(self.max_pending - len(self._pending), 0)
+            if len(batch) > room:
+                self._drop(len(batch) - room)
+                batch = batch[:room]
+            batch = self._pending + batch
+            self._pending = []
+        if not batch:
+            return
+        if time.monotonic() < self._retry_at:
+            self._pending = batch
+            return
+        for start in range(0, len(batch), self.batch_size):
+            if not self._copy(batch[start:start + self.batch_size]):
+                self._pending = batch[start:]
+                return
+
+    def _copy(self, samples):
+        """Escribe un lote con COPY; False si PostgreSQL no está disponible."""
+        rows = [row for sample in samples for row in sample_rows(sample)]
+        try:
+            self._ensure_partitions(RAW, {row[0] for row in rows})
+            with self.pool.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    with cursor.copy(_COPY) as copy:
+                        for row in rows:
+                            copy.write_row(row)
+        except (psycopg.DataError, psycopg.IntegrityError) as e:
+            # Datos inválidos: reintentar no sirve y bloquearía los lotes siguientes
+            self.rejected += len(samples)
+            logger.error(f"PostgreSQL rechazó un lote de {len(samples)} muestras: {e}")
+            return True
+        except Exception as e:
+            return self._failed(e)
+        self.written += len(samples)
+        self.rows += len(rows)
+        if not self.online:
+            self.online = True
+            logger.info(f"PostgreSQL disponible de nuevo; historial al día ({self.written} muestras escritas)")
+        self._backoff = 1.0
+        return True
+
+    def _failed(self, error):
+        self.last_error = str(error)
+        self._retry_at = time.monotonic() + self._backoff
+        self._backoff = min(self._backoff * 2, RETRY_MAX)
+        if self.online:
+            self.online = False
+            logger.error(f"PostgreSQL no disponible para el historial ({error}); reintentando")
+        return False
+
+    # ------------------------------------------------------------------
+    # Particiones, rollups y retención
+    # ------------------------------------------------------------------
+    def _ensure_partitions(self, level, timestamps):
+        """Crea las particiones de ``level`` que contienen ``timestamps`` (una transacción cada una)."""
+        missing = {}
+        for ts in timestamps:
+            suffix, start, end = partition_range(level.partition, ts)
+            name = partition_name(level.table, suffix)
+            if name not in self._partitions:
+                missing[name] = (start, end)
+        for name, (start, end) in sorted(missing.items()):
+            statement = sql.SQL(_CREATE_PARTITION).format(
+                partition=sql.Identifier(name), table=sql.Identifier(level.table),
+                start=sql.Literal(start), end=sql.Literal(end))
+            try:
+                with self.pool.get_connection() as conn:
+                    conn.execute(statement)
+            except (psycopg.errors.DuplicateTable, psycopg.errors.UniqueViolation):
+                pass  # La creó otro proceso al mismo tiempo
+            self._partitions.add(name)
+
+    def maintain(self, now=None):
+        """Particiones por adelantado, rollups incrementales y retención."""
+        now = now or datetime.now(timezone.utc)
+        for level in LEVELS:
+            ahead = [partition_range(level.partition, now)[1]]
+            for _ in range(PARTITIONS_AHEAD):
+                ahead.append(partition_range(level.partition, ahead[-1])[2])
+            self._ensure_partitions(level, ahead)
+
+        source_until = now
+        for index, level in enumerate(ROLLUPS):
+            source_until = self._refresh(index, level, source_until)
+            self.watermarks[level.name] = source_until.isoformat()
+        self._apply_retention(now)
+        self.last_maintenance = now.isoformat()
+
+    def _refresh(self, index, level, source_until):
+        """Recalcula los buckets cerrados de ``level``; retorna hasta dónde quedó agregado."""
+        column = 'ts' if level.source == RAW.table else 'bucket'
+        with self.pool.get_connection() as conn:
+            row = conn.execute(f'SELECT hasta FROM {STATE_TABLE} WHERE nivel = %s', (level.name,)).fetchone()
+            if row:
+                watermark = row[0]
+            else:
+                first = conn.execute(sql.SQL('SELECT min({}) FROM {}').format(
+                    sql.Identifier(column), sql.Identifier(level.source))).fetchone()[0]
+                watermark = floor_time(first or source_until, level.width)
+
+        window = rollup_window(level, watermark, source_until)
+        if window is None:
+            return watermark
+        start, until = window
+        # Las particiones se crean antes: el DDL no puede esperar al upsert en curso
+        self._ensure_partitions(level, partition_span(level.partition, start, until))
+
+        select = _ROLLUP_FROM_RAW if column == 'ts' else _ROLLUP_FROM_ROLLUP
+        statement = sql.SQL(_UPSERT).format(
+            table=sql.Identifier(level.table),
+            select=sql.SQL(select).format(source=sql.Identifier(level.source)))
+        with self.pool.get_connection() as conn:
+            if not conn.execute('SELECT pg_try_advisory_xact_lock(%s, %s)', (_LOCK_ID, index)).fetchone()[0]:
+                return watermark  # Lo está agregando otro proceso
+            conn.execute(statement, {'width': level.width, 'origin': _EPOCH, 'start': start, 'until': until})
+            conn.execute(
+                f"""INSERT INTO {STATE_TABLE} (nivel, hasta) VALUES (%s, %s)
+                    ON CONFLICT (nivel) DO UPDATE SET
+                        hasta = GREATEST({STATE_TABLE}.hasta, EXCLUDED.hasta), updated_at = NOW()""",
+                (level.name, until))
+        return until
+
+    def _apply_retention(self, now):
+        """Elimina las particiones vencidas de cada nivel; retorna sus nombres."""
+        dropped = []
+        for level in LEVELS:
+            with self.pool.get_connection() as conn:
+                names = [row[0] for row in conn.execute(_CHILDREN, (level.table,)).fetchall()]
+            for name in expired_partitions(level, names, now):
+                with self.pool.get_connection() as conn:
+                    conn.execute("SET LOCAL lock_timeout = '5s'")
+                    conn.execute(sql.SQL('DROP TABLE IF EXISTS {}').format(sql.Identifier(name)))
+                self._partitions.discard(name)
+                dropped.append(name)
+        if dropped:
+            logger.info(f"Retención del historial: {len(dropped)} particiones eliminadas ({', '.join(dropped)})")
+        return dropped
+
+    # ------------------------------------------------------------------
+    # Lectura (API de historial)
+    # ------------------------------------------------------------------
+    def series(self, device_id, metric, start, end, points):
+        """(nivel, filas (instante, min, max, promedio)) de ``metric`` en [start, end)."""
+        level = choose_level(start, end, points, datetime.now(timezone.utc))
+        if level is RAW:
+            statement = _SERIES_RAW
+        else:
+            statement = sql.SQL(_SERIES_ROLLUP).format(table=sql.Identifier(level.table))
+        with self.pool.get_connection() as conn:
+            rows = conn.execute(statement, (device_id, metric, start, end)).fetchall()
+        return level.name, rows
+
+    def flush(self, timeout=10.0):
+        """Espera a que la cola en memoria quede vacía (pruebas y apagado)."""
+        deadline = time.monotonic() + timeout
+        while not self._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self._queue.empty()
+
+    def get_stats(self):
+        return {
+            'online': self.online,
+            'queued': self._queue.qsize(),
+            'pending': len(self._pending),
+            'written': self.written,
+            'rows': self.rows,
+            'dropped': self.dropped,
+            'rejected': self.rejected,
+            'rollups': dict(self.watermarks),
+            'last_maintenance': self.last_maintenance,
+            'last_error': self.last_error,
+        }
+
+    def close(self):
+        """Detiene el escritor: lo que quede en cola se intenta escribir una vez."""
+        thread = self._thread
+        if thread is not None and self._running:
+            self._running = False
+            thread.join(self.flush_interval + 15)
+
+
+# Singleton instance
+pg_telemetry = PostgresTelemetry()
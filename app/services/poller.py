@@ -0,0 +1,180 @@
+"""
+Poller headless: sondeo SNMP/Modbus fuera de la aplicación web.
+
+    python -m app.services.poller [--shards N] [--address host:puerto]
+
+Corre solo los motores de monitoreo (en este proceso o repartidos en shards)
+y publica los eventos en un broker local (multiprocessing.connection). Los
+procesos web con ``MONITORING_MODE=subscribe`` se suscriben y los reemiten
+por Socket.IO, así varios workers de gunicorn comparten un solo poller en
+lugar de sondear cada uno la flota.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from app.services.event_bus import STATS_EVENT, EventUplink, parse_address, relay_events
+from app.services.monitor_shards import STATS_INTERVAL, ShardStatsView
+
+logger = logging.getLogger(__name__)
+
+
+class EventBroker(threading.Thread):
+    """Acepta suscriptores y reparte cada evento publicado a todos ellos."""
+
+    def __init__(self, address, authkey):
+        super().__init__(name='poller-broker', daemon=True)
+        self._listener = Listener(address, authkey=authkey)
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self.last_stats = None
+
+    @property
+    def address(self):
+        return self._listener.address
+
+    @property
+    def subscribers(self):
+        with self._lock:
+            return sum(1 for s in self._subscribers if s.alive)
+
+    def run(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except AuthenticationError:
+                logger.warning("Suscriptor rechazado: POLLER_AUTHKEY no coincide")
+                continue
+            except OSError:
+                return
+            uplink = EventUplink(conn, name='poller-subscriber')
+            # Un suscriptor nuevo recibe de inmediato las últimas estadísticas
+            if self.last_stats is not None:
+                uplink(STATS_EVENT, self.last_stats)
+            with self._lock:
+                self._subscribers.append(uplink)
+            logger.info(f"Suscriptor conectado ({self.subscribers} activos)")
+
+    def __call__(self, event, payload, namespace=None):
+        if event == STATS_EVENT:
+            self.last_stats = payload
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s.alive]
+            subscribers = list(self._subscribers)
+        for uplink in subscribers:
+            uplink(event, payload, namespace)
+
+    def close(self):
+        self._listener.close()
+        with self._lock:
+            for uplink in self._subscribers:
+                uplink.close()
+            self._subscribers.clear()
+
+
+class PollerSubscriber(threading.Thread):
+    """
+    Lado web: se suscribe al poller headless y reemite sus eventos.
+
+    Reintenta la conexión mientras el poller no esté disponible.
+    ``modbus_monitor`` expone las estadísticas para las rutas de monitoreo.
+    """
+
+    def __init__(self, address, authkey, retry_interval=5.0):
+        super().__init__(name='poller-subscriber', daemon=True)
+        self.address = address
+        self.authkey = authkey
+        self.retry_interval = retry_interval
+        self.running = True
+        self.connected = False
+        self.modbus_monitor = ShardStatsView()
+
+    def run(self):
+        warned = False
+        while self.running:
+            try:
+                conn = Client(self.address, authkey=self.authkey)
+            except (OSError, AuthenticationError) as e:
+                if not warned:
+                    logger.warning(f"Poller no disponible en {self.address}: {e}")
+                    warned = True
+                time.sleep(self.retry_interval)
+                continue
+
+            logger.info(f"Suscrito al poller en {self.address}")
+            warned = False
+            self.connected = True
+            with conn:
+                relay_events(conn, self.modbus_monitor, lambda: self.running)
+            self.connected = False
+            if self.running:
+                logger.warning("Conexión con el poller perdida, reintentando")
+                time.sleep(self.retry_interval)
+
+    def stop(self):
+        self.running = False
+
+
+def main(argv=None):
+    from app.config import config_map
+
+    config = config_map[os.environ.get('FLASK_CONFIG', 'development')]
+    parser = argparse.ArgumentParser(description='Poller headless SNMP/Modbus')
+    parser.add_argument('--shards', type=int, default=config.MONITOR_SHARDS,
+                        help='Procesos de sondeo (0 = todo en este proceso)')
+    parser.add_argument('--address', default=config.POLLER_ADDRESS,
+                        help='host:puerto del broker de eventos')
+    args = parser.parse_args(argv)
+    if not config.POLLER_AUTHKEY:
+        parser.error('Definir POLLER_AUTHKEY (la misma clave en el poller y en la app web)')
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s [%(levelname)s] poller %(name)s: %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    from app.db_connection import ConnectionPool
+    from app.services import event_bus
+    from app.services.recent_samples import recent_samples
+
+    ConnectionPool.initialize(config.DATABASE_URL)
+
+    broker = EventBroker(parse_address(args.address), config.POLLER_AUTHKEY.encode())
+    broker.start()
+    event_bus.set_sink(broker)
+    recent_samples.forward_to(lambda sample: broker(event_bus.SAMPLE_EVENT, sample))
+
+    if args.shards > 0:
+        from app.services.monitor_shards import ShardedMonitoringService
+        service = ShardedMonitoringService(args.shards)
+    else:
+        from app.services.influx_db import influx_service
+        from app.services.monitoring_service import MonitoringService
+        influx_service.use_spool('poller')
+        service = MonitoringService()
+    service.start()
+    logger.info(f"Poller publicando en {args.address} (shards={args.shards})")
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        while not stop.wait(STATS_INTERVAL):
+            try:
+                broker(STATS_EVENT, dict(service.modbus_monitor.get_stats_snapshot(), shard=0))
+            except Exception as e:
+                logger.warning(f"No se pudieron recolectar estadísticas: {e}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        broker.close()
+        logger.info("Poller detenido")
+
+
+if __name__ == '__main__':
+    main()
@@ -13,13 +13,8 @@ from pysnmp.hlapi.asyncio import (
     ObjectType, ObjectIdentity, get_cmd
 )
 
-from app.utils.ups_oids import (
-    UPS_BASE_OID, ENTERPRISE_OID,
-    UPS_INFO_OIDS, UPS_STATUS_OIDS, UPS_BYPASS_OIDS,
-    UPS_INPUT_OIDS, UPS_OUTPUT_OIDS, UPS_LOAD_OIDS,
-    UPS_BATTERY_OIDS, SCALE_FACTORS, DECODERS,
-    CRITICAL_OIDS,
-)
+from app.services.snmp_batching import get_batched, pdu_limits
+from app.utils.ups_oids import UPS_INFO_OIDS, DECODERS, INVT_ENTERPRISE_PROFILE
 
 logger = logging.getLogger(__name__)
 
@@ -45,6 +40,7 @@ class SNMPClient:
         self.retries = retries
         self.mp_model = mp_model  # 0=v1, 1=v2c
         self.engine = SnmpEngine()
+        self.profile = INVT_ENTERPRISE_PROFILE
 
     async def get_ups_data(self, ip_address: str = None) -> Dict[str, Any]:
         """Consulta completa del UPS via SNMP usando OIDs INVT (56788)."""
@@ -53,32 +49,8 @@ class SNMPClient:
             return {}
 
         try:
-            # Construir mapa de OIDs a consultar
-            oids_map = {}
-
-            # Status (critico - siempre)
-            for key, oid in UPS_STATUS_OIDS.items():
-                oids_map[f'status_{key}'] = oid
-
-            # Input
-            for key, oid in UPS_INPUT_OIDS.items():
-                oids_map[f'input_{key}'] = oid
-
-            # Output
-            for key, oid in UPS_OUTPUT_OIDS.items():
-                oids_map[f'output_{key}'] = oid
-
-            # Load
-            for key, oid in UPS_LOAD_OIDS.items():
-                oids_map[f'load_{key}'] = oid
-
-            # Battery
-            for key, oid in UPS_BATTERY_OIDS.items():
-                oids_map[f'battery_{key}'] = oid
-
-            # Bypass
-            for key, oid in UPS_BYPASS_OIDS.items():
-                oids_map[f'bypass_{key}'] = oid
+            # OIDs precompilados y resueltos (app.utils.ups_oids)
+            profile = self.profile
 
             # Consulta SNMP
             transport = await UdpTransportTarget.create(
@@ -86,38 +58,22 @@ class SNMPClient:
                 timeout=self.timeout,
                 retries=self.retries
             )
-            objetos = [ObjectType(ObjectIdentity(oid)) for oid in oids_map.values()]
 
-            errorIndication, errorStatus, errorIndex, varBinds = await get_cmd(
+            # Lotes según el límite de PDU aprendido para este agente
+            values = await get_batched(
                 self.engine,
                 CommunityData(self.community, mpModel=self.mp_model),
                 transport,
-                ContextData(),
-                *objetos
+                profile.objects,
+                pdu_limits.get(target_ip, self.port)
             )
 
-            if errorIndication:
-                logger.error(f"Error crítico SNMP en {target_ip}: {errorIndication}")
+            if values is None:
+                logger.error(f"Error crítico SNMP en {target_ip}: sin respuesta")
                 return {}
 
-            # noSuchName es NORMAL (OID no existe en este dispositivo)
-            # Procesamos los que SÍ exist en
-            if errorStatus and str(errorStatus) != 'noSuchName':
-                logger.warning(f"Error SNMP en {target_ip}: {errorStatus}")
-                # No retornar vacío, procesar lo que se pueda
-
-            # Mapear respuestas (incluso si algunas fallaron)
-            keys = list(oids_map.keys())
-            oid_list = list(oids_map.values())
-            raw_data = {}
-            for i, var in enumerate(varBinds):
-                value_str = var[1].prettyPrint()
-                # Filtrar valores que indican OID no existe
-                if 'No Such Object' not in value_str and 'No Such Instance' not in value_str:
-                    raw_data[keys[i]] = value_str
-
-            # Formatear y escalar
-            data = self._format_data(raw_data, oid_list, keys)
+            # Mapear respuestas por posición (incluso si algunas fallaron)
+            data = self._format_data(profile.raw_values(values))
 
             # Detectar fases por heuristica de valores
             in_phases = 3 if data.get('input_voltage_b', 0) > 50 else 1
@@ -132,13 +88,13 @@ class SNMPClient:
             logger.exception(f"Fallo critico SNMP {target_ip}: {e}")
             return {}
 
-    def _format_data(self, raw_data: Dict[str, str], oid_list: list, keys: list) -> Dict[str, Any]:
-        """Escala valores segun SCALE_FACTORS y decodifica enums."""
+    def _format_data(self, values: list) -> Dict[str, Any]:
+        """Escala valores segun el perfil y decodifica enums (values alineados con profile.keys)."""
         formatted = {}
 
-        for i, (key, val_str) in enumerate(raw_data.items()):
-            oid = oid_list[i]
-            scale = SCALE_FACTORS.get(oid, None)
+        for key, scale, val_str in zip(self.profile.keys, self.profile.scales, values):
+            if val_str is None:
+                continue  # OID no existe en este dispositivo
 
             # Intentar convertir a numero
             try:
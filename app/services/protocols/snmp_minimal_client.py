@@ -7,6 +7,9 @@ Para UPS con soporte SNMP limitado
 import logging
 from pysnmp.hlapi.v3arch.asyncio import *
 
+from app.services.snmp_batching import get_batched, pdu_limits
+from app.utils.ups_oids import MEGATEC_OIDS, MEGATEC_PROFILE
+
 logger = logging.getLogger(__name__)
 
 class MinimalSNMPClient:
@@ -16,84 +19,65 @@ class MinimalSNMPClient:
     """
     
     # OIDs Megatec / Voltronic (Enterprise .935) detectados en escaneo
-    MINIMAL_OIDS = {
-        'megatec_model': '1.3.6.1.4.1.935.1.1.1.1.1.1.0',     
-        'megatec_version': '1.3.6.1.4.1.935.1.1.1.1.2.1.0',
-        'megatec_batt_capacity': '1.3.6.1.4.1.935.1.1.1.2.2.1.0', # 90 -> 90%
-        'megatec_batt_voltage': '1.3.6.1.4.1.935.1.1.1.2.2.2.0',  # 1060 -> 106.0V
-        'megatec_input_voltage': '1.3.6.1.4.1.935.1.1.1.3.2.1.0', # 1232 -> 123.2V
-        'megatec_input_freq': '1.3.6.1.4.1.935.1.1.1.3.2.4.0',    # 600 -> 60.0Hz
-        'megatec_output_voltage': '1.3.6.1.4.1.935.1.1.1.4.2.1.0',# 1201 -> 120.1V
-        'megatec_output_load': '1.3.6.1.4.1.935.1.1.1.4.2.3.0',   # 0 -> 0%
-    }
+    MINIMAL_OIDS = MEGATEC_OIDS
     
-    def __init__(self, community='public', port=161, mp_model=0):
+    def __init__(self, community='public', port=161, mp_model=0, runtime=None):
         """
         Args:
             community: SNMP community string (default: 'public')
             port: SNMP port (default: 161)
             mp_model: 0=SNMPv1, 1=SNMPv2c
+            runtime: SnmpRuntime compartido (engine y transportes cacheados).
+                Sin runtime el cliente crea su propio engine (scripts sueltos).
         """
         self.community = community
         self.port = port
         self.mp_model = mp_model
-        self.engine = SnmpEngine()
+        self.runtime = runtime
+        self.engine = runtime.engine if runtime is not None else SnmpEngine()
+        # Varbinds precompilados y resueltos (app.utils.ups_oids)
+        self.profile = MEGATEC_PROFILE
+
+    async def _transport(self, target_ip):
+        if self.runtime is not None:
+            return await self.runtime.target(target_ip, self.port, timeout=2.0, retries=1)
+        return await UdpTransportTarget.create((target_ip, self.port), timeout=2.0, retries=1)
+
+    def _auth(self):
+        if self.runtime is not None:
+            return self.runtime.auth(self.community, self.mp_model)
+        return CommunityData(self.community, mpModel=self.mp_model)
     
     async def get_ups_data(self, target_ip):
         """
         Consulta los OIDs Megatec disponibles.
         """
         try:
-            # Crear objetos SNMP
-            objetos = [ObjectType(ObjectIdentity(oid)) for oid in self.MINIMAL_OIDS.values()]
+            # Transporte (cacheado si hay runtime compartido)
+            transport = await self._transport(target_ip)
+            auth = self._auth()
             
-            # Crear transporte
-            transport = await UdpTransportTarget.create((target_ip, self.port), timeout=2.0, retries=1)
-            
-            # Consultar (SNMPv1 a veces falla con multiples OIDs, pero probemos)
-            # Si falla, podemos intentar uno a uno, pero probemos GET normal primero
-            errorIndication, errorStatus, errorIndex, varBinds = await get_cmd(
+            # SNMPv1 a veces falla con multiples OIDs: los lotes se ajustan al
+            # limite de PDU aprendido para el agente y se envian en paralelo
+            values = await get_batched(
                 self.engine,
-                CommunityData(self.community, mpModel=self.mp_model),
+                auth,
                 transport,
-                ContextData(),
-                *objetos
+                self.profile.objects,
+                pdu_limits.get(target_ip, self.port)
             )
             
-            # Si hay error, intentar fallback o retornar vacio
-            if errorIndication or errorStatus:
-                logger.warning(f"Error SNMP agrupado {target_ip}: {errorIndication or errorStatus}. Intentando individual...")
-                # Fallback: consultar uno a uno (lento pero seguro en hardware viejo)
-                raw_data = {}
-                keys = list(self.MINIMAL_OIDS.keys())
-                for key, oid in self.MINIMAL_OIDS.items():
-                    try:
-                        _, errSt, _, vb = await get_cmd(
-                             self.engine,
-                             CommunityData(self.community, mpModel=self.mp_model),
-                             transport,
-                             ContextData(),
-                             ObjectType(ObjectIdentity(oid))
-                        )
-                        if not errSt and vb:
-                            raw_data[key] = vb[0][1].prettyPrint()
-                    except:
-                        pass
-                
-                if raw_data:
-                    return self._format_minimal_data(raw_data)
+            if values is None:
+                logger.warning(f"Sin respuesta SNMP de {target_ip}")
                 return {}
             
-            # Mapear respuestas agrupadas
-            keys = list(self.MINIMAL_OIDS.keys())
-            raw_data = {}
-            
-            for i, var in enumerate(varBinds):
-                value_str = var[1].prettyPrint()
-                raw_data[keys[i]] = value_str
+            # Escalas del perfil aplicadas por posición
+            values = self.profile.decode(values)
+            if not values:
+                return {}
             
             # Formatear datos
-            data = self._format_minimal_data(raw_data)
+            data = self._format_minimal_data(values)
             
             logger.info(f"✓ UPS Megatec {target_ip}: {data.get('input_voltage_l1', 0)}V In, {data.get('battery_voltage', 0)}V Bat")
             
@@ -103,31 +87,33 @@ class MinimalSNMPClient:
             logger.error(f"Error consultando UPS {target_ip}: {e}")
             return {}
     
-    def _format_minimal_data(self, raw):
+    def _format_minimal_data(self, values):
         """
-        Formatea los valores Megatec (divisores 10).
+        Formatea los valores Megatec ya escalados por el perfil
+        (MEGATEC_SCALE_FACTORS: divisores 10).
         """
-        def safe_float(value, divisor=1.0):
+        def safe_float(key):
+            value = values.get(key, 0)
+            if isinstance(value, (int, float)):
+                return float(value)
             try:
                 # Limpiar chars no numericos raros
-                clean = ''.join(c for c in str(value) if c.isdigit() or c == '.')
-                return float(clean) / divisor
-            except:
+                return float(''.join(c for c in str(value) if c.isdigit() or c == '.'))
+            except ValueError:
                 return 0.0
         
-        # OIDs Megatec suelen requerir divisor 10
-        input_voltage = safe_float(raw.get('megatec_input_voltage', 0), 10.0)
-        output_voltage = safe_float(raw.get('megatec_output_voltage', 0), 10.0)
-        battery_voltage = safe_float(raw.get('megatec_batt_voltage', 0), 10.0)
-        input_freq = safe_float(raw.get('megatec_input_freq', 0), 10.0)
-        batt_capacity = safe_float(raw.get('megatec_batt_capacity', 0), 1.0) # Ya esta en %
-        load_pct = safe_float(raw.get('megatec_output_load', 0), 1.0)
+        input_voltage = safe_float('megatec_input_voltage')
+        output_voltage = safe_float('megatec_output_voltage')
+        battery_voltage = safe_float('megatec_batt_voltage')
+        input_freq = safe_float('megatec_input_freq')
+        batt_capacity = safe_float('megatec_batt_capacity') # Ya esta en %
+        load_pct = safe_float('megatec_output_load')
         
         data = {
             # === DATOS REALES === 
             'manufacturer': 'Megatec/Voltronic',
-            'model': raw.get('megatec_model', 'Unknown'),
-            'serial': raw.get('megatec_version', 'N/A'),
+            'model': values.get('megatec_model', 'Unknown'),
+            'serial': values.get('megatec_version', 'N/A'),
             
             # Voltajes (Monofasico L1)
             'input_voltage_l1': input_voltage,
@@ -1,20 +1,34 @@
 """
 SNMP Advanced Scanner - Autodetección de Configuración
 Prueba diferentes versiones, communities y OIDs automáticamente
+
+Las combinaciones versión/community se prueban todas a la vez y gana la
+primera que responde; los OIDs se consultan agrupados en GETs de varios
+varbinds (ver snmp_batching). Un UPS que responde se detecta en menos de un
+segundo y una IP muerta cuesta un solo timeout.
 """
 
 import asyncio
 import logging
-from typing import Dict, List, Tuple, Any, Optional, Callable
+import time
+from typing import Dict, Tuple, Any, Optional, Callable
 from datetime import datetime
 from pysnmp.hlapi.asyncio import (
     SnmpEngine, CommunityData, UdpTransportTarget, ContextData,
-    ObjectType, ObjectIdentity, get_cmd, next_cmd
+    ObjectType, ObjectIdentity, get_cmd
 )
 
+from app.services.snmp_batching import get_batched, pdu_limits
+from app.utils.ups_oids import OidProfile
+
 logger = logging.getLogger(__name__)
 
 
+def _profile(name, *tables):
+    """Perfil precompilado con los OIDs de las tablas del escáner."""
+    return OidProfile(name, [(key, oid, None, None) for table in tables for key, oid in table.items()])
+
+
 class SNMPScanner:
     """
     Escáner avanzado que auto-detecta la configuración SNMP correcta
@@ -85,6 +99,21 @@ class SNMPScanner:
         'monitor'
     ]
     
+    # (mpModel, nombre) a probar
+    SNMP_VERSIONS = [
+        (0, 'SNMPv1'),
+        (1, 'SNMPv2c'),
+    ]
+    
+    # Espera extra por la respuesta v2c cuando gana SNMPv1 (mismo agente, ya vivo)
+    V2C_GRACE = 0.5
+    
+    # Perfiles precompilados (OIDs ya resueltos, ver app.utils.ups_oids)
+    SCAN_PROFILE = _profile('scan', STANDARD_OIDS, UPS_MIB_OIDS, INVT_OIDS)
+    UPS_MIB_PROFILE = _profile('scan_ups_mib', UPS_MIB_OIDS)
+    INVT_PROFILE = _profile('scan_invt', INVT_OIDS)
+    SCAN_OBJECTS = dict(zip(SCAN_PROFILE.oids, SCAN_PROFILE.objects))
+    
     def __init__(self, ip: str, port: int = 161, timeout: int = 3, callback: Optional[Callable] = None):
         self.ip = ip
         self.port = port
@@ -92,6 +121,7 @@ class SNMPScanner:
         self.engine = SnmpEngine()
         self.callback = callback  # Para actualizar UI en tiempo real
         self.results = []
+        self._transport = None
         
     def log_progress(self, message: str, level: str = 'info'):
         """Log con timestamp y envío a callback si está disponible"""
@@ -115,6 +145,7 @@ class SNMPScanner:
         Auto-detecta la mejor configuración SNMP para el dispositivo
         Retorna dict con configuración óptima encontrada
         """
+        started = time.monotonic()
         self.log_progress(f"🔍 Iniciando auto-detección SNMP para {self.ip}", 'info')
         
         best_config = {
@@ -124,59 +155,45 @@ class SNMPScanner:
             'community': None,
             'version': None,
             'oids_working': [],
+            'oids_missing': [],
             'device_info': {},
             'capabilities': [],
             'error': None
         }
         
-        # Paso 1: Probar versiones y communities
+        # Paso 1: Probar versiones y communities (todas en paralelo)
         self.log_progress("📡 Paso 1/4: Probando versiones SNMP y community strings...", 'info')
-        snmp_versions = [
-            (1, 'SNMPv1'),  # mpModel=0
-            (1, 'SNMPv2c'), # mpModel=1
-        ]
-        
-        for mpModel, version_name in snmp_versions:
-            self.log_progress(f"  → Probando {version_name}...", 'info')
-            
-            for community in self.COMMON_COMMUNITIES:
-                self.log_progress(f"    • Community: '{community}'", 'info')
-                
-                # Test con OID estándar más básico
-                success, value = await self._test_oid(
-                    self.STANDARD_OIDS['sysDescr'],
-                    community,
-                    mpModel
-                )
-                
-                if success:
-                    self.log_progress(f"    ✅ ¡ÉXITO! {version_name} con community '{community}'", 'success')
-                    best_config['success'] = True
-                    best_config['community'] = community
-                    best_config['version'] = version_name
-                    best_config['mpModel'] = mpModel
-                    best_config['device_info']['sysDescr'] = value
-                    break
-            
-            if best_config['success']:
-                break
+        credential = await self._detect_credential()
         
-        if not best_config['success']:
+        if credential is None:
             self.log_progress("❌ No se pudo establecer comunicación SNMP", 'error')
             best_config['error'] = 'No se encontró versión/community válida'
+            best_config['elapsed_s'] = round(time.monotonic() - started, 2)
             return best_config
         
-        # Paso 2: Obtener info básica del sistema
-        self.log_progress("📋 Paso 2/4: Obteniendo información del sistema...", 'info')
-        await self._get_system_info(best_config)
+        community, mpModel, version_name, sys_descr = credential
+        self.log_progress(f"    ✅ ¡ÉXITO! {version_name} con community '{community}'", 'success')
+        best_config['success'] = True
+        best_config['community'] = community
+        best_config['version'] = version_name
+        best_config['mpModel'] = mpModel
+        best_config['device_info']['sysDescr'] = sys_descr
+        
+        # Pasos 2-4: todos los OIDs conocidos en GETs agrupados
+        self.log_progress("📋 Paso 2/4: Consultando OIDs de sistema, UPS-MIB e INVT...", 'info')
+        raw_values = await self._get_values(self.SCAN_PROFILE, community, mpModel)
+        values = self.SCAN_PROFILE.raw_data(raw_values) if raw_values else {}
+        # OIDs que el agente dice que no existen (siembra del perfil de capacidades)
+        best_config['oids_missing'] = self.SCAN_PROFILE.missing_oids(raw_values) if raw_values else []
         
-        # Paso 3: Detectar tipo de UPS (UPS-MIB vs Enterprise)
         self.log_progress("🔌 Paso 3/4: Detectando tipo de UPS...", 'info')
-        await self._detect_ups_type(best_config)
+        self._get_system_info(best_config, values)
+        self._detect_ups_type(best_config, values)
         
-        # Paso 4: Escanear OIDs disponibles
         self.log_progress("🗂️  Paso 4/4: Escaneando OIDs disponibles...", 'info')
-        await self._scan_available_oids(best_config)
+        self._scan_available_oids(best_config, values)
+        
+        best_config['elapsed_s'] = round(time.monotonic() - started, 2)
         
         # Resumen
         self.log_progress("="*60, 'info')
@@ -189,81 +206,116 @@ class SNMPScanner:
         if best_config.get('ups_type'):
             self.log_progress(f"  Tipo UPS: {best_config['ups_type']}", 'success')
         
+        self.log_progress(f"  Tiempo: {best_config['elapsed_s']} s", 'info')
         self.log_progress("="*60, 'info')
         
         return best_config
     
-    async def _test_oid(self, oid: str, community: str, mpModel: int = 1) -> Tuple[bool, Optional[str]]:
-        """Prueba un OID específico y retorna (success, value)"""
-        try:
-            transport = await UdpTransportTarget.create(
+    async def _get_transport(self):
+        """Transporte único del escaneo (sin reintentos: cada prueba es un solo paquete)."""
+        if self._transport is None:
+            self._transport = await UdpTransportTarget.create(
                 (self.ip, self.port),
                 timeout=self.timeout,
                 retries=0
             )
+        return self._transport
+    
+    async def _detect_credential(self) -> Optional[Tuple[str, int, str, str]]:
+        """
+        Prueba todas las combinaciones versión/community a la vez.
+        
+        Gana la primera que responde; si con esa community también responde
+        SNMPv2c (GETBULK disponible) dentro de ``V2C_GRACE`` se prefiere v2c.
+        
+        Returns:
+            (community, mpModel, nombre_versión, sysDescr) o None
+        """
+        probes = {}
+        for community in self.COMMON_COMMUNITIES:
+            for mpModel, version_name in self.SNMP_VERSIONS:
+                task = asyncio.ensure_future(self._test_oid(self.STANDARD_OIDS['sysDescr'], community, mpModel))
+                probes[task] = (community, mpModel, version_name)
+        self.log_progress(f"  → {len(probes)} combinaciones en paralelo "
+                          f"({len(self.COMMON_COMMUNITIES)} communities × {len(self.SNMP_VERSIONS)} versiones)", 'info')
+        
+        order = {task: i for i, task in enumerate(probes)}
+        pending = set(probes)
+        try:
+            winner = None
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                working = [task for task in done if task.result()[0]]
+                if working:
+                    # Si llegan juntas, se respeta el orden de COMMON_COMMUNITIES
+                    winner = min(working, key=order.get)
+            if winner is None:
+                return None
+            
+            community, mpModel, version_name = probes[winner]
+            value = winner.result()[1]
+            if mpModel == 0:
+                v2c = next(task for task, (c, m, _) in probes.items() if c == community and m == 1)
+                await asyncio.wait([v2c], timeout=self.V2C_GRACE)
+                if v2c.done() and v2c.result()[0]:
+                    mpModel, version_name, value = 1, 'SNMPv2c', v2c.result()[1]
+            return community, mpModel, version_name, value
+        finally:
+            for task in probes:
+                task.cancel()
+    
+    async def _test_oid(self, oid: str, community: str, mpModel: int = 1) -> Tuple[bool, Optional[str]]:
+        """Prueba un OID específico y retorna (success, value)"""
+        try:
+            transport = await self._get_transport()
             
             errorIndication, errorStatus, errorIndex, varBinds = await get_cmd(
                 self.engine,
                 CommunityData(community, mpModel=mpModel),
                 transport,
                 ContextData(),
-                ObjectType(ObjectIdentity(oid))
+                self.SCAN_OBJECTS.get(oid) or ObjectType(ObjectIdentity(oid))
             )
             
             if errorIndication or errorStatus:
                 return False, None
             
-            value = varBinds[0][1].prettyPrint()
-            return True, value
+            value = self.SCAN_PROFILE.raw_values([varBinds[0][1]])[0]
+            return value is not None, value
             
         except Exception as e:
+            logger.debug(f"Prueba SNMP {self.ip} ({community}, v{mpModel}): {e}")
             return False, None
     
-    async def _get_system_info(self, config: Dict):
-        """Obtiene información básica del sistema"""
+    async def _get_values(self, profile: OidProfile, community: str, mpModel: int):
+        """Valores SNMP alineados con el perfil (None si el agente no respondió)."""
+        return await get_batched(
+            self.engine,
+            CommunityData(community, mpModel=mpModel),
+            await self._get_transport(),
+            profile.objects,
+            pdu_limits.get(self.ip, self.port)
+        )
+    
+    async def _get_many(self, profile: OidProfile, community: str, mpModel: int) -> Dict[str, str]:
+        """Consulta todos los OIDs del perfil en GETs agrupados; devuelve {nombre: valor}."""
+        values = await self._get_values(profile, community, mpModel)
+        if values is None:
+            return {}
+        return profile.raw_data(values)
+    
+    def _get_system_info(self, config: Dict, values: Dict[str, str]):
+        """Información básica del sistema (MIB-II)"""
         for name, oid in self.STANDARD_OIDS.items():
-            success, value = await self._test_oid(
-                oid,
-                config['community'],
-                config['mpModel']
-            )
-            
-            if success:
-                config['device_info'][name] = value
-                self.log_progress(f"  ✅ {name}: {value}", 'info')
+            if name in values:
+                config['device_info'][name] = values[name]
+                self.log_progress(f"  ✅ {name}: {values[name]}", 'info')
                 config['oids_working'].append(oid)
     
-    async def _detect_ups_type(self, config: Dict):
+    def _detect_ups_type(self, config: Dict, values: Dict[str, str]):
         """Detecta si es UPS-MIB estándar o Enterprise INVT"""
-        # Probar UPS-MIB estándar
-        ups_mib_works = 0
-        for name, oid in list(self.UPS_MIB_OIDS.items())[:5]:  # Probar primeros 5
-            success, value = await self._test_oid(
-                oid,
-                config['community'],
-                config['mpModel']
-            )
-            
-            if success:
-                ups_mib_works += 1
-                if name not in config['device_info']:
-                    config['device_info'][name] = value
-                config['oids_working'].append(oid)
-        
-        # Probar INVT
-        invt_works = 0
-        for name, oid in self.INVT_OIDS.items():
-            success, value = await self._test_oid(
-                oid,
-                config['community'],
-                config['mpModel']
-            )
-            
-            if success:
-                invt_works += 1
-                if name not in config['device_info']:
-                    config['device_info'][name] = value
-                config['oids_working'].append(oid)
+        ups_mib_works = sum(1 for name in self.UPS_MIB_OIDS if name in values)
+        invt_works = sum(1 for name in self.INVT_OIDS if name in values)
         
         # Determinar tipo
         if invt_works > 0:
@@ -283,29 +335,18 @@ class SNMPScanner:
             config['ups_type'] = 'Genérico (MIB-II solamente)'
             self.log_progress("  ⚠️  Solo responde a MIB-II básico", 'warning')
     
-    async def _scan_available_oids(self, config: Dict):
-        """Escanea todos los OIDs conocidos y reporta cuáles funcionan"""
-        all_oids = {**self.UPS_MIB_OIDS, **self.INVT_OIDS}
-        
+    def _scan_available_oids(self, config: Dict, values: Dict[str, str]):
+        """Reporta cuáles OIDs UPS-MIB/INVT conocidos funcionan"""
         working = []
-        for name, oid in all_oids.items():
-            if oid in config['oids_working']:  # Ya lo probamos
-                continue
-                
-            success, value = await self._test_oid(
-                oid,
-                config['community'],
-                config['mpModel']
-            )
-            
-            if success:
+        for name, oid in {**self.UPS_MIB_OIDS, **self.INVT_OIDS}.items():
+            if name in values:
                 working.append(name)
                 config['oids_working'].append(oid)
                 if name not in config['device_info']:
-                    config['device_info'][name] = value
+                    config['device_info'][name] = values[name]
         
         if working:
-            self.log_progress(f"  ✅ {len(working)} OIDs adicionales disponibles", 'info')
+            self.log_progress(f"  ✅ {len(working)} OIDs UPS disponibles", 'info')
     
     async def get_full_data(self, config: Dict) -> Dict[str, Any]:
         """
@@ -332,48 +373,36 @@ class SNMPScanner:
     async def _get_ups_mib_data(self, config: Dict) -> Dict:
         """Obtiene datos usando UPS-MIB estándar"""
         data = {}
+        values = await self._get_many(self.UPS_MIB_PROFILE, config['community'], config['mpModel'])
         
-        for name, oid in self.UPS_MIB_OIDS.items():
-            success, value = await self._test_oid(
-                oid,
-                config['community'],
-                config['mpModel']
-            )
-            
-            if success:
-                # Mapear a nombres genéricos
-                try:
-                    num_value = float(value)
-                    
-                    # Aplicar escalado según UPS-MIB
-                    if 'voltage' in name:
-                        num_value = num_value / 10  # UPS-MIB usa decisión (1/10)
-                    elif 'current' in name:
-                        num_value = num_value / 10
-                    elif 'frequency' in name:
-                        num_value = num_value / 10
-                    
-                    data[name] = num_value
-                except:
-                    data[name] = value
+        for name, value in values.items():
+            # Mapear a nombres genéricos
+            try:
+                num_value = float(value)
+                
+                # Aplicar escalado según UPS-MIB
+                if 'voltage' in name:
+                    num_value = num_value / 10  # UPS-MIB usa decisión (1/10)
+                elif 'current' in name:
+                    num_value = num_value / 10
+                elif 'frequency' in name:
+                    num_value = num_value / 10
+                
+                data[name] = num_value
+            except (ValueError, TypeError):
+                data[name] = value
         
         return data
     
     async def _get_invt_data(self, config: Dict) -> Dict:
         """Obtiene datos usando OIDs INVT"""
         data = {}
+        values = await self._get_many(self.INVT_PROFILE, config['community'], config['mpModel'])
         
-        for name, oid in self.INVT_OIDS.items():
-            success, value = await self._test_oid(
-                oid,
-                config['community'],
-                config['mpModel']
-            )
-            
-            if success:
-                try:
-                    data[name] = float(value)
-                except:
-                    data[name] = value
+        for name, value in values.items():
+            try:
+                data[name] = float(value)
+            except (ValueError, TypeError):
+                data[name] = value
         
         return data
@@ -7,73 +7,21 @@ Soporta sistemas MONOFÁSICOS y TRIFÁSICOS.
 import logging
 from typing import Dict, Any
 from pysnmp.hlapi.v3arch.asyncio import (
-    SnmpEngine, CommunityData, UdpTransportTarget, ContextData,
-    ObjectType, ObjectIdentity, get_cmd
+    SnmpEngine, CommunityData, UdpTransportTarget
 )
 
-logger = logging.getLogger(__name__)
-
-# OIDs UPS-MIB RFC 1628 (solo los que detectamos que funcionan)
-UPS_MIB_OIDS = {
-    # Identificación
-    'ident_manufacturer': '1.3.6.1.2.1.33.1.1.1.0',
-    'ident_model': '1.3.6.1.2.1.33.1.1.2.0',
-    'ident_sw_version': '1.3.6.1.2.1.33.1.1.3.0',
-    'ident_agent_version': '1.3.6.1.2.1.33.1.1.4.0',
-    
-    # Batería
-    'battery_status': '1.3.6.1.2.1.33.1.2.1.0',
-    'battery_seconds_on_battery': '1.3.6.1.2.1.33.1.2.2.0',
-    'battery_minutes_remaining': '1.3.6.1.2.1.33.1.2.3.0',
-    'battery_charge_remaining': '1.3.6.1.2.1.33.1.2.4.0',
-    'battery_voltage': '1.3.6.1.2.1.33.1.2.5.0',
-    'battery_current': '1.3.6.1.2.1.33.1.2.6.0',
-    'battery_temperature': '1.3.6.1.2.1.33.1.2.7.0',
-    
-    # Entrada
-    'input_line_bads': '1.3.6.1.2.1.33.1.3.1.0',
-    'input_num_lines': '1.3.6.1.2.1.33.1.3.2.0',
-    'input_frequency': '1.3.6.1.2.1.33.1.3.3.1.2.1',
-    'input_voltage': '1.3.6.1.2.1.33.1.3.3.1.3.1',
-    'input_current': '1.3.6.1.2.1.33.1.3.3.1.4.1',
-    'input_true_power': '1.3.6.1.2.1.33.1.3.3.1.5.1',
-    
-    # Salida
-    'output_source': '1.3.6.1.2.1.33.1.4.1.0',
-    'output_frequency': '1.3.6.1.2.1.33.1.4.2.0',
-    'output_num_lines': '1.3.6.1.2.1.33.1.4.3.0',
-    'output_voltage': '1.3.6.1.2.1.33.1.4.4.1.2.1',
-    'output_current': '1.3.6.1.2.1.33.1.4.4.1.3.1',
-    'output_power': '1.3.6.1.2.1.33.1.4.4.1.4.1',
-    'output_percent_load': '1.3.6.1.2.1.33.1.4.4.1.5.1',
-}
-
-# OIDs INVT complementarios (si existen)
-INVT_OIDS = {
-    'invt_model': '1.3.6.1.4.1.56788.1.1.1.0',
-    'invt_serial': '1.3.6.1.4.1.56788.1.1.2.0',
-    'invt_input_voltage': '1.3.6.1.4.1.56788.1.3.1.2.1',
-    'invt_output_voltage': '1.3.6.1.4.1.56788.1.4.1.2.1',
-    'invt_battery_voltage': '1.3.6.1.4.1.56788.1.6.1.0',
-}
+from app.utils.ups_oids import (
+    HYBRID_INVT_OIDS, UPS_MIB_BATTERY_STATUS, UPS_MIB_OUTPUT_SOURCE,
+    UPS_MIB_PROFILE, HYBRID_PROFILE, UPS_MIB_LINE_COLUMNS,
+)
+from app.services.snmp_batching import get_batched, get_bulk_rows, pdu_limits
 
-# Decodificadores
-BATTERY_STATUS_DECODER = {
-    1: 'Unknown',
-    2: 'Normal',
-    3: 'Low',
-    4: 'Depleted',
-}
+logger = logging.getLogger(__name__)
 
-OUTPUT_SOURCE_DECODER = {
-    1: 'Other',
-    2: 'None',
-    3: 'Normal',
-    4: 'Bypass',
-    5: 'Battery',
-    6: 'Booster',
-    7: 'Reducer',
-}
+# Tablas compartidas con app.utils.ups_oids (se mantienen los nombres de este módulo)
+INVT_OIDS = HYBRID_INVT_OIDS
+BATTERY_STATUS_DECODER = UPS_MIB_BATTERY_STATUS
+OUTPUT_SOURCE_DECODER = UPS_MIB_OUTPUT_SOURCE
 
 
 class UPSMIBClient:
@@ -82,11 +30,14 @@ class UPSMIBClient:
     def __init__(self, ip_address: str, port: int = 161,
                  community: str = 'public', timeout: int = 2,
                  retries: int = 1, mp_model: int = 1,
-                 include_invt: bool = True):
+                 include_invt: bool = True, runtime=None, capabilities=None):
         """
         Args:
             mp_model: 0 para SNMPv1, 1 para SNMPv2c
             include_invt: Si True, intenta leer OIDs INVT adicionales
+            runtime: SnmpRuntime compartido (engine y transportes cacheados)
+            capabilities: CapabilityProfile del equipo; si se indica solo se
+                piden los OIDs soportados (ver snmp_capabilities)
         """
         self.ip_address = ip_address
         self.community = community
@@ -95,7 +46,11 @@ class UPSMIBClient:
         self.retries = retries
         self.mp_model = mp_model
         self.include_invt = include_invt
-        self.engine = SnmpEngine()
+        self.runtime = runtime
+        self.engine = runtime.engine if runtime is not None else SnmpEngine()
+        # Varbinds precompilados y resueltos (app.utils.ups_oids)
+        self.profile = HYBRID_PROFILE if include_invt else UPS_MIB_PROFILE
+        self.capabilities = capabilities
     
     async def get_ups_data(self, ip_address: str = None) -> Dict[str, Any]:
         """Consulta datos del UPS usando UPS-MIB estándar."""
@@ -104,68 +59,80 @@ class UPSMIBClient:
             return {}
         
         try:
-            # Construir lista de OIDs a consultar
-            oids_to_query = dict(UPS_MIB_OIDS)
-            if self.include_invt:
-                oids_to_query.update(INVT_OIDS)
-            
-            # Crear objetos SNMP
-            transport = await UdpTransportTarget.create(
-                (target_ip, self.port),
-                timeout=self.timeout,
-                retries=self.retries
-            )
+            # Transporte (cacheado si hay runtime compartido)
+            if self.runtime is not None:
+                transport = await self.runtime.target(target_ip, self.port,
+                                                      timeout=self.timeout, retries=self.retries)
+                auth = self.runtime.auth(self.community, self.mp_model)
+            else:
+                transport = await UdpTransportTarget.create(
+                    (target_ip, self.port),
+                    timeout=self.timeout,
+                    retries=self.retries
+                )
+                auth = CommunityData(self.community, mpModel=self.mp_model)
             
-            objects = [ObjectType(ObjectIdentity(oid)) for oid in oids_to_query.values()]
+            # Solo los OIDs que el equipo soporta (perfil completo al re-sondear)
+            profile = self.capabilities.request_profile() if self.capabilities else self.profile
             
-            # Consulta SNMP
-            errorIndication, errorStatus, errorIndex, varBinds = await get_cmd(
-                self.engine,
-                CommunityData(self.community, mpModel=self.mp_model),
-                transport,
-                ContextData(),
-                *objects
-            )
+            # Consulta SNMP en lotes según el límite de PDU del agente
+            limit = pdu_limits.get(target_ip, self.port)
+            values = await get_batched(self.engine, auth, transport, profile.objects, limit)
             
-            if errorIndication:
-                logger.error(f"Error crítico SNMP en {target_ip}: {errorIndication}")
+            if values is None:
+                logger.error(f"Error crítico SNMP en {target_ip}: sin respuesta")
                 return {}
             
-            # Mapear respuestas (tolerante a OIDs faltantes)
-            keys = list(oids_to_query.keys())
-            raw_data = {}
-            for i, var in enumerate(varBinds):
-                value_str = var[1].prettyPrint()
-                # Solo guardar si el valor es válido
-                if 'No Such Object' not in value_str and 'No Such Instance' not in value_str:
-                    raw_data[keys[i]] = value_str
+            if self.capabilities is not None:
+                self.capabilities.observe(profile, values)
             
-            # Formatear datos
-            return self._format_data(raw_data)
+            # Escalas y decodificadores del perfil aplicados por posición
+            # (tolerante a OIDs faltantes)
+            decoded = profile.decode(values)
+            
+            # Trifásicos: líneas 2..N de las tablas de entrada/salida con un GETBULK (v2c)
+            lines = max(self._safe_int(decoded.get('input_num_lines')),
+                        self._safe_int(decoded.get('output_num_lines')))
+            if lines > 1 and self.mp_model >= 1:
+                rows = await get_bulk_rows(self.engine, auth, transport, UPS_MIB_LINE_COLUMNS,
+                                           first_row=2, rows=lines - 1, limit=limit)
+                for key, by_row in rows.items():
+                    for row, value in by_row.items():
+                        decoded[f'{key}.{row}'] = self.profile.decode_column(key, value)
+            
+            return self._format_data(decoded)
             
         except Exception as e:
             logger.error(f"Error en UPSMIBClient para {target_ip}: {e}")
             return {}
     
-    def _format_data(self, raw: Dict[str, str]) -> Dict[str, Any]:
-        """Convierte valores SNMP a formato del dashboard."""
+    @staticmethod
+    def _safe_int(value):
+        try:
+            return int(value)
+        except (ValueError, TypeError):
+            return 0
+    
+    def _format_data(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Convierte al formato del dashboard los valores ya escalados y
+        decodificados por el perfil (``OidProfile.decode``).
+        """
         
-        def safe_float(value, divisor=1.0):
-            """Conversión segura a float."""
+        def safe_float(key, fallback=None):
+            """Valor numérico de ``key`` (o de ``fallback``) como float; 0.0 si falta."""
+            value = values.get(key, values.get(fallback))
             try:
-                return float(value) / divisor
+                return float(value)
             except (ValueError, TypeError):
                 return 0.0
         
-        def safe_int(value):
-            """Conversión segura a int."""
-            try:
-                return int(value)
-            except (ValueError, TypeError):
-                return 0
+        def safe_int(key):
+            """Valor numérico de ``key`` como int; 0 si falta."""
+            return int(safe_float(key))
         
         # Determinar número de fases
-        num_lines = safe_int(raw.get('input_num_lines', 1))
+        num_lines = safe_int('input_num_lines') if 'input_num_lines' in values else 1
         phases = num_lines if num_lines > 0 else 1
         
         # Formatear datos (compatible con dashboard trifásico)
@@ -175,49 +142,49 @@ class UPSMIBClient:
             '_ups_type': 'ups_mib_standard',
             
             # Identificación
-            'manufacturer': raw.get('ident_manufacturer', ''),
-            'model': raw.get('ident_model', raw.get('invt_model', '')),
-            'serial': raw.get('invt_serial', ''),
-            'sw_version': raw.get('ident_sw_version', ''),
+            'manufacturer': values.get('ident_manufacturer', ''),
+            'model': values.get('ident_model', values.get('invt_model', '')),
+            'serial': values.get('invt_serial', ''),
+            'sw_version': values.get('ident_sw_version', ''),
             
-            # Batería
-            'battery_status': BATTERY_STATUS_DECODER.get(safe_int(raw.get('battery_status')), 'Unknown'),
-            'battery_capacity': safe_int(raw.get('battery_charge_remaining')),
-            'battery_voltage': safe_float(raw.get('battery_voltage'), 10.0),  # En décimas de volt
-            'battery_current': safe_float(raw.get('battery_current'), 10.0),  # En décimas de amp
-            'battery_temperature': safe_int(raw.get('battery_temperature')),
-            'battery_runtime': safe_int(raw.get('battery_minutes_remaining')),
-            'seconds_on_battery': safe_int(raw.get('battery_seconds_on_battery')),
+            # Batería (UPS_MIB_SCALE_FACTORS: décimas de volt y de amp)
+            'battery_status': values.get('battery_status', 'Unknown'),
+            'battery_capacity': safe_int('battery_charge_remaining'),
+            'battery_voltage': safe_float('battery_voltage'),
+            'battery_current': safe_float('battery_current'),
+            'battery_temperature': safe_int('battery_temperature'),
+            'battery_runtime': safe_int('battery_minutes_remaining'),
+            'seconds_on_battery': safe_int('battery_seconds_on_battery'),
             
             # Entrada (monofásica = solo L1)
-            'input_voltage_l1': safe_float(raw.get('input_voltage', raw.get('invt_input_voltage', 0))),
-            'input_voltage_l2': 0,  # No aplica en monofásico
-            'input_voltage_l3': 0,  # No aplica en monofásico
-            'input_frequency': safe_float(raw.get('input_frequency'), 10.0),  # En décimas de Hz
-            'input_current': safe_float(raw.get('input_current'), 10.0),
-            'input_power': safe_int(raw.get('input_true_power')),
+            'input_voltage_l1': safe_float('input_voltage', 'invt_input_voltage'),
+            'input_voltage_l2': safe_float('input_voltage.2'),  # 0 en monofásico
+            'input_voltage_l3': safe_float('input_voltage.3'),
+            'input_frequency': safe_float('input_frequency'),
+            'input_current': safe_float('input_current'),
+            'input_power': safe_int('input_true_power'),
             
             # Salida (monofásica = solo L1)
-            'output_source': OUTPUT_SOURCE_DECODER.get(safe_int(raw.get('output_source')), 'Unknown'),
-            'power_source': OUTPUT_SOURCE_DECODER.get(safe_int(raw.get('output_source')), 'Unknown'),
-            'output_voltage_l1': safe_float(raw.get('output_voltage', raw.get('invt_output_voltage', 0))),
-            'output_voltage_l2': 0,  # No aplica en monofásico
-            'output_voltage_l3': 0,  # No aplica en monofásico
-            'output_frequency': safe_float(raw.get('output_frequency'), 10.0),
-            'output_current': safe_float(raw.get('output_current'), 10.0),
-            'output_current_l1': safe_float(raw.get('output_current'), 10.0),
-            'output_current_l2': 0,
-            'output_current_l3': 0,
-            'output_power': safe_int(raw.get('output_power')),
-            'output_load': safe_int(raw.get('output_percent_load')),
+            'output_source': values.get('output_source', 'Unknown'),
+            'power_source': values.get('output_source', 'Unknown'),
+            'output_voltage_l1': safe_float('output_voltage', 'invt_output_voltage'),
+            'output_voltage_l2': safe_float('output_voltage.2'),  # 0 en monofásico
+            'output_voltage_l3': safe_float('output_voltage.3'),
+            'output_frequency': safe_float('output_frequency'),
+            'output_current': safe_float('output_current'),
+            'output_current_l1': safe_float('output_current'),
+            'output_current_l2': safe_float('output_current.2'),
+            'output_current_l3': safe_float('output_current.3'),
+            'output_power': safe_int('output_power'),
+            'output_load': safe_int('output_percent_load'),
             
             # Factor de potencia y potencias (estimados si no disponibles)
             'power_factor': 0.8,  # Estimado
-            'active_power': safe_int(raw.get('output_power')),
-            'apparent_power': int(safe_int(raw.get('output_power')) / 0.8) if raw.get('output_power') else 0,
+            'active_power': safe_int('output_power'),
+            'apparent_power': int(safe_int('output_power') / 0.8),
             
             # Estado general
-            'temperature': safe_int(raw.get('battery_temperature')),
+            'temperature': safe_int('battery_temperature'),
         }
         
         logger.info(f"✅ UPS-MIB {self.ip_address}: {data.get('output_voltage_l1')}V, "
@@ -0,0 +1,213 @@
+"""
+Muestras recientes por equipo en memoria (buffer circular).
+
+Cada equipo tiene un ``SampleRing`` de capacidad fija (por defecto la que
+cubre ``RECENT_SAMPLES_MINUTES`` a la cadencia más rápida del polling): un
+``array('d')`` de instantes y una columna ``array('f')`` por métrica
+normalizada (las de ``sample_sink.SAMPLE_FIELDS``). Las columnas se crean la primera vez que el
+equipo reporta esa métrica, así un UPS monofásico no reserva las de L2/L3;
+un campo que no vino en una lectura queda en NaN.
+
+``append`` es O(1) (sobrescribe la posición más antigua) y ``view`` retorna
+un ``RingView`` que referencia las columnas con ``memoryview`` sin copiar
+(uno o dos tramos según la vuelta del buffer). Lo usan el endpoint de
+backfill del dashboard y la lógica que necesite tendencias recientes.
+
+Con ``MONITOR_SHARDS`` o el poller headless las muestras se registran donde
+se sondea y se reenvían al proceso web (``event_bus.SAMPLE_EVENT``), que es
+el que atiende la API.
+"""
+
+import math
+import os
+import threading
+import time
+from array import array
+
+from app.services.modbus_scheduler import MIN_INTERVAL
+
+RECENT_SAMPLES_MINUTES = float(os.environ.get('RECENT_SAMPLES_MINUTES', '15'))
+# Muestras por equipo; 0 = las que cubren la ventana a la cadencia más rápida
+RECENT_SAMPLES_CAPACITY = int(os.environ.get('RECENT_SAMPLES_CAPACITY', '0'))
+
+# Intervalo más corto entre lecturas de un equipo: el piso del planificador
+# Modbus (un equipo en alarma sondea a la mitad de su cadencia); SNMP va cada 2 s
+FASTEST_SAMPLE_INTERVAL = MIN_INTERVAL
+
+_NAN = float('nan')
+
+
+class RingView:
+    """
+    Tramo de un ``SampleRing`` (del más antiguo al más nuevo) sin copiar datos.
+    Es una vista: si el buffer da la vuelta, sus posiciones más antiguas se
+    sobrescriben con lecturas nuevas.
+    """
+
+    __slots__ = ('ring', 'segments', 'length')
+
+    def __init__(self, ring, segments):
+        self.ring = ring
+        self.segments = segments  # [(desde, hasta)] en índices físicos
+        self.length = sum(hi - lo for lo, hi in segments)
+
+    def __len__(self):
+        return self.length
+
+    def _slices(self, column):
+        view = memoryview(column)
+        return [view[lo:hi] for lo, hi in self.segments]
+
+    def times(self):
+        """Instantes (epoch s) como lista de memoryview."""
+        return self._slices(self.ring.times)
+
+    def column(self, field):
+        """Valores de ``field`` como lista de memoryview; None si el equipo no lo reporta."""
+        column = self.ring.columns.get(field)
+        return None if column is None else self._slices(column)
+
+    def to_dict(self):
+        """Serie materializada para JSON: instantes en epoch ms y NaN como None."""
+        with self.ring.lock:
+            times = [int(t * 1000) for part in self.times() for t in part]
+            series = {}
+            for field in self.ring.columns:
+                series[field] = [None if math.isnan(v) else round(v, 3)
+                                 for part in self.column(field) for v in part]
+        return {'t': times, 'series': series}
+
+
+class SampleRing:
+    """Buffer circular de muestras normalizadas de un equipo."""
+
+    __slots__ = ('capacity', 'times', 'columns', 'head', 'count', 'lock')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.columns = {}
+        self.head = 0    # próxima posición a escribir
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, fields):
+        """Agrega una lectura ``{campo: float}`` con su instante (epoch s)."""
+        with self.lock:
+            index = self.head
+            self.times[index] = timestamp
+            for name, column in self.columns.items():
+                column[index] = fields.get(name, _NAN)
+            for name in fields.keys() - self.columns.keys():
+                column = array('f', [_NAN]) * self.capacity
+                column[index] = fields[name]
+                self.columns[name] = column
+            self.head = (index + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def _physical(self, offset):
+        """Índice físico de la muestra lógica ``offset`` (0 = la más antigua)."""
+        return (self.head - self.count + offset) % self.capacity
+
+    def view(self, since=None, limit=None):
+        """
+        Las muestras con instante >= ``since`` (todas si es None), como mucho
+        las últimas ``limit``.
+        """
+        with self.lock:
+            # Búsqueda binaria sobre el orden lógico (los instantes son crecientes)
+            lo, hi = 0, self.count
+            if since is not None:
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if self.times[self._physical(mid)] < since:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+            first = lo if limit is None else max(lo, self.count - limit)
+            length = self.count - first
+            if length <= 0:
+                return RingView(self, [])
+            start = self._physical(first)
+            end = start + length
+            if end <= self.capacity:
+                return RingView(self, [(start, end)])
+            return RingView(self, [(start, self.capacity), (0, end - self.capacity)])
+
+    def latest(self):
+        """Último valor no NaN de cada métrica y el instante de la última muestra."""
+        with self.lock:
+            if not self.count:
+                return None, {}
+            values = {}
+            for name, column in self.columns.items():
+                for offset in range(self.count - 1, -1, -1):
+                    value = column[self._physical(offset)]
+                    if not math.isnan(value):
+                        values[name] = round(value, 3)
+                        break
+            return self.times[self._physical(self.count - 1)], values
+
+
+class RecentSamples:
+    """Buffers de todos los equipos del proceso."""
+
+    def __init__(self, capacity=None, minutes=None):
+        self.window = (minutes or RECENT_SAMPLES_MINUTES) * 60
+        self.capacity = (capacity or RECENT_SAMPLES_CAPACITY
+                         or math.ceil(self.window / FASTEST_SAMPLE_INTERVAL))
+        self._rings = {}
+        self._lock = threading.Lock()
+        self._forward = None
+
+    def forward_to(self, callback):
+        """Además de guardar, pasa cada muestra a ``callback`` (shards -> proceso web)."""
+        self._forward = callback
+
+    def record(self, sample):
+        ring = self._rings.get(sample.device_id)
+        if ring is None:
+            with self._lock:
+                ring = self._rings.setdefault(sample.device_id, SampleRing(self.capacity))
+        ring.append(sample.timestamp_ns / 1e9, sample.fields)
+        if self._forward is not None:
+            self._forward(sample)
+
+    def ring(self, device_id):
+        return self._rings.get(device_id)
+
+    def view(self, device_id, seconds=None, limit=None, now=None):
+        """Muestras de los últimos ``seconds`` (por defecto la ventana completa)."""
+        ring = self._rings.get(device_id)
+        if ring is None:
+            return None
+        return ring.view(since=(now or time.time()) - (seconds or self.window), limit=limit)
+
+    def latest(self, device_id):
+        ring = self._rings.get(device_id)
+        return (None, {}) if ring is None else ring.latest()
+
+    def device_ids(self):
+        return list(self._rings)
+
+    def forget(self, device_id):
+        self._rings.pop(device_id, None)
+
+    def get_stats(self):
+        rings = list(self._rings.values())
+        return {
+            'devices': len(rings),
+            'capacity': self.capacity,
+            'window_s': self.window,
+            'samples': sum(len(ring) for ring in rings),
+            'bytes': sum(ring.times.itemsize * ring.capacity
+                         + sum(c.itemsize * ring.capacity for c in ring.columns.values())
+                         for ring in rings),
+        }
+
+
+# Singleton instance
+recent_samples = RecentSamples()
@@ -0,0 +1,178 @@
+"""
+Consulta del historial de muestras para los gráficos de tendencia.
+
+Lee del almacén configurado en ``SAMPLE_SINKS`` (PostgreSQL si está, por sus
+rollups; si no, InfluxDB) y reduce la serie en el servidor a la cantidad de
+puntos pedida:
+
+- ``lttb``: Largest-Triangle-Three-Buckets sobre el promedio; conserva la
+  forma de la curva con pocos puntos.
+- ``minmax``: por cada bucket el mínimo y el máximo, en orden temporal; no
+  pierde picos ni caídas breves.
+
+En PostgreSQL el nivel (crudo, 1 min, 15 min, 1 h) se elige según el paso
+``(hasta - desde) / puntos``, así un gráfico de 30 días lee una cantidad de
+filas parecida a uno de 1 hora. InfluxDB agrega en ventanas del mismo paso
+con ``aggregateWindow``.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+
+from app.services.sample_sink import SAMPLE_FIELDS, SAMPLE_SINKS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RANGE = timedelta(hours=1)
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+MAX_METRICS = 8
+MODES = ('lttb', 'minmax')
+OVERSAMPLE = 4  # Ventanas de InfluxDB por punto pedido (LTTB necesita más puntos que la salida)
+
+
+def parse_time(value, default):
+    """Instante UTC desde ISO 8601 o epoch (s o ms); ``default`` si viene vacío."""
+    if value in (None, ''):
+        return default
+    if value.isdigit():
+        number = int(value)
+        return datetime.fromtimestamp(number / 1000 if number > 10 ** 11 else number, timezone.utc)
+    ts = datetime.fromisoformat(value)
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+def lttb(points, threshold):
+    """Reduce ``points`` [(t, v)] (ordenados por t numérico) a ``threshold`` puntos con LTTB."""
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Promedio del bucket siguiente: tercer vértice del triángulo
+        start = int((i + 1) * every) + 1
+        end = min(int((i + 2) * every) + 1, n)
+        count = end - start
+        avg_t = sum(p[0] for p in points[start:end]) / count
+        avg_v = sum(p[1] for p in points[start:end]) / count
+
+        at, av = points[a]
+        best, best_area = a + 1, -1.0
+        for j in range(int(i * every) + 1, start):
+            t, v = points[j]
+            area = abs((at - avg_t) * (v - av) - (at - t) * (avg_v - av))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def minmax(rows, threshold):
+    """
+    Reduce ``rows`` [(t, min, max, promedio)] a ``threshold`` puntos: el mínimo
+    y el máximo de cada bucket, en orden temporal.
+    """
+    buckets = max(threshold // 2, 1)
+    size = max(-(-len(rows) // buckets), 1)
+    points = []
+    for start in range(0, len(rows), size):
+        chunk = rows[start:start + size]
+        low = min(chunk, key=lambda row: row[1])
+        high = max(chunk, key=lambda row: row[2])
+        pair = sorted([(low[0], low[1]), (high[0], high[2])])
+        points.extend(pair[:1] if pair[0] == pair[1] else pair)
+    return points
+
+
+class PostgresHistory:
+    """Historial en ``ups_samples`` y sus rollups."""
+
+    name = 'postgres'
+
+    def __init__(self, service=None):
+        if service is None:
+            from app.services.pg_telemetry import pg_telemetry as service
+        self.service = service
+
+    def rows(self, device_id, metric, start, end, points, mode):
+        level, rows = self.service.series(device_id, metric, start, end, points)
+        return f'{self.name}:{level}', rows
+
+
+class InfluxHistory:
+    """Historial en InfluxDB, agregado en ventanas por el servidor."""
+
+    name = 'influx'
+
+    def __init__(self, service=None):
+        if service is None:
+            from app.services.influx_db import influx_service as service
+        self.service = service
+
+    def rows(self, device_id, metric, start, end, points, mode):
+        if mode == 'minmax':
+            every = (end - start) / max(points // 2, 1)
+            low = dict(self.service.series(device_id, metric, start, end, every, 'min'))
+            high = dict(self.service.series(device_id, metric, start, end, every, 'max'))
+            rows = [(t, low[t], high[t], (low[t] + high[t]) / 2) for t in sorted(low) if t in high]
+        else:
+            every = (end - start) / (points * OVERSAMPLE)
+            rows = [(t, v, v, v) for t, v in self.service.series(device_id, metric, start, end, every)]
+        return f'{self.name}:{every.total_seconds():g}s', rows
+
+
+# Preferencia cuando hay varios sinks configurados: PostgreSQL tiene rollups
+HISTORY_STORES = {
+    'postgres': PostgresHistory,
+    'influx': InfluxHistory,
+}
+
+
+def history_store(names=None):
+    """Almacén de historial de los sinks configurados; None si no hay ninguno."""
+    configured = {part.strip() for part in (names or SAMPLE_SINKS).split(',')}
+    for name, factory in HISTORY_STORES.items():
+        if name in configured:
+            return factory()
+    return None
+
+
+def query_history(store, device_id, metrics, start, end, points=DEFAULT_POINTS, mode='lttb'):
+    """
+    Series de ``metrics`` de un equipo en [start, end), reducidas a ``points``
+    puntos como [[epoch_ms, valor], ...]. ValueError si los parámetros no son válidos.
+    """
+    unknown = [metric for metric in metrics if metric not in SAMPLE_FIELDS]
+    if not metrics or unknown:
+        raise ValueError(f"Métrica desconocida: {', '.join(unknown) or '(vacía)'}")
+    if len(metrics) > MAX_METRICS:
+        raise ValueError(f"Máximo {MAX_METRICS} métricas por consulta")
+    if end <= start:
+        raise ValueError("'from' debe ser anterior a 'to'")
+    if mode not in MODES:
+        raise ValueError(f"Modo desconocido: {mode} (lttb | minmax)")
+    points = min(max(points, 2), MAX_POINTS)
+
+    series = {}
+    source = None
+    for metric in metrics:
+        source, rows = store.rows(device_id, metric, start, end, points, mode)
+        rows = [(int(row[0].timestamp() * 1000),) + tuple(row[1:]) for row in rows]
+        if mode == 'minmax':
+            reduced = minmax(rows, points)
+        else:
+            reduced = lttb([(row[0], row[3]) for row in rows], points)
+        series[metric] = [[t, v] for t, v in reduced]
+    return {
+        'device_id': device_id,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'points': points,
+        'mode': mode,
+        'source': source,
+        'series': series,
+    }
@@ -0,0 +1,243 @@
+"""
+Destino único de las muestras de monitoreo (SNMP y Modbus).
+
+Los dos pipelines entregan su lectura cruda a ``record_sample``, que la
+normaliza al esquema de ``mapped_data`` (``voltaje_in_l1``, ``bateria_pct``,
+...) con todos los valores como float y las mismas etiquetas (``device_id``,
+``device_name``, ``ip``, ``protocol``, ``ups_type``), y la pasa al sink
+configurado en ``SAMPLE_SINKS``.
+
+Solo se guardan los campos presentes en la lectura: Modbus no lee todos los
+grupos en cada ciclo y un 0 de relleno no debe quedar en el historial.
+Cada muestra queda además en el buffer de muestras recientes del proceso
+(``recent_samples``). ``write`` de cada sink encola y retorna; los lotes se
+escriben en segundo plano, así agregar historial no suma latencia al polling.
+"""
+
+import logging
+import math
+import os
+import time
+from typing import NamedTuple
+
+from app.services.recent_samples import recent_samples
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_SINKS = os.environ.get('SAMPLE_SINKS', 'influx')
+
+# Campo normalizado -> claves de origen en la lectura (gana la primera presente)
+SNMP_SOURCES = {
+    'voltaje_in_l1': ('input_voltage_l1',),
+    'voltaje_in_l2': ('input_voltage_l2',),
+    'voltaje_in_l3': ('input_voltage_l3',),
+    'frecuencia_in': ('input_frequency',),
+    'voltaje_out_l1': ('output_voltage_l1',),
+    'voltaje_out_l2': ('output_voltage_l2',),
+    'voltaje_out_l3': ('output_voltage_l3',),
+    'frecuencia_out': ('output_frequency',),
+    'corriente_out_l1': ('output_current_l1', 'output_current'),
+    'corriente_out_l2': ('output_current_l2',),
+    'corriente_out_l3': ('output_current_l3',),
+    'power_factor': ('power_factor',),
+    'active_power': ('active_power',),
+    'apparent_power': ('apparent_power',),
+    'carga_pct': ('output_load',),
+    'bateria_pct': ('battery_capacity', 'bateria_pct'),
+    'voltaje_bateria': ('battery_voltage',),
+    'corriente_bateria': ('battery_current',),
+    'temperatura': ('temperature',),
+    'battery_remain_time': ('battery_runtime',),
+}
+
+MODBUS_SOURCES = {
+    'voltaje_in_l1': ('input_voltage_a',),
+    'voltaje_in_l2': ('input_voltage_b',),
+    'voltaje_in_l3': ('input_voltage_c',),
+    'frecuencia_in': ('input_frequency_a',),
+    'voltaje_out_l1': ('output_voltage_a',),
+    'voltaje_out_l2': ('output_voltage_b',),
+    'voltaje_out_l3': ('output_voltage_c',),
+    'frecuencia_out': ('output_frequency_a',),
+    'corriente_out_l1': ('output_current_a',),
+    'corriente_out_l2': ('output_current_b',),
+    'corriente_out_l3': ('output_current_c',),
+    'power_factor': ('output_pf_a',),
+    'active_power': ('output_active_a',),
+    'apparent_power': ('output_apparent_a',),
+    'carga_pct': ('load_pct_a',),
+    'bateria_pct': ('battery_capacity',),
+    'voltaje_bateria': ('battery_voltage_pos',),
+    'corriente_bateria': ('battery_current_pos',),
+    'temperatura': ('battery_temp',),
+    'battery_remain_time': ('battery_remain_time',),
+    'bypass_voltage_a': ('bypass_voltage_a',),
+    'bypass_voltage_b': ('bypass_voltage_b',),
+    'bypass_voltage_c': ('bypass_voltage_c',),
+    'env_temperature': ('env_temperature',),
+    'env_humidity': ('env_humidity',),
+    'water_leak': ('water_leak_location',),
+}
+
+SOURCES = {'snmp': SNMP_SOURCES, 'modbus': MODBUS_SOURCES}
+
+# Todos los campos que puede tener una muestra, en orden estable
+SAMPLE_FIELDS = tuple(dict.fromkeys([*SNMP_SOURCES, *MODBUS_SOURCES]))
+
+
+class Sample(NamedTuple):
+    """Una lectura normalizada de un equipo."""
+    device_id: int
+    name: str
+    ip: str
+    protocol: str
+    ups_type: str
+    fields: dict          # {campo normalizado: float}
+    timestamp_ns: int
+
+    @property
+    def tags(self):
+        return {'device_id': self.device_id, 'device_name': self.name, 'ip': self.ip,
+                'protocol': self.protocol, 'ups_type': self.ups_type}
+
+
+def sample_fields(protocol, data):
+    """Campos normalizados (float) presentes en la lectura cruda ``data``."""
+    fields = {}
+    for name, keys in SOURCES[protocol].items():
+        for key in keys:
+            value = data.get(key)
+            if isinstance(value, (int, float)) and math.isfinite(value):
+                fields[name] = float(value)
+                break
+    return fields
+
+
+class SampleSink:
+    """Destino de muestras; ``write`` no debe bloquear (encola y retorna)."""
+
+    name = 'sink'
+
+    def write(self, sample):
+        raise NotImplementedError
+
+    def get_stats(self):
+        return {}
+
+
+class InfluxSampleSink(SampleSink):
+    """Muestras como line protocol en la cola del escritor de InfluxDB."""
+
+    name = 'influx'
+
+    def __init__(self, service=None):
+        if service is None:
+            from app.services.influx_db import influx_service as service
+        self.service = service
+
+    def line(self, sample):
+        from app.services.influx_db import MEASUREMENT, to_line
+        return to_line(MEASUREMENT, sample.tags, sample.fields, sample.timestamp_ns)
+
+    def write(self, sample):
+        if not self.service.enabled:
+            return False
+        line = self.line(sample)
+        return line is not None and self.service.enqueue(line)
+
+    def get_stats(self):
+        return self.service.get_stats()
+
+
+class PostgresSampleSink(SampleSink):
+    """Muestras en la cola del escritor de PostgreSQL (COPY a ``ups_samples``)."""
+
+    name = 'postgres'
+
+    def __init__(self, service=None):
+        if service is None:
+            from app.services.pg_telemetry import pg_telemetry as service
+        self.service = service
+
+    def write(self, sample):
+        return self.service.enqueue(sample)
+
+    def get_stats(self):
+        return self.service.get_stats()
+
+
+class MultiSink(SampleSink):
+    """Reparte cada muestra entre varios sinks; el error de uno no afecta al resto."""
+
+    name = 'multi'
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def write(self, sample):
+        written = False
+        for sink in self.sinks:
+            try:
+                written = sink.write(sample) or written
+            except Exception as e:
+                logger.error(f"Error escribiendo muestra en {sink.name}: {e}")
+        return written
+
+    def get_stats(self):
+        return {sink.name: sink.get_stats() for sink in self.sinks}
+
+
+# Nombre en SAMPLE_SINKS -> constructor
+SINK_FACTORIES = {
+    'influx': InfluxSampleSink,
+    'postgres': PostgresSampleSink,
+}
+
+
+def build_sink(names):
+    """MultiSink con los sinks de una lista separada por comas ('influx,postgres')."""
+    sinks = []
+    for name in (part.strip() for part in names.split(',')):
+        if not name or name == 'none':
+            continue
+        factory = SINK_FACTORIES.get(name)
+        if factory is None:
+            logger.error(f"Sink de muestras desconocido: {name}")
+            continue
+        sinks.append(factory())
+    return MultiSink(sinks)
+
+
+_sink = None
+
+
+def get_sink():
+    """Sink del proceso (se arma con ``SAMPLE_SINKS`` al primer uso)."""
+    global _sink
+    if _sink is None:
+        _sink = build_sink(SAMPLE_SINKS)
+    return _sink
+
+
+def set_sink(sink):
+    """Reemplaza el sink del proceso (None vuelve a ``SAMPLE_SINKS``)."""
+    global _sink
+    _sink = sink
+
+
+def record_sample(dev, protocol, data, ups_type=None, timestamp_ns=None):
+    """
+    Normaliza una lectura cruda de ``dev`` (fila de monitoreo_config) y la
+    entrega al sink. Retorna la muestra, o None si no tenía campos numéricos.
+    """
+    fields = sample_fields(protocol, data)
+    if not fields:
+        return None
+    sample = Sample(dev['id'], dev.get('nombre', 'UPS'), dev['ip'], protocol,
+                    ups_type or dev.get('ups_type') or '', fields, timestamp_ns or time.time_ns())
+    try:
+        recent_samples.record(sample)
+        get_sink().write(sample)
+    except Exception as e:
+        logger.error(f"Error registrando muestra de {sample.ip}: {e}")
+    return sample
@@ -0,0 +1,232 @@
+"""
+Lotes de varbinds por PDU con límite aprendido por agente.
+
+Los agentes SNMP viejos rechazan PDUs grandes (``tooBig``) o directamente no
+responden. En lugar de caer a un GET por OID, los OIDs se reparten en lotes
+del tamaño máximo conocido para ese agente y los lotes se envían en paralelo.
+Cuando un lote falla por tamaño se parte a la mitad y el límite aprendido
+queda guardado por equipo (``PduLimits``) para los ciclos siguientes.
+
+Un timeout no siempre es tamaño: si el agente no respondió nada en la misma
+consulta se asume caído y no se aprende. Mientras el tamaño no esté probado
+se envía junto con los lotes un GET de un solo OID que confirma si el agente
+está vivo (sin costo extra de tiempo: va en paralelo).
+
+Si el agente rechaza cualquier PDU de varios OIDs (genErr y similares, típico
+de tarjetas Megatec SNMPv1) el equipo queda marcado como "single-OID": sus
+OIDs se piden de a uno, en paralelo con un máximo de ``SNMP_MAX_IN_FLIGHT``
+consultas por equipo, y los ciclos siguientes ya no intentan el GET agrupado.
+
+Para tablas (líneas de entrada/salida de UPS-MIB) en SNMPv2c se usa GETBULK.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+
+from pysnmp.hlapi.v3arch.asyncio import ContextData, bulk_cmd, get_cmd
+from pysnmp.proto import errind, rfc1905
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_VARBINDS = 64  # Primer intento con agentes desconocidos
+SNMP_MAX_IN_FLIGHT = int(os.environ.get('SNMP_MAX_IN_FLIGHT', '4'))
+
+_OK = 'ok'
+_TOO_BIG = 'tooBig'
+_MULTI_REJECTED = 'multiRejected'
+_TIMEOUT = 'timeout'
+_FAILED = 'failed'
+
+
+class PduLimit:
+    """Límite de varbinds por PDU de un agente."""
+
+    __slots__ = ('name', 'max_varbinds', 'confirmed', '_in_flight', '_loop')
+
+    def __init__(self, max_varbinds=DEFAULT_MAX_VARBINDS, name='agente'):
+        self.name = name
+        self.max_varbinds = max_varbinds
+        self.confirmed = 0  # Lote más grande que el agente respondió
+        self._in_flight = None
+        self._loop = None
+
+    def in_flight(self):
+        """
+        Semáforo de consultas en vuelo al agente (``SNMP_MAX_IN_FLIGHT``),
+        compartido por todas las llamadas del loop actual.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._in_flight = asyncio.Semaphore(SNMP_MAX_IN_FLIGHT)
+            self._loop = loop
+        return self._in_flight
+
+    def shrink(self, failed_size):
+        """Un lote de ``failed_size`` no pasó: el límite baja a la mitad."""
+        self.max_varbinds = max(1, min(self.max_varbinds, failed_size // 2))
+
+    def confirm(self, size):
+        self.confirmed = max(self.confirmed, size)
+
+    @property
+    def single_oid(self):
+        """El agente solo acepta un OID por PDU."""
+        return self.max_varbinds == 1
+
+    def mark_single_oid(self):
+        self.max_varbinds = 1
+
+
+class PduLimits:
+    """Límites aprendidos por (ip, puerto); viven mientras viva el proceso."""
+
+    def __init__(self, default=DEFAULT_MAX_VARBINDS):
+        self.default = default
+        self._limits = {}
+
+    def get(self, ip, port):
+        key = (ip, int(port))
+        limit = self._limits.get(key)
+        if limit is None:
+            limit = self._limits[key] = PduLimit(self.default, name=f'{ip}:{port}')
+        return limit
+
+    def snapshot(self):
+        return {
+            f'{ip}:{port}': {'max_varbinds': limit.max_varbinds, 'confirmed': limit.confirmed,
+                             'single_oid': limit.single_oid}
+            for (ip, port), limit in self._limits.items()
+        }
+
+
+def _chunks(indices, size):
+    return [indices[i:i + size] for i in range(0, len(indices), size)]
+
+
+async def _get_chunk(engine, auth, transport, objects, chunk, values, in_flight):
+    """GET de un lote; escribe los valores en ``values`` y devuelve el resultado."""
+    while chunk:
+        try:
+            async with in_flight:
+                error_indication, error_status, error_index, var_binds = await get_cmd(
+                    engine, auth, transport, ContextData(), *(objects[i] for i in chunk))
+        except Exception as e:
+            logger.warning(f"Error en GET SNMP de {len(chunk)} OID(s): {e}")
+            return _FAILED
+
+        if error_indication:
+            return _TIMEOUT if isinstance(error_indication, errind.RequestTimedOut) else _FAILED
+        if not error_status:
+            for index, (_, value) in zip(chunk, var_binds):
+                values[index] = value
+            return _OK
+
+        status = error_status.prettyPrint() if hasattr(error_status, 'prettyPrint') else str(error_status)
+        if status == 'tooBig':
+            return _TOO_BIG
+        if status == 'noSuchName' and 0 < int(error_index) <= len(chunk):
+            # SNMPv1: un OID inexistente anula toda la PDU; se marca como
+            # inexistente (igual que noSuchObject en v2c) y se reintenta sin él
+            values[chunk[int(error_index) - 1]] = rfc1905.noSuchObject
+            chunk = chunk[:int(error_index) - 1] + chunk[int(error_index):]
+            continue
+        # genErr y similares en PDUs de varios OIDs: el agente no acepta agrupados
+        if len(chunk) > 1:
+            return _MULTI_REJECTED
+        logger.debug(f"OID rechazado por el agente: {status}")
+        return _OK
+    return _OK
+
+
+async def _probe(engine, auth, transport, obj, in_flight):
+    try:
+        async with in_flight:
+            error_indication, _, _, _ = await get_cmd(engine, auth, transport, ContextData(), obj)
+    except Exception as e:
+        logger.warning(f"Error en sondeo SNMP: {e}")
+        return False
+    return not error_indication
+
+
+async def get_batched(engine, auth, transport, objects, limit):
+    """
+    GET de ``objects`` en lotes concurrentes según el límite del agente.
+
+    Como mucho ``SNMP_MAX_IN_FLIGHT`` consultas del equipo en vuelo a la vez,
+    sumando las de otras llamadas concurrentes al mismo agente.
+
+    Returns:
+        Lista de valores alineada con ``objects`` (None si el OID no respondió,
+        noSuchObject/noSuchInstance si el agente dice que no existe), o None si
+        el agente no respondió ninguna consulta.
+    """
+    values = [None] * len(objects)
+    in_flight = limit.in_flight()
+    pending = _chunks(list(range(len(objects))), min(limit.max_varbinds, len(objects)) or 1)
+    answered = False
+
+    while pending:
+        requests = [_get_chunk(engine, auth, transport, objects, chunk, values, in_flight)
+                    for chunk in pending]
+        probing = not answered and len(pending[0]) > max(limit.confirmed, 1)
+        if probing:
+            requests.append(_probe(engine, auth, transport, objects[pending[0][0]], in_flight))
+        outcomes = await asyncio.gather(*requests)
+        if probing:
+            answered = outcomes.pop()
+
+        answered = answered or any(outcome != _TIMEOUT for outcome in outcomes)
+        retry = []
+        for chunk, outcome in zip(pending, outcomes):
+            if outcome == _OK:
+                limit.confirm(len(chunk))
+            elif outcome == _MULTI_REJECTED:
+                if not limit.single_oid:
+                    logger.warning(f"{limit.name} no acepta GET agrupado: se consultará de a un OID")
+                limit.mark_single_oid()
+                retry.extend([index] for index in chunk)
+            elif len(chunk) > 1 and (outcome == _TOO_BIG or (outcome == _TIMEOUT and answered)):
+                limit.shrink(len(chunk))
+                retry.extend(_chunks(chunk, limit.max_varbinds))
+        if retry and not limit.single_oid:
+            logger.info(f"{limit.name}: límite de PDU reducido a {limit.max_varbinds} varbinds")
+        pending = retry
+
+    return values if answered else None
+
+
+async def get_bulk_rows(engine, auth, transport, columns, first_row, rows, limit=None):
+    """
+    GETBULK (SNMPv2c) de ``rows`` filas de una tabla desde ``first_row``.
+
+    Args:
+        columns: Secuencia de (clave, oid_columna, ObjectType de la fila ``first_row - 1``)
+        first_row: Primera fila a leer (índice SNMP)
+        rows: Cantidad de filas (max-repetitions)
+        limit: ``PduLimit`` del agente; su semáforo cuenta esta consulta en vuelo
+
+    Returns:
+        Diccionario {clave: {fila: valor}} con lo que respondió el agente.
+    """
+    async with (limit.in_flight() if limit is not None else contextlib.nullcontext()):
+        error_indication, error_status, _, var_binds = await bulk_cmd(
+            engine, auth, transport, ContextData(), 0, rows, *(obj for _, _, obj in columns))
+    result = {key: {} for key, _, _ in columns}
+    if error_indication or error_status:
+        logger.debug(f"GETBULK sin datos: {error_indication or error_status}")
+        return result
+
+    prefixes = [(key, tuple(int(part) for part in oid.split('.'))) for key, oid, _ in columns]
+    for oid, value in var_binds:
+        oid = tuple(oid.get_oid())
+        for key, prefix in prefixes:
+            if len(oid) == len(prefix) + 1 and oid[:-1] == prefix and oid[-1] >= first_row:
+                result[key][oid[-1]] = value
+                break
+    return result
+
+
+# Límites compartidos por todos los clientes SNMP del proceso
+pdu_limits = PduLimits()
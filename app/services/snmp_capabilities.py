@@ -0,0 +1,161 @@
+"""
+Perfil de capacidades SNMP por equipo.
+
+Los UPS ``ups_mib_standard`` / ``hybrid`` suelen implementar solo una parte
+de UPS-MIB y de los OIDs INVT; pedir todo en cada ciclo cuesta varbinds que
+vuelven como noSuchObject. Cada equipo guarda qué OIDs de su perfil no existen
+(tabla ``monitoreo_capacidades``, migración 010) y el polling pide solo el
+resto:
+
+- La auto-detección (``SNMPScanner``) siembra el perfil de los equipos ya
+  configurados con esa IP.
+- Cada respuesta lo refina: un OID que pasa a noSuchObject deja de pedirse.
+- Cada ``SNMP_REPROBE_INTERVAL`` segundos se vuelve a pedir el perfil completo
+  para detectar OIDs nuevos tras un cambio de firmware.
+
+Un OID que no respondió (timeout de un lote) no cuenta como inexistente.
+"""
+
+import logging
+import os
+import time
+from datetime import datetime
+
+from app.utils.ups_oids import HYBRID_PROFILE, UPS_MIB_PROFILE
+
+logger = logging.getLogger(__name__)
+
+SNMP_REPROBE_INTERVAL = float(os.environ.get('SNMP_REPROBE_INTERVAL', '21600'))  # 6 h
+
+# Perfil base de cada ups_type con perfil de capacidades
+BASE_PROFILES = {
+    'ups_mib_standard': UPS_MIB_PROFILE,
+    'hybrid': HYBRID_PROFILE,
+}
+
+SOURCE_SCANNER = 'scanner'
+SOURCE_PROBE = 'probe'
+SOURCE_POLL = 'poll'
+
+
+class CapabilityProfile:
+    """OIDs de un perfil base que existen en un equipo."""
+
+    def __init__(self, base, missing=(), probed_at=None, source=None):
+        self.base = base
+        self.missing = frozenset(missing) & frozenset(base.oids)
+        self.probed_at = probed_at  # epoch del último sondeo completo (None: nunca)
+        self.source = source
+        self.dirty = False          # Cambios pendientes de guardar
+        self._active = None
+
+    @property
+    def supported(self):
+        return [oid for oid in self.base.oids if oid not in self.missing]
+
+    @property
+    def active(self):
+        """Perfil con solo los OIDs soportados (precompilado, se cachea)."""
+        if self._active is None:
+            self._active = self.base.subset(self.supported)
+        return self._active
+
+    def due(self, now=None):
+        """True si toca sondear el perfil completo."""
+        if self.probed_at is None:
+            return True
+        return (now or time.time()) - self.probed_at >= SNMP_REPROBE_INTERVAL
+
+    def request_profile(self, now=None):
+        """Perfil a pedir en este ciclo: el completo si toca re-sondeo."""
+        if self.due(now) or not len(self.active):
+            return self.base
+        return self.active
+
+    def observe(self, profile, values, now=None):
+        """Refina el perfil con la respuesta a ``profile`` (perfil pedido en el ciclo)."""
+        found = profile.missing_oids(values)
+        if profile is self.base:
+            missing = frozenset(found)
+            self.probed_at = now or time.time()
+            self.source = SOURCE_PROBE
+            self.dirty = True
+        else:
+            missing = self.missing.union(found)
+            if missing != self.missing:
+                self.source = SOURCE_POLL
+        if missing == self.missing:
+            return
+        added, removed = len(missing - self.missing), len(self.missing - missing)
+        logger.info(f"Capacidades SNMP ({self.base.name}): {len(self.base) - len(missing)}/{len(self.base)} "
+                    f"OIDs soportados (+{removed} / -{added})")
+        self.missing = missing
+        self._active = None
+        self.dirty = True
+
+
+class CapabilityStore:
+    """Lectura y escritura de perfiles en ``monitoreo_capacidades``."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def load(self, device_id, base):
+        """Perfil guardado del equipo; uno vacío (se sondea) si no hay o es de otro tipo."""
+        try:
+            row = self.db.obtener_capacidades_snmp(device_id)
+        except Exception as e:
+            logger.warning(f"No se pudo leer capacidades SNMP del equipo {device_id}: {e}")
+            row = None
+        if not row or row.get('profile') != base.name:
+            return CapabilityProfile(base)
+        probed_at = row.get('probed_at')
+        return CapabilityProfile(base, row.get('missing_oids') or (),
+                                 probed_at=probed_at.timestamp() if probed_at else None,
+                                 source=row.get('source'))
+
+    def save(self, device_id, capabilities):
+        capabilities.dirty = False
+        try:
+            self.db.guardar_capacidades_snmp(
+                device_id, capabilities.base.name, capabilities.supported, sorted(capabilities.missing),
+                capabilities.source or SOURCE_PROBE,
+                datetime.fromtimestamp(capabilities.probed_at or time.time()))
+        except Exception as e:
+            capabilities.dirty = True
+            logger.error(f"Error guardando capacidades SNMP del equipo {device_id}: {e}")
+
+
+def seed_from_scan(db, scan):
+    """
+    Siembra el perfil de los equipos SNMP configurados con la IP/puerto de un
+    resultado de ``SNMPScanner.auto_detect``. Los OIDs que el escáner no
+    consulta quedan como soportados hasta que el polling diga lo contrario.
+    Las sesiones leen el perfil al construirse: se toca ``updated_at`` de cada
+    equipo sembrado para que los pollers en marcha las reconstruyan.
+
+    Returns:
+        Cantidad de equipos sembrados.
+    """
+    if not scan.get('success'):
+        return 0
+    missing = set(scan.get('oids_missing') or ())
+    store = CapabilityStore(db)
+    seeded = 0
+    for dev in db.obtener_monitoreo_ups():
+        base = BASE_PROFILES.get(dev.get('ups_type'))
+        if (base is None or dev.get('protocolo') != 'snmp' or dev.get('ip') != scan.get('ip')
+                or int(dev.get('snmp_port') or 161) != int(scan.get('port') or 161)):
+            continue
+        profile = CapabilityProfile(base, missing, probed_at=time.time(), source=SOURCE_SCANNER)
+        store.save(dev['id'], profile)
+        if profile.dirty:
+            continue  # No se guardó
+        try:
+            db.tocar_monitoreo_ups(dev['id'])
+        except Exception as e:
+            logger.error(f"No se pudo invalidar la sesión SNMP del equipo {dev['id']}: {e}")
+        seeded += 1
+    if seeded:
+        logger.info(f"Capacidades SNMP de {scan.get('ip')} sembradas en {seeded} equipo(s)")
+    return seeded
@@ -0,0 +1,81 @@
+"""
+Runtime SNMP persistente.
+
+Un solo event loop (hilo daemon), un solo ``SnmpEngine`` y transportes UDP y
+credenciales cacheados para todo el polling SNMP. Antes cada ciclo creaba un
+loop con ``asyncio.run`` y cada cliente su propio engine y transporte, con un
+costo de CPU que crecía con la flota.
+
+Todo lo que use ``engine`` o ``target`` debe correr en el loop del runtime
+(``snmp_runtime.run(...)`` desde código síncrono).
+"""
+
+import logging
+
+from pysnmp.hlapi.v3arch.asyncio import SnmpEngine, CommunityData, UdpTransportTarget
+
+from app.services.async_runtime import AsyncRuntime
+
+logger = logging.getLogger(__name__)
+
+
+class SnmpRuntime:
+    """Loop, engine y cachés de transporte/credenciales compartidos."""
+
+    def __init__(self, name='snmp'):
+        self.runtime = AsyncRuntime(name)
+        self._engine = None
+        self._targets = {}     # (ip, puerto, timeout, reintentos) -> UdpTransportTarget
+        self._auth = {}        # (community, mp_model) -> CommunityData
+        self.engines_created = 0
+        self.targets_created = 0
+
+    @property
+    def engine(self):
+        """SnmpEngine único (se crea al primer uso)."""
+        if self._engine is None:
+            self._engine = SnmpEngine()
+            self.engines_created += 1
+        return self._engine
+
+    async def target(self, ip, port=161, timeout=2.0, retries=1):
+        """Transporte UDP cacheado por equipo (la resolución de dirección se hace una vez)."""
+        key = (ip, int(port), timeout, retries)
+        target = self._targets.get(key)
+        if target is None:
+            target = await UdpTransportTarget.create((ip, int(port)), timeout=timeout, retries=retries)
+            self._targets[key] = target
+            self.targets_created += 1
+        return target
+
+    def auth(self, community, mp_model):
+        """CommunityData cacheado por (community, versión)."""
+        key = (community, int(mp_model))
+        auth = self._auth.get(key)
+        if auth is None:
+            auth = CommunityData(community, mpModel=int(mp_model))
+            self._auth[key] = auth
+        return auth
+
+    def discard(self, ip):
+        """Olvida los transportes de una IP (equipo eliminado o reconfigurado)."""
+        for key in [k for k in self._targets if k[0] == ip]:
+            del self._targets[key]
+
+    def submit(self, coro):
+        return self.runtime.submit(coro)
+
+    def run(self, coro, timeout=None):
+        """Ejecuta una corrutina en el loop SNMP desde código síncrono."""
+        return self.runtime.run(coro, timeout)
+
+    def get_stats(self):
+        return {
+            'engines_created': self.engines_created,
+            'targets_cached': len(self._targets),
+            'targets_created': self.targets_created,
+            'auth_cached': len(self._auth),
+        }
+
+
+snmp_runtime = SnmpRuntime()
@@ -0,0 +1,138 @@
+"""
+Registro de sesiones SNMP por dispositivo.
+
+Cada fila SNMP de monitoreo_config se traduce una sola vez en una sesión:
+cliente según ``ups_type`` (con su perfil de varbinds precompilado), versión
+SNMP normalizada y puerto/community resueltos. La sesión se reconstruye solo
+cuando cambia la fila (columna ``updated_at``, migración 009); en estado
+estable el polling no construye objetos. Los equipos UPS-MIB/híbridos cargan
+además su perfil de capacidades (OIDs soportados, migración 010), que
+``refresh`` lee fuera del loop de ``snmp_runtime``.
+"""
+
+import asyncio
+import logging
+
+from app.services.protocols.snmp_minimal_client import MinimalSNMPClient
+from app.services.protocols.snmp_upsmib_client import UPSMIBClient
+from app.services.snmp_capabilities import BASE_PROFILES
+
+logger = logging.getLogger(__name__)
+
+# Campos que definen la sesión si la fila aún no tiene updated_at
+_CONFIG_FIELDS = ('ip', 'snmp_port', 'snmp_community', 'snmp_version', 'ups_type', 'nombre')
+
+
+def _row_version(dev):
+    updated_at = dev.get('updated_at')
+    if updated_at is not None:
+        return updated_at
+    return tuple(dev.get(field) for field in _CONFIG_FIELDS)
+
+
+class SnmpDeviceSession:
+    """Cliente y parámetros resueltos de un dispositivo SNMP."""
+
+    __slots__ = ('device_id', 'version', 'ip', 'nombre', 'ups_type',
+                 'snmp_version', 'version_name', 'capabilities', 'client')
+
+    def __init__(self, dev, runtime, capabilities=None):
+        self.device_id = dev['id']
+        self.version = _row_version(dev)
+        self.ip = dev['ip']
+        self.nombre = dev.get('nombre', 'UPS')
+        port = dev.get('snmp_port', 161) or 161
+        community = dev.get('snmp_community', 'public') or 'public'
+        # snmp_version puede venir como None, str o int
+        snmp_version_raw = dev.get('snmp_version')
+        if snmp_version_raw is None or snmp_version_raw == '':
+            self.snmp_version = 1  # Default SNMPv2c
+        else:
+            self.snmp_version = int(snmp_version_raw)
+        self.version_name = 'SNMPv1' if self.snmp_version == 0 else 'SNMPv2c'
+        self.ups_type = dev.get('ups_type', 'invt_enterprise')
+        self.capabilities = None
+
+        if self.ups_type in ('ups_mib_standard', 'hybrid'):
+            self.capabilities = capabilities
+            # UPS-MIB para monofásicos o híbridos
+            self.client = UPSMIBClient(
+                ip_address=self.ip,
+                community=community,
+                port=port,
+                mp_model=self.snmp_version,
+                include_invt=(self.ups_type == 'hybrid'),
+                runtime=runtime,
+                capabilities=self.capabilities,
+            )
+        else:
+            # Cliente MINIMAL para INVT (muchos UPS INVT tienen OIDs limitados)
+            self.client = MinimalSNMPClient(community=community, port=port,
+                                            mp_model=self.snmp_version, runtime=runtime)
+        logger.info(f"Sesión SNMP {self.ip}: {type(self.client).__name__} "
+                    f"(tipo: {self.ups_type}, {self.version_name})")
+
+
+class SnmpSessionRegistry:
+    """Sesiones por id de monitoreo_config, invalidadas por cambio de fila."""
+
+    def __init__(self, runtime=None, capabilities=None):
+        """
+        Args:
+            runtime: SnmpRuntime compartido por los clientes
+            capabilities: CapabilityStore para los perfiles de capacidades (opcional)
+        """
+        self.runtime = runtime
+        self.capabilities = capabilities
+        self._sessions = {}
+        self.builds = 0
+
+    def _stale(self, dev):
+        session = self._sessions.get(dev['id'])
+        return session is None or session.version != _row_version(dev)
+
+    def _build(self, dev, capabilities):
+        session = self._sessions.get(dev['id'])
+        if session is not None and session.ip != dev['ip']:
+            self._discard(session.ip)
+        session = SnmpDeviceSession(dev, self.runtime, capabilities)
+        self._sessions[dev['id']] = session
+        self.builds += 1
+        return session
+
+    def _base_profile(self, dev):
+        return None if self.capabilities is None else BASE_PROFILES.get(dev.get('ups_type'))
+
+    def get(self, dev):
+        """Sesión vigente para la fila (la reconstruye si la fila cambió)."""
+        if not self._stale(dev):
+            return self._sessions[dev['id']]
+        base = self._base_profile(dev)
+        return self._build(dev, None if base is None else self.capabilities.load(dev['id'], base))
+
+    async def refresh(self, devices):
+        """
+        Construye las sesiones nuevas o cambiadas de ``devices`` leyendo sus
+        perfiles de capacidades con ``asyncio.to_thread`` (consulta a la DB),
+        para no bloquear el loop compartido; después ``get`` no consulta.
+        """
+        for dev in devices:
+            if not self._stale(dev):
+                continue
+            base = self._base_profile(dev)
+            capabilities = None
+            if base is not None:
+                capabilities = await asyncio.to_thread(self.capabilities.load, dev['id'], base)
+            self._build(dev, capabilities)
+
+    def prune(self, device_ids):
+        """Descarta las sesiones de equipos que ya no están configurados."""
+        for device_id in set(self._sessions) - set(device_ids):
+            self._discard(self._sessions.pop(device_id).ip)
+
+    def _discard(self, ip):
+        if self.runtime is not None:
+            self.runtime.discard(ip)
+
+    def __len__(self):
+        return len(self._sessions)
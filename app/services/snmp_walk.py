@@ -0,0 +1,357 @@
+"""
+SNMP walk por streaming.
+
+Recorre un subárbol completo (por ejemplo el enterprise INVT 1.3.6.1.4.1.56788)
+sin límite de filas: en SNMPv2c con GETBULK (``max_repetitions`` ajustable, se
+reduce a la mitad ante ``tooBig``) y en SNMPv1 con GETNEXT. El recorrido
+termina al salir del subárbol, en endOfMibView/noSuchName o si el agente
+devuelve un OID que no avanza (agentes con tablas rotas que entran en ciclo).
+
+Las filas se entregan por páginas (una por respuesta del agente) para que la
+ruta las transmita como NDJSON o por Socket.IO (solo al cliente que pidió el
+walk) a medida que llegan. Los walks que terminan completos se guardan en
+``SNMP_WALK_DIR`` como texto gzip, una línea ``oid<TAB>tipo<TAB>valor`` por
+OID, para compararlos sin conexión; la compresión corre en un hilo para no
+frenar el loop SNMP compartido con el monitoreo:
+
+    python -m app.services.snmp_walk diff viejo.walk.gz nuevo.walk.gz
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import time
+import uuid
+
+from pysnmp.hlapi.v3arch.asyncio import ContextData, ObjectIdentity, ObjectType, bulk_cmd, next_cmd
+from pysnmp.proto import errind, rfc1905
+
+from app.extensions import socketio
+from app.services.snmp_runtime import snmp_runtime
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SNMP_WALK_DIR = os.environ.get('SNMP_WALK_DIR', os.path.join(_PROJECT_ROOT, 'data', 'snmp_walks'))
+SNMP_WALK_MAX_REPETITIONS = int(os.environ.get('SNMP_WALK_MAX_REPETITIONS', '25'))
+
+WALK_SUFFIX = '.walk.gz'
+_FILE_NAME = re.compile(r'^[\w.\-]+\.walk\.gz$')
+
+# Motivos de fin de un walk; solo los completos se guardan en disco
+END_SUBTREE = 'subtree'          # Primer OID fuera del subárbol
+END_MIB = 'end_of_mib'           # endOfMibView / noSuchName
+END_LOOP = 'oid_not_increasing'  # El agente repitió o retrocedió
+END_LIMIT = 'max_rows'
+END_TIMEOUT = 'timeout'
+END_ERROR = 'error'
+END_CANCELLED = 'cancelled'
+COMPLETE = (END_SUBTREE, END_MIB)
+
+
+def parse_oid(text):
+    """'1.3.6.1.4.1' o '.1.3.6.1.4.1' -> tupla de enteros."""
+    try:
+        oid = tuple(int(part) for part in str(text).strip().strip('.').split('.'))
+    except ValueError:
+        raise ValueError(f'OID inválido: {text}')
+    if len(oid) < 2:
+        raise ValueError(f'OID inválido: {text}')
+    return oid
+
+
+def _oid_text(oid):
+    return '.'.join(str(part) for part in oid)
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _unescape(text):
+    return re.sub(r'\\(.)', lambda m: {'t': '\t', 'n': '\n', 'r': '\r'}.get(m.group(1), m.group(1)), text)
+
+
+class SnmpWalk:
+    """Un recorrido de subárbol: parámetros, progreso y resultado."""
+
+    def __init__(self, ip, root, port=161, community='public', version=1,
+                 max_repetitions=None, timeout=2.0, retries=1, max_rows=0):
+        self.id = uuid.uuid4().hex[:12]
+        self.ip = ip
+        self.root = parse_oid(root)
+        self.port = int(port)
+        self.community = community or 'public'
+        self.version = int(version)
+        self.max_repetitions = max(1, int(max_repetitions or SNMP_WALK_MAX_REPETITIONS))
+        self.timeout = float(timeout)
+        self.retries = int(retries)
+        self.max_rows = int(max_rows or 0)
+        self.rows = 0
+        self.requests = 0
+        self.end = None
+        self.error = None
+        self.path = None
+        self.started_at = time.time()
+        self.finished_at = None
+
+    @property
+    def complete(self):
+        return self.end in COMPLETE
+
+    def summary(self):
+        return {
+            'walk_id': self.id,
+            'ip': self.ip,
+            'root': _oid_text(self.root),
+            'version': 'SNMPv1' if self.version == 0 else 'SNMPv2c',
+            'rows': self.rows,
+            'requests': self.requests,
+            'end': self.end,
+            'complete': self.complete,
+            'error': self.error,
+            'file': os.path.basename(self.path) if self.path else None,
+            'elapsed_s': round((self.finished_at or time.time()) - self.started_at, 2),
+        }
+
+    async def _request(self, engine, auth, transport, oid):
+        """Una consulta desde ``oid``; devuelve (error_indication, error_status, varbinds)."""
+        start = ObjectType(ObjectIdentity(oid))
+        self.requests += 1
+        if self.version == 0:
+            error_indication, error_status, _, var_binds = await next_cmd(
+                engine, auth, transport, ContextData(), start, lookupMib=False)
+        else:
+            error_indication, error_status, _, var_binds = await bulk_cmd(
+                engine, auth, transport, ContextData(), 0, self.max_repetitions, start,
+                lookupMib=False)
+        return error_indication, error_status, var_binds
+
+    async def pages(self, runtime=None):
+        """
+        Generador asíncrono de páginas de filas ``[(oid, tipo, valor), ...]``.
+
+        Debe correr en el loop de ``runtime`` (por defecto ``snmp_runtime``).
+        Al terminar ``self.end`` indica el motivo.
+        """
+        runtime = runtime or snmp_runtime
+        engine = runtime.engine
+        auth = runtime.auth(self.community, self.version)
+        transport = await runtime.target(self.ip, self.port, timeout=self.timeout, retries=self.retries)
+        root_len = len(self.root)
+        current = self.root
+
+        while self.end is None:
+            error_indication, error_status, var_binds = await self._request(engine, auth, transport, current)
+            if error_indication:
+                self.error = str(error_indication)
+                self.end = END_TIMEOUT if isinstance(error_indication, errind.RequestTimedOut) else END_ERROR
+                break
+            if error_status:
+                status = error_status.prettyPrint() if hasattr(error_status, 'prettyPrint') else str(error_status)
+                if status == 'tooBig' and self.max_repetitions > 1:
+                    self.max_repetitions //= 2
+                    logger.info(f"Walk {self.ip}: tooBig, max-repetitions reducido a {self.max_repetitions}")
+                    continue
+                if status == 'noSuchName':
+                    self.end = END_MIB
+                else:
+                    self.end = END_ERROR
+                    self.error = f'Error SNMP: {status}'
+                break
+
+            page = []
+            for name, value in var_binds:
+                if isinstance(value, rfc1905.EndOfMibView):
+                    self.end = END_MIB
+                    break
+                oid = tuple(name)
+                if oid[:root_len] != self.root:
+                    self.end = END_SUBTREE
+                    break
+                if oid <= current:
+                    self.end = END_LOOP
+                    self.error = f'OID no creciente: {_oid_text(oid)}'
+                    break
+                page.append((_oid_text(oid), type(value).__name__, value.prettyPrint()))
+                current = oid
+                if self.max_rows and self.rows + len(page) >= self.max_rows:
+                    self.end = END_LIMIT
+                    break
+            else:
+                if not var_binds:
+                    self.end = END_MIB
+
+            if page:
+                self.rows += len(page)
+                yield page
+
+
+class WalkFile:
+    """Escritura de un walk en disco; el archivo aparece solo si el walk terminó completo."""
+
+    def __init__(self, walk, directory=None):
+        self.walk = walk
+        self.directory = directory or SNMP_WALK_DIR
+        stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(walk.started_at))
+        name = f"{walk.ip.replace(':', '_')}_{_oid_text(walk.root)}_{stamp}{WALK_SUFFIX}"
+        self.path = os.path.join(self.directory, name)
+        self._tmp = f'{self.path}.part'
+        self._file = None
+
+    def write(self, page):
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = gzip.open(self._tmp, 'wt', encoding='utf-8')
+            meta = {'ip': self.walk.ip, 'root': _oid_text(self.walk.root), 'version': self.walk.version,
+                    'started_at': self.walk.started_at}
+            self._file.write(f'# {json.dumps(meta)}\n')
+        for oid, kind, value in page:
+            self._file.write(f'{oid}\t{kind}\t{_escape(value)}\n')
+
+    def close(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if self.walk.complete:
+            os.replace(self._tmp, self.path)
+            self.walk.path = self.path
+            logger.info(f"Walk {self.walk.ip} {_oid_text(self.walk.root)} guardado: "
+                        f"{self.walk.rows} OIDs en {self.path}")
+        else:
+            os.remove(self._tmp)
+
+
+async def run_walk(walk, on_page, save=True, runtime=None):
+    """Recorre ``walk`` llamando ``on_page(page)`` por cada respuesta; guarda si terminó completo."""
+    out = WalkFile(walk) if save else None
+    try:
+        async for page in walk.pages(runtime):
+            if out is not None:
+                await asyncio.to_thread(out.write, page)
+            on_page(page)
+    except asyncio.CancelledError:
+        walk.end = END_CANCELLED
+        raise
+    except Exception as e:
+        logger.exception(f"Error en walk {walk.ip}: {e}")
+        walk.end, walk.error = END_ERROR, str(e)
+    finally:
+        walk.finished_at = time.time()
+        if out is not None:
+            await asyncio.to_thread(out.close)
+    return walk
+
+
+async def publish_walk(walk, sid, save=True, runtime=None):
+    """
+    Walk con las páginas enviadas por Socket.IO (snmp_walk_rows /
+    snmp_walk_done) solo a la sesión ``sid`` que lo pidió.
+    """
+    def on_page(page):
+        socketio.emit('snmp_walk_rows', {'walk_id': walk.id, 'rows': [list(row) for row in page]}, to=sid)
+
+    try:
+        await run_walk(walk, on_page, save=save, runtime=runtime)
+    finally:
+        socketio.emit('snmp_walk_done', walk.summary(), to=sid)
+
+
+def iter_walk(walk, save=True, runtime=None):
+    """
+    Walk desde código síncrono (rutas Flask): genera las páginas a medida que
+    llegan. Si el consumidor deja de iterar (cliente desconectado) el walk se
+    cancela.
+    """
+    runtime = runtime or snmp_runtime
+    pages = queue.Queue()
+    future = runtime.submit(run_walk(walk, pages.put, save=save, runtime=runtime))
+    future.add_done_callback(lambda _: pages.put(None))
+    try:
+        while True:
+            page = pages.get()
+            if page is None:
+                break
+            yield page
+    finally:
+        future.cancel()
+
+
+def list_walks(directory=None):
+    """Walks guardados, del más reciente al más antiguo."""
+    directory = directory or SNMP_WALK_DIR
+    if not os.path.isdir(directory):
+        return []
+    files = []
+    for name in os.listdir(directory):
+        if name.endswith(WALK_SUFFIX):
+            stat = os.stat(os.path.join(directory, name))
+            files.append({'file': name, 'size': stat.st_size, 'modified': stat.st_mtime})
+    return sorted(files, key=lambda item: item['modified'], reverse=True)
+
+
+def walk_path(name, directory=None):
+    """Ruta de un walk guardado; ValueError si el nombre no es de un walk."""
+    if not _FILE_NAME.match(name or ''):
+        raise ValueError(f'Nombre de walk inválido: {name}')
+    return os.path.join(directory or SNMP_WALK_DIR, name)
+
+
+def read_walk(path, offset=0, limit=None):
+    """
+    Lee un walk guardado.
+
+    Returns:
+        (meta, filas, total) con las filas [oid, tipo, valor] de la página
+        ``offset``..``offset + limit`` (todas si ``limit`` es None).
+    """
+    meta, rows, total = {}, [], 0
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('#'):
+                meta = json.loads(line[1:])
+                continue
+            if total >= offset and (limit is None or len(rows) < limit):
+                oid, kind, value = line.rstrip('\n').split('\t', 2)
+                rows.append([oid, kind, _unescape(value)])
+            total += 1
+    return meta, rows, total
+
+
+def diff_walks(old_path, new_path):
+    """OIDs agregados, quitados y con tipo/valor distinto entre dos walks guardados."""
+    old = {oid: (kind, value) for oid, kind, value in read_walk(old_path)[1]}
+    new = {oid: (kind, value) for oid, kind, value in read_walk(new_path)[1]}
+    key = parse_oid
+    return {
+        'added': sorted((oid for oid in new if oid not in old), key=key),
+        'removed': sorted((oid for oid in old if oid not in new), key=key),
+        'changed': sorted((oid for oid in new if oid in old and new[oid] != old[oid]), key=key),
+    }
+
+
+def _main(argv):
+    if len(argv) != 3 or argv[0] != 'diff':
+        print('Uso: python -m app.services.snmp_walk diff viejo.walk.gz nuevo.walk.gz')
+        return 2
+    old = {oid: value for oid, _, value in read_walk(argv[1])[1]}
+    new = {oid: value for oid, _, value in read_walk(argv[2])[1]}
+    diff = diff_walks(argv[1], argv[2])
+    for oid in diff['added']:
+        print(f'+ {oid} = {new[oid]}')
+    for oid in diff['removed']:
+        print(f'- {oid} = {old[oid]}')
+    for oid in diff['changed']:
+        print(f'~ {oid}: {old[oid]} -> {new[oid]}')
+    print(f"{len(diff['added'])} agregados, {len(diff['removed'])} quitados, {len(diff['changed'])} cambiados")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(_main(sys.argv[1:]))
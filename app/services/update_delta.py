@@ -0,0 +1,154 @@
+"""
+Actualizaciones de monitoreo por diferencias para Socket.IO.
+
+Los monitores siguen publicando el ``ups_update`` completo de cada equipo;
+en el proceso web, antes de emitir, ``DeltaEncoder`` lo compara con el último
+estado enviado y emite ``ups_delta`` solo con lo que cambió:
+
+    {'id': 7, 'seq': 42, 'set': {'status': 'online', 'alarms': [...]},
+     'merge': {'data': {'voltaje_in_l1': 221.4}}}
+
+- ``set`` reemplaza claves del estado (``data``/``status_data`` completos si
+  perdieron campos, p. ej. al pasar a offline);
+- ``merge`` actualiza campos sueltos de ``data``/``status_data``;
+- ``items`` actualiza campos sueltos de listas de dicts dentro de esos
+  (``data.modules`` de los UPS modulares), por índice:
+  ``{'data': {'modules': {'2': {'mod_output_voltage_a': 229.8}}}}``;
+- sin cambios el mensaje queda en ``{'id', 'seq'}``: el cliente sabe que el
+  equipo sigue respondiendo y agrega el punto al gráfico.
+
+Los números se redondean a la precisión con que se muestran
+(``FIELD_PRECISION``), así el ruido de la última cifra no genera tráfico.
+Cada cliente recibe ``ups_snapshot`` (los estados, con su ``seq``) de los
+equipos a los que se suscribe y lo pide de nuevo con ``request_snapshot`` si
+detecta un salto de ``seq``.
+"""
+
+import threading
+
+UPDATE_EVENT = 'ups_update'
+DELTA_EVENT = 'ups_delta'
+SNAPSHOT_EVENT = 'ups_snapshot'
+STATUS_EVENT = 'ups_status'
+
+# Diccionarios que se actualizan campo por campo
+NESTED = ('data', 'status_data')
+# Cambian en cada ciclo y el dashboard no los usa: se guardan pero no se envían
+VOLATILE = ('timestamp',)
+
+# Decimales con que el dashboard muestra cada campo
+FIELD_PRECISION = {
+    'voltaje_in_l1': 1, 'voltaje_in_l2': 1, 'voltaje_in_l3': 1,
+    'voltaje_out_l1': 1, 'voltaje_out_l2': 1, 'voltaje_out_l3': 1,
+    'bypass_voltage_a': 1, 'bypass_voltage_b': 1, 'bypass_voltage_c': 1,
+    'frecuencia_in': 2, 'frecuencia_out': 2,
+    'corriente_out_l1': 1, 'corriente_out_l2': 1, 'corriente_out_l3': 1,
+    'power_factor': 2, 'active_power': 1, 'apparent_power': 1,
+    'carga_pct': 0, 'bateria_pct': 0, 'battery_remain_time': 0,
+    'voltaje_bateria': 1, 'corriente_bateria': 1,
+    'temperatura': 1, 'env_temperature': 1, 'env_humidity': 1,
+}
+DEFAULT_PRECISION = 2
+
+
+def quantize(value, precision=DEFAULT_PRECISION):
+    """Redondea floats (también dentro de listas y dicts) a ``precision`` decimales."""
+    if isinstance(value, float):
+        if value != value or value in (float('inf'), float('-inf')):
+            return None
+        return int(round(value)) if precision == 0 else round(value, precision)
+    if isinstance(value, dict):
+        return {k: quantize(v, FIELD_PRECISION.get(k, precision)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [quantize(v, precision) for v in value]
+    return value
+
+
+def _row_changes(old, new):
+    """
+    Campos cambiados por índice entre dos listas de dicts de igual largo y
+    mismas claves; None si no se pueden comparar así (se envía la lista).
+    """
+    if not (isinstance(old, list) and isinstance(new, list) and len(old) == len(new)):
+        return None
+    rows = {}
+    for index, (before, after) in enumerate(zip(old, new)):
+        if not (isinstance(before, dict) and isinstance(after, dict) and before.keys() == after.keys()):
+            return None
+        fields = {k: v for k, v in after.items() if before[k] != v}
+        if fields:
+            rows[str(index)] = fields
+    return rows
+
+
+class DeltaEncoder:
+    """Último estado enviado por equipo y cálculo de las diferencias."""
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def encode(self, payload):
+        """Diferencia de ``payload`` (ups_update completo) contra el último estado enviado."""
+        state = quantize(payload)
+        device_id = state['id']
+        with self._lock:
+            previous = self._states.get(device_id)
+            seq = previous['seq'] + 1 if previous else 1
+            state['seq'] = seq
+            self._states[device_id] = state
+        delta = {'id': device_id, 'seq': seq}
+        if previous is None:
+            delta['set'] = {k: v for k, v in state.items() if k not in ('id', 'seq')}
+            return delta
+
+        changed, merged, items = {}, {}, {}
+        for key, value in state.items():
+            if key in ('id', 'seq') or key in VOLATILE:
+                continue
+            old = previous.get(key)
+            if value == old:
+                continue
+            if key in NESTED and isinstance(value, dict) and isinstance(old, dict) and old.keys() <= value.keys():
+                fields = {}
+                for k, v in value.items():
+                    if k in old and old[k] == v:
+                        continue
+                    rows = _row_changes(old.get(k), v)
+                    if rows is None:
+                        fields[k] = v
+                    else:
+                        items.setdefault(key, {})[k] = rows
+                if fields:
+                    merged[key] = fields
+            else:
+                changed[key] = value
+        for key in previous.keys() - state.keys():
+            changed[key] = None
+        if changed:
+            delta['set'] = changed
+        if merged:
+            delta['merge'] = merged
+        if items:
+            delta['items'] = items
+        return delta
+
+    def snapshot(self, device_ids=None):
+        """Estados completos (con ``seq``) de todos los equipos o de ``device_ids``."""
+        with self._lock:
+            if device_ids is None:
+                return list(self._states.values())
+            return [self._states[i] for i in device_ids if i in self._states]
+
+    def statuses(self):
+        """``[{'id', 'status'}]`` de todos los equipos (lista del dashboard)."""
+        with self._lock:
+            return [{'id': state['id'], 'status': state.get('status')} for state in self._states.values()]
+
+    def forget(self, device_id):
+        with self._lock:
+            self._states.pop(device_id, None)
+
+
+# Singleton instance
+update_encoder = DeltaEncoder()
@@ -0,0 +1,109 @@
+"""
+Suscripciones Socket.IO a las actualizaciones de monitoreo.
+
+Cada cliente elige qué equipos recibe uniéndose a salas:
+
+    device:<id>      un equipo
+    site:<sitio>     los equipos de un sitio (``monitoreo_config.sitio``)
+    fleet            todos (pared de monitoreo)
+
+``Subscriptions`` lleva la cuenta de clientes por sala para que
+``event_bus.publish`` serialice y emita el ``ups_delta`` de un equipo solo si
+alguna de sus salas tiene clientes. Los cambios de ``status`` de cualquier
+equipo van a todos como ``ups_status`` (lista de equipos del dashboard).
+"""
+
+import threading
+from collections import Counter
+
+FLEET_ROOM = 'fleet'
+
+
+def device_room(device_id):
+    return f'device:{device_id}'
+
+
+def site_room(site):
+    return f'site:{site}'
+
+
+def parse_rooms(data):
+    """
+    Salas pedidas por un cliente: ``{'device_id': 7}``, ``{'device_ids': [..]}``,
+    ``{'site': 'Planta 1'}`` y/o ``{'fleet': true}``. ValueError si no hay
+    ninguna válida.
+    """
+    data = data or {}
+    rooms = []
+    device_ids = data.get('device_ids') or []
+    if data.get('device_id') is not None:
+        device_ids = [data['device_id'], *device_ids]
+    try:
+        rooms.extend(device_room(int(device_id)) for device_id in device_ids)
+    except (TypeError, ValueError):
+        raise ValueError(f"device_id inválido: {device_ids!r}")
+    site = data.get('site')
+    if isinstance(site, str) and site.strip():
+        rooms.append(site_room(site.strip()))
+    if data.get('fleet'):
+        rooms.append(FLEET_ROOM)
+    if not rooms:
+        raise ValueError("Sin equipos, sitio ni flota a suscribir")
+    return rooms
+
+
+def room_covers(room, state):
+    """Si el estado (``ups_update``) de un equipo se envía a ``room``."""
+    return (room == FLEET_ROOM
+            or room == device_room(state.get('id'))
+            or (state.get('sitio') is not None and room == site_room(state['sitio'])))
+
+
+class Subscriptions:
+    """Salas de cada cliente y cantidad de clientes por sala."""
+
+    def __init__(self):
+        self._rooms = {}          # sid -> set(salas)
+        self._members = Counter()  # sala -> clientes
+        self._lock = threading.Lock()
+
+    def join(self, sid, room):
+        with self._lock:
+            rooms = self._rooms.setdefault(sid, set())
+            if room not in rooms:
+                rooms.add(room)
+                self._members[room] += 1
+
+    def leave(self, sid, room):
+        with self._lock:
+            rooms = self._rooms.get(sid)
+            if rooms and room in rooms:
+                rooms.discard(room)
+                self._release(room)
+
+    def drop(self, sid):
+        """Olvida un cliente desconectado."""
+        with self._lock:
+            for room in self._rooms.pop(sid, ()):
+                self._release(room)
+
+    def _release(self, room):
+        self._members[room] -= 1
+        if self._members[room] <= 0:
+            del self._members[room]
+
+    def rooms_for(self, device_id, site=None):
+        """Salas con clientes que reciben al equipo (vacío: no se emite)."""
+        candidates = [FLEET_ROOM, device_room(device_id)]
+        if site is not None:
+            candidates.append(site_room(site))
+        with self._lock:
+            return [room for room in candidates if self._members.get(room)]
+
+    def get_stats(self):
+        with self._lock:
+            return {'clients': len(self._rooms), 'rooms': dict(self._members)}
+
+
+# Singleton instance
+subscriptions = Subscriptions()
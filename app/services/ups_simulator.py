@@ -0,0 +1,512 @@
+"""
+Simulador local de una flota de UPS (agentes SNMP y esclavos Modbus TCP).
+
+    python -m app.services.ups_simulator --snmp 200 --modbus 200 [--register]
+
+Levanta en localhost, en puertos consecutivos, agentes SNMP v1/v2c que sirven
+los OIDs de ``app.utils.ups_oids`` (perfiles INVT, Megatec, UPS-MIB e híbrido,
+con GETNEXT/GETBULK y tablas de líneas UPS-MIB) y esclavos Modbus TCP con el
+mapa de registros INVT de ``app.utils.modbus_registers`` (el que lee
+``ModbusMonitor``). Todo corre en un solo event loop, así cientos de equipos
+caben en un proceso.
+
+Cada equipo puede tener latencia, pérdida de paquetes y un modo de falla:
+
+    down          no responde (SNMP) / rechaza la conexión (Modbus)
+    flap          alterna ``flap_period`` segundos arriba y abajo
+    reject_multi  genErr en GETs de varios OIDs (tarjetas Megatec v1)
+    too_big       tooBig por encima de ``max_varbinds`` varbinds
+    error         genErr (SNMP) / excepción 0x04 "slave device failure" (Modbus)
+
+Con ``--register`` los equipos se cargan en monitoreo_config (nombres
+``SIM-...``) para que los pollers reales los consulten; ``--unregister`` los
+quita.
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import random
+import struct
+import time
+
+from pyasn1.codec.ber import decoder, encoder
+from pysnmp.proto import api, rfc1905
+
+from app.utils.modbus_registers import (
+    MAX_MODULES, MODULE_PARAMS, REGISTER_MAP, STATUS_BLOCK_START, STATUS_MAP,
+    THS_BLOCK_START, THS_MAP, UPS_BLOCK_START, WATER_BLOCK_START, WATER_MAP, module_base,
+)
+from app.utils.ups_oids import (
+    HYBRID_PROFILE, INVT_ENTERPRISE_PROFILE, MEGATEC_PROFILE, UPS_MIB_INPUT_COLUMNS,
+    UPS_MIB_OUTPUT_COLUMNS, UPS_MIB_PROFILE,
+)
+
+logger = logging.getLogger(__name__)
+
+SIM_PREFIX = 'SIM-'
+SNMP_BASE_PORT = 20161
+MODBUS_BASE_PORT = 25020
+TICK = 1.0  # Segundos entre cambios de las mediciones simuladas
+
+FAILURE_MODES = ('down', 'flap', 'reject_multi', 'too_big', 'error')
+
+# Tipos de agente SNMP: perfiles servidos, ups_type y versión de monitoreo_config
+SNMP_KINDS = {
+    'megatec': {'profiles': (MEGATEC_PROFILE,), 'ups_type': 'invt_minimal', 'snmp_version': 0},
+    'invt': {'profiles': (INVT_ENTERPRISE_PROFILE, MEGATEC_PROFILE), 'ups_type': 'invt_enterprise',
+             'snmp_version': 1},
+    'ups_mib': {'profiles': (UPS_MIB_PROFILE,), 'ups_type': 'ups_mib_standard', 'snmp_version': 1},
+    'hybrid': {'profiles': (HYBRID_PROFILE,), 'ups_type': 'hybrid', 'snmp_version': 1},
+}
+
+_SYS_DESCR = (1, 3, 6, 1, 2, 1, 1, 1, 0)
+_SYS_UPTIME = (1, 3, 6, 1, 2, 1, 1, 3, 0)
+_SYS_NAME = (1, 3, 6, 1, 2, 1, 1, 5, 0)
+
+# Códigos "normales" de los campos de estado
+_STATUS_CODES = {
+    'power_source': 1, 'connected': 1, 'battery_status': 2, 'output_source': 3,
+    'power_supply_mode': 1, 'rectifier_status': 2, 'battery_test': 1, 'battery_test_result': 1,
+}
+
+# (fragmento de la clave, valor físico nominal, varía en el tiempo)
+_NOMINALS = (
+    ('num_lines', None, False), ('phases', None, False),
+    ('line_bads', 0, False), ('cycles', 0, False), ('leak', 0, False), ('seconds', 0, False),
+    ('freq', 60.0, True), ('power_factor', 0.95, True), ('_pf', 0.95, True),
+    ('current', 12.5, True), ('charge', 100.0, False), ('capacity', 100.0, False),
+    ('load', 42.0, True), ('percent', 42.0, True),
+    ('runtime', 35.0, True), ('minutes', 35.0, True), ('remain', 35.0, True),
+    ('temp', 26.0, True), ('humidity', 45.0, True),
+    ('battery_voltage', 240.0, True), ('batt_voltage', 240.0, True), ('dc_bus', 380.0, True),
+    ('voltage', 220.0, True), ('power', 8.0, True), ('apparent', 8.4, True), ('active', 8.0, True),
+)
+
+_TEXT_FIELDS = ('model', 'manufacturer', 'serial', 'version')
+
+
+def _oid(text):
+    return tuple(int(part) for part in text.strip('.').split('.'))
+
+
+def _nominal(key, phases):
+    """(valor físico, varía) para una clave de perfil o de registro."""
+    for fragment, value, varies in _NOMINALS:
+        if fragment in key:
+            return (phases if value is None else value), varies
+    return 1, False
+
+
+class Faults:
+    """Latencia, pérdida y modo de falla de un equipo simulado."""
+
+    def __init__(self, latency=0.0, jitter=0.0, loss=0.0, mode=None, flap_period=10.0,
+                 max_varbinds=8, rng=None):
+        if mode is not None and mode not in FAILURE_MODES:
+            raise ValueError(f'Modo de falla desconocido: {mode}')
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.mode = mode
+        self.flap_period = flap_period
+        self.max_varbinds = max_varbinds
+        self.rng = rng or random.Random()
+
+    def down(self, now=None):
+        if self.mode == 'down':
+            return True
+        if self.mode == 'flap':
+            return int((now or time.monotonic()) / self.flap_period) % 2 == 1
+        return False
+
+    def dropped(self):
+        return self.loss > 0 and self.rng.random() < self.loss
+
+    def delay(self):
+        return self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+
+
+class SimulatedUPS:
+    """Un equipo de la flota: tabla de valores, fallas y contadores."""
+
+    def __init__(self, index, protocol, port, kind=None, phases=3, faults=None, host='127.0.0.1',
+                 seed=None):
+        self.index = index
+        self.protocol = protocol
+        self.kind = kind
+        self.port = port
+        self.host = host
+        self.phases = phases
+        self.faults = faults or Faults()
+        self.rng = random.Random(seed)
+        self.name = f"{SIM_PREFIX}{'SNMP' if protocol == 'snmp' else 'MB'}-{index:04d}"
+        self.requests = 0
+        self.responses = 0
+        self._base = {}      # clave (OID o registro) -> (valor base, varía)
+        self._values = {}
+        self._tick = None
+        if protocol == 'snmp':
+            self._build_snmp()
+        else:
+            self._build_modbus()
+        self._keys = sorted(self._base)
+
+    def _set(self, key, value, varies=False):
+        self._base[key] = (value, varies)
+
+    def _scaled(self, key, scale, decoder_map):
+        if decoder_map:
+            code = _STATUS_CODES.get(key.split('_', 1)[-1], _STATUS_CODES.get(key))
+            return (code if code in decoder_map else min(decoder_map)), False
+        if any(field in key for field in _TEXT_FIELDS):
+            return f'{self.name} {self.kind}', False
+        value, varies = _nominal(key, self.phases)
+        return round(value / (scale or 1)), varies
+
+    def _build_snmp(self):
+        spec = SNMP_KINDS[self.kind]
+        for profile in spec['profiles']:
+            for key, oid, scale, decoder_map in zip(profile.keys, profile.oids, profile.scales,
+                                                    profile.decoders):
+                self._set(_oid(oid), *self._scaled(key, scale, decoder_map))
+        if spec['ups_type'] in ('ups_mib_standard', 'hybrid'):
+            scales = dict(zip(UPS_MIB_PROFILE.keys, UPS_MIB_PROFILE.scales))
+            for key, column in dict(UPS_MIB_INPUT_COLUMNS, **UPS_MIB_OUTPUT_COLUMNS).items():
+                for row in range(2, self.phases + 1):
+                    self._set(_oid(f'{column}.{row}'), *self._scaled(key, scales.get(key), None))
+        self._set(_SYS_DESCR, f'UPS simulado {self.kind} ({self.name})')
+        self._set(_SYS_NAME, self.name)
+        self._set(_SYS_UPTIME, 0)
+
+    def _build_modbus(self):
+        for key, info in REGISTER_MAP.items():
+            self._set(UPS_BLOCK_START + info['pos'], *self._register(key, info['coef']))
+        for key, info in STATUS_MAP.items():
+            self._set(STATUS_BLOCK_START + info['pos'], *self._scaled(key, None, info['values']))
+        if self.phases == 1:
+            self._set(STATUS_BLOCK_START + STATUS_MAP['phase_config']['pos'], 2)  # 1/1
+        for key, info in THS_MAP.items():
+            self._set(THS_BLOCK_START + info['pos'], *self._register(key, info['coef']))
+        for key, info in WATER_MAP.items():
+            self._set(WATER_BLOCK_START + info['pos'], 0)
+        for mod_num in range(1, MAX_MODULES + 1):
+            for key, info in MODULE_PARAMS.items():
+                self._set(module_base(mod_num) + info['rel'], *self._register(key, info['coef']))
+
+    def _register(self, key, coef):
+        value, varies = _nominal(key, self.phases)
+        if self.phases == 1 and key[-2:] in ('_b', '_c'):
+            value, varies = 0, False
+        return round(value / coef), varies
+
+    def values(self, now=None):
+        """Valores actuales (cambian cada ``TICK`` segundos alrededor del nominal)."""
+        now = now or time.monotonic()
+        tick = int(now / TICK)
+        if tick != self._tick:
+            self._tick = tick
+            self._values = {
+                key: round(value * (1 + self.rng.uniform(-0.01, 0.01))) if varies else value
+                for key, (value, varies) in self._base.items()
+            }
+            if _SYS_UPTIME in self._values:
+                self._values[_SYS_UPTIME] = int(now * 100)
+        return self._values
+
+    def next_key(self, key):
+        index = bisect.bisect_right(self._keys, key)
+        return self._keys[index] if index < len(self._keys) else None
+
+    def row(self):
+        """Fila de monitoreo_config que apunta a este equipo."""
+        row = {'ip': self.host, 'port': self.port, 'slave_id': 1, 'nombre': self.name,
+               'protocolo': self.protocol}
+        if self.protocol == 'snmp':
+            spec = SNMP_KINDS[self.kind]
+            row.update(snmp_community='public', snmp_port=self.port,
+                       snmp_version=spec['snmp_version'], ups_type=spec['ups_type'])
+        return row
+
+
+class SnmpAgent(asyncio.DatagramProtocol):
+    """Agente SNMP v1/v2c de un equipo simulado (GET, GETNEXT y GETBULK)."""
+
+    def __init__(self, device):
+        self.device = device
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        device, faults = self.device, self.device.faults
+        device.requests += 1
+        if faults.down() or faults.dropped():
+            return
+        try:
+            response = self._respond(data)
+        except Exception as e:
+            logger.debug(f"{device.name}: petición SNMP inválida: {e}")
+            return
+        if response is None:
+            return
+        device.responses += 1
+        delay = faults.delay()
+        if delay:
+            asyncio.get_running_loop().call_later(delay, self.transport.sendto, response, addr)
+        else:
+            self.transport.sendto(response, addr)
+
+    def _respond(self, data):
+        device, faults = self.device, self.device.faults
+        version = int(api.decodeMessageVersion(data))
+        p_mod = api.PROTOCOL_MODULES[version]
+        req_msg, _ = decoder.decode(data, asn1Spec=p_mod.Message())
+        if str(p_mod.apiMessage.get_community(req_msg)) != 'public':
+            return None
+        req_pdu = p_mod.apiMessage.get_pdu(req_msg)
+        rsp_msg = p_mod.apiMessage.get_response(req_msg)
+        rsp_pdu = p_mod.apiMessage.get_pdu(rsp_msg)
+        oids = [tuple(oid) for oid, _ in p_mod.apiPDU.get_varbinds(req_pdu)]
+        values = device.values()
+
+        def encode(value):
+            return p_mod.OctetString(value) if isinstance(value, str) else p_mod.Integer(value)
+
+        def fail(status, index=0):
+            p_mod.apiPDU.set_error_status(rsp_pdu, status)
+            p_mod.apiPDU.set_error_index(rsp_pdu, index)
+            p_mod.apiPDU.set_varbinds(rsp_pdu, [(oid, p_mod.Null()) for oid in oids])
+            return encoder.encode(rsp_msg)
+
+        if faults.mode == 'error':
+            return fail('genErr', 1)
+        if faults.mode == 'reject_multi' and len(oids) > 1:
+            return fail('genErr', 1)
+
+        bulk = getattr(p_mod, 'GetBulkRequestPDU', None)
+        if bulk is not None and req_pdu.isSameTypeWith(bulk()):
+            repetitions = min(p_mod.apiBulkPDU.get_max_repetitions(req_pdu), 64)
+            var_binds, current = [], oids
+            for _ in range(repetitions):
+                following = [device.next_key(oid) for oid in current]
+                var_binds.extend((oid, encode(values[oid])) if oid else (previous, rfc1905.endOfMibView)
+                                 for oid, previous in zip(following, current))
+                if None in following:
+                    break
+                current = following
+        elif req_pdu.isSameTypeWith(p_mod.GetNextRequestPDU()):
+            var_binds = []
+            for index, oid in enumerate(oids, 1):
+                following = device.next_key(oid)
+                if following is not None:
+                    var_binds.append((following, encode(values[following])))
+                elif version == 1:
+                    var_binds.append((oid, rfc1905.endOfMibView))
+                else:
+                    return fail('noSuchName', index)
+        else:
+            if faults.mode == 'too_big' and len(oids) > faults.max_varbinds:
+                return fail('tooBig')
+            var_binds = []
+            for index, oid in enumerate(oids, 1):
+                if oid in values:
+                    var_binds.append((oid, encode(values[oid])))
+                elif version == 1:
+                    return fail('noSuchName', index)
+                else:
+                    var_binds.append((oid, rfc1905.noSuchObject))
+        p_mod.apiPDU.set_varbinds(rsp_pdu, var_binds)
+        return encoder.encode(rsp_msg)
+
+
+class ModbusSlave(asyncio.Protocol):
+    """Esclavo Modbus TCP de un equipo simulado (función 0x03, read holding registers)."""
+
+    def __init__(self, device):
+        self.device = device
+        self.transport = None
+        self._buffer = b''
+
+    def connection_made(self, transport):
+        self.transport = transport
+        if self.device.faults.down():
+            transport.abort()
+
+    def data_received(self, data):
+        self._buffer += data
+        while len(self._buffer) >= 7:
+            length = struct.unpack('>H', self._buffer[4:6])[0]
+            if len(self._buffer) < 6 + length:
+                return
+            frame, self._buffer = self._buffer[:6 + length], self._buffer[6 + length:]
+            self._handle(frame)
+
+    def _handle(self, frame):
+        device, faults = self.device, self.device.faults
+        device.requests += 1
+        if faults.down():
+            self.transport.abort()
+            return
+        if faults.dropped():
+            return
+        transaction, _, _, unit = struct.unpack('>HHHB', frame[:7])
+        pdu = frame[7:]
+        function = pdu[0]
+        if faults.mode == 'error':
+            body = bytes((function | 0x80, 0x04))
+        elif function != 0x03 or len(pdu) < 5:
+            body = bytes((function | 0x80, 0x01))
+        else:
+            start, count = struct.unpack('>HH', pdu[1:5])
+            if not 1 <= count <= 125:
+                body = bytes((function | 0x80, 0x03))
+            else:
+                values = device.values()
+                registers = [values.get(address, 0) & 0xFFFF for address in range(start, start + count)]
+                body = struct.pack(f'>BB{count}H', function, count * 2, *registers)
+        response = struct.pack('>HHHB', transaction, 0, len(body) + 1, unit) + body
+        device.responses += 1
+        delay = faults.delay()
+        if delay:
+            asyncio.get_running_loop().call_later(delay, self._write, response)
+        else:
+            self.transport.write(response)
+
+    def _write(self, response):
+        if not self.transport.is_closing():
+            self.transport.write(response)
+
+
+class Fleet:
+    """Conjunto de equipos simulados servidos desde el loop actual."""
+
+    def __init__(self, snmp=0, modbus=0, kinds=None, host='127.0.0.1', snmp_base_port=SNMP_BASE_PORT,
+                 modbus_base_port=MODBUS_BASE_PORT, phases=3, latency=0.0, jitter=0.0, loss=0.0,
+                 failure_rate=0.0, failure_mode='down', flap_period=10.0, seed=0):
+        kinds = list(kinds or SNMP_KINDS)
+        for kind in kinds:
+            if kind not in SNMP_KINDS:
+                raise ValueError(f'Tipo de agente SNMP desconocido: {kind}')
+        rng = random.Random(seed)
+        total = snmp + modbus
+        failing = set(rng.sample(range(total), round(total * failure_rate))) if failure_rate else set()
+
+        self.devices = []
+        for i in range(total):
+            is_snmp = i < snmp
+            faults = Faults(latency=latency, jitter=jitter, loss=loss,
+                            mode=failure_mode if i in failing else None,
+                            flap_period=flap_period, rng=random.Random(rng.random()))
+            self.devices.append(SimulatedUPS(
+                i + 1 if is_snmp else i - snmp + 1,
+                'snmp' if is_snmp else 'modbus',
+                snmp_base_port + i if is_snmp else modbus_base_port + i - snmp,
+                kind=kinds[i % len(kinds)] if is_snmp else 'invt',
+                phases=phases, faults=faults, host=host, seed=rng.random(),
+            ))
+        self._endpoints = []
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        for device in self.devices:
+            if device.protocol == 'snmp':
+                transport, _ = await loop.create_datagram_endpoint(
+                    lambda device=device: SnmpAgent(device), local_addr=(device.host, device.port))
+                self._endpoints.append(transport)
+            else:
+                server = await loop.create_server(
+                    lambda device=device: ModbusSlave(device), device.host, device.port)
+                self._endpoints.append(server)
+        logger.info(f"Flota simulada: {len(self.devices)} equipos en {self.devices[0].host if self.devices else '-'}")
+        return self
+
+    async def stop(self):
+        for endpoint in self._endpoints:
+            endpoint.close()
+        self._endpoints = []
+
+    def rows(self):
+        return [device.row() for device in self.devices]
+
+    def stats(self):
+        return {
+            'devices': len(self.devices),
+            'requests': sum(device.requests for device in self.devices),
+            'responses': sum(device.responses for device in self.devices),
+            'failing': sum(1 for device in self.devices if device.faults.mode),
+        }
+
+
+def register(rows, db=None):
+    """Carga las filas de la flota en monitoreo_config (reemplaza las SIM- existentes)."""
+    from app.base_datos import GestorDB
+    db = db or GestorDB()
+    db.eliminar_monitoreo_por_prefijo(SIM_PREFIX)
+    return db.guardar_monitoreo_ups(rows)
+
+
+def unregister(db=None):
+    from app.base_datos import GestorDB
+    return (db or GestorDB()).eliminar_monitoreo_por_prefijo(SIM_PREFIX)
+
+
+async def _serve(args):
+    fleet = Fleet(snmp=args.snmp, modbus=args.modbus, kinds=args.kinds.split(','), host=args.host,
+                  snmp_base_port=args.snmp_port, modbus_base_port=args.modbus_port, phases=args.phases,
+                  latency=args.latency, jitter=args.jitter, loss=args.loss,
+                  failure_rate=args.failure_rate, failure_mode=args.failure_mode,
+                  flap_period=args.flap_period, seed=args.seed)
+    await fleet.start()
+    if args.register:
+        logger.info(f"{register(fleet.rows())} equipos simulados registrados en monitoreo_config")
+    # Una línea JSON al quedar lista (la leen los benchmarks que lanzan el simulador)
+    print(json.dumps({'ready': True, **fleet.stats(), 'rows': fleet.rows() if args.rows else None}),
+          flush=True)
+    try:
+        while True:
+            await asyncio.sleep(args.stats_every or 3600)
+            if args.stats_every:
+                logger.info(f"Simulador: {fleet.stats()}")
+    finally:
+        await fleet.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Flota local de UPS simulados (SNMP y Modbus TCP)')
+    parser.add_argument('--snmp', type=int, default=0, help='Agentes SNMP')
+    parser.add_argument('--modbus', type=int, default=0, help='Esclavos Modbus TCP')
+    parser.add_argument('--kinds', default=','.join(SNMP_KINDS),
+                        help=f"Tipos de agente SNMP, en rotación ({', '.join(SNMP_KINDS)})")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--snmp-port', type=int, default=SNMP_BASE_PORT, help='Primer puerto SNMP')
+    parser.add_argument('--modbus-port', type=int, default=MODBUS_BASE_PORT, help='Primer puerto Modbus')
+    parser.add_argument('--phases', type=int, default=3, choices=(1, 3))
+    parser.add_argument('--latency', type=float, default=0.0, help='Latencia de respuesta (s)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Latencia extra aleatoria máxima (s)')
+    parser.add_argument('--loss', type=float, default=0.0, help='Fracción de peticiones descartadas')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Fracción de equipos con falla')
+    parser.add_argument('--failure-mode', default='down', choices=FAILURE_MODES)
+    parser.add_argument('--flap-period', type=float, default=10.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--register', action='store_true', help='Cargar la flota en monitoreo_config')
+    parser.add_argument('--unregister', action='store_true', help='Quitar los equipos SIM- y salir')
+    parser.add_argument('--rows', action='store_true', help='Incluir las filas en la línea de inicio')
+    parser.add_argument('--stats-every', type=float, default=0, help='Loguear contadores cada N s')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    if args.unregister:
+        logger.info(f"{unregister()} equipos simulados eliminados de monitoreo_config")
+        return
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
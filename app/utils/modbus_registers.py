@@ -0,0 +1,146 @@
+"""
+Mapa de registros Modbus TCP para UPS INVT.
+
+Direccionamiento: Dirección Final = Offset del Equipo + ID del Registro
+  - Gabinete:  Offset 0,    IDs 0-99
+  - UPS:       Offset 100,  IDs 0-3071
+  - THS:       Offset 3271, IDs 0-39
+  - Water:     Offset 3311, IDs 0-9
+
+Coeficientes: 0.1 para voltajes/corrientes/temp, 0.01 para frecuencia/PF
+"""
+
+# =============================================================================
+# MAPA DE REGISTROS INVT (Offset UPS = 100)
+# =============================================================================
+
+# Lectura en bloque: registros 100..155 (56 registros)
+UPS_BLOCK_START = 100
+UPS_BLOCK_COUNT = 56
+
+# IDs relativos al offset 100 (posición en el bloque leído)
+REGISTER_MAP = {
+    # Bypass (IDs 0-6)
+    'bypass_voltage_a':    {'pos': 0,  'coef': 0.1, 'unit': 'V'},
+    'bypass_voltage_b':    {'pos': 1,  'coef': 0.1, 'unit': 'V'},
+    'bypass_voltage_c':    {'pos': 2,  'coef': 0.1, 'unit': 'V'},
+    'bypass_current_a':    {'pos': 3,  'coef': 0.1, 'unit': 'A'},
+    'bypass_frequency':    {'pos': 6,  'coef': 0.01, 'unit': 'Hz'},
+
+    # Input (IDs 12-23)
+    'input_voltage_a':     {'pos': 12, 'coef': 0.1, 'unit': 'V'},
+    'input_voltage_b':     {'pos': 13, 'coef': 0.1, 'unit': 'V'},
+    'input_voltage_c':     {'pos': 14, 'coef': 0.1, 'unit': 'V'},
+    'input_current_a':     {'pos': 15, 'coef': 0.1, 'unit': 'A'},
+    'input_current_b':     {'pos': 16, 'coef': 0.1, 'unit': 'A'},
+    'input_current_c':     {'pos': 17, 'coef': 0.1, 'unit': 'A'},
+    'input_frequency_a':   {'pos': 18, 'coef': 0.01, 'unit': 'Hz'},
+    'input_frequency_b':   {'pos': 19, 'coef': 0.01, 'unit': 'Hz'},
+    'input_frequency_c':   {'pos': 20, 'coef': 0.01, 'unit': 'Hz'},
+    'input_pf_a':          {'pos': 21, 'coef': 0.01, 'unit': ''},
+    'input_pf_b':          {'pos': 22, 'coef': 0.01, 'unit': ''},
+    'input_pf_c':          {'pos': 23, 'coef': 0.01, 'unit': ''},
+
+    # Output (IDs 24-47)
+    'output_voltage_a':    {'pos': 24, 'coef': 0.1, 'unit': 'V'},
+    'output_voltage_b':    {'pos': 25, 'coef': 0.1, 'unit': 'V'},
+    'output_voltage_c':    {'pos': 26, 'coef': 0.1, 'unit': 'V'},
+    'output_current_a':    {'pos': 27, 'coef': 0.1, 'unit': 'A'},
+    'output_current_b':    {'pos': 28, 'coef': 0.1, 'unit': 'A'},
+    'output_current_c':    {'pos': 29, 'coef': 0.1, 'unit': 'A'},
+    'output_frequency_a':  {'pos': 30, 'coef': 0.01, 'unit': 'Hz'},
+    'output_pf_a':         {'pos': 33, 'coef': 0.01, 'unit': ''},
+    'output_apparent_a':   {'pos': 36, 'coef': 0.1, 'unit': 'kVA'},
+    'output_active_a':     {'pos': 39, 'coef': 0.1, 'unit': 'kW'},
+    'load_pct_a':          {'pos': 45, 'coef': 0.1, 'unit': '%'},
+    'load_pct_b':          {'pos': 46, 'coef': 0.1, 'unit': '%'},
+    'load_pct_c':          {'pos': 47, 'coef': 0.1, 'unit': '%'},
+
+    # Battery (IDs 49-55)
+    'battery_temp':        {'pos': 49, 'coef': 0.1, 'unit': '°C'},
+    'battery_voltage_pos': {'pos': 50, 'coef': 0.1, 'unit': 'V'},
+    'battery_voltage_neg': {'pos': 51, 'coef': 0.1, 'unit': 'V'},
+    'battery_current_pos': {'pos': 52, 'coef': 0.1, 'unit': 'A'},
+    'battery_current_neg': {'pos': 53, 'coef': 0.1, 'unit': 'A'},
+    'battery_remain_time': {'pos': 54, 'coef': 0.1, 'unit': 'min'},
+    'battery_capacity':    {'pos': 55, 'coef': 0.1, 'unit': '%'},
+}
+
+# Bloque de estado: registros 171..195 (25 registros)
+STATUS_BLOCK_START = 171
+STATUS_BLOCK_COUNT = 25
+
+STATUS_MAP = {
+    'power_supply_mode':    {'pos': 0,  'values': {0: 'Sin carga', 1: 'En UPS', 2: 'En Bypass'}},
+    'battery_status':       {'pos': 1,  'values': {0: 'No conectada', 1: 'Falla', 2: 'Flotacion', 3: 'Carga rapida', 4: 'Descargando'}},
+    'maint_breaker':        {'pos': 2,  'values': {0: 'Abierto', 1: 'Cerrado'}},
+    'battery_test':         {'pos': 3,  'values': {0: 'Sin test', 1: 'OK', 2: 'Fallido', 3: 'En progreso'}},
+    'rectifier_status':     {'pos': 5,  'values': {0: 'Cerrado', 1: 'Arranque suave', 2: 'Normal'}},
+    'phase_config':         {'pos': 20, 'values': {0: '3/3', 1: '3/1', 2: '1/1'}},
+    'battery_type':         {'pos': 24, 'values': {0: 'VRLA', 1: 'Litio', 2: 'NiCd'}},
+}
+
+# Sensores ambientales
+THS_BLOCK_START = 3271
+THS_BLOCK_COUNT = 2
+
+WATER_BLOCK_START = 3311
+WATER_BLOCK_COUNT = 1
+
+# Modulos: Dirección = 100 + 111 + (N-1)*96 + ID_Relativo
+MODULE_BASE = 211  # 100 + 111
+MODULE_STRIDE = 96
+MODULE_PARAMS = {
+    'mod_input_voltage_a':  {'rel': 0,  'coef': 0.1, 'unit': 'V'},
+    'mod_input_current_a':  {'rel': 3,  'coef': 0.1, 'unit': 'A'},
+    'mod_dc_bus_voltage':   {'rel': 12, 'coef': 0.1, 'unit': 'V'},
+    'mod_battery_voltage':  {'rel': 14, 'coef': 0.1, 'unit': 'V'},
+    'mod_discharge_current':{'rel': 20, 'coef': 0.1, 'unit': 'A'},
+    'mod_output_voltage_a': {'rel': 34, 'coef': 0.1, 'unit': 'V'},
+    'mod_inlet_temp':       {'rel': 84, 'coef': 0.1, 'unit': '°C'},
+    'mod_outlet_temp':      {'rel': 85, 'coef': 0.1, 'unit': '°C'},
+    'mod_scr_temp':         {'rel': 95, 'coef': 0.1, 'unit': '°C'},
+}
+
+MAX_MODULES = 4
+
+THS_MAP = {
+    'env_temperature':     {'pos': 0, 'coef': 0.1, 'unit': '°C'},
+    'env_humidity':        {'pos': 1, 'coef': 0.1, 'unit': '%'},
+}
+
+WATER_MAP = {
+    'water_leak_location': {'pos': 0, 'coef': 1, 'unit': ''},
+}
+
+
+# =============================================================================
+# GRUPOS DE POLLING
+# =============================================================================
+# Cada grupo se consulta con su propia cadencia; el planificador de lecturas
+# agrupa las direcciones de los grupos que tocan en cada ciclo.
+GROUP_ELECTRICAL = 'electrical'
+GROUP_STATUS = 'status'
+GROUP_ENVIRONMENT = 'environment'
+GROUP_MODULES = 'modules'
+
+
+def module_base(mod_num):
+    """Dirección del registro relativo 0 del módulo N (1-based)."""
+    return MODULE_BASE + (mod_num - 1) * MODULE_STRIDE
+
+
+def group_addresses(group):
+    """Direcciones absolutas que necesita un grupo de polling."""
+    if group == GROUP_ELECTRICAL:
+        return [UPS_BLOCK_START + info['pos'] for info in REGISTER_MAP.values()]
+    if group == GROUP_STATUS:
+        return [STATUS_BLOCK_START + info['pos'] for info in STATUS_MAP.values()]
+    if group == GROUP_ENVIRONMENT:
+        return ([THS_BLOCK_START + info['pos'] for info in THS_MAP.values()] +
+                [WATER_BLOCK_START + info['pos'] for info in WATER_MAP.values()])
+    if group == GROUP_MODULES:
+        return [module_base(n) + info['rel']
+                for n in range(1, MAX_MODULES + 1)
+                for info in MODULE_PARAMS.values()]
+    raise ValueError(f"Grupo de registros desconocido: {group}")
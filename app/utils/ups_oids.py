@@ -8,10 +8,19 @@ factores de escala y diccionarios de decodificación.
 MIB Version: 1.00 (Enero 2021)
 OID Base: .1.3.6.1.4.1.56788.1.1.1
 
+También define los perfiles precompilados que usan los clientes SNMP
+(INVT enterprise, Megatec mínimo, UPS-MIB e híbrido): OIDs ya resueltos y
+arreglos paralelos de clave/escala/decodificador, armados una vez al importar.
+
 Autor: Sistema de Monitoreo UPS
 Fecha: 2026-01-26
 """
 
+from pyasn1.type import univ
+from pysnmp.hlapi.v3arch.asyncio import ObjectIdentity, ObjectType
+from pysnmp.proto.rfc1905 import EndOfMibView, NoSuchInstance, NoSuchObject
+from pysnmp.smi import builder, view
+
 # OID Base del fabricante INC
 ENTERPRISE_OID = '.1.3.6.1.4.1.56788'
 UPS_BASE_OID = '.1.3.6.1.4.1.56788.1.1.1'
@@ -287,3 +296,291 @@ def get_all_oids_flat() -> list:
     for group in UPS_OIDS.values():
         all_oids.extend(group.values())
     return all_oids
+
+
+# ============================================================================
+# OIDs DE OTROS PERFILES (Megatec / UPS-MIB RFC 1628)
+# ============================================================================
+
+# OIDs Megatec / Voltronic (Enterprise .935) detectados en escaneo
+MEGATEC_OIDS = {
+    'megatec_model': '1.3.6.1.4.1.935.1.1.1.1.1.1.0',
+    'megatec_version': '1.3.6.1.4.1.935.1.1.1.1.2.1.0',
+    'megatec_batt_capacity': '1.3.6.1.4.1.935.1.1.1.2.2.1.0',  # 90 -> 90%
+    'megatec_batt_voltage': '1.3.6.1.4.1.935.1.1.1.2.2.2.0',   # 1060 -> 106.0V
+    'megatec_input_voltage': '1.3.6.1.4.1.935.1.1.1.3.2.1.0',  # 1232 -> 123.2V
+    'megatec_input_freq': '1.3.6.1.4.1.935.1.1.1.3.2.4.0',     # 600 -> 60.0Hz
+    'megatec_output_voltage': '1.3.6.1.4.1.935.1.1.1.4.2.1.0', # 1201 -> 120.1V
+    'megatec_output_load': '1.3.6.1.4.1.935.1.1.1.4.2.3.0',    # 0 -> 0%
+}
+
+MEGATEC_SCALE_FACTORS = {
+    'megatec_batt_voltage': 0.1,
+    'megatec_input_voltage': 0.1,
+    'megatec_input_freq': 0.1,
+    'megatec_output_voltage': 0.1,
+}
+
+# OIDs UPS-MIB RFC 1628 (solo los que detectamos que funcionan)
+UPS_MIB_OIDS = {
+    # Identificación
+    'ident_manufacturer': '1.3.6.1.2.1.33.1.1.1.0',
+    'ident_model': '1.3.6.1.2.1.33.1.1.2.0',
+    'ident_sw_version': '1.3.6.1.2.1.33.1.1.3.0',
+    'ident_agent_version': '1.3.6.1.2.1.33.1.1.4.0',
+
+    # Batería
+    'battery_status': '1.3.6.1.2.1.33.1.2.1.0',
+    'battery_seconds_on_battery': '1.3.6.1.2.1.33.1.2.2.0',
+    'battery_minutes_remaining': '1.3.6.1.2.1.33.1.2.3.0',
+    'battery_charge_remaining': '1.3.6.1.2.1.33.1.2.4.0',
+    'battery_voltage': '1.3.6.1.2.1.33.1.2.5.0',
+    'battery_current': '1.3.6.1.2.1.33.1.2.6.0',
+    'battery_temperature': '1.3.6.1.2.1.33.1.2.7.0',
+
+    # Entrada
+    'input_line_bads': '1.3.6.1.2.1.33.1.3.1.0',
+    'input_num_lines': '1.3.6.1.2.1.33.1.3.2.0',
+    'input_frequency': '1.3.6.1.2.1.33.1.3.3.1.2.1',
+    'input_voltage': '1.3.6.1.2.1.33.1.3.3.1.3.1',
+    'input_current': '1.3.6.1.2.1.33.1.3.3.1.4.1',
+    'input_true_power': '1.3.6.1.2.1.33.1.3.3.1.5.1',
+
+    # Salida
+    'output_source': '1.3.6.1.2.1.33.1.4.1.0',
+    'output_frequency': '1.3.6.1.2.1.33.1.4.2.0',
+    'output_num_lines': '1.3.6.1.2.1.33.1.4.3.0',
+    'output_voltage': '1.3.6.1.2.1.33.1.4.4.1.2.1',
+    'output_current': '1.3.6.1.2.1.33.1.4.4.1.3.1',
+    'output_power': '1.3.6.1.2.1.33.1.4.4.1.4.1',
+    'output_percent_load': '1.3.6.1.2.1.33.1.4.4.1.5.1',
+}
+
+# Columnas de las tablas de líneas (upsInputTable / upsOutputTable); la
+# fila 1 va en el GET del perfil, las demás se leen con GETBULK en v2c
+UPS_MIB_INPUT_COLUMNS = {
+    'input_frequency': '1.3.6.1.2.1.33.1.3.3.1.2',
+    'input_voltage': '1.3.6.1.2.1.33.1.3.3.1.3',
+    'input_current': '1.3.6.1.2.1.33.1.3.3.1.4',
+    'input_true_power': '1.3.6.1.2.1.33.1.3.3.1.5',
+}
+
+UPS_MIB_OUTPUT_COLUMNS = {
+    'output_voltage': '1.3.6.1.2.1.33.1.4.4.1.2',
+    'output_current': '1.3.6.1.2.1.33.1.4.4.1.3',
+    'output_power': '1.3.6.1.2.1.33.1.4.4.1.4',
+    'output_percent_load': '1.3.6.1.2.1.33.1.4.4.1.5',
+}
+
+UPS_MIB_SCALE_FACTORS = {
+    'battery_voltage': 0.1,    # Décimas de volt
+    'battery_current': 0.1,    # Décimas de amp
+    'input_frequency': 0.1,    # Décimas de Hz
+    'input_current': 0.1,
+    'output_frequency': 0.1,
+    'output_current': 0.1,
+}
+
+# OIDs INVT complementarios que lee el perfil híbrido (si existen)
+HYBRID_INVT_OIDS = {
+    'invt_model': '1.3.6.1.4.1.56788.1.1.1.0',
+    'invt_serial': '1.3.6.1.4.1.56788.1.1.2.0',
+    'invt_input_voltage': '1.3.6.1.4.1.56788.1.3.1.2.1',
+    'invt_output_voltage': '1.3.6.1.4.1.56788.1.4.1.2.1',
+    'invt_battery_voltage': '1.3.6.1.4.1.56788.1.6.1.0',
+}
+
+# Decodificadores UPS-MIB
+UPS_MIB_BATTERY_STATUS = {
+    1: 'Unknown',
+    2: 'Normal',
+    3: 'Low',
+    4: 'Depleted',
+}
+
+UPS_MIB_OUTPUT_SOURCE = {
+    1: 'Other',
+    2: 'None',
+    3: 'Normal',
+    4: 'Bypass',
+    5: 'Battery',
+    6: 'Booster',
+    7: 'Reducer',
+}
+
+UPS_MIB_DECODERS = {
+    'battery_status': UPS_MIB_BATTERY_STATUS,
+    'output_source': UPS_MIB_OUTPUT_SOURCE,
+}
+
+# ============================================================================
+# PERFILES PRECOMPILADOS
+# ============================================================================
+
+# Vista MIB solo para resolver los OIDs numéricos al importar; pysnmp no
+# vuelve a resolver un ObjectType ya resuelto, así cada GET reutiliza estos
+# objetos sin construir ni resolver nada.
+_MIB_VIEW = view.MibViewController(builder.MibBuilder())
+
+# Valores que indican que el OID no existe en el equipo
+_MISSING_VALUES = (NoSuchObject, NoSuchInstance, EndOfMibView)
+
+
+def _resolved(oid):
+    object_type = ObjectType(ObjectIdentity(tuple(int(part) for part in oid.strip('.').split('.'))))
+    return object_type.resolve_with_mib(_MIB_VIEW, ignoreErrors=False)
+
+
+def _decode_value(value, scale, decoder):
+    """
+    Valor SNMP ya escalado (número), decodificado (texto del enum) o como
+    texto. None si el OID no respondió o no existe.
+    """
+    if value is None or isinstance(value, _MISSING_VALUES):
+        return None
+    if isinstance(value, univ.Integer):  # Integer32, Gauge32, Counter32, TimeTicks
+        number = int(value)
+    else:
+        text = value.prettyPrint()
+        if scale is None and decoder is None:
+            return text
+        try:
+            number = float(text)  # Algunos agentes informan números como OctetString
+        except ValueError:
+            return text
+    if decoder is not None:
+        return decoder.get(int(number), value.prettyPrint())
+    if scale:
+        return round(number * scale, 2)
+    return number
+
+
+class OidProfile:
+    """
+    Tabla de consulta precompilada de un tipo de cliente.
+
+    ``keys``, ``oids``, ``scales``, ``decoders`` y ``objects`` son tuplas
+    paralelas en el orden en que se piden los varbinds, de modo que la
+    respuesta se mapea por posición.
+    """
+
+    __slots__ = ('name', 'keys', 'oids', 'scales', 'decoders', 'objects')
+
+    def __init__(self, name, entries):
+        """
+        Args:
+            name: Nombre del perfil
+            entries: Secuencia de (clave, oid, escala o None, decodificador o None)
+        """
+        self.name = name
+        self.keys = tuple(entry[0] for entry in entries)
+        self.oids = tuple(entry[1].lstrip('.') for entry in entries)
+        self.scales = tuple(entry[2] for entry in entries)
+        self.decoders = tuple(entry[3] for entry in entries)
+        self.objects = tuple(_resolved(oid) for oid in self.oids)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def raw_values(self, values):
+        """
+        Valores como texto alineados con ``keys`` (None si el OID no existe).
+
+        ``values`` son los valores SNMP en el orden del perfil (None si el OID
+        no respondió), tal como los devuelve ``snmp_batching.get_batched``.
+        """
+        return [None if value is None or isinstance(value, _MISSING_VALUES) else value.prettyPrint()
+                for value in values]
+
+    def raw_data(self, values):
+        """Diccionario {clave: texto} con los OIDs que respondieron."""
+        return {key: value for key, value in zip(self.keys, self.raw_values(values))
+                if value is not None}
+
+    def decode(self, values):
+        """
+        Diccionario {clave: valor} con la escala y el decodificador de cada
+        posición aplicados; omite los OIDs que no respondieron.
+        """
+        data = {}
+        for key, scale, decoder, value in zip(self.keys, self.scales, self.decoders, values):
+            decoded = _decode_value(value, scale, decoder)
+            if decoded is not None:
+                data[key] = decoded
+        return data
+
+    def decode_column(self, key, value):
+        """Valor de otra fila de la tabla de ``key`` (GETBULK), con la escala de esa clave."""
+        if key not in self.keys:
+            return _decode_value(value, None, None)
+        index = self.keys.index(key)
+        return _decode_value(value, self.scales[index], self.decoders[index])
+
+    def missing_oids(self, values):
+        """OIDs que el agente informó como inexistentes (noSuchObject/noSuchName)."""
+        return [oid for oid, value in zip(self.oids, values) if isinstance(value, _MISSING_VALUES)]
+
+    def subset(self, oids):
+        """Perfil con solo ``oids`` (en el orden original), reutilizando los varbinds resueltos."""
+        keep = set(oids)
+        indices = [i for i, oid in enumerate(self.oids) if oid in keep]
+        profile = object.__new__(OidProfile)
+        profile.name = self.name
+        for attr in ('keys', 'oids', 'scales', 'decoders', 'objects'):
+            values = getattr(self, attr)
+            setattr(profile, attr, tuple(values[i] for i in indices))
+        return profile
+
+
+def table_columns(columns, after_row):
+    """
+    Columnas de una tabla listas para GETBULK desde la fila ``after_row + 1``.
+
+    Returns:
+        Tupla de (clave, oid_columna, ObjectType resuelto de la fila ``after_row``)
+    """
+    return tuple((key, oid, _resolved(f'{oid}.{after_row}')) for key, oid in columns.items())
+
+
+def _entries(oids, scales=None, decoders=None, prefix=''):
+    scales = scales or {}
+    decoders = decoders or {}
+    return [(prefix + key, oid, scales.get(key, scales.get(oid)), decoders.get(key))
+            for key, oid in oids.items()]
+
+
+# Orden de grupos del perfil INVT enterprise (el mismo que consulta SNMPClient)
+_INVT_GROUPS = (
+    ('status', UPS_STATUS_OIDS),
+    ('input', UPS_INPUT_OIDS),
+    ('output', UPS_OUTPUT_OIDS),
+    ('load', UPS_LOAD_OIDS),
+    ('battery', UPS_BATTERY_OIDS),
+    ('bypass', UPS_BYPASS_OIDS),
+)
+
+_INVT_DECODERS = dict(DECODERS, connected=CONNECTION_STATUS)
+
+INVT_ENTERPRISE_PROFILE = OidProfile('invt_enterprise', [
+    entry
+    for group, oids in _INVT_GROUPS
+    for entry in _entries(oids, SCALE_FACTORS, _INVT_DECODERS if group == 'status' else None,
+                          prefix=f'{group}_')
+])
+
+MEGATEC_PROFILE = OidProfile('invt_minimal', _entries(MEGATEC_OIDS, MEGATEC_SCALE_FACTORS))
+
+UPS_MIB_PROFILE = OidProfile('ups_mib_standard',
+                             _entries(UPS_MIB_OIDS, UPS_MIB_SCALE_FACTORS, UPS_MIB_DECODERS))
+
+HYBRID_PROFILE = OidProfile('hybrid',
+                            _entries(UPS_MIB_OIDS, UPS_MIB_SCALE_FACTORS, UPS_MIB_DECODERS)
+                            + _entries(HYBRID_INVT_OIDS))
+
+PROFILES = {
+    profile.name: profile
+    for profile in (INVT_ENTERPRISE_PROFILE, MEGATEC_PROFILE, UPS_MIB_PROFILE, HYBRID_PROFILE)
+}
+
+# Líneas 2..N de UPS-MIB para GETBULK (la línea 1 ya está en el perfil)
+UPS_MIB_LINE_COLUMNS = table_columns(dict(UPS_MIB_INPUT_COLUMNS, **UPS_MIB_OUTPUT_COLUMNS), after_row=1)
@@ -0,0 +1,121 @@
+"""
+Microbenchmark: decodificación Modbus por campo (legado) vs tablas NumPy.
+
+Compara el bucle dict-por-campo que usaba ModbusMonitor con ``decode_plan``
+sobre el mismo ciclo completo (eléctricos, estados, ambientales y 4 módulos).
+
+Uso:
+    python benchmarks/bench_modbus_decode.py [--number 20000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.modbus_read_plan import build_read_plan, execute_plan, decode_plan
+from app.utils.modbus_registers import (
+    UPS_BLOCK_START, UPS_BLOCK_COUNT, REGISTER_MAP,
+    STATUS_BLOCK_START, STATUS_BLOCK_COUNT, STATUS_MAP,
+    THS_BLOCK_START, WATER_BLOCK_START,
+    MODULE_PARAMS, MAX_MODULES, module_base,
+    GROUP_ELECTRICAL, GROUP_STATUS, GROUP_ENVIRONMENT, GROUP_MODULES,
+)
+
+ALL_GROUPS = frozenset({GROUP_ELECTRICAL, GROUP_STATUS, GROUP_ENVIRONMENT, GROUP_MODULES})
+
+
+def _registros_sinteticos():
+    regs = {}
+    for info in REGISTER_MAP.values():
+        regs[UPS_BLOCK_START + info['pos']] = 2200 + info['pos']
+    for info in STATUS_MAP.values():
+        regs[STATUS_BLOCK_START + info['pos']] = 1
+    for mod_num in range(1, MAX_MODULES + 1):
+        for info in MODULE_PARAMS.values():
+            regs[module_base(mod_num) + info['rel']] = 1000 * mod_num + info['rel']
+    regs[THS_BLOCK_START] = 253
+    regs[THS_BLOCK_START + 1] = 481
+    return regs
+
+
+def decode_legacy(blocks):
+    """Bucle por campo tal como estaba en ModbusMonitor._process_device."""
+    regs, status_regs, ths_regs, water_regs, module_regs = blocks
+    data = {}
+    status_data = {}
+    for key, info in REGISTER_MAP.items():
+        pos = info['pos']
+        if pos < len(regs):
+            data[key] = round(regs[pos] * info['coef'], 2)
+    for key, info in STATUS_MAP.items():
+        pos = info['pos']
+        if pos < len(status_regs):
+            raw_val = status_regs[pos]
+            status_data[f'{key}_raw'] = raw_val
+            status_data[key] = info['values'].get(raw_val, f'Desconocido({raw_val})')
+    data['env_temperature'] = round(ths_regs[0] * 0.1, 1)
+    data['env_humidity'] = round(ths_regs[1] * 0.1, 1)
+    data['water_leak_location'] = water_regs[0]
+    modules_data = []
+    for mod_num, mod_regs in enumerate(module_regs, start=1):
+        if mod_regs[0] == 0:
+            break
+        mod_data = {'module_number': mod_num}
+        for key, info in MODULE_PARAMS.items():
+            mod_data[key] = round(mod_regs[info['rel']] * info['coef'], 2)
+        modules_data.append(mod_data)
+    if modules_data:
+        data['modules'] = modules_data
+    return data, status_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--number', type=int, default=20000, help='Decodificaciones por medición')
+    parser.add_argument('--repeat', type=int, default=5, help='Mediciones (se reporta la mejor)')
+    args = parser.parse_args()
+
+    regs = _registros_sinteticos()
+
+    def block(start, count):
+        return [regs.get(start + i, 0) for i in range(count)]
+
+    legacy_blocks = (
+        block(UPS_BLOCK_START, UPS_BLOCK_COUNT),
+        block(STATUS_BLOCK_START, STATUS_BLOCK_COUNT),
+        block(THS_BLOCK_START, 2),
+        block(WATER_BLOCK_START, 1),
+        [block(module_base(n), max(i['rel'] for i in MODULE_PARAMS.values()) + 1)
+         for n in range(1, MAX_MODULES + 1)],
+    )
+
+    async def read(start, count):
+        return block(start, count)
+
+    plan = build_read_plan(ALL_GROUPS)
+    responses = asyncio.run(execute_plan(plan, read))
+
+    # Ambos caminos deben producir el mismo resultado
+    legacy_data, legacy_status = decode_legacy(legacy_blocks)
+    data, status_data, _ = decode_plan(plan, responses)
+    assert data == legacy_data and status_data == legacy_status, "Los decodificadores no coinciden"
+
+    resultados = {
+        'legado (dict por campo)': min(timeit.repeat(lambda: decode_legacy(legacy_blocks),
+                                                    number=args.number, repeat=args.repeat)),
+        'numpy (decode_plan)': min(timeit.repeat(lambda: decode_plan(plan, responses),
+                                                 number=args.number, repeat=args.repeat)),
+    }
+
+    base = resultados['legado (dict por campo)']
+    print(f"{'Decodificador':<28}{'us/ciclo':>12}{'relativo':>12}")
+    for nombre, total in resultados.items():
+        print(f"{nombre:<28}{total / args.number * 1e6:>12.2f}{base / total:>11.2f}x")
+
+
+if __name__ == '__main__':
+    main()
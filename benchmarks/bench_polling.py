@@ -0,0 +1,479 @@
+"""
+Benchmark del camino caliente del monitoreo contra una flota simulada.
+
+Corre cada escenario con 10, 100 y 1000 equipos servidos por
+``app.services.ups_simulator`` en un subproceso (su CPU no se cuenta):
+
+    snmp_minimal        MinimalSNMPClient (Megatec v1) con el runtime compartido
+    snmp_invt           SNMPClient (OIDs INVT, un SnmpEngine por cliente)
+    snmp_upsmib         UPSMIBClient (UPS-MIB, líneas por GETBULK)
+    snmp_hybrid         UPSMIBClient con OIDs INVT
+    monitoring_service  MonitoringService._async_poll (sesiones, alarmas y publish)
+    modbus_monitor      ModbusMonitor con su motor y planificador adaptativo
+
+Los escenarios SNMP encadenan ciclos completos de la flota lo más rápido
+posible; ``modbus_monitor`` corre ``--duration`` segundos con las cadencias
+reales del planificador (muestras/s alcanzadas vs objetivo). Por escenario y
+tamaño se reporta muestras/s, latencia por equipo y por ciclo (p50/p99), CPU
+por muestra y RSS del proceso. Sin InfluxDB ni Postgres: se mide el polling.
+
+El resultado se guarda en JSON para comparar entre commits; con
+``--baseline`` (o ``--compare base.json nuevo.json``) el script termina con
+código 1 si alguna métrica empeora más que su tolerancia.
+
+Uso:
+    python benchmarks/bench_polling.py [--sizes 10,100,1000] [--scenarios snmp_minimal,...]
+        [--cycles 5] [--duration 10] [--output resultado.json] [--baseline base.json]
+    python benchmarks/bench_polling.py --compare base.json nuevo.json [--tolerance rss_mb=0.5]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+SNMP_BASE_PORT = 20000
+SNMP_PORT_STRIDE = 1100  # Rango de puertos propio por escenario (límites PDU y targets no se mezclan)
+MODBUS_BASE_PORT = 30000
+WARMUP_TIMEOUT = 60.0
+
+# Escenario -> (tipo de agente simulado, protocolo)
+SCENARIOS = {
+    'snmp_minimal': ('megatec', 'snmp'),
+    'snmp_invt': ('invt', 'snmp'),
+    'snmp_upsmib': ('ups_mib', 'snmp'),
+    'snmp_hybrid': ('hybrid', 'snmp'),
+    'monitoring_service': ('megatec,invt,ups_mib,hybrid', 'snmp'),
+    'modbus_monitor': (None, 'modbus'),
+}
+
+# Tolerancia relativa por métrica y sentido en que empeora
+TOLERANCES = {
+    'samples_per_s': 0.15,
+    'latency_p99_ms': 0.30,
+    'cycle_p99_ms': 0.30,
+    'cpu_ms_per_sample': 0.20,
+    'rss_mb': 0.25,
+}
+HIGHER_IS_BETTER = {'samples_per_s'}
+# Diferencias absolutas por debajo de esto son ruido
+NOISE_FLOOR = {
+    'samples_per_s': 1.0,
+    'latency_p99_ms': 2.0,
+    'cycle_p99_ms': 5.0,
+    'cpu_ms_per_sample': 0.05,
+    'rss_mb': 10.0,
+}
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _raise_fd_limit():
+    """Cada equipo Modbus es una conexión TCP: el límite por defecto (1024) no alcanza."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class SimulatedFleet:
+    """Simulador en un subproceso; ``rows`` son filas de monitoreo_config con id."""
+
+    def __init__(self, snmp=0, modbus=0, kinds=None, snmp_port=SNMP_BASE_PORT):
+        cmd = [sys.executable, '-m', 'app.services.ups_simulator', '--rows',
+               '--snmp', str(snmp), '--modbus', str(modbus),
+               '--snmp-port', str(snmp_port), '--modbus-port', str(MODBUS_BASE_PORT)]
+        if kinds:
+            cmd += ['--kinds', kinds]
+        self.proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                     text=True)
+        line = self.proc.stdout.readline()
+        if not line:
+            self.close()
+            raise RuntimeError('El simulador no arrancó')
+        self.rows = [dict(row, id=i + 1) for i, row in enumerate(json.loads(line)['rows'])]
+
+    def close(self):
+        self.proc.terminate()
+        try:
+            self.proc.wait(10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+class Meter:
+    """Muestras, errores, latencias por equipo y CPU/tiempo de un escenario."""
+
+    def __init__(self):
+        self.samples = 0
+        self.errors = 0
+        self.latencies = []
+        self.cycles = []
+        self._cpu = self._wall = None
+
+    def start(self):
+        self.samples = self.errors = 0
+        self.latencies, self.cycles = [], []
+        self._cpu, self._wall = time.process_time(), time.perf_counter()
+
+    def timed(self, poll):
+        """Envuelve una corrutina de polling por equipo registrando latencia y éxito."""
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = await poll(*args, **kwargs)
+            except Exception:
+                self.errors += 1
+                raise
+            self.latencies.append(time.perf_counter() - started)
+            return result
+        return wrapper
+
+    def result(self, scenario, devices, **extra):
+        cpu = time.process_time() - self._cpu
+        wall = time.perf_counter() - self._wall
+
+        def ms(value):
+            return round(value * 1000, 3) if value is not None else None
+        return {
+            'scenario': scenario,
+            'devices': devices,
+            'samples': self.samples,
+            'errors': self.errors,
+            'duration_s': round(wall, 3),
+            'samples_per_s': round(self.samples / wall, 2) if wall else 0.0,
+            'latency_p50_ms': ms(_percentile(self.latencies, 50)),
+            'latency_p99_ms': ms(_percentile(self.latencies, 99)),
+            'cycle_p50_ms': ms(_percentile(self.cycles, 50)),
+            'cycle_p99_ms': ms(_percentile(self.cycles, 99)),
+            'cpu_ms_per_sample': round(cpu / self.samples * 1000, 4) if self.samples else None,
+            'rss_mb': round(_rss_mb(), 1),
+            **extra,
+        }
+
+
+def _snmp_client(scenario, row, runtime):
+    from app.services.protocols.snmp_client import SNMPClient
+    from app.services.protocols.snmp_minimal_client import MinimalSNMPClient
+    from app.services.protocols.snmp_upsmib_client import UPSMIBClient
+
+    if scenario == 'snmp_minimal':
+        client = MinimalSNMPClient(port=row['snmp_port'], mp_model=row['snmp_version'], runtime=runtime)
+        return lambda: client.get_ups_data(row['ip'])
+    if scenario == 'snmp_invt':
+        client = SNMPClient(row['ip'], port=row['snmp_port'], mp_model=row['snmp_version'])
+        return client.get_ups_data
+    client = UPSMIBClient(row['ip'], port=row['snmp_port'], mp_model=row['snmp_version'],
+                          include_invt=(scenario == 'snmp_hybrid'), runtime=runtime)
+    return client.get_ups_data
+
+
+def bench_snmp_client(scenario, rows, cycles):
+    """Ciclos completos de la flota con un cliente SNMP por equipo."""
+    from app.services.snmp_runtime import snmp_runtime
+
+    meter = Meter()
+    polls = [meter.timed(_snmp_client(scenario, row, snmp_runtime)) for row in rows]
+
+    async def cycle():
+        started = time.perf_counter()
+        results = await asyncio.gather(*(poll() for poll in polls), return_exceptions=True)
+        meter.cycles.append(time.perf_counter() - started)
+        meter.samples += sum(1 for result in results if result and not isinstance(result, Exception))
+
+    snmp_runtime.run(cycle())  # Calentamiento: transportes, límites de PDU
+    meter.start()
+    for _ in range(cycles):
+        snmp_runtime.run(cycle())
+    return meter.result(scenario, len(rows))
+
+
+def bench_monitoring_service(scenario, rows, cycles):
+    """``MonitoringService._async_poll`` sobre la flota mixta, con publish contado."""
+    from app.services import event_bus, sample_sink
+    from app.services.monitoring_service import MonitoringService
+    from app.services.snmp_runtime import snmp_runtime
+
+    meter = Meter()
+    service = MonitoringService(db=FleetDB(rows))
+    service._check_device = meter.timed(service._check_device)
+
+    def sink(event, payload, namespace):
+        if event == 'ups_update' and payload.get('status') == 'online':
+            meter.samples += 1
+
+    async def cycle():
+        started = time.perf_counter()
+        await service._async_poll()
+        meter.cycles.append(time.perf_counter() - started)
+
+    event_bus.set_sink(sink)
+    sample_sink.set_sink(FormatOnlySink())
+    try:
+        snmp_runtime.run(cycle())
+        meter.start()
+        for _ in range(cycles):
+            snmp_runtime.run(cycle())
+        return meter.result(scenario, len(rows))
+    finally:
+        event_bus.set_sink(None)
+        sample_sink.set_sink(None)
+
+
+def bench_modbus_monitor(scenario, rows, duration):
+    """``ModbusMonitor`` corriendo ``duration`` segundos con su planificador."""
+    from app.services import event_bus, sample_sink
+    from app.services.modbus_monitor import ModbusMonitor
+    from app.services.modbus_pool import modbus_pool
+
+    meter = Meter()
+    monitor = ModbusMonitor(db=FleetDB(rows))
+    engine = monitor.engine
+    engine.poll_device = meter.timed(engine.poll_device)
+
+    def sink(event, payload, namespace):
+        if event == 'ups_update' and payload.get('status') == 'online':
+            meter.samples += 1
+
+    event_bus.set_sink(sink)
+    sample_sink.set_sink(FormatOnlySink())
+    monitor.start_background_task()
+    try:
+        deadline = time.monotonic() + WARMUP_TIMEOUT
+        while time.monotonic() < deadline:
+            stats = monitor.get_stats_snapshot()['cycle']
+            if len(stats) == len(rows) and all(s['cycles'] for s in stats):
+                break
+            time.sleep(0.2)
+        meter.start()
+        time.sleep(duration)
+        stats = monitor.get_stats_snapshot()['cycle']
+        meter.cycles = [s['achieved_s'] for s in stats if s['achieved_s'] is not None]
+        target = sum(1 / s['target_s'] for s in stats if s['target_s'])
+        return meter.result(scenario, len(rows), target_samples_per_s=round(target, 2))
+    finally:
+        monitor.stop()
+        event_bus.set_sink(None)
+
+        async def close_pool():
+            modbus_pool.close_all()
+        modbus_pool.run(close_pool(), timeout=10)
+        sample_sink.set_sink(None)
+
+
+class FormatOnlySink:
+    """Sink que arma la línea de InfluxDB y la descarta: el costo que paga el polling, sin red ni spool."""
+
+    name = 'format-only'
+
+    def __init__(self):
+        from app.services.sample_sink import InfluxSampleSink
+        self._influx = InfluxSampleSink()
+
+    def write(self, sample):
+        return self._influx.line(sample) is not None
+
+    def get_stats(self):
+        return {}
+
+
+class FleetDB:
+    """Reemplazo de GestorDB con las filas de la flota simulada (sin Postgres)."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def obtener_monitoreo_ups(self):
+        return list(self.rows)
+
+    def obtener_capacidades_snmp(self, device_id):
+        return None
+
+    def guardar_capacidades_snmp(self, *args):
+        pass
+
+
+def run_suite(sizes, scenarios, cycles, duration):
+    results = []
+    for index, scenario in enumerate(scenarios):
+        kinds, protocol = SCENARIOS[scenario]
+        for size in sizes:
+            fleet = SimulatedFleet(snmp=size if protocol == 'snmp' else 0,
+                                   modbus=size if protocol == 'modbus' else 0, kinds=kinds,
+                                   snmp_port=SNMP_BASE_PORT + index * SNMP_PORT_STRIDE)
+            try:
+                if scenario == 'modbus_monitor':
+                    result = bench_modbus_monitor(scenario, fleet.rows, duration)
+                elif scenario == 'monitoring_service':
+                    result = bench_monitoring_service(scenario, fleet.rows, cycles)
+                else:
+                    result = bench_snmp_client(scenario, fleet.rows, cycles)
+            finally:
+                fleet.close()
+            _print_result(result)
+            results.append(result)
+    return results
+
+
+def _print_header():
+    print(f"{'escenario':<20}{'equipos':>8}{'muestras/s':>12}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'ciclo p99':>11}{'CPU ms/m':>10}{'RSS MB':>8}{'err':>6}")
+
+
+def _print_result(r):
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else '-'
+    print(f"{r['scenario']:<20}{r['devices']:>8}{r['samples_per_s']:>12.1f}"
+          f"{fmt(r['latency_p50_ms'], '>9.1f')}{fmt(r['latency_p99_ms'], '>9.1f')}"
+          f"{fmt(r['cycle_p99_ms'], '>11.1f')}{fmt(r['cpu_ms_per_sample'], '>10.3f')}"
+          f"{r['rss_mb']:>8.0f}{r['errors']:>6}", flush=True)
+
+
+def compare(baseline, current, tolerances=None):
+    """
+    Métricas de ``current`` que empeoraron respecto de ``baseline`` más que
+    su tolerancia (y por encima del piso de ruido).
+
+    Returns:
+        Lista de dicts {scenario, devices, metric, baseline, current, change}.
+    """
+    tolerances = dict(TOLERANCES, **(tolerances or {}))
+    previous = {(r['scenario'], r['devices']): r for r in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        base = previous.get((result['scenario'], result['devices']))
+        if base is None:
+            continue
+        for metric, tolerance in tolerances.items():
+            old, new = base.get(metric), result.get(metric)
+            if old is None or new is None or abs(new - old) < NOISE_FLOOR.get(metric, 0):
+                continue
+            if metric in HIGHER_IS_BETTER:
+                worse = new < old * (1 - tolerance)
+            else:
+                worse = new > old * (1 + tolerance)
+            if worse:
+                regressions.append({
+                    'scenario': result['scenario'], 'devices': result['devices'], 'metric': metric,
+                    'baseline': old, 'current': new,
+                    'change': round((new - old) / old, 3) if old else None,
+                })
+    return regressions
+
+
+def _report(regressions, tolerances):
+    if not regressions:
+        print('\nSin regresiones respecto de la línea base.')
+        return 0
+    print(f"\n{len(regressions)} regresión(es) (tolerancias: {dict(TOLERANCES, **tolerances)}):")
+    for r in regressions:
+        change = f"{r['change']:+.0%}" if r['change'] is not None else ''
+        print(f"  {r['scenario']} x{r['devices']}: {r['metric']} {r['baseline']} -> {r['current']} {change}")
+    return 1
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _parse_tolerances(items):
+    tolerances = {}
+    for item in items or ():
+        metric, _, value = item.partition('=')
+        if metric not in TOLERANCES or not value:
+            raise SystemExit(f"Tolerancia inválida: {item} (métricas: {', '.join(TOLERANCES)})")
+        tolerances[metric] = float(value)
+    return tolerances
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de polling contra una flota simulada')
+    parser.add_argument('--sizes', default='10,100,1000', help='Tamaños de flota separados por coma')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Escenarios ({', '.join(SCENARIOS)})")
+    parser.add_argument('--cycles', type=int, default=5, help='Ciclos medidos por escenario SNMP')
+    parser.add_argument('--duration', type=float, default=10.0, help='Segundos medidos de modbus_monitor')
+    parser.add_argument('--output', help='Archivo JSON de resultados (default: benchmarks/results/)')
+    parser.add_argument('--baseline', help='JSON anterior contra el que se comparan los resultados')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NUEVO'), help='Solo comparar dos JSON')
+    parser.add_argument('--tolerance', action='append', metavar='METRICA=FRACCION',
+                        help='Cambiar la tolerancia de una métrica (p. ej. rss_mb=0.5)')
+    args = parser.parse_args()
+    tolerances = _parse_tolerances(args.tolerance)
+
+    if args.compare:
+        base, current = map(_load, args.compare)
+        sys.exit(_report(compare(base, current, tolerances), tolerances))
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"Escenarios desconocidos: {', '.join(unknown)}")
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    logging.basicConfig(level=logging.ERROR)
+    _raise_fd_limit()
+    _print_header()
+    results = run_suite(sizes, scenarios, args.cycles, args.duration)
+
+    commit = _git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'cycles': args.cycles,
+            'duration_s': args.duration,
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"polling-{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados: {output}")
+
+    if args.baseline:
+        sys.exit(_report(compare(_load(args.baseline), report, tolerances), tolerances))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark: CPU por dispositivo del polling SNMP antes/después del runtime persistente.
+
+Antes: ``asyncio.run`` por ciclo y un SnmpEngine + transporte nuevos por
+dispositivo (MinimalSNMPClient sin runtime). Después: loop, engine,
+transportes y credenciales compartidos (``snmp_runtime``).
+
+Los agentes SNMP son un responder local en un subproceso (uno por puerto),
+así su CPU no se cuenta en la medición.
+
+Uso:
+    python benchmarks/bench_snmp_runtime.py [--devices 20] [--cycles 10]
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+BASE_PORT = 16100
+
+
+class _Responder(asyncio.DatagramProtocol):
+    """Agente mínimo: responde cualquier GET v1/v2c con un entero fijo."""
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        from pyasn1.codec.ber import decoder, encoder
+        from pysnmp.proto import api
+
+        p_mod = api.PROTOCOL_MODULES[api.decodeMessageVersion(data)]
+        req_msg, _ = decoder.decode(data, asn1Spec=p_mod.Message())
+        rsp_msg = p_mod.apiMessage.get_response(req_msg)
+        req_pdu = p_mod.apiMessage.get_pdu(req_msg)
+        rsp_pdu = p_mod.apiMessage.get_pdu(rsp_msg)
+        p_mod.apiPDU.set_varbinds(
+            rsp_pdu, [(oid, p_mod.Integer(1200)) for oid, _ in p_mod.apiPDU.get_varbinds(req_pdu)])
+        self.transport.sendto(encoder.encode(rsp_msg), addr)
+
+
+async def _serve(devices):
+    loop = asyncio.get_running_loop()
+    for i in range(devices):
+        await loop.create_datagram_endpoint(_Responder, local_addr=('127.0.0.1', BASE_PORT + i))
+    print('listo', flush=True)
+    await asyncio.Event().wait()
+
+
+def _measure(label, devices, cycles, run_cycle):
+    run_cycle()  # calentamiento (importaciones, MIBs)
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    ok = 0
+    for _ in range(cycles):
+        ok += run_cycle()
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+    samples = devices * cycles
+    print(f"{label:<34}{cpu / samples * 1000:>10.2f}{wall / cycles * 1000:>12.1f}{ok:>8}/{samples}")
+    return cpu / samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CPU por dispositivo: SNMP por ciclo vs runtime persistente')
+    parser.add_argument('--devices', type=int, default=20)
+    parser.add_argument('--cycles', type=int, default=10)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        asyncio.run(_serve(args.devices))
+        return
+
+    from app.services.protocols.snmp_minimal_client import MinimalSNMPClient
+    from app.services.snmp_runtime import snmp_runtime
+
+    responder = subprocess.Popen([sys.executable, __file__, '--serve', '--devices', str(args.devices)],
+                                 stdout=subprocess.PIPE, text=True)
+    try:
+        responder.stdout.readline()
+        ports = [BASE_PORT + i for i in range(args.devices)]
+
+        def legacy_cycle():
+            async def poll():
+                clients = [MinimalSNMPClient(port=p, mp_model=1) for p in ports]
+                return await asyncio.gather(*(c.get_ups_data('127.0.0.1') for c in clients))
+            return sum(1 for r in asyncio.run(poll()) if r)
+
+        def runtime_cycle():
+            async def poll():
+                clients = [MinimalSNMPClient(port=p, mp_model=1, runtime=snmp_runtime) for p in ports]
+                return await asyncio.gather(*(c.get_ups_data('127.0.0.1') for c in clients))
+            return sum(1 for r in snmp_runtime.run(poll()) if r)
+
+        print(f"{'Modo':<34}{'CPU ms/disp':>10}{'ms/ciclo':>12}{'ok':>10}")
+        before = _measure('antes (asyncio.run + engine/disp)', args.devices, args.cycles, legacy_cycle)
+        after = _measure('después (snmp_runtime)', args.devices, args.cycles, runtime_cycle)
+        print(f"\nReducción de CPU por dispositivo: {before / after:.1f}x")
+        print(f"Runtime: {snmp_runtime.get_stats()}")
+    finally:
+        responder.terminate()
+
+
+if __name__ == '__main__':
+    main()
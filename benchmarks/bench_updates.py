@@ -0,0 +1,122 @@
+"""
+Bytes por cliente de las actualizaciones Socket.IO del monitoreo.
+
+Corre ``MonitoringService`` (SNMP + Modbus, ciclos reales) contra una flota
+simulada durante ``--duration`` segundos, captura lo que publica y mide el
+tamaño de los frames Socket.IO (``42["evento",{...}]``) que recibiría cada
+navegador conectado:
+
+    full    cada evento tal como se publica (ups_update completo)
+    delta   ups_update pasado por ``DeltaEncoder`` (ups_delta); el resto igual
+    one     ups_delta de un solo equipo (cliente suscrito a ``device:<id>``)
+
+full y delta son lo que recibe un cliente suscrito a la flota; con
+``--clients`` se reporta también el total del servidor.
+
+Uso:
+    python benchmarks/bench_updates.py [--snmp 25] [--modbus 25] [--duration 30] [--clients 20]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_polling import FleetDB, SimulatedFleet, _raise_fd_limit  # noqa: E402
+
+
+def frame_size(event, payload):
+    """Bytes de un paquete EVENT de Socket.IO sobre WebSocket."""
+    return 2 + len(json.dumps([event, payload], separators=(',', ':')))
+
+
+def measure(snmp, modbus, duration):
+    from app.services import event_bus, sample_sink
+    from app.services.monitoring_service import MonitoringService
+    from app.services.modbus_pool import modbus_pool
+    from app.services.update_delta import DELTA_EVENT, SNAPSHOT_EVENT, UPDATE_EVENT, DeltaEncoder
+
+    fleet = SimulatedFleet(snmp=snmp, modbus=modbus, kinds='megatec,invt,ups_mib,hybrid')
+    encoder = DeltaEncoder()
+    full, delta, events = Counter(), Counter(), Counter()
+    one_device = fleet.rows[0]['id']
+    one = 0
+    measuring = False
+
+    def sink(event, payload, namespace):
+        nonlocal one
+        if not measuring:
+            if event == UPDATE_EVENT:
+                encoder.encode(payload)  # Calentamiento: el cliente ya tiene el estado
+            return
+        events[event] += 1
+        full[event] += frame_size(event, payload)
+        if event == UPDATE_EVENT:
+            size = frame_size(DELTA_EVENT, encoder.encode(payload))
+            delta[DELTA_EVENT] += size
+            if payload['id'] == one_device:
+                one += size
+        else:
+            delta[event] += frame_size(event, payload)
+
+    event_bus.set_sink(sink)
+    sample_sink.set_sink(sample_sink.MultiSink([]))
+    service = MonitoringService(db=FleetDB(fleet.rows))
+    service.start()
+    try:
+        time.sleep(min(duration / 3, 10))
+        measuring = True
+        time.sleep(duration)
+        measuring = False
+    finally:
+        service.stop()
+        event_bus.set_sink(None)
+        sample_sink.set_sink(None)
+        fleet.close()
+
+        async def close_pool():
+            modbus_pool.close_all()
+        modbus_pool.run(close_pool(), timeout=10)
+
+    return {
+        'devices': len(fleet.rows),
+        'duration_s': duration,
+        'events': dict(events),
+        'full_bytes_per_s': round(sum(full.values()) / duration),
+        'delta_bytes_per_s': round(sum(delta.values()) / duration),
+        'one_device_bytes_per_s': round(one / duration),
+        'full_by_event': {k: round(v / duration) for k, v in full.items()},
+        'snapshot_bytes': frame_size(SNAPSHOT_EVENT, encoder.snapshot()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bytes por cliente de ups_update completo vs ups_delta')
+    parser.add_argument('--snmp', type=int, default=25)
+    parser.add_argument('--modbus', type=int, default=25)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--clients', type=int, default=20)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    _raise_fd_limit()
+    result = measure(args.snmp, args.modbus, args.duration)
+    full, delta = result['full_bytes_per_s'], result['delta_bytes_per_s']
+    print(json.dumps(result, indent=2))
+    print(f"\nPor cliente: {full / 1024:.1f} KiB/s completo -> {delta / 1024:.1f} KiB/s por diferencias "
+          f"({100 * (1 - delta / full):.0f}% menos)" if full else "\nSin eventos")
+    if full:
+        print(f"Suscrito a un equipo: {result['one_device_bytes_per_s']} B/s")
+        print(f"{args.clients} clientes: {full * args.clients / 1024:.0f} KiB/s -> "
+              f"{delta * args.clients / 1024:.0f} KiB/s; snapshot de la flota {result['snapshot_bytes'] / 1024:.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
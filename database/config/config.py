@@ -59,6 +59,15 @@ class BaseConfig:
     INFLUXDB_ORG = os.environ.get('INFLUXDB_ORG', 'my-org')
     INFLUXDB_BUCKET = os.environ.get('INFLUXDB_BUCKET', 'ups_monitoring')
 
+    # Monitoreo: 'embedded' sondea dentro del proceso web, 'subscribe' recibe
+    # los eventos de ``python -m app.services.poller``, 'off' no monitorea
+    MONITORING_MODE = os.environ.get('MONITORING_MODE', 'embedded')
+    POLLER_ADDRESS = os.environ.get('POLLER_ADDRESS', '127.0.0.1:6010')
+    POLLER_AUTHKEY = os.environ.get('POLLER_AUTHKEY', '')
+
+    # Procesos de sondeo (0 = SNMP/Modbus dentro del proceso web o del poller)
+    MONITOR_SHARDS = int(os.environ.get('MONITOR_SHARDS', '0'))
+
 
 class DevelopmentConfig(BaseConfig):
     DEBUG = True
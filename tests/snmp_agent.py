@@ -0,0 +1,112 @@
+"""
+Agente SNMP v1/v2c en memoria para las pruebas (sin hardware).
+
+Uso desde una prueba:
+    from snmp_agent import Agent
+"""
+
+import asyncio
+
+from pyasn1.codec.ber import decoder, encoder
+from pysnmp.proto import api, rfc1905
+
+
+def _oid(text):
+    return tuple(int(part) for part in text.split('.'))
+
+
+class Agent(asyncio.DatagramProtocol):
+    """Agente v1/v2c con MIB en memoria y límite de varbinds por PDU."""
+
+    def __init__(self, mib, max_varbinds=None, drop_large=False, reject_multi=False, delay=0,
+                 communities=None, versions=(0, 1)):
+        self.communities = communities
+        self.versions = versions
+        self.mib = {_oid(oid): value for oid, value in mib.items()}
+        self.max_varbinds = max_varbinds
+        self.drop_large = drop_large
+        self.reject_multi = reject_multi
+        self.delay = delay
+        self.requests = []
+        self.pending = 0
+        self.max_pending = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def _next(self, oid):
+        following = [key for key in sorted(self.mib) if key > oid]
+        return following[0] if following else None
+
+    def datagram_received(self, data, addr):
+        version = int(api.decodeMessageVersion(data))
+        p_mod = api.PROTOCOL_MODULES[version]
+        req_msg, _ = decoder.decode(data, asn1Spec=p_mod.Message())
+        community = str(p_mod.apiMessage.get_community(req_msg))
+        if version not in self.versions or (self.communities and community not in self.communities):
+            return  # Los agentes descartan community/versión inválidas sin responder
+        req_pdu = p_mod.apiMessage.get_pdu(req_msg)
+        rsp_msg = p_mod.apiMessage.get_response(req_msg)
+        rsp_pdu = p_mod.apiMessage.get_pdu(rsp_msg)
+        oids = [tuple(oid) for oid, _ in p_mod.apiPDU.get_varbinds(req_pdu)]
+        self.requests.append(len(oids))
+
+        bulk = getattr(p_mod, 'GetBulkRequestPDU', None)
+        if self.reject_multi and len(oids) > 1:
+            p_mod.apiPDU.set_error_status(rsp_pdu, 'genErr')
+            p_mod.apiPDU.set_varbinds(rsp_pdu, [(oid, p_mod.Null()) for oid in oids])
+            self._send(encoder.encode(rsp_msg), addr)
+            return
+        if bulk is not None and req_pdu.isSameTypeWith(bulk()):
+            repetitions = p_mod.apiBulkPDU.get_max_repetitions(req_pdu)
+            var_binds, current = [], oids
+            for _ in range(repetitions):
+                following = [self._next(oid) for oid in current]
+                var_binds.extend((oid, p_mod.Integer(self.mib[oid])) if oid else
+                                 (previous, rfc1905.endOfMibView)
+                                 for oid, previous in zip(following, current))
+                if None in following:
+                    break
+                current = following
+        elif req_pdu.isSameTypeWith(p_mod.GetNextRequestPDU()):
+            var_binds = []
+            for index, oid in enumerate(oids):
+                next_oid = self._next(oid)
+                if next_oid is not None:
+                    var_binds.append((next_oid, p_mod.Integer(self.mib[next_oid])))
+                elif version == 1:
+                    var_binds.append((oid, rfc1905.endOfMibView))
+                else:
+                    var_binds.append((oid, p_mod.Null()))
+                    p_mod.apiPDU.set_error_status(rsp_pdu, 'noSuchName')
+                    p_mod.apiPDU.set_error_index(rsp_pdu, index + 1)
+        else:
+            if self.max_varbinds and len(oids) > self.max_varbinds:
+                if self.drop_large:
+                    return
+                p_mod.apiPDU.set_error_status(rsp_pdu, 'tooBig')
+                p_mod.apiPDU.set_varbinds(rsp_pdu, [(oid, p_mod.Null()) for oid in oids])
+                self._send(encoder.encode(rsp_msg), addr)
+                return
+            # v2c: OID inexistente = noSuchObject; v1: noSuchName anula la PDU
+            absent = rfc1905.noSuchObject if version == 1 else p_mod.Null()
+            var_binds = [(oid, p_mod.Integer(self.mib[oid]) if oid in self.mib else absent)
+                         for oid in oids]
+            missing = [i for i, oid in enumerate(oids) if oid not in self.mib]
+            if missing and version == 0:
+                p_mod.apiPDU.set_error_status(rsp_pdu, 'noSuchName')
+                p_mod.apiPDU.set_error_index(rsp_pdu, missing[0] + 1)
+        p_mod.apiPDU.set_varbinds(rsp_pdu, var_binds)
+        self._send(encoder.encode(rsp_msg), addr)
+
+    def _send(self, data, addr):
+        if not self.delay:
+            self.transport.sendto(data, addr)
+            return
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+
+        def send():
+            self.pending -= 1
+            self.transport.sendto(data, addr)
+        asyncio.get_running_loop().call_later(self.delay, send)
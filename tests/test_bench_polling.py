@@ -0,0 +1,41 @@
+"""
+Pruebas de la verificación de regresiones del benchmark de polling.
+
+Uso:
+    pytest tests/test_bench_polling.py -v
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from bench_polling import compare
+
+
+def _report(**metrics):
+    result = {'scenario': 'snmp_minimal', 'devices': 100, 'samples_per_s': 150.0,
+              'latency_p99_ms': 800.0, 'cycle_p99_ms': 820.0, 'cpu_ms_per_sample': 5.0, 'rss_mb': 80.0}
+    result.update(metrics)
+    return {'meta': {}, 'results': [result]}
+
+
+def test_detecta_regresiones_por_encima_de_la_tolerancia():
+    base = _report()
+    assert compare(base, _report(samples_per_s=140.0, cpu_ms_per_sample=5.5)) == []
+
+    regressions = compare(base, _report(samples_per_s=100.0, latency_p99_ms=1200.0))
+    assert {r['metric'] for r in regressions} == {'samples_per_s', 'latency_p99_ms'}
+    assert regressions[0]['devices'] == 100
+
+    # Mejoras y escenarios sin línea base no cuentan
+    assert compare(base, _report(samples_per_s=300.0, rss_mb=40.0)) == []
+    assert compare(base, _report(devices=1000, samples_per_s=1.0)) == []
+
+
+def test_piso_de_ruido_y_tolerancias_propias():
+    # 1 ms -> 2.5 ms es +150 % pero por debajo del piso de ruido
+    assert compare(_report(latency_p99_ms=1.0), _report(latency_p99_ms=2.5)) == []
+    base = _report()
+    assert compare(base, _report(rss_mb=110.0)) != []
+    assert compare(base, _report(rss_mb=110.0), tolerances={'rss_mb': 0.5}) == []
@@ -0,0 +1,97 @@
+"""
+Pruebas del descubrimiento de red asíncrono contra servicios locales.
+
+Uso:
+    pytest tests/test_discovery.py -v
+"""
+
+import sys
+import os
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from app.services import discovery
+from app.services.discovery import DiscoveryJob, parse_targets, run_discovery
+
+from snmp_agent import Agent
+
+
+def test_parse_targets():
+    assert parse_targets(cidr='192.168.10.0/30') == ['192.168.10.1', '192.168.10.2']
+    assert parse_targets(cidr='10.0.0.7/32') == ['10.0.0.7']
+    assert parse_targets(network='192.168.0', start=250, end=300) == [
+        '192.168.0.250', '192.168.0.251', '192.168.0.252', '192.168.0.253', '192.168.0.254']
+    with pytest.raises(ValueError):
+        parse_targets(cidr='10.0.0.0/8')
+
+
+def test_descubre_servicios_y_publica_en_vivo(monkeypatch):
+    events = []
+    monkeypatch.setattr(discovery, 'publish', lambda event, payload, namespace=None: events.append((event, payload)))
+
+    async def http(reader, writer):
+        await reader.read(1024)
+        writer.write(b'HTTP/1.0 200 OK\r\nServer: UPS-Web/1.0\r\n\r\n')
+        await writer.drain()
+        writer.close()
+
+    async def modbus(reader, writer):
+        writer.close()
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        modbus_server = await asyncio.start_server(modbus, '127.0.0.1', 0)
+        http_server = await asyncio.start_server(http, '127.0.0.1', 0)
+        agent = Agent({'1.3.6.1.2.1.1.1.0': 42}, communities={'public'}, versions=(1,))
+        snmp, _ = await loop.create_datagram_endpoint(lambda: agent, local_addr=('127.0.0.1', 0))
+        monkeypatch.setattr(discovery, 'MODBUS_PORT', modbus_server.sockets[0].getsockname()[1])
+        monkeypatch.setattr(discovery, 'HTTP_PORT', http_server.sockets[0].getsockname()[1])
+        monkeypatch.setattr(discovery, 'SNMP_PORT', snmp.get_extra_info('sockname')[1])
+        try:
+            # 127.0.0.2 responde RST: host vivo sin servicios
+            job = DiscoveryJob(['127.0.0.1', '127.0.0.2'], 'local', rate=0, timeout=1.0, community='public')
+            await run_discovery(job)
+            return job
+        finally:
+            modbus_server.close()
+            http_server.close()
+            snmp.close()
+
+    job = asyncio.run(run())
+    assert job.status == 'done' and job.scanned == 2
+    by_ip = {host['ip']: host for host in job.hosts}
+    local = by_ip['127.0.0.1']
+    assert local['modbus'] and local['snmp'] and local['sys_descr'] == '42'
+    assert local['snmp_version'] == 1
+    assert local['http'] == 'HTTP/1.0 200 OK UPS-Web/1.0'
+    assert by_ip['127.0.0.2']['ports'] == []
+
+    names = [event for event, _ in events]
+    assert names.count('discovery_host') == 2
+    assert names[-1] == 'discovery_done'
+    assert events[-1][1]['found'] == 2 and 'hosts' not in events[-1][1]
+
+
+def test_descubre_agentes_solo_v1(monkeypatch):
+    monkeypatch.setattr(discovery, 'publish', lambda event, payload, namespace=None: None)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        # Tarjeta Megatec: descarta los paquetes v2c sin responder
+        agent = Agent({'1.3.6.1.2.1.1.1.0': 7}, communities={'public'}, versions=(0,))
+        snmp, _ = await loop.create_datagram_endpoint(lambda: agent, local_addr=('127.0.0.1', 0))
+        monkeypatch.setattr(discovery, 'SNMP_PORT', snmp.get_extra_info('sockname')[1])
+        try:
+            job = DiscoveryJob(['127.0.0.1'], 'local', rate=0, timeout=1.0, community='public')
+            await run_discovery(job)
+            return job
+        finally:
+            snmp.close()
+
+    host, = asyncio.run(run()).hosts
+    assert host['snmp'] and host['snmp_version'] == 0 and host['sys_descr'] == '7'
+    assert 'SNMP:%d' % discovery.SNMP_PORT in host['ports']
@@ -0,0 +1,187 @@
+"""
+Pruebas del escritor de InfluxDB en lotes con spool en disco, contra un
+servidor HTTP local que implementa /api/v2/write.
+
+Uso:
+    pytest tests/test_influx_writer.py -v
+"""
+
+import sys
+import os
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from app.services.influx_db import MEASUREMENT, InfluxDBService, LineSpool, to_line
+
+
+class FakeInflux:
+    """Endpoint de escritura de InfluxDB 2.x que guarda las líneas recibidas."""
+
+    def __init__(self, port):
+        self.port = port
+        self.lines = []
+        self.requests = 0
+        self.status = 204
+        self._server = None
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+                fake.requests += 1
+                if fake.status == 204:
+                    fake.lines.extend(body.splitlines())
+                self.send_response(fake.status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def _write(service, seq, name='UPS-1'):
+    line = to_line(MEASUREMENT, {'device_name': name, 'ip': '10.0.0.1'}, {'seq': seq}, time.time_ns())
+    return service.enqueue(line)
+
+
+@pytest.fixture
+def influx(tmp_path, monkeypatch):
+    port = _free_port()
+    monkeypatch.setenv('INFLUXDB_URL', f'http://127.0.0.1:{port}')
+    fake = FakeInflux(port)
+    service = InfluxDBService(enabled=True, batch_size=4, flush_interval=0.1, spool_dir=str(tmp_path))
+    yield service, fake
+    service.close()
+    fake.stop()
+
+
+def test_line_protocol():
+    line = to_line('ups_status', {'device_name': 'UPS A,1', 'ip': '10.0.0.1', 'vacío': ''},
+                   {'voltaje_in': 220, 'ok': True, 'nan': float('nan'), 'modo': 'En UPS'}, 123)
+    assert line == r'ups_status,device_name=UPS\ A\,1,ip=10.0.0.1 voltaje_in=220.0,ok=1.0 123'
+    assert to_line('ups_status', {}, {'modo': 'En UPS'}, 1) is None
+
+
+def test_lotes_spool_y_reenvio_en_orden(influx):
+    service, fake = influx
+    # InfluxDB caído: nada bloquea y las muestras van al spool
+    started = time.perf_counter()
+    for i in range(10):
+        assert _write(service, i)
+    assert time.perf_counter() - started < 0.1
+    assert _wait(lambda: service.spooled == 10)
+    assert not service.online and service.spool.pending
+
+    # Vuelve: se reenvía el spool en orden y después lo nuevo
+    fake.start()
+    assert _wait(lambda: service.online, timeout=15)
+    for i in range(10, 13):
+        _write(service, i)
+    assert _wait(lambda: len(fake.lines) == 13)
+    assert [line.split(' ')[1] for line in fake.lines] == [f'seq={float(i)!r}' for i in range(13)]
+    assert not service.spool.pending and not os.path.exists(service.spool.path)
+    # Lotes de hasta batch_size líneas, no una escritura por muestra
+    assert fake.requests <= 13 / 4 + 2
+
+
+def test_lote_rechazado_no_bloquea(influx):
+    service, fake = influx
+    fake.start()
+    fake.status = 400
+    _write(service, 0)
+    assert _wait(lambda: service.rejected == 1)
+    fake.status = 204
+    _write(service, 1)
+    assert _wait(lambda: len(fake.lines) == 1) and service.online
+
+
+def test_dos_procesos_con_spool_propio(tmp_path, monkeypatch):
+    port = _free_port()
+    monkeypatch.setenv('INFLUXDB_URL', f'http://127.0.0.1:{port}')
+    fake = FakeInflux(port)
+    shards = []
+    for index in range(2):
+        service = InfluxDBService(enabled=True, batch_size=4, flush_interval=0.1, spool_dir=str(tmp_path))
+        service.use_spool(f'shard-{index}')
+        shards.append(service)
+    try:
+        assert shards[0].spool.path != shards[1].spool.path
+        # InfluxDB caído: los dos escriben al spool a la vez
+        for i in range(6):
+            for index, service in enumerate(shards):
+                assert _write(service, i, name=f'UPS-{index}')
+        assert _wait(lambda: all(service.spooled == 6 for service in shards))
+
+        # Vuelve: cada uno reenvía lo suyo sin borrar ni repetir lo del otro
+        fake.start()
+        assert _wait(lambda: all(service.online for service in shards), timeout=15)
+        assert _wait(lambda: len(fake.lines) == 12)
+        assert sorted(fake.lines) == sorted(set(fake.lines))
+        for index in range(2):
+            seqs = [line.split(' ')[1] for line in fake.lines if f'device_name=UPS-{index}' in line]
+            assert seqs == [f'seq={float(i)!r}' for i in range(6)]
+        with pytest.raises(RuntimeError):
+            shards[0].use_spool('otro')
+    finally:
+        for service in shards:
+            service.close()
+        fake.stop()
+
+
+def test_spool_retoma_desde_el_offset(tmp_path):
+    spool = LineSpool(str(tmp_path), max_bytes=1024)
+    assert spool.append([f'm v={i} {i}' for i in range(5)]) == 0
+    lines, end = spool.read(2)
+    assert lines == ['m v=0 0', 'm v=1 1']
+    spool.commit(end)
+
+    # Reinicio del proceso: continúa donde quedó
+    reopened = LineSpool(str(tmp_path), max_bytes=1024)
+    assert reopened.read(10)[0] == ['m v=2 2', 'm v=3 3', 'm v=4 4']
+    assert reopened.append(['x' * 2000]) == 1  # No entra: se descarta
+
+
+def test_limite_cuenta_solo_lo_pendiente(tmp_path):
+    spool = LineSpool(str(tmp_path), max_bytes=95)
+    lines = [f'm v={i} {i:02d}' for i in range(10)]  # 9 bytes por línea
+    assert spool.append(lines) == 0
+    spool.commit(spool.read(8)[1])
+    assert spool.pending_bytes == 18
+
+    # Lo ya reenviado no ocupa lugar: se compacta y la línea nueva entra
+    assert spool.append(['m v=a 10']) == 0
+    assert spool.offset == 0 and spool.size == os.path.getsize(spool.path) == 27
+    assert spool.read(10)[0] == ['m v=8 08', 'm v=9 09', 'm v=a 10']
+
+    reopened = LineSpool(str(tmp_path), max_bytes=95)
+    assert reopened.offset == 0 and reopened.read(10)[0] == ['m v=8 08', 'm v=9 09', 'm v=a 10']
+    assert reopened.append(['x' * 80]) == 1  # Lo pendiente sí cuenta
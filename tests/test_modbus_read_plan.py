@@ -0,0 +1,161 @@
+"""
+Pruebas del planificador de lecturas Modbus (sin hardware).
+
+Uso:
+    pytest tests/test_modbus_read_plan.py -v
+"""
+
+import sys
+import os
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.modbus_read_plan import (
+    MAX_REGISTERS_PER_READ, MAP_BOUNDARIES, ReadRequest, plan_reads, build_read_plan,
+    execute_plan, decode_plan,
+)
+from app.utils.modbus_registers import (
+    UPS_BLOCK_START, REGISTER_MAP, STATUS_BLOCK_START, STATUS_MAP,
+    THS_BLOCK_START, WATER_BLOCK_START,
+    MODULE_PARAMS, MAX_MODULES, module_base,
+    GROUP_ELECTRICAL, GROUP_STATUS, GROUP_ENVIRONMENT, GROUP_MODULES,
+)
+
+ALL_GROUPS = frozenset({GROUP_ELECTRICAL, GROUP_STATUS, GROUP_ENVIRONMENT, GROUP_MODULES})
+
+
+class FakeDevice:
+    """Memoria de registros que cuenta los round-trips."""
+
+    def __init__(self, registers):
+        self.registers = registers
+        self.round_trips = 0
+
+    async def read(self, start, count):
+        self.round_trips += 1
+        return [self.registers.get(start + i, 0) for i in range(count)]
+
+
+def _ups_con_modulos(n_modulos):
+    regs = {}
+    for info in REGISTER_MAP.values():
+        regs[UPS_BLOCK_START + info['pos']] = 2200 + info['pos']
+    regs[STATUS_BLOCK_START + STATUS_MAP['battery_status']['pos']] = 2
+    for mod_num in range(1, n_modulos + 1):
+        for info in MODULE_PARAMS.values():
+            regs[module_base(mod_num) + info['rel']] = 1000 * mod_num + info['rel']
+    regs[3271] = 253   # 25.3 °C
+    regs[3272] = 481   # 48.1 %
+    return regs
+
+
+def test_plan_reads_respeta_limite_por_peticion():
+    requests = plan_reads(range(0, 300), boundaries=())
+    assert requests == [ReadRequest(0, 125), ReadRequest(125, 125), ReadRequest(250, 50)]
+
+
+def test_plan_reads_no_rellena_huecos_grandes():
+    assert plan_reads([10, 11, 500]) == [ReadRequest(10, 2), ReadRequest(500, 1)]
+
+
+def test_no_cruza_entre_mapas_de_equipo():
+    # THS (3271) y Water (3311) están a menos de MAX_GAP pero son mapas distintos
+    plan = build_read_plan(frozenset({GROUP_ENVIRONMENT}))
+    assert plan.requests == [ReadRequest(THS_BLOCK_START, 2), ReadRequest(WATER_BLOCK_START, 1)]
+    for req in build_read_plan(ALL_GROUPS).requests:
+        end = req.start + req.count - 1
+        assert all(not req.start < boundary <= end for boundary in MAP_BOUNDARIES)
+
+
+def test_plan_cubre_todas_las_direcciones():
+    plan = build_read_plan(ALL_GROUPS)
+    for req in plan.requests:
+        assert 1 <= req.count <= MAX_REGISTERS_PER_READ
+    for mod_num in range(1, MAX_MODULES + 1):
+        for info in MODULE_PARAMS.values():
+            plan.locate(module_base(mod_num) + info['rel'])
+
+
+def test_round_trips_antes_y_despues():
+    # Polling anterior: bloque UPS + bloque estados + THS + Water, y por
+    # cada módulo una lectura de prueba más una por parámetro
+    legacy = 4 + MAX_MODULES * (1 + len(MODULE_PARAMS))
+
+    device = FakeDevice(_ups_con_modulos(MAX_MODULES))
+    plan = build_read_plan(ALL_GROUPS)
+    asyncio.run(execute_plan(plan, device.read))
+
+    assert legacy == 44
+    # UPS + estados, un módulo por petición, THS y Water
+    assert device.round_trips == len(plan) == 3 + MAX_MODULES
+    # Con un módulo completo por petición, el ciclo solo eléctrico es una lectura
+    assert len(build_read_plan(frozenset({GROUP_ELECTRICAL}))) == 1
+
+
+def test_decodificacion_desde_buffers():
+    device = FakeDevice(_ups_con_modulos(2))
+    plan = build_read_plan(ALL_GROUPS)
+    responses = asyncio.run(execute_plan(plan, device.read))
+    data, status_data, online = decode_plan(plan, responses)
+
+    assert online
+    assert data['input_voltage_a'] == round((2200 + 12) * 0.1, 2)
+    assert data['input_frequency_a'] == round((2200 + 18) * 0.01, 2)
+    assert status_data['battery_status_raw'] == 2
+    assert status_data['battery_status'] == 'Flotacion'
+    assert data['env_temperature'] == 25.3
+    assert data['env_humidity'] == 48.1
+    assert [m['module_number'] for m in data['modules']] == [1, 2]
+    assert data['modules'][1]['mod_scr_temp'] == round((2000 + 95) * 0.1, 2)
+
+
+def test_peticion_fallida_deja_campos_vacios():
+    plan = build_read_plan(frozenset({GROUP_ELECTRICAL}))
+    data, status_data, online = decode_plan(plan, [None])
+    assert not online
+    assert data == {} and status_data == {}
+
+
+def test_campos_con_nombre_son_vistas_del_arreglo():
+    import numpy as np
+
+    device = FakeDevice(_ups_con_modulos(1))
+    plan = build_read_plan(ALL_GROUPS)
+    responses = asyncio.run(execute_plan(plan, device.read))
+    data, _, _ = decode_plan(plan, responses)
+
+    fields = plan.fields[GROUP_ELECTRICAL]
+    assert fields['input_voltage_a'] == data['input_voltage_a']
+    assert np.shares_memory(fields, plan.values[GROUP_ELECTRICAL])
+
+
+def test_fallo_parcial_no_desalinea_estados():
+    device = FakeDevice(_ups_con_modulos(1))
+    plan = build_read_plan(ALL_GROUPS)
+    responses = asyncio.run(execute_plan(plan, device.read))
+    responses[-2] = None  # Sin tarjeta THS
+    data, status_data, online = decode_plan(plan, responses)
+
+    assert online
+    assert status_data['battery_status'] == 'Flotacion'
+    assert 'env_temperature' not in data
+    assert data['water_leak_location'] == 0  # Water se leyó aparte
+
+
+def test_modulos_ausentes_rechazados_no_afectan_al_modulo_1():
+    device = FakeDevice(_ups_con_modulos(1))
+    plan = build_read_plan(ALL_GROUPS)
+    module_2 = plan.locate(module_base(2))[0]
+
+    async def read(start, count):
+        # El equipo rechaza las direcciones de los módulos 2-4
+        return None if start >= module_base(2) and start < THS_BLOCK_START else await device.read(start, count)
+
+    responses = asyncio.run(execute_plan(plan, read))
+    assert responses[module_2] is None
+    data, status_data, online = decode_plan(plan, responses)
+
+    assert online and status_data['battery_status'] == 'Flotacion'
+    assert [m['module_number'] for m in data['modules']] == [1]
+    assert data['modules'][0]['mod_scr_temp'] == round((1000 + 95) * 0.1, 2)
@@ -0,0 +1,120 @@
+"""
+Pruebas del planificador adaptativo de polling Modbus (sin hardware).
+
+Uso:
+    pytest tests/test_modbus_scheduler.py -v
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.modbus_scheduler import (
+    AdaptiveScheduler, BASE_INTERVALS, STABLE_AFTER, OFFLINE_FACTOR_MAX,
+    STATE_NORMAL, STATE_ALARM, STATE_STABLE, STATE_OFFLINE,
+)
+from app.utils.modbus_registers import GROUP_ELECTRICAL, GROUP_STATUS, GROUP_ENVIRONMENT
+
+ALL = frozenset(BASE_INTERVALS)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _scheduler():
+    clock = FakeClock()
+    return AdaptiveScheduler(clock=clock), clock
+
+
+def _poll(sched, clock, until, state=STATE_NORMAL):
+    """Simula el despachador hasta ``until``; retorna las lecturas hechas."""
+    polls = []
+    while True:
+        wait = sched.time_until_next()
+        if wait is None or clock.now + wait > until:
+            clock.now = until
+            return polls
+        clock.now += wait
+        for device_id, groups in sched.pop_due().items():
+            polls.append((clock.now, groups))
+            sched.complete(device_id, groups, state)
+
+
+def test_alta_lee_todos_los_grupos_en_una_lectura():
+    sched, clock = _scheduler()
+    sched.add_device(1)
+    assert sched.pop_due() == {1: ALL}
+    # Mientras la lectura está en curso no se vuelve a entregar
+    assert sched.pop_due() == {}
+
+
+def test_cadencia_base_equivale_al_polling_anterior():
+    sched, clock = _scheduler()
+    sched.add_device(1)
+    polls = _poll(sched, clock, 20.0)
+    assert [t for t, g in polls if GROUP_ELECTRICAL in g] == [2.0 * i for i in range(11)]
+    assert [t for t, g in polls if GROUP_STATUS in g] == [0.0, 6.0, 12.0, 18.0]
+    assert [t for t, g in polls if GROUP_ENVIRONMENT in g] == [0.0]
+
+
+def test_alarma_acorta_los_intervalos_de_inmediato():
+    sched, clock = _scheduler()
+    sched.add_device(1)
+    _poll(sched, clock, 3.0)
+    assert sched.interval(1, GROUP_ENVIRONMENT) == BASE_INTERVALS[GROUP_ENVIRONMENT]
+
+    clock.now = 4.0
+    groups = sched.pop_due()[1]
+    sched.complete(1, groups, STATE_ALARM)
+    assert sched.snapshot()[0]['state'] == STATE_ALARM
+    assert sched.interval(1, GROUP_ELECTRICAL) == 1.0
+    # El grupo ambiental (pendiente a t=30) se adelanta al nuevo intervalo
+    assert sched.snapshot()[0]['next_due_s'][GROUP_ENVIRONMENT] <= BASE_INTERVALS[GROUP_ENVIRONMENT] / 2
+
+
+def test_equipo_estable_estira_los_intervalos():
+    sched, clock = _scheduler()
+    sched.add_device(1)
+    _poll(sched, clock, 2.0 * STABLE_AFTER)
+    snap = sched.snapshot()[0]
+    assert snap['state'] == STATE_STABLE
+    assert snap['intervals_s'][GROUP_ELECTRICAL] == 2 * BASE_INTERVALS[GROUP_ELECTRICAL]
+
+
+def test_offline_aplica_backoff_acotado():
+    sched, clock = _scheduler()
+    sched.add_device(1)
+    polls = _poll(sched, clock, 300.0, state=STATE_OFFLINE)
+    gaps = [b[0] - a[0] for a, b in zip(polls, polls[1:])]
+    assert gaps[:4] == [2.0, 4.0, 8.0, 16.0]
+    # Todos los grupos viajan juntos en cada sondeo
+    assert all(groups == ALL for _, groups in polls[1:])
+    assert max(gaps) <= BASE_INTERVALS[GROUP_ELECTRICAL] * OFFLINE_FACTOR_MAX + 0.5
+    assert sched.snapshot()[0]['state'] == STATE_OFFLINE
+
+
+def test_grupos_vencidos_durante_lectura_quedan_pendientes():
+    sched, clock = _scheduler()
+    sched.add_device(1)
+    sched.complete(1, sched.pop_due()[1], STATE_NORMAL)
+
+    clock.now = 2.0
+    in_flight = sched.pop_due()[1]
+    clock.now = 6.0         # lectura lenta: el grupo de estados vence mientras tanto
+    assert sched.pop_due() == {}
+    sched.complete(1, in_flight, STATE_NORMAL)
+    assert GROUP_STATUS in sched.pop_due()[1]
+
+
+def test_dispositivo_retirado_no_se_entrega():
+    sched, clock = _scheduler()
+    sched.add_device(1)
+    sched.remove_device(1)
+    assert sched.pop_due() == {}
+    assert sched.time_until_next() is None
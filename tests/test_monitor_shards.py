@@ -0,0 +1,52 @@
+"""
+Pruebas del reparto de la flota en shards (sin hardware ni base de datos).
+
+Uso:
+    pytest tests/test_monitor_shards.py -v
+"""
+
+import sys
+import os
+import threading
+import time
+from multiprocessing.connection import Client
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.event_bus import STATS_EVENT, EventUplink
+from app.services.monitor_shards import ShardedMonitoringService, filter_shard
+
+
+def test_particion_cubre_la_flota_sin_duplicados():
+    devices = [{'id': i, 'ip': f'10.0.0.{i}'} for i in range(1, 41)]
+    shards = [filter_shard(devices, (index, 3)) for index in range(3)]
+    ids = sorted(d['id'] for shard in shards for d in shard)
+    assert ids == list(range(1, 41))
+    assert max(map(len, shards)) - min(map(len, shards)) <= 1
+    assert filter_shard(devices, None) is devices
+
+
+def test_eventos_del_worker_llegan_al_proceso_web(monkeypatch):
+    service = ShardedMonitoringService(2)
+    received = []
+    done = threading.Event()
+
+    def publish(event, payload, namespace):
+        received.append((event, payload, namespace))
+        done.set()
+
+    monkeypatch.setattr('app.services.event_bus.publish', publish)
+    threading.Thread(target=service._accept_loop, daemon=True).start()
+    try:
+        uplink = EventUplink(Client(service._listener.address, authkey=service._authkey))
+        uplink(STATS_EVENT, {'shard': 1, 'cycle': [{'device_id': 7}],
+                             'cadence': [], 'connections': []})
+        uplink('ups_update', {'id': 7, 'status': 'online'})
+        assert done.wait(5)
+        # Las estadísticas se agregan y no se reemiten
+        time.sleep(0.1)
+        assert received == [('ups_update', {'id': 7, 'status': 'online'}, None)]
+        assert service.modbus_monitor.get_cycle_stats() == [{'device_id': 7}]
+    finally:
+        service.running = False
+        service._listener.close()
@@ -0,0 +1,144 @@
+"""
+Pruebas del historial en PostgreSQL: particiones, ventanas de rollup,
+retención y escritura en lotes con COPY (contra un pool de conexiones falso
+que registra las sentencias).
+
+Uso:
+    pytest tests/test_pg_telemetry.py -v
+"""
+
+import sys
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services import pg_telemetry
+from app.services.pg_telemetry import (
+    RAW, ROLLUPS, PostgresTelemetry, expired_partitions, partition_range, partition_span,
+    rollup_window, sample_rows,
+)
+from app.services.sample_sink import Sample
+
+UTC = timezone.utc
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def execute(self, statement, params=None):
+        if self.pool.down:
+            raise OSError('conexión rechazada')
+        text = statement if isinstance(statement, str) else statement.as_string(None)
+        self.pool.statements.append(text)
+        return self
+
+    def fetchall(self):
+        return []
+
+    def cursor(self):
+        return FakeCursor(self.pool)
+
+
+class FakeCursor:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @contextmanager
+    def copy(self, statement):
+        if self.pool.down:
+            raise OSError('conexión rechazada')
+        rows = []
+
+        class Copy:
+            def write_row(self, row):
+                rows.append(row)
+
+        yield Copy()
+        self.pool.copies.append(rows)
+
+
+class FakePool:
+    def __init__(self):
+        self.statements = []
+        self.copies = []
+        self.down = False
+
+    @contextmanager
+    def get_connection(self):
+        yield FakeConnection(self)
+
+
+def _sample(device_id, ts, **fields):
+    return Sample(device_id, f'UPS-{device_id}', '10.0.0.1', 'snmp', 'hybrid', fields,
+                  int(ts.timestamp()) * 1_000_000_000 + 1500)
+
+
+def test_particiones_y_retencion():
+    assert partition_range('day', datetime(2026, 10, 17, 23, 59, tzinfo=UTC)) == (
+        '20261017', datetime(2026, 10, 17, tzinfo=UTC), datetime(2026, 10, 18, tzinfo=UTC))
+    assert partition_range('month', datetime(2026, 12, 31, 12, tzinfo=UTC))[2] == datetime(2027, 1, 1, tzinfo=UTC)
+    assert partition_span('day', datetime(2026, 10, 17, 22, tzinfo=UTC), datetime(2026, 10, 19, 1, tzinfo=UTC)) == [
+        datetime(2026, 10, 17, 22, tzinfo=UTC), datetime(2026, 10, 18, tzinfo=UTC), datetime(2026, 10, 19, tzinfo=UTC)]
+
+    now = datetime(2026, 10, 17, 12, tzinfo=UTC)
+    names = ['ups_samples_p20261002', 'ups_samples_p20261003', 'ups_samples_p20261004',
+             'ups_samples_1m_p20261001', 'ups_samples_pxyz']
+    # 14 días: el corte es el 3/10 12:00, solo se eliminan días completos anteriores
+    assert expired_partitions(RAW, names, now) == ['ups_samples_p20261002']
+    assert expired_partitions(RAW._replace(retention_days=0), names, now) == []
+
+
+def test_ventana_de_rollup_incremental():
+    one_minute = ROLLUPS[0]
+    watermark = datetime(2026, 10, 17, 12, 10, tzinfo=UTC)
+    # Solo buckets cerrados, y se repasa el margen de muestras atrasadas (120 s)
+    assert rollup_window(one_minute, watermark, watermark + timedelta(seconds=150)) == (
+        datetime(2026, 10, 17, 12, 8, tzinfo=UTC), datetime(2026, 10, 17, 12, 12, tzinfo=UTC))
+    assert rollup_window(one_minute, watermark, watermark + timedelta(seconds=30)) is None
+
+    # El nivel de 1 h sigue a la marca del de 15 min; al ponerse al día avanza por tramos
+    hour = ROLLUPS[2]
+    start, until = rollup_window(hour, datetime(2026, 10, 1, tzinfo=UTC), datetime(2026, 10, 17, tzinfo=UTC))
+    assert until - start == pg_telemetry.ROLLUP_MAX_WINDOW
+
+
+def test_copy_en_lotes_y_reintento():
+    pool = FakePool()
+    writer = PostgresTelemetry(pool=pool, batch_size=3, flush_interval=0.05, maintenance_interval=3600)
+    writer._maintain_at = time.monotonic() + 3600
+    ts = datetime(2026, 10, 17, 12, tzinfo=UTC)
+    rows = sample_rows(_sample(1, ts, voltaje_in_l1=220.0, carga_pct=40.0))
+    assert rows == [(ts + timedelta(microseconds=1), 1, 'voltaje_in_l1', 220.0),
+                    (ts + timedelta(microseconds=1), 1, 'carga_pct', 40.0)]
+
+    pool.down = True
+    for i in range(5):
+        assert writer.enqueue(_sample(i, ts, carga_pct=float(i)))
+    deadline = time.monotonic() + 5
+    while writer.online and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert not writer.online and writer.written == 0
+
+    # Vuelve: lo pendiente se escribe en orden, en COPY de hasta batch_size muestras
+    pool.down = False
+    writer._retry_at = 0.0
+    deadline = time.monotonic() + 5
+    while writer.written < 5 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    writer.close()
+    assert writer.online and writer.written == 5 and writer.dropped == 0
+    assert [len(rows) for rows in pool.copies] == [3, 2]
+    assert [row[3] for rows in pool.copies for row in rows] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    # La partición del día se crea una sola vez, antes del primer COPY
+    created = [s for s in pool.statements if 'PARTITION OF' in s]
+    assert len(created) == 1 and '"ups_samples_p20261017"' in created[0]
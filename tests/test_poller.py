@@ -0,0 +1,67 @@
+"""
+Pruebas del broker del poller headless y su suscriptor web (sin base de datos).
+
+Uso:
+    pytest tests/test_poller.py -v
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.event_bus import STATS_EVENT
+from app.services.poller import EventBroker, PollerSubscriber
+
+AUTHKEY = b'clave-de-prueba'
+
+
+def _wait(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_suscriptores_reciben_eventos_y_estadisticas(monkeypatch):
+    received = []
+    monkeypatch.setattr('app.services.event_bus.publish',
+                        lambda event, payload, namespace=None: received.append((event, payload)))
+
+    broker = EventBroker(('127.0.0.1', 0), AUTHKEY)
+    broker.start()
+    # Estadísticas publicadas antes de que exista algún suscriptor
+    broker(STATS_EVENT, {'shard': 0, 'cycle': [{'device_id': 3}], 'cadence': [], 'connections': []})
+
+    subscribers = [PollerSubscriber(broker.address, AUTHKEY, retry_interval=0.1) for _ in range(2)]
+    try:
+        for sub in subscribers:
+            sub.start()
+        assert _wait(lambda: broker.subscribers == 2)
+
+        broker('ups_update', {'id': 3, 'status': 'online'})
+        assert _wait(lambda: len(received) == 2)
+        assert received == [('ups_update', {'id': 3, 'status': 'online'})] * 2
+        for sub in subscribers:
+            assert _wait(lambda: sub.modbus_monitor.get_cycle_stats() == [{'device_id': 3}])
+    finally:
+        for sub in subscribers:
+            sub.stop()
+        broker.close()
+
+
+def test_suscriptor_con_clave_incorrecta_no_recibe_eventos():
+    broker = EventBroker(('127.0.0.1', 0), AUTHKEY)
+    broker.start()
+    sub = PollerSubscriber(broker.address, b'otra-clave', retry_interval=0.1)
+    try:
+        sub.start()
+        time.sleep(0.3)
+        assert not sub.connected
+        assert broker.subscribers == 0
+    finally:
+        sub.stop()
+        broker.close()
@@ -0,0 +1,101 @@
+"""
+Pruebas del buffer circular de muestras recientes por equipo.
+
+Uso:
+    pytest tests/test_recent_samples.py -v
+"""
+
+import sys
+import os
+import threading
+from multiprocessing import Pipe
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services import event_bus, sample_sink
+from app.services.recent_samples import RecentSamples, SampleRing, recent_samples
+from app.services.sample_sink import Sample, record_sample
+
+
+def test_buffer_circular_y_vistas_sin_copia():
+    ring = SampleRing(8)
+    for i in range(11):
+        fields = {'carga_pct': float(i)}
+        if i % 2 == 0:
+            fields['temperatura'] = 20.0 + i  # Grupo leído solo en ciclos pares
+        ring.append(1000.0 + i, fields)
+
+    assert len(ring) == 8
+    view = ring.view()
+    assert [t for part in view.times() for t in part] == [1000.0 + i for i in range(3, 11)]
+    assert len(view.segments) == 2  # Dio la vuelta: dos tramos sin copiar
+
+    # Ventana por tiempo y por cantidad
+    last = ring.view(since=1007.0)
+    assert [v for part in last.column('carga_pct') for v in part] == [7.0, 8.0, 9.0, 10.0]
+    assert len(ring.view(since=1007.0, limit=2)) == 2
+    assert len(ring.view(since=2000.0)) == 0 and ring.view(since=2000.0).to_dict()['t'] == []
+
+    # La vista referencia las columnas del buffer, no una copia
+    first = last.times()[0]
+    assert isinstance(first, memoryview) and first.obj is ring.times
+    data = view.to_dict()
+    assert data['t'][0] == 1003000 and data['series']['temperatura'][:2] == [None, 24.0]
+    assert ring.latest() == (1010.0, {'carga_pct': 10.0, 'temperatura': 30.0})
+    assert ring.view().column('voltaje_in_l1') is None
+
+
+def test_registro_desde_record_sample():
+    store = RecentSamples(capacity=4, minutes=5)
+    forwarded = []
+    store.forward_to(forwarded.append)
+
+    class NullSink(sample_sink.SampleSink):
+        def write(self, sample):
+            return True
+
+    sample_sink.set_sink(NullSink())
+    original = sample_sink.recent_samples
+    sample_sink.recent_samples = store
+    try:
+        sample = record_sample({'id': 3, 'ip': '10.0.0.3'}, 'modbus', {'battery_capacity': 97})
+    finally:
+        sample_sink.recent_samples = original
+        sample_sink.set_sink(None)
+
+    assert forwarded == [sample]
+    now = sample.timestamp_ns / 1e9
+    assert store.latest(3)[1] == {'bateria_pct': 97.0}
+    assert len(store.view(3, seconds=60, now=now)) == 1
+    assert len(store.view(3, seconds=60, now=now + 120)) == 0
+    assert store.view(99) is None
+    assert store.get_stats()['devices'] == 1
+
+
+def test_capacidad_cubre_la_ventana_a_la_cadencia_mas_rapida():
+    # 15 min a 1 muestra/s (equipo Modbus en alarma) sin perder el inicio de la ventana
+    assert RecentSamples(minutes=15).capacity == 900
+    assert RecentSamples(minutes=1).capacity == 60
+    assert RecentSamples(capacity=100, minutes=15).capacity == 100  # Límite explícito
+
+
+def test_muestras_de_shards_llegan_al_proceso_web():
+    receiver, sender = Pipe(duplex=False)
+    sample = Sample(4242, 'UPS', '10.0.0.9', 'snmp', 'hybrid', {'carga_pct': 55.0}, 5_000_000_000)
+    sender.send((event_bus.SAMPLE_EVENT, sample, None))
+    sender.close()
+
+    published = []
+    event_bus.set_sink(lambda *args: published.append(args))
+    try:
+        thread = threading.Thread(target=event_bus.relay_events, args=(receiver, None, lambda: True))
+        thread.start()
+        thread.join(5)
+    finally:
+        event_bus.set_sink(None)
+        recent = recent_samples.latest(4242)
+        recent_samples.forget(4242)
+
+    assert not published  # No se reemite por Socket.IO
+    assert recent == (5.0, {'carga_pct': 55.0})
+
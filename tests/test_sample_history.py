@@ -0,0 +1,101 @@
+"""
+Pruebas de la consulta de historial: reducción LTTB y min/max, elección del
+nivel de rollup según el rango y validación de parámetros.
+
+Uso:
+    pytest tests/test_sample_history.py -v
+"""
+
+import sys
+import os
+import math
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from app.services.pg_telemetry import choose_level
+from app.services.sample_history import (
+    InfluxHistory, PostgresHistory, history_store, lttb, minmax, parse_time, query_history,
+)
+
+UTC = timezone.utc
+NOW = datetime(2026, 10, 17, 12, tzinfo=UTC)
+
+
+class ListStore:
+    """Almacén con una serie cruda fija (una muestra cada 2 s)."""
+
+    def __init__(self, rows):
+        self.rows_ = rows
+
+    def rows(self, device_id, metric, start, end, points, mode):
+        return 'list:raw', [row for row in self.rows_ if start <= row[0] < end]
+
+
+def _discharge(count):
+    """Descarga de batería con un pico breve en el medio."""
+    rows = []
+    for i in range(count):
+        value = 100 - i * 80 / count + math.sin(i / 5)
+        if i == count // 2:
+            value = 5.0
+        rows.append((NOW - timedelta(seconds=2 * (count - i)), value, value, value))
+    return rows
+
+
+def test_lttb_y_minmax_conservan_forma_y_picos():
+    points = [(i, v) for i, (_, v, _, _) in enumerate(_discharge(5000))]
+    reduced = lttb(points, 200)
+    assert len(reduced) == 200
+    assert reduced[0] == points[0] and reduced[-1] == points[-1]
+    assert [p[0] for p in reduced] == sorted(p[0] for p in reduced)
+    assert (2500, 5.0) in reduced  # El pico es el vértice de mayor área
+    assert lttb(points[:10], 200) == points[:10]
+
+    rows = [(i, v, v, v) for i, v in points]
+    reduced = minmax(rows, 200)
+    assert len(reduced) <= 200 and (2500, 5.0) in reduced
+    assert min(v for _, v in reduced) == 5.0 and max(v for _, v in reduced) == max(v for _, v in points)
+
+
+def test_nivel_segun_rango_y_retencion():
+    assert choose_level(NOW - timedelta(hours=1), NOW, 500, NOW).name == 'raw'
+    assert choose_level(NOW - timedelta(days=1), NOW, 500, NOW).name == '1m'
+    assert choose_level(NOW - timedelta(days=30), NOW, 500, NOW).name == '1h'
+    assert choose_level(NOW - timedelta(days=30), NOW, 2000, NOW).name == '15m'
+    # Una hora de hace un mes ya no está en crudo (14 días): se lee del rollup de 1 min
+    old = NOW - timedelta(days=30)
+    assert choose_level(old, old + timedelta(hours=1), 500, NOW).name == '1m'
+
+
+def test_consulta_y_validacion():
+    store = ListStore(_discharge(1800))
+    result = query_history(store, 7, ['bateria_pct', 'carga_pct'], NOW - timedelta(hours=1), NOW, points=100)
+    assert result['source'] == 'list:raw' and result['mode'] == 'lttb'
+    series = result['series']['bateria_pct']
+    assert len(series) == 100 and all(isinstance(t, int) for t, _ in series)
+    assert series[-1][0] == int((NOW - timedelta(seconds=2)).timestamp() * 1000)
+
+    result = query_history(store, 7, ['bateria_pct'], NOW - timedelta(hours=1), NOW, points=100, mode='minmax')
+    assert min(v for _, v in result['series']['bateria_pct']) == 5.0
+
+    with pytest.raises(ValueError):
+        query_history(store, 7, ['voltaje_inexistente'], NOW - timedelta(hours=1), NOW)
+    with pytest.raises(ValueError):
+        query_history(store, 7, ['bateria_pct'], NOW, NOW - timedelta(hours=1))
+    with pytest.raises(ValueError):
+        query_history(store, 7, ['bateria_pct'], NOW - timedelta(hours=1), NOW, mode='avg')
+
+
+def test_parametros_y_almacen():
+    assert parse_time('2026-10-17T12:00:00Z', None) == NOW
+    assert parse_time('2026-10-17T09:00:00-03:00', None) == NOW
+    assert parse_time(str(int(NOW.timestamp() * 1000)), None) == NOW
+    assert parse_time(str(int(NOW.timestamp())), None) == NOW
+    assert parse_time('', NOW) == NOW
+
+    assert isinstance(history_store('influx,postgres'), PostgresHistory)
+    assert isinstance(history_store('influx'), InfluxHistory)
+    assert history_store('none') is None
@@ -0,0 +1,186 @@
+"""
+Pruebas del sink único de muestras SNMP/Modbus.
+
+Uso:
+    pytest tests/test_sample_sink.py -v
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from pysnmp.proto.rfc1902 import Integer
+
+from app.services import event_bus, sample_sink
+from app.services.modbus_monitor import ModbusMonitor
+from app.services.modbus_pool import modbus_pool
+from app.services.protocols.snmp_minimal_client import MinimalSNMPClient
+from app.services.sample_sink import (
+    InfluxSampleSink, MultiSink, SampleSink, Sample, record_sample,
+)
+from app.services.ups_simulator import Fleet
+from app.services import modbus_monitor
+from app.utils.modbus_registers import GROUP_ELECTRICAL, GROUP_ENVIRONMENT
+
+MODBUS_PORT = 16500
+
+
+class ListSink(SampleSink):
+    name = 'list'
+
+    def __init__(self):
+        self.samples = []
+
+    def write(self, sample):
+        self.samples.append(sample)
+        return True
+
+
+class FleetDB:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def obtener_monitoreo_ups(self):
+        return list(self.rows)
+
+
+@pytest.fixture
+def sink():
+    sink = ListSink()
+    sample_sink.set_sink(sink)
+    yield sink
+    sample_sink.set_sink(None)
+
+
+def test_esquema_comun_snmp_y_modbus(sink):
+    dev = {'id': 7, 'nombre': 'UPS-7', 'ip': '10.0.0.7', 'ups_type': 'ups_mib_standard'}
+    snmp = record_sample(dev, 'snmp', {'input_voltage_l1': 221, 'output_current': 12,
+                                       'battery_status': 'Normal', 'output_load': float('nan')})
+    modbus = record_sample(dict(dev, id=8), 'modbus', {'input_voltage_a': 220.5, 'output_current_a': 11.0})
+
+    assert snmp.fields == {'voltaje_in_l1': 221.0, 'corriente_out_l1': 12.0}
+    assert modbus.fields == {'voltaje_in_l1': 220.5, 'corriente_out_l1': 11.0}
+    assert all(type(value) is float for s in sink.samples for value in s.fields.values())
+    assert snmp.tags == {'device_id': 7, 'device_name': 'UPS-7', 'ip': '10.0.0.7',
+                         'protocol': 'snmp', 'ups_type': 'ups_mib_standard'}
+    assert sink.samples == [snmp, modbus]
+    # Sin campos numéricos no hay muestra
+    assert record_sample(dev, 'snmp', {'battery_status': 'Normal'}) is None
+
+
+def test_megatec_registra_bateria(sink):
+    dev = {'id': 9, 'nombre': 'UPS-9', 'ip': '10.0.0.9', 'ups_type': 'megatec_snmp'}
+    client = MinimalSNMPClient()
+    raw = {'megatec_input_voltage': 2201, 'megatec_output_voltage': 2199, 'megatec_batt_voltage': 272,
+           'megatec_input_freq': 500, 'megatec_batt_capacity': 87, 'megatec_output_load': 35}
+    values = client.profile.decode([Integer(raw[key]) if key in raw else None for key in client.profile.keys])
+    data = client._format_minimal_data(values)
+    sample = record_sample(dev, 'snmp', data)
+    assert sample.fields['bateria_pct'] == 87.0
+    assert sample.fields['voltaje_bateria'] == 27.2 and sample.fields['carga_pct'] == 35.0
+
+
+def test_line_protocol_y_multisink():
+    class Broken(SampleSink):
+        name = 'broken'
+
+        def write(self, sample):
+            raise RuntimeError('caído')
+
+    sample = Sample(3, 'UPS 3', '10.0.0.3', 'modbus', 'invt_enterprise', {'carga_pct': 42.0}, 1000)
+    line = InfluxSampleSink(service=object()).line(sample)
+    assert line == (r'ups_status,device_id=3,device_name=UPS\ 3,ip=10.0.0.3,protocol=modbus,'
+                    r'ups_type=invt_enterprise carga_pct=42.0 1000')
+
+    target = ListSink()
+    assert MultiSink([Broken(), target]).write(sample)
+    assert target.samples == [sample]
+
+
+def test_modbus_solo_registra_los_grupos_leidos(sink):
+    fleet = Fleet(modbus=1, modbus_base_port=MODBUS_PORT)
+    dev = dict(fleet.rows()[0], id=1)
+    monitor = ModbusMonitor(db=FleetDB([dev]))
+    events = []
+    event_bus.set_sink(lambda event, payload, namespace: events.append((event, payload)))
+
+    async def poll():
+        await fleet.start()
+        try:
+            return await monitor._process_device(dev, frozenset({GROUP_ELECTRICAL}))
+        finally:
+            await fleet.stop()
+            modbus_pool.close_all()
+
+    try:
+        assert monitor.runtime.run(poll(), timeout=20) == 'normal'
+    finally:
+        event_bus.set_sink(None)
+    (sample,) = sink.samples
+    assert sample.protocol == 'modbus' and 200 < sample.fields['voltaje_in_l1'] < 240
+    # El grupo ambiental no se leyó: no se guarda un 0 de relleno
+    assert 'env_temperature' not in sample.fields and 'bateria_pct' in sample.fields
+    assert events and events[0][1]['status'] == 'online'
+
+
+def test_alarmas_con_ultimo_valor_de_grupos_no_leidos(sink, monkeypatch):
+    monkeypatch.setitem(modbus_monitor.ALARM_THRESHOLDS, 'temp_env_high', 20.0)  # El simulador reporta ~25 °C
+    fleet = Fleet(modbus=1, modbus_base_port=MODBUS_PORT)
+    dev = dict(fleet.rows()[0], id=1)
+    monitor = ModbusMonitor(db=FleetDB([dev]))
+    events = []
+    event_bus.set_sink(lambda event, payload, namespace: events.append(payload))
+
+    async def poll():
+        await fleet.start()
+        try:
+            await monitor._process_device(dev, frozenset({GROUP_ELECTRICAL, GROUP_ENVIRONMENT}))
+            return await monitor._process_device(dev, frozenset({GROUP_ELECTRICAL}))
+        finally:
+            await fleet.stop()
+            modbus_pool.close_all()
+
+    try:
+        assert monitor.runtime.run(poll(), timeout=20) == 'normal'
+    finally:
+        event_bus.set_sink(None)
+    # La alarma ambiental sigue activa en el ciclo que no leyó el grupo
+    assert [[a['code'] for a in p['alarms']].count('ENV_TEMP_HIGH') for p in events] == [1, 1]
+    # pero la muestra de ese ciclo solo trae lo leído
+    assert 'env_temperature' in sink.samples[0].fields
+    assert 'env_temperature' not in sink.samples[1].fields
+
+
+def test_offline_descarta_los_ultimos_valores(sink, monkeypatch):
+    monkeypatch.setitem(modbus_monitor.ALARM_THRESHOLDS, 'temp_env_high', 20.0)
+    fleet = Fleet(modbus=1, modbus_base_port=MODBUS_PORT)
+    dev = dict(fleet.rows()[0], id=1)
+    monitor = ModbusMonitor(db=FleetDB([dev]))
+    events = []
+    event_bus.set_sink(lambda event, payload, namespace: events.append(payload))
+
+    async def poll():
+        await fleet.start()
+        try:
+            await monitor._process_device(dev, frozenset({GROUP_ELECTRICAL, GROUP_ENVIRONMENT}))
+            monitor._emit_offline(dev)  # Excedió su deadline
+            await monitor._process_device(dev, frozenset({GROUP_ELECTRICAL}))
+        finally:
+            await fleet.stop()
+            modbus_pool.close_all()
+        try:
+            return await monitor._process_device(dev, frozenset({GROUP_ELECTRICAL}))
+        finally:
+            modbus_pool.close_all()
+
+    try:
+        assert monitor.runtime.run(poll(), timeout=30) == 'offline'
+    finally:
+        event_bus.set_sink(None)
+    assert [p['status'] for p in events] == ['online', 'offline', 'online', 'offline']
+    # Tras el corte no se alarma con el valor ambiental de antes
+    assert [[a['code'] for a in p['alarms']].count('ENV_TEMP_HIGH') for p in events] == [1, 0, 0, 0]
+    assert events[0]['data']['env_temperature'] > 20 and events[2]['data']['env_temperature'] == 0
+    assert dev['id'] not in monitor._last_data and dev['id'] not in monitor._last_status
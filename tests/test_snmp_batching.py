@@ -0,0 +1,166 @@
+"""
+Pruebas de lotes SNMP por tamaño de PDU y GETBULK contra un agente local.
+
+Uso:
+    pytest tests/test_snmp_batching.py -v
+"""
+
+import sys
+import os
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from app.services.snmp_batching import SNMP_MAX_IN_FLIGHT, PduLimits, get_batched, get_bulk_rows
+from app.services.snmp_runtime import SnmpRuntime
+from app.utils.ups_oids import UPS_MIB_LINE_COLUMNS, UPS_MIB_PROFILE, table_columns
+
+from snmp_agent import Agent
+
+PORT = 16171
+
+
+@pytest.fixture
+def runtime():
+    runtime = SnmpRuntime('snmp-test')
+    yield runtime
+    runtime.runtime.stop()
+
+
+def _serve_and_get(runtime, agent, objects, limits, mp_model=0):
+    async def run():
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(lambda: agent, local_addr=('127.0.0.1', PORT))
+        try:
+            target = await runtime.target('127.0.0.1', PORT, timeout=0.5, retries=0)
+            return await get_batched(runtime.engine, runtime.auth('public', mp_model), target,
+                                     objects, limits.get('127.0.0.1', PORT))
+        finally:
+            transport.close()
+    return runtime.run(run(), timeout=20)
+
+
+def test_too_big_parte_en_lotes_y_recuerda_el_limite(runtime):
+    profile = UPS_MIB_PROFILE
+    mib = {oid: i for i, oid in enumerate(profile.oids)}
+    agent = Agent(mib, max_varbinds=5)
+    limits = PduLimits()
+
+    values = _serve_and_get(runtime, agent, profile.objects, limits)
+    assert [int(v) for v in values] == list(range(len(profile)))
+    limit = limits.get('127.0.0.1', PORT)
+    assert limit.max_varbinds <= 5 and limit.confirmed == limit.max_varbinds
+
+    # El ciclo siguiente ya no manda PDUs rechazadas
+    agent.requests.clear()
+    values = _serve_and_get(runtime, agent, profile.objects, limits)
+    assert [int(v) for v in values] == list(range(len(profile)))
+    assert max(agent.requests) <= 5
+
+
+def test_agente_que_descarta_pdus_grandes(runtime):
+    profile = UPS_MIB_PROFILE
+    mib = {oid: 7 for oid in profile.oids}
+    limits = PduLimits()
+
+    values = _serve_and_get(runtime, Agent(mib, max_varbinds=8, drop_large=True),
+                            profile.objects, limits)
+    assert values is not None and all(int(v) == 7 for v in values)
+    assert limits.get('127.0.0.1', PORT).max_varbinds <= 8
+
+
+def test_agente_caido_no_aprende_limite(runtime):
+    limits = PduLimits()
+
+    async def run():
+        target = await runtime.target('127.0.0.1', PORT + 1, timeout=0.3, retries=0)
+        return await get_batched(runtime.engine, runtime.auth('public', 1), target,
+                                 UPS_MIB_PROFILE.objects, limits.get('127.0.0.1', PORT + 1))
+
+    assert runtime.run(run(), timeout=20) is None
+    assert limits.get('127.0.0.1', PORT + 1).max_varbinds == limits.default
+
+
+def test_v1_no_such_name_no_anula_el_resto(runtime):
+    profile = UPS_MIB_PROFILE
+    mib = {oid: 3 for oid in profile.oids[1:]}
+    values = _serve_and_get(runtime, Agent(mib), profile.objects, PduLimits())
+    assert profile.raw_values(values)[0] is None
+    assert profile.missing_oids(values) == [profile.oids[0]]
+    assert all(int(v) == 3 for v in values[1:])
+
+
+def test_agente_single_oid_en_paralelo_con_limite(runtime):
+    profile = UPS_MIB_PROFILE
+    mib = {oid: 5 for oid in profile.oids}
+    agent = Agent(mib, reject_multi=True, delay=0.05)
+    limits = PduLimits()
+
+    values = _serve_and_get(runtime, agent, profile.objects, limits)
+    assert all(int(v) == 5 for v in values)
+    assert limits.get('127.0.0.1', PORT).single_oid
+    assert agent.max_pending <= SNMP_MAX_IN_FLIGHT
+
+    # Los ciclos siguientes no repiten el GET agrupado condenado a fallar
+    agent.requests.clear()
+    _serve_and_get(runtime, agent, profile.objects, limits)
+    assert agent.requests == [1] * len(profile)
+
+
+def test_limite_en_vuelo_es_por_agente(runtime):
+    # Dos consultas concurrentes al mismo agente (p. ej. dos filas con la misma
+    # IP) comparten el límite, también con el GETBULK de líneas
+    profile = UPS_MIB_PROFILE
+    columns = {'input_voltage': '1.3.6.1.2.1.33.1.3.3.1.3'}
+    mib = {oid: 5 for oid in profile.oids}
+    mib.update({f"{columns['input_voltage']}.{line}": 220 for line in (2, 3)})
+    agent = Agent(mib, reject_multi=True, delay=0.05)
+    limits = PduLimits()
+    limits.get('127.0.0.1', PORT).mark_single_oid()
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(lambda: agent, local_addr=('127.0.0.1', PORT))
+        try:
+            target = await runtime.target('127.0.0.1', PORT, timeout=1.0, retries=0)
+            auth = runtime.auth('public', 1)
+            limit = limits.get('127.0.0.1', PORT)
+            return await asyncio.gather(
+                get_batched(runtime.engine, auth, target, profile.objects, limit),
+                get_batched(runtime.engine, auth, target, profile.objects, limit),
+                get_bulk_rows(runtime.engine, auth, target, table_columns(columns, after_row=1),
+                              first_row=2, rows=2, limit=limit))
+        finally:
+            transport.close()
+
+    first, second, rows = runtime.run(run(), timeout=30)
+    assert all(int(v) == 5 for v in first + second)
+    assert {row: int(v) for row, v in rows['input_voltage'].items()} == {2: 220, 3: 220}
+    assert agent.max_pending <= SNMP_MAX_IN_FLIGHT
+
+
+def test_getbulk_lee_lineas_de_la_tabla(runtime):
+    columns = {'input_voltage': '1.3.6.1.2.1.33.1.3.3.1.3', 'output_voltage': '1.3.6.1.2.1.33.1.4.4.1.2'}
+    mib = {f'{oid}.{line}': 220 + line for oid in columns.values() for line in (1, 2, 3)}
+    mib['1.3.6.1.2.1.33.1.4.4.1.3.1'] = 99  # siguiente columna: no se mezcla
+    agent = Agent(mib)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(lambda: agent, local_addr=('127.0.0.1', PORT))
+        try:
+            target = await runtime.target('127.0.0.1', PORT, timeout=0.5, retries=0)
+            return await get_bulk_rows(runtime.engine, runtime.auth('public', 1), target,
+                                       table_columns(columns, after_row=1), first_row=2, rows=2)
+        finally:
+            transport.close()
+
+    rows = runtime.run(run(), timeout=20)
+    assert {key: {row: int(v) for row, v in by_row.items()} for key, by_row in rows.items()} == {
+        'input_voltage': {2: 222, 3: 223}, 'output_voltage': {2: 222, 3: 223},
+    }
+    assert agent.requests == [2]
+    assert len(UPS_MIB_LINE_COLUMNS) == 8
@@ -0,0 +1,160 @@
+"""
+Pruebas del perfil de capacidades SNMP por equipo contra un agente local.
+
+Uso:
+    pytest tests/test_snmp_capabilities.py -v
+"""
+
+import sys
+import os
+import asyncio
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from pysnmp.proto import rfc1905
+
+from app.services import snmp_capabilities
+from app.services.snmp_capabilities import CapabilityProfile, CapabilityStore, seed_from_scan
+from app.services.snmp_runtime import SnmpRuntime
+from app.services.snmp_sessions import SnmpSessionRegistry
+from app.utils.ups_oids import HYBRID_PROFILE, UPS_MIB_OIDS, UPS_MIB_PROFILE
+
+from snmp_agent import Agent
+
+PORT = 16191
+
+
+class MemoryDB:
+    """Tablas monitoreo_config / monitoreo_capacidades en memoria."""
+
+    def __init__(self, devices=()):
+        self.devices = list(devices)
+        self.rows = {}
+
+    def obtener_monitoreo_ups(self):
+        return list(self.devices)
+
+    def obtener_capacidades_snmp(self, device_id):
+        return self.rows.get(device_id)
+
+    def tocar_monitoreo_ups(self, device_id):
+        for dev in self.devices:
+            if dev['id'] == device_id:
+                dev['updated_at'] = datetime.now()
+
+    def guardar_capacidades_snmp(self, device_id, profile, supported, missing, source, probed_at):
+        self.rows[device_id] = {'device_id': device_id, 'profile': profile, 'supported_oids': supported,
+                                'missing_oids': missing, 'source': source, 'probed_at': probed_at}
+
+
+def _device(**kwargs):
+    row = {'id': 1, 'nombre': 'UPS-1', 'ip': '127.0.0.1', 'protocolo': 'snmp', 'snmp_port': PORT,
+           'snmp_community': 'public', 'snmp_version': 1, 'ups_type': 'hybrid',
+           'updated_at': datetime(2026, 1, 1)}
+    row.update(kwargs)
+    return row
+
+
+@pytest.fixture
+def runtime():
+    runtime = SnmpRuntime('snmp-test')
+    yield runtime
+    runtime.runtime.stop()
+
+
+def _poll(runtime, agent, session, cycles=1):
+    async def run():
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(lambda: agent, local_addr=('127.0.0.1', PORT))
+        try:
+            results = []
+            for _ in range(cycles):
+                agent.requests.clear()
+                data = await session.client.get_ups_data()
+                results.append((data, sum(agent.requests)))
+            return results
+        finally:
+            transport.close()
+    return runtime.run(run(), timeout=20)
+
+
+def test_polling_pide_solo_los_oids_soportados(runtime):
+    # El UPS implementa la mitad de UPS-MIB y ninguno de los OIDs INVT
+    implemented = list(UPS_MIB_OIDS.values())[::2]
+    agent = Agent({oid: 1 for oid in implemented})  # Monofásico: sin GETBULK de líneas
+    db = MemoryDB()
+    store = CapabilityStore(db)
+    session = SnmpSessionRegistry(runtime, capabilities=store).get(_device())
+
+    (first, asked_first), (second, asked_second) = _poll(runtime, agent, session, cycles=2)
+    assert first and second
+    assert asked_first >= len(HYBRID_PROFILE)  # + sondeo de un OID si el límite de PDU es nuevo
+    assert asked_second == len(implemented)
+    assert session.capabilities.source == 'probe'
+
+    store.save(1, session.capabilities)
+    row = db.rows[1]
+    assert row['profile'] == 'hybrid' and sorted(row['supported_oids']) == sorted(implemented)
+
+    # Otra sesión (reinicio) arranca con el perfil guardado
+    restarted = SnmpSessionRegistry(runtime, capabilities=store).get(_device())
+    (_, asked), = _poll(runtime, agent, restarted)
+    assert asked == len(implemented)
+
+
+def test_re_sondeo_detecta_oids_nuevos(monkeypatch):
+    caps = CapabilityProfile(UPS_MIB_PROFILE)
+    values = [object() for _ in UPS_MIB_PROFILE.oids]
+    missing = UPS_MIB_PROFILE.oids[:3]
+    values[:3] = [rfc1905.noSuchObject] * 3
+
+    assert caps.request_profile() is UPS_MIB_PROFILE
+    caps.observe(UPS_MIB_PROFILE, values, now=1000)
+    assert caps.missing == set(missing) and caps.dirty
+    assert caps.request_profile(now=1001) is caps.active
+    assert len(caps.active) == len(UPS_MIB_PROFILE) - 3
+
+    # Respuesta en vivo: un OID soportado deja de existir
+    active_values = [object() for _ in caps.active.oids]
+    active_values[0] = rfc1905.noSuchInstance
+    caps.observe(caps.active, active_values, now=1002)
+    assert caps.source == 'poll' and len(caps.missing) == 4
+
+    # Cambio de firmware: al vencer el intervalo se pide el perfil completo
+    monkeypatch.setattr(snmp_capabilities, 'SNMP_REPROBE_INTERVAL', 60)
+    assert caps.request_profile(now=1059) is caps.active
+    assert caps.request_profile(now=1061) is UPS_MIB_PROFILE
+    caps.observe(UPS_MIB_PROFILE, [object() for _ in UPS_MIB_PROFILE.oids], now=1061)
+    assert caps.missing == set() and caps.request_profile(now=1062) is caps.active
+
+
+def test_escaner_siembra_los_equipos_con_esa_ip():
+    db = MemoryDB([_device(), _device(id=2, ip='10.0.0.9'), _device(id=3, ups_type='invt_minimal')])
+    missing = [UPS_MIB_PROFILE.oids[0], '1.3.6.1.2.1.1.4.0']
+    scan = {'success': True, 'ip': '127.0.0.1', 'port': PORT, 'oids_missing': missing}
+
+    assert seed_from_scan(db, scan) == 1
+    caps = CapabilityStore(db).load(1, HYBRID_PROFILE)
+    assert caps.missing == {UPS_MIB_PROFILE.oids[0]}
+    assert caps.source == 'scanner' and not caps.due()
+
+    # Perfil guardado para otro tipo de UPS: se vuelve a sondear
+    assert CapabilityStore(db).load(1, UPS_MIB_PROFILE).due()
+
+
+def test_sesion_en_marcha_toma_el_perfil_sembrado():
+    db = MemoryDB([_device()])
+    registry = SnmpSessionRegistry(None, capabilities=CapabilityStore(db))
+    live = registry.get(db.obtener_monitoreo_ups()[0])
+    assert live.capabilities.missing == set()
+
+    missing = [UPS_MIB_PROFILE.oids[0], UPS_MIB_PROFILE.oids[1]]
+    assert seed_from_scan(db, {'success': True, 'ip': '127.0.0.1', 'port': PORT, 'oids_missing': missing}) == 1
+
+    # El próximo ciclo lee la fila tocada y reconstruye la sesión con el perfil sembrado
+    session = registry.get(db.obtener_monitoreo_ups()[0])
+    assert session is not live
+    assert session.capabilities.missing == set(missing) and session.capabilities.source == 'scanner'
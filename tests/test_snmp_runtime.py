@@ -0,0 +1,36 @@
+"""
+Pruebas del runtime SNMP persistente (sin agentes reales).
+
+Uso:
+    pytest tests/test_snmp_runtime.py -v
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.snmp_runtime import SnmpRuntime
+from app.services.protocols.snmp_minimal_client import MinimalSNMPClient
+
+
+def test_engine_transportes_y_credenciales_se_reutilizan():
+    runtime = SnmpRuntime('snmp-test')
+    try:
+        async def two_cycles():
+            targets = []
+            for _ in range(2):
+                client = MinimalSNMPClient(community='public', port=16161, mp_model=1, runtime=runtime)
+                targets.append((client.engine, await client._transport('127.0.0.1'), client._auth()))
+            return targets
+
+        (e1, t1, a1), (e2, t2, a2) = runtime.run(two_cycles(), timeout=10)
+        assert e1 is e2 and t1 is t2 and a1 is a2
+        assert runtime.get_stats() == {
+            'engines_created': 1, 'targets_cached': 1, 'targets_created': 1, 'auth_cached': 1,
+        }
+
+        runtime.discard('127.0.0.1')
+        assert runtime.get_stats()['targets_cached'] == 0
+    finally:
+        runtime.runtime.stop()
@@ -0,0 +1,77 @@
+"""
+Pruebas de la auto-detección SNMP en paralelo contra un agente local.
+
+Uso:
+    pytest tests/test_snmp_scanner.py -v
+"""
+
+import sys
+import os
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.protocols.snmp_scanner import SNMPScanner
+
+from snmp_agent import Agent
+
+PORT = 16181
+
+
+def _detect(agent, port=PORT, timeout=1):
+    messages = []
+
+    async def run():
+        transport = None
+        if agent is not None:
+            loop = asyncio.get_running_loop()
+            transport, _ = await loop.create_datagram_endpoint(lambda: agent, local_addr=('127.0.0.1', port))
+        try:
+            scanner = SNMPScanner('127.0.0.1', port=port, timeout=timeout,
+                                  callback=lambda message, level: messages.append(level))
+            return await scanner.auto_detect()
+        finally:
+            if transport is not None:
+                transport.close()
+
+    return asyncio.run(run()), messages
+
+
+def test_detecta_ups_en_menos_de_3_segundos():
+    mib = {
+        SNMPScanner.STANDARD_OIDS['sysDescr']: 1,
+        SNMPScanner.STANDARD_OIDS['sysName']: 2,
+        SNMPScanner.UPS_MIB_OIDS['ups_input_voltage']: 2200,
+        SNMPScanner.UPS_MIB_OIDS['ups_battery_status']: 2,
+    }
+    agent = Agent(mib, communities={'ups'})
+
+    config, messages = _detect(agent)
+    assert config['success']
+    assert config['community'] == 'ups'
+    assert config['version'] == 'SNMPv2c' and config['mpModel'] == 1
+    assert config['ups_type'] == 'UPS-MIB Estándar'
+    assert len(config['oids_working']) == 4
+    assert config['elapsed_s'] < 3
+    assert 'success' in messages
+
+    # Todas las credenciales en una ronda más un solo GET agrupado de OIDs
+    probes = len(SNMPScanner.COMMON_COMMUNITIES) * len(SNMPScanner.SNMP_VERSIONS)
+    assert len(agent.requests) <= probes + 1
+
+
+def test_agente_solo_v1():
+    agent = Agent({SNMPScanner.STANDARD_OIDS['sysDescr']: 1}, communities={'public'}, versions=(0,))
+
+    config, _ = _detect(agent)
+    assert config['success']
+    assert config['version'] == 'SNMPv1' and config['mpModel'] == 0
+    assert config['ups_type'] == 'Genérico (MIB-II solamente)'
+
+
+def test_ip_muerta_cuesta_un_solo_timeout():
+    config, messages = _detect(None, port=PORT + 1, timeout=0.5)
+    assert not config['success']
+    assert config['elapsed_s'] < 1.5
+    assert messages[-1] == 'error'
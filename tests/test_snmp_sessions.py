@@ -0,0 +1,97 @@
+"""
+Pruebas del registro de sesiones SNMP por fila de monitoreo_config.
+
+Uso:
+    pytest tests/test_snmp_sessions.py -v
+"""
+
+import sys
+import os
+import asyncio
+import threading
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.snmp_capabilities import CapabilityProfile
+from app.services.snmp_runtime import SnmpRuntime
+from app.services.snmp_sessions import SnmpSessionRegistry
+from app.services.protocols.snmp_minimal_client import MinimalSNMPClient
+from app.services.protocols.snmp_upsmib_client import UPSMIBClient
+from app.utils.ups_oids import HYBRID_PROFILE
+
+
+def _row(**kwargs):
+    row = {'id': 1, 'nombre': 'UPS-1', 'ip': '10.0.0.10', 'protocolo': 'snmp',
+           'snmp_port': 161, 'snmp_community': 'public', 'snmp_version': '0',
+           'ups_type': 'invt_minimal', 'updated_at': datetime(2026, 1, 1)}
+    row.update(kwargs)
+    return row
+
+
+def test_sesion_se_reutiliza_mientras_la_fila_no_cambia():
+    registry = SnmpSessionRegistry(SnmpRuntime('snmp-test'))
+    first = registry.get(_row())
+    objects = first.client.profile.objects
+
+    for _ in range(5):
+        session = registry.get(_row())
+        assert session is first
+        assert session.client.profile.objects is objects
+
+    assert registry.builds == 1
+    assert isinstance(first.client, MinimalSNMPClient)
+    assert first.snmp_version == 0 and first.version_name == 'SNMPv1'
+
+
+def test_cambio_de_updated_at_reconstruye_la_sesion():
+    registry = SnmpSessionRegistry(SnmpRuntime('snmp-test'))
+    first = registry.get(_row())
+
+    changed = registry.get(_row(ups_type='hybrid', snmp_version=None,
+                                updated_at=datetime(2026, 1, 2)))
+    assert changed is not first
+    assert isinstance(changed.client, UPSMIBClient) and changed.client.include_invt
+    assert changed.version_name == 'SNMPv2c'
+    assert registry.builds == 2
+
+
+def test_sin_updated_at_se_compara_la_configuracion():
+    registry = SnmpSessionRegistry(SnmpRuntime('snmp-test'))
+    first = registry.get(_row(updated_at=None))
+    assert registry.get(_row(updated_at=None)) is first
+    assert registry.get(_row(updated_at=None, snmp_community='privada')) is not first
+
+
+def test_prune_descarta_equipos_eliminados():
+    registry = SnmpSessionRegistry(SnmpRuntime('snmp-test'))
+    registry.get(_row())
+    registry.get(_row(id=2, ip='10.0.0.11'))
+
+    registry.prune([2])
+    assert len(registry) == 1
+
+
+def test_refresh_lee_capacidades_fuera_del_loop():
+    loaded = []
+
+    class Store:
+        def load(self, device_id, base):
+            loaded.append((device_id, threading.current_thread()))
+            return CapabilityProfile(base, base.oids[:1])
+
+    registry = SnmpSessionRegistry(None, capabilities=Store())
+    rows = [_row(ups_type='hybrid'), _row(id=2, ip='10.0.0.11')]
+
+    async def cycle():
+        await registry.refresh(rows)
+        return threading.current_thread(), [registry.get(row) for row in rows]
+
+    loop_thread, (hybrid, minimal) = asyncio.run(cycle())
+    assert [device_id for device_id, _ in loaded] == [1]
+    assert loaded[0][1] is not loop_thread
+    assert hybrid.capabilities.missing == {HYBRID_PROFILE.oids[0]}
+    assert minimal.capabilities is None and registry.builds == 2
+
+    asyncio.run(registry.refresh(rows))
+    assert registry.builds == 2 and len(loaded) == 1
@@ -0,0 +1,133 @@
+"""
+Pruebas del SNMP walk por streaming contra un agente local.
+
+Uso:
+    pytest tests/test_snmp_walk.py -v
+"""
+
+import sys
+import os
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services import snmp_walk
+from app.services.snmp_runtime import SnmpRuntime
+from app.services.snmp_walk import SnmpWalk, diff_walks, iter_walk, publish_walk, read_walk, run_walk
+
+from snmp_agent import Agent
+
+INVT = '1.3.6.1.4.1.56788'
+
+
+def _mib(count, changed=()):
+    mib = {f'{INVT}.1.{i}.0': i for i in range(1, count + 1)}
+    mib.update({f'{INVT}.1.{i}.0': -i for i in changed})
+    mib['1.3.6.1.2.1.1.1.0'] = 7
+    mib['1.3.6.1.4.1.99999.1.0'] = 8  # Fuera del subárbol
+    return mib
+
+
+def _walk(agent, root=INVT, version=1, **options):
+    pages = []
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(lambda: agent, local_addr=('127.0.0.1', 0))
+        walk = SnmpWalk('127.0.0.1', root, port=transport.get_extra_info('sockname')[1],
+                        version=version, timeout=1, retries=0, **options)
+        try:
+            return await run_walk(walk, pages.append, runtime=SnmpRuntime())
+        finally:
+            transport.close()
+
+    return asyncio.run(run()), pages
+
+
+def test_getbulk_recorre_el_subarbol_completo(tmp_path, monkeypatch):
+    monkeypatch.setattr(snmp_walk, 'SNMP_WALK_DIR', str(tmp_path))
+    walk, pages = _walk(Agent(_mib(120)), max_repetitions=25)
+
+    assert walk.end == 'subtree' and walk.complete
+    assert walk.rows == 120 and sum(len(page) for page in pages) == 120
+    assert walk.requests == 5  # 120 filas en páginas de 25
+    assert pages[0][0] == (f'{INVT}.1.1.0', 'Integer', '1')
+
+    # Guardado completo y paginable
+    meta, rows, total = read_walk(walk.path, offset=100, limit=50)
+    assert meta['root'] == INVT and total == 120
+    assert len(rows) == 20 and rows[0] == [f'{INVT}.1.101.0', 'Integer', '101']
+
+
+def test_getnext_v1_termina_en_fin_de_mib(tmp_path, monkeypatch):
+    monkeypatch.setattr(snmp_walk, 'SNMP_WALK_DIR', str(tmp_path))
+    walk, pages = _walk(Agent(_mib(5)), root='1.3.6.1.4.1.99999', version=0)
+    assert walk.end == 'end_of_mib' and walk.complete
+    assert walk.rows == 1 and walk.requests == 2
+
+    # Walk incompleto: no queda archivo
+    walk, _ = _walk(Agent(_mib(50)), max_repetitions=10, max_rows=15)
+    assert walk.end == 'max_rows' and walk.rows == 15
+    assert walk.path is None
+    assert len(os.listdir(tmp_path)) == 1  # Solo el walk completo anterior
+
+
+def test_diff_entre_walks_guardados(tmp_path, monkeypatch):
+    monkeypatch.setattr(snmp_walk, 'SNMP_WALK_DIR', str(tmp_path / 'a'))
+    old, _ = _walk(Agent(_mib(30)))
+    monkeypatch.setattr(snmp_walk, 'SNMP_WALK_DIR', str(tmp_path / 'b'))
+    new, _ = _walk(Agent(_mib(32, changed=(3, 10))))
+
+    diff = diff_walks(old.path, new.path)
+    assert diff['added'] == [f'{INVT}.1.31.0', f'{INVT}.1.32.0']
+    assert diff['removed'] == []
+    assert diff['changed'] == [f'{INVT}.1.3.0', f'{INVT}.1.10.0']
+
+
+def test_iter_walk_desde_codigo_sincrono():
+    runtime = SnmpRuntime('snmp-walk-test')
+    agent = Agent(_mib(40))
+
+    async def bind():
+        loop = asyncio.get_running_loop()
+        return await loop.create_datagram_endpoint(lambda: agent, local_addr=('127.0.0.1', 0))
+
+    transport, _ = runtime.run(bind())
+    try:
+        walk = SnmpWalk('127.0.0.1', INVT, port=transport.get_extra_info('sockname')[1],
+                        max_repetitions=10, timeout=1, retries=0)
+        rows = [row for page in iter_walk(walk, save=False, runtime=runtime) for row in page]
+        assert len(rows) == 40 and walk.end == 'subtree'
+    finally:
+        runtime.runtime.loop.call_soon_threadsafe(transport.close)
+        runtime.runtime.stop()
+
+
+def test_publish_walk_solo_a_quien_lo_pidio(tmp_path, monkeypatch):
+    monkeypatch.setattr(snmp_walk, 'SNMP_WALK_DIR', str(tmp_path))
+    emitted, writers = [], set()
+    monkeypatch.setattr(snmp_walk.socketio, 'emit', lambda *args, **kwargs: emitted.append((args, kwargs)))
+    write = snmp_walk.WalkFile.write
+    monkeypatch.setattr(snmp_walk.WalkFile, 'write',
+                        lambda self, page: (writers.add(threading.get_ident()), write(self, page)))
+    agent = Agent(_mib(30))
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(lambda: agent, local_addr=('127.0.0.1', 0))
+        walk = SnmpWalk('127.0.0.1', INVT, port=transport.get_extra_info('sockname')[1],
+                        max_repetitions=10, timeout=1, retries=0)
+        try:
+            await publish_walk(walk, 'sid-1', runtime=SnmpRuntime())
+            return walk
+        finally:
+            transport.close()
+
+    walk = asyncio.run(run())
+    assert walk.complete and walk.path
+    assert [args[0] for args, _ in emitted] == ['snmp_walk_rows'] * 3 + ['snmp_walk_done']
+    assert all(kwargs == {'to': 'sid-1'} for _, kwargs in emitted)
+    # El gzip se escribe fuera del hilo del loop
+    assert writers and threading.get_ident() not in writers
@@ -0,0 +1,86 @@
+"""
+Pruebas de las actualizaciones de monitoreo por diferencias (ups_delta).
+
+Uso:
+    pytest tests/test_update_delta.py -v
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services import event_bus
+from app.services.update_delta import DELTA_EVENT, STATUS_EVENT, DeltaEncoder, quantize, update_encoder
+from app.services.update_rooms import subscriptions
+
+
+def _payload(**data):
+    base = {'voltaje_in_l1': 220.04, 'carga_pct': 41.6, 'power_factor': 0.987}
+    base.update(data)
+    return {'id': 7, 'nombre': 'UPS-1', 'status': 'online', 'protocol': 'modbus',
+            'data': base, 'status_data': {'alarm_count': 0}, 'alarms': [],
+            'timestamp': '2026-10-17T10:00:00'}
+
+
+def test_redondeo_a_precision_de_pantalla():
+    assert quantize({'voltaje_in_l1': 220.04, 'carga_pct': 41.6, 'x': 1.23456}) == \
+        {'voltaje_in_l1': 220.0, 'carga_pct': 42, 'x': 1.23}
+    assert quantize([float('nan'), float('inf'), 'ok', 3]) == [None, None, 'ok', 3]
+
+
+def test_primer_envio_completo_y_luego_solo_cambios():
+    encoder = DeltaEncoder()
+    first = encoder.encode(_payload())
+    assert first['seq'] == 1 and first['set']['data']['voltaje_in_l1'] == 220.0
+
+    # Ruido por debajo de la precisión y timestamp nuevo: solo id/seq
+    quiet = _payload(voltaje_in_l1=220.01)
+    quiet['timestamp'] = '2026-10-17T10:00:02'
+    assert encoder.encode(quiet) == {'id': 7, 'seq': 2}
+
+    delta = encoder.encode(_payload(voltaje_in_l1=221.3))
+    assert delta == {'id': 7, 'seq': 3, 'merge': {'data': {'voltaje_in_l1': 221.3}}}
+
+    # Sin respuesta: data pierde campos, se reemplaza completo
+    offline = _payload()
+    offline.update(status='offline', data={}, alarms=['Sin respuesta'])
+    del offline['status_data']
+    delta = encoder.encode(offline)
+    assert delta['set'] == {'status': 'offline', 'data': {}, 'alarms': ['Sin respuesta'], 'status_data': None}
+    assert 'merge' not in delta
+
+    state, = encoder.snapshot([7])
+    assert state['seq'] == 4 and state['status'] == 'offline'
+    assert encoder.snapshot([99]) == []
+
+
+def test_modulos_por_indice():
+    encoder = DeltaEncoder()
+    modules = [{'module_number': n, 'mod_output_voltage_a': 230.0} for n in (1, 2, 3)]
+    encoder.encode(_payload(modules=modules))
+
+    changed = [dict(m) for m in modules]
+    changed[2]['mod_output_voltage_a'] = 229.8
+    delta = encoder.encode(_payload(modules=changed))
+    assert delta['items'] == {'data': {'modules': {'2': {'mod_output_voltage_a': 229.8}}}}
+    assert 'merge' not in delta
+
+    # Cambió la cantidad de módulos: va la lista completa
+    delta = encoder.encode(_payload(modules=changed[:2]))
+    assert delta['merge'] == {'data': {'modules': changed[:2]}} and 'items' not in delta
+
+
+def test_publish_emite_diferencias(monkeypatch):
+    emitted = []
+    monkeypatch.setattr(event_bus.socketio, 'emit', lambda *args, **kwargs: emitted.append((args, kwargs)))
+    subscriptions.join('sid-test', 'device:7')
+    try:
+        event_bus.publish('ups_update', _payload())
+        event_bus.publish('ups_update', _payload(carga_pct=55.0))
+    finally:
+        subscriptions.drop('sid-test')
+        update_encoder.forget(7)
+
+    assert [args[0] for args, _ in emitted] == [STATUS_EVENT, DELTA_EVENT, DELTA_EVENT]
+    assert emitted[2] == (('ups_delta', {'id': 7, 'seq': 2, 'merge': {'data': {'carga_pct': 55}}}), {'to': ['device:7']})
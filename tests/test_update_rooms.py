@@ -0,0 +1,103 @@
+"""
+Pruebas de las suscripciones Socket.IO por equipo / sitio / flota.
+
+Uso:
+    pytest tests/test_update_rooms.py -v
+"""
+
+import sys
+import os
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.extensions import socketio
+from app.services import event_bus
+from app.services.update_delta import update_encoder
+from app.services.update_rooms import FLEET_ROOM, Subscriptions, parse_rooms, room_covers
+
+
+def _payload(device_id, sitio=None, status='online', carga=40.0):
+    return {'id': device_id, 'name': f'UPS-{device_id}', 'sitio': sitio, 'status': status,
+            'protocol': 'modbus', 'data': {'carga_pct': carga}, 'alarms': []}
+
+
+def test_salas_pedidas_y_cobertura():
+    assert parse_rooms({'device_id': '7'}) == ['device:7']
+    assert parse_rooms({'device_ids': [1, 2], 'site': ' Planta 1 ', 'fleet': True}) == \
+        ['device:1', 'device:2', 'site:Planta 1', FLEET_ROOM]
+    for bad in (None, {}, {'device_id': 'x'}, {'site': ''}):
+        with pytest.raises(ValueError):
+            parse_rooms(bad)
+
+    state = _payload(3, sitio='Norte')
+    assert room_covers('device:3', state) and room_covers('site:Norte', state) and room_covers(FLEET_ROOM, state)
+    assert not room_covers('device:4', state) and not room_covers('site:Sur', state)
+
+
+def test_cuenta_de_clientes_por_sala():
+    subs = Subscriptions()
+    subs.join('a', 'device:1')
+    subs.join('a', 'device:1')  # Repetido: no cuenta dos veces
+    subs.join('b', 'site:Norte')
+    assert subs.rooms_for(1, 'Norte') == ['device:1', 'site:Norte']
+    assert subs.rooms_for(2) == []
+
+    subs.leave('a', 'device:1')
+    assert subs.rooms_for(1, 'Norte') == ['site:Norte']
+    subs.drop('b')
+    assert subs.rooms_for(1, 'Norte') == [] and subs.get_stats()['rooms'] == {}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    socketio.init_app(app, async_mode='threading')
+    from app.routes import monitoreo_socket  # noqa: F401
+    for device_id, sitio in ((901, 'Norte'), (902, 'Sur')):
+        update_encoder.encode(_payload(device_id, sitio))
+    test_client = socketio.test_client(app)
+    yield test_client
+    test_client.disconnect()
+    for device_id in (901, 902):
+        update_encoder.forget(device_id)
+
+
+def _events(client, name):
+    return [message['args'][0] for message in client.get_received() if message['name'] == name]
+
+
+def test_solo_recibe_los_equipos_suscritos(client):
+    statuses = _events(client, 'ups_status')[0]
+    assert {'id': 901, 'status': 'online'} in statuses
+
+    ack = client.emit('subscribe', {'device_id': 901}, callback=True)
+    assert ack == {'rooms': ['device:901']}
+    snapshot, = _events(client, 'ups_snapshot')
+    assert [state['id'] for state in snapshot] == [901]
+
+    event_bus.publish('ups_update', _payload(901, 'Norte', carga=55.0))
+    event_bus.publish('ups_update', _payload(902, 'Sur', carga=55.0))
+    event_bus.publish('ups_update', _payload(902, 'Sur', status='offline'))
+    received = client.get_received()
+    deltas = [m['args'][0] for m in received if m['name'] == 'ups_delta']
+    assert [delta['id'] for delta in deltas] == [901]
+    assert deltas[0]['merge'] == {'data': {'carga_pct': 55}}
+    # Los cambios de estado llegan aunque no esté suscrito al equipo
+    assert [m['args'][0] for m in received if m['name'] == 'ups_status'] == [[{'id': 902, 'status': 'offline'}]]
+
+    # request_update responde desde el último estado conocido
+    client.emit('request_update', {'device_id': 902})
+    state, = _events(client, 'ups_snapshot')[0]
+    assert state['id'] == 902 and state['status'] == 'offline'
+
+    # Por sitio
+    client.emit('unsubscribe', {'device_id': 901})
+    client.emit('subscribe', {'site': 'Sur'})
+    assert [s['id'] for s in _events(client, 'ups_snapshot')[0]] == [902]
+    event_bus.publish('ups_update', _payload(901, 'Norte', carga=60.0))
+    event_bus.publish('ups_update', _payload(902, 'Sur', carga=60.0))
+    assert [delta['id'] for delta in _events(client, 'ups_delta')] == [902]
@@ -0,0 +1,86 @@
+"""
+Pruebas de los perfiles de OIDs precompilados (sin agentes reales).
+
+Uso:
+    pytest tests/test_ups_oids.py -v
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pysnmp.proto.rfc1902 import Integer, OctetString
+from pysnmp.proto.rfc1905 import NoSuchObject
+
+from app.utils.ups_oids import (
+    PROFILES, INVT_ENTERPRISE_PROFILE, MEGATEC_PROFILE, UPS_MIB_PROFILE,
+    UPS_BATTERY_OIDS, UPS_STATUS_OIDS, POWER_SOURCE,
+)
+from app.services.protocols.snmp_client import SNMPClient
+from app.services.protocols.snmp_minimal_client import MinimalSNMPClient
+from app.services.protocols.snmp_upsmib_client import UPSMIBClient
+
+
+def test_perfiles_paralelos_y_resueltos():
+    for profile in PROFILES.values():
+        assert len(profile.keys) == len(profile.oids) == len(profile.scales) \
+            == len(profile.decoders) == len(profile.objects)
+        for oid, obj in zip(profile.oids, profile.objects):
+            assert str(obj[0].get_oid()) == oid
+            # Ya resuelto: pysnmp lo devuelve tal cual en cada GET
+            assert obj.resolve_with_mib(None) is obj
+
+
+def test_perfil_invt_escalas_y_decodificadores():
+    profile = INVT_ENTERPRISE_PROFILE
+    index = profile.keys.index('battery_voltage')
+    assert profile.oids[index] == UPS_BATTERY_OIDS['voltage'].lstrip('.')
+    assert profile.scales[index] == 0.1
+    index = profile.keys.index('status_power_source')
+    assert profile.oids[index] == UPS_STATUS_OIDS['power_source'].lstrip('.')
+    assert profile.decoders[index] is POWER_SOURCE
+
+
+def test_format_data_mapea_por_posicion_con_faltantes():
+    profile = INVT_ENTERPRISE_PROFILE
+    values = []
+    for key in profile.keys:
+        if key == 'input_voltage_b':
+            value = NoSuchObject()
+        elif key == 'battery_voltage':
+            value = Integer(2712)
+        elif key == 'status_power_source':
+            value = Integer(2)
+        else:
+            value = Integer(0)
+        values.append(value)
+
+    data = SNMPClient()._format_data(profile.raw_values(values))
+    assert data['battery_voltage'] == 271.2
+    assert data['input_voltage_l2'] == 0
+    assert data['power_source'] == 'Bypass'
+
+
+def _values(profile, **by_key):
+    return [by_key.get(key) for key in profile.keys]
+
+
+def test_decode_aplica_escalas_y_decodificadores_del_perfil():
+    profile = UPS_MIB_PROFILE
+    values = profile.decode(_values(profile, battery_voltage=Integer(2712), battery_status=Integer(2),
+                                    output_source=Integer(3), ident_model=OctetString('3000'),
+                                    input_frequency=OctetString('600'), input_voltage=NoSuchObject()))
+    assert values == {'battery_voltage': 271.2, 'battery_status': 'Normal', 'output_source': 'Normal',
+                      'ident_model': '3000', 'input_frequency': 60.0}
+    assert profile.decode_column('output_current', Integer(125)) == 12.5
+
+    data = UPSMIBClient('10.0.0.1')._format_data(dict(values, **{'output_current.2': 12.5}))
+    assert data['battery_voltage'] == 271.2 and data['input_frequency'] == 60.0
+    assert data['battery_status'] == 'Normal' and data['power_source'] == 'Normal'
+    assert data['model'] == '3000' and data['output_current_l2'] == 12.5 and data['input_voltage_l1'] == 0.0
+
+    data = MinimalSNMPClient()._format_minimal_data(MEGATEC_PROFILE.decode(
+        _values(MEGATEC_PROFILE, megatec_input_voltage=Integer(1232), megatec_batt_capacity=Integer(90),
+                megatec_version=OctetString('1.02'))))
+    assert data['input_voltage_l1'] == 123.2 and data['bateria_pct'] == 90.0 and data['serial'] == '1.02'
@@ -0,0 +1,138 @@
+"""
+Pruebas del simulador de flota UPS contra los clientes reales de polling.
+
+Uso:
+    pytest tests/test_ups_simulator.py -v
+"""
+
+import sys
+import os
+import asyncio
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from pymodbus.client import AsyncModbusTcpClient
+
+from app.services.modbus_read_plan import build_read_plan, decode_plan, execute_plan
+from app.services.snmp_batching import pdu_limits
+from app.services.snmp_runtime import SnmpRuntime
+from app.services.snmp_sessions import SnmpSessionRegistry
+from app.services.ups_simulator import Faults, Fleet
+from app.utils.modbus_registers import (
+    GROUP_ELECTRICAL, GROUP_ENVIRONMENT, GROUP_MODULES, GROUP_STATUS,
+)
+
+SNMP_PORT = 16300
+MODBUS_PORT = 16400
+ALL_GROUPS = frozenset({GROUP_ELECTRICAL, GROUP_STATUS, GROUP_ENVIRONMENT, GROUP_MODULES})
+
+
+@pytest.fixture
+def runtime():
+    runtime = SnmpRuntime('sim-test')
+    yield runtime
+    runtime.runtime.stop()
+
+
+async def _poll_snmp(runtime, row):
+    session = SnmpSessionRegistry(runtime).get(dict(row, id=row['port']))
+    if session.ups_type in ('ups_mib_standard', 'hybrid'):
+        return await session.client.get_ups_data()
+    return await session.client.get_ups_data(row['ip'])
+
+
+async def _modbus_client(row):
+    client = AsyncModbusTcpClient(row['ip'], port=row['port'], timeout=1, retries=0)
+    await client.connect()
+    return client
+
+
+def _with_fleet(runtime, fleet, body):
+    async def run():
+        await fleet.start()
+        try:
+            return await body(fleet.rows())
+        finally:
+            await fleet.stop()
+    return runtime.run(run(), timeout=60)
+
+
+def test_pollers_leen_la_flota(runtime):
+    fleet = Fleet(snmp=4, modbus=1, snmp_base_port=SNMP_PORT, modbus_base_port=MODBUS_PORT, seed=1)
+
+    async def body(rows):
+        snmp = [await _poll_snmp(runtime, row) for row in rows if row['protocolo'] == 'snmp']
+        client = await _modbus_client(rows[-1])
+
+        async def read(start, count):
+            response = await client.read_holding_registers(start, count, slave=1)
+            return None if response.isError() else response.registers
+        plan = build_read_plan(ALL_GROUPS)
+        try:
+            modbus = decode_plan(plan, await execute_plan(plan, read))
+        finally:
+            client.close()
+        return snmp, modbus
+
+    snmp, (data, status, online) = _with_fleet(runtime, fleet, body)
+    assert [row['ups_type'] for row in fleet.rows()[:4]] == [
+        'invt_minimal', 'invt_enterprise', 'ups_mib_standard', 'hybrid']
+    for result in snmp:
+        assert 200 < result['input_voltage_l1'] < 240
+    # UPS-MIB: líneas 2..3 por GETBULK
+    assert all(snmp[2][f'output_voltage_l{line}'] > 200 for line in (1, 2, 3))
+
+    assert online
+    assert 200 < data['input_voltage_a'] < 240 and 55 < data['output_frequency_a'] < 65
+    assert len(data['modules']) == 4
+    assert status['battery_status'] == 'Flotacion' and status['phase_config'] == '3/3'
+    assert fleet.stats()['requests'] == fleet.stats()['responses']
+
+
+def test_modos_de_falla(runtime):
+    fleet = Fleet(snmp=1, modbus=2, kinds=['megatec'], snmp_base_port=SNMP_PORT + 10,
+                  modbus_base_port=MODBUS_PORT + 10)
+    snmp_dev, down_dev, error_dev = fleet.devices
+    snmp_dev.faults.mode = 'reject_multi'
+    down_dev.faults.mode = 'down'
+    error_dev.faults.mode = 'error'
+
+    async def body(rows):
+        # Megatec v1 que rechaza GETs agrupados: el cliente cae a un OID por PDU
+        data = await _poll_snmp(runtime, rows[0])
+        limit = pdu_limits.get(rows[0]['ip'], rows[0]['port'])
+
+        client = await _modbus_client(rows[2])
+        try:
+            error = await client.read_holding_registers(100, 10, slave=1)
+        finally:
+            client.close()
+
+        reader = writer = None
+        try:
+            reader, writer = await asyncio.open_connection(rows[1]['ip'], rows[1]['port'])
+            closed = await asyncio.wait_for(reader.read(), 2) == b''
+        finally:
+            if writer:
+                writer.close()
+        return data, limit, error, closed
+
+    data, limit, error, closed = _with_fleet(runtime, fleet, body)
+    assert data and data['input_voltage'] > 200
+    assert limit.single_oid
+    assert error.isError() and error.exception_code == 0x04
+    assert closed
+
+
+def test_perdida_y_flap_deterministas():
+    lossy = Faults(loss=0.25, rng=random.Random(3))
+    dropped = sum(lossy.dropped() for _ in range(4000))
+    assert 800 < dropped < 1200
+
+    flap = Faults(mode='flap', flap_period=10)
+    assert not flap.down(now=5) and flap.down(now=15) and not flap.down(now=25)
+    assert Faults(latency=0.1, jitter=0.05).delay() >= 0.1
+    with pytest.raises(ValueError):
+        Faults(mode='lento')